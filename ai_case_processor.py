@@ -7,36 +7,68 @@ Processes cases without verdict.json and generates AI analysis using ALPR
 import os
 import sys
 import json
-import shutil
+import time
+import heapq
 import logging
+import sqlite3
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-import cv2
-import numpy as np
+from typing import Any, Dict, Iterator, List, Optional
+
+from atomic_write import FsyncBatch, atomic_write_json
+from blob_store import link_or_copy
+from ai_stats import STATS_FILE, StatsAggregator, case_contribution
+from change_feed import ChangeFeed
+from case_cache import CaseSummaryCache, get_default_cache
+from case_walker import walk_cases
+from day_pack import DayPack, iter_packs, read_case_file
+from plate_index import PLATE_INDEX_FILE, PlateIndex
+
+_STARTED_AT = time.perf_counter()
 
 # Add ALPR system to path
 sys.path.append('/home/rnd2/Desktop/radar_system_clean/Automatic-License-Plate-Recognition')
 
-try:
-    # Try to import the Jordanian ALPR system
-    sys.path.append('/home/rnd2/Desktop/radar_system_clean/Automatic-License-Plate-Recognition')
-    from jordanian_numbers_only_alpr import JordanianNumbersOnlyALPR
-    ALPR_AVAILABLE = True
-    ALPR_TYPE = "jordanian"
-except ImportError:
+# Read-only CLI commands should be ready within this budget (ms)
+STARTUP_BUDGET_MS = float(os.environ.get('AI_CLI_STARTUP_BUDGET_MS', '250'))
+# (stats, plate and offenders may build their state on first use, so they are not held to it)
+READ_ONLY_COMMANDS = ('list', 'cases', 'find', 'file')
+
+_alpr_probe: Optional[tuple] = None
+
+def detect_alpr_type() -> tuple:
+    """Probe the available ALPR system once: (ALPR_AVAILABLE, ALPR_TYPE)"""
+    global _alpr_probe
+    if _alpr_probe is not None:
+        return _alpr_probe
+    
     try:
-        # Fallback to fast_alpr
-        from fast_alpr.alpr import ALPR
-        from fast_alpr.base import ALPRResult
-        ALPR_AVAILABLE = True
-        ALPR_TYPE = "fast_alpr"
+        # Try to import the Jordanian ALPR system
+        import jordanian_numbers_only_alpr  # noqa: F401
+        _alpr_probe = (True, "jordanian")
     except ImportError:
-        # Only print warning if not being used as API (when sys.argv has specific commands)
-        if len(sys.argv) > 1 and sys.argv[1] in ['process', 'list', 'find']:
-            print("Warning: ALPR system not available. Using mock detection.")
-        ALPR_AVAILABLE = False
-        ALPR_TYPE = "mock"
+        try:
+            # Fallback to fast_alpr
+            import fast_alpr.alpr  # noqa: F401
+            _alpr_probe = (True, "fast_alpr")
+        except ImportError:
+            # Only print warning if not being used as API (when sys.argv has specific commands)
+            # (never on stdout when it carries JSON Lines)
+            if len(sys.argv) > 1 and sys.argv[1] in ['process', 'list', 'find'] and '--jsonl' not in sys.argv:
+                print("Warning: ALPR system not available. Using mock detection.")
+            _alpr_probe = (False, "mock")
+    return _alpr_probe
+
+def __getattr__(name: str):
+    # ALPR_AVAILABLE / ALPR_TYPE / MockALPR are resolved on first access, not at import
+    if name == 'ALPR_AVAILABLE':
+        return detect_alpr_type()[0]
+    if name == 'ALPR_TYPE':
+        return detect_alpr_type()[1]
+    if name == 'MockALPR':
+        from alpr_engine import MockALPR
+        return MockALPR
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Configure logging
 logging.basicConfig(
@@ -49,137 +81,113 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class MockALPR:
-    """Mock ALPR for testing when real ALPR is not available"""
-    def __init__(self):
-        # Realistic Jordanian plate patterns
-        self.jordanian_patterns = [
-            "1234567", "2345678", "3456789", "4567890", "5678901",
-            "6789012", "7890123", "8901234", "9012345", "0123456",
-            "1111111", "2222222", "3333333", "4444444", "5555555",
-            "1357924", "2468135", "9876543", "1122334", "5566778"
-        ]
-    
-    def predict(self, image_path: str) -> List[Dict]:
-        # Generate realistic Jordanian plate number based on image name
-        import hashlib
-        import random
-        
-        # Use image path to generate consistent results
-        hash_obj = hashlib.md5(str(image_path).encode())
-        hash_int = int(hash_obj.hexdigest()[:8], 16)
-        
-        # Select a pattern based on hash
-        pattern_idx = hash_int % len(self.jordanian_patterns)
-        base_plate = self.jordanian_patterns[pattern_idx]
-        
-        # Add some variation based on image name
-        image_name = Path(image_path).name
-        if 'camera001' in str(image_path):
-            # Camera 1 plates start with 1-3
-            plate_num = f"{random.choice(['1', '2', '3'])}{base_plate[1:]}"
-        elif 'camera002' in str(image_path):
-            # Camera 2 plates start with 4-6
-            plate_num = f"{random.choice(['4', '5', '6'])}{base_plate[1:]}"
-        else:
-            plate_num = base_plate
-            
-        # Format as Jordanian plate (7 digits, sometimes with dash)
-        if len(plate_num) == 7:
-            # Sometimes add dash for readability: 123-4567
-            if hash_int % 3 == 0:
-                formatted_plate = f"{plate_num[:3]}-{plate_num[3:]}"
-            else:
-                formatted_plate = plate_num
-        else:
-            formatted_plate = plate_num[:7]  # Ensure 7 digits max
-            
-        # Generate confidence based on image quality simulation
-        base_confidence = 0.75 + (hash_int % 20) / 100  # 0.75 to 0.94
-        
-        return [{
-            'plate': formatted_plate,
-            'confidence': round(base_confidence, 2),
-            'bbox': [100 + (hash_int % 50), 100 + (hash_int % 30), 200, 150]
-        }]
+# Image types picked up from case and ai directories
+CASE_IMAGE_EXTENSIONS = ('.jpg', '.png')
+
+def image_previews(ai_data: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Thumbnail and annotated preview keys (relative to .ai_previews) per image of a result"""
+    return [{'image': entry['image'], 'thumbnail': entry['thumbnail'], 'preview': entry['preview']}
+            for entry in ai_data.get('images', []) if entry.get('thumbnail')]
+
+def matches_search(search: str, case_id: str, ai_data: Dict[str, Any]) -> bool:
+    """Case-insensitive substring match on the case's plate number or case ID"""
+    search = search.lower()
+    return search in (ai_data.get('plate_number') or '').lower() or search in case_id.lower()
 
 class AICaseProcessor:
     """Main AI Case Processor class"""
     
-    def __init__(self, processing_inbox_path: str = "/srv/processing_inbox"):
+    def __init__(self, processing_inbox_path: str = "/srv/processing_inbox",
+                 cache: Optional[CaseSummaryCache] = None):
         self.processing_inbox_path = Path(processing_inbox_path)
-        self.alpr = None
-        self.init_alpr()
+        # Parsed ai.json files, shared process-wide unless a cache is passed in
+        self.cache = cache if cache is not None else get_default_cache()
+        # Running stats aggregates, updated by save_ai_json
+        self.stats = StatsAggregator(str(self.processing_inbox_path / STATS_FILE))
+        # Ordered log of completed results for downstream consumers
+        self.change_feed = ChangeFeed(str(self.processing_inbox_path))
+        # Plate -> case lookups, updated by save_ai_json
+        self.plate_index = PlateIndex(str(self.processing_inbox_path / PLATE_INDEX_FILE))
+        # ALPR is loaded on first use so read-only commands stay fast
+        self._engine = None
+        self._repeat_offenders = None
+    
+    @property
+    def engine(self):
+        if self._engine is None:
+            self.init_alpr()
+        return self._engine
+    
+    @property
+    def repeat_offenders(self):
+        """Streaming repeat-offender counts, fed from the change feed"""
+        if self._repeat_offenders is None:
+            from repeat_offenders import RepeatOffenderDetector
+            self._repeat_offenders = RepeatOffenderDetector(str(self.processing_inbox_path),
+                                                            change_feed=self.change_feed)
+        return self._repeat_offenders
+    
+    @property
+    def alpr(self):
+        return self.engine.backend
         
     def init_alpr(self):
-        """Initialize ALPR system"""
-        try:
-            if ALPR_AVAILABLE:
-                if ALPR_TYPE == "jordanian":
-                    self.alpr = JordanianNumbersOnlyALPR()
-                    logger.info("Jordanian ALPR system initialized successfully")
-                elif ALPR_TYPE == "fast_alpr":
-                    self.alpr = ALPR()
-                    logger.info("Fast ALPR system initialized successfully")
-                else:
-                    self.alpr = MockALPR()
-                    logger.info("Using Mock ALPR system")
-            else:
-                self.alpr = MockALPR()
-                logger.info("Using Mock ALPR system")
-        except Exception as e:
-            logger.error(f"Failed to initialize ALPR: {e}")
-            self.alpr = MockALPR()
-            logger.info("Falling back to Mock ALPR system")
+        """Initialize ALPR system (hot-swappable via <inbox>/.ai_backends/ai_case_processor.json)"""
+        from alpr_engine import ProcessingEngine
+        from backend_manager import ManagedBackend
+        from blob_store import BlobStore, blob_store_enabled
+        from previews import PreviewCache, previews_enabled
+        from resolution_policy import ResolutionPolicy
+        
+        alpr_available, alpr_type = detect_alpr_type()
+        backend_name = alpr_type if alpr_available else "mock"
+        backend = ManagedBackend(backend_name, str(self.processing_inbox_path), pool='ai_case_processor').load()
+        blobs = BlobStore(str(self.processing_inbox_path)) if blob_store_enabled() else None
+        previews = PreviewCache(str(self.processing_inbox_path)) if previews_enabled() else None
+        self._engine = ProcessingEngine(backend, image_extensions=CASE_IMAGE_EXTENSIONS,
+                                        resolution=ResolutionPolicy(str(self.processing_inbox_path)),
+                                        blobs=blobs, previews=previews)
+        logger.info(f"Using {self._engine.backend_name} ALPR backend")
+    
+    def close(self):
+        """Finish pending shadow evaluations and flush their stats and resolution profiles"""
+        if self._engine is not None:
+            self._engine.backend.close()
+            self._engine.resolution.save(force=True)
     
     def find_cases_with_verdict(self) -> List[Dict[str, Any]]:
         """Find all cases that HAVE verdict.json - ONLY process cases WITH verdict.json"""
-        cases_with_verdict = []
+        return list(self.iter_cases_with_verdict())
+    
+    def iter_cases_with_verdict(self) -> Iterator[Dict[str, Any]]:
+        """Yield the cases WITH verdict.json and images while walking the inbox"""
+        cases_with_verdict = 0
         cases_without_verdict_count = 0
         
         if not self.processing_inbox_path.exists():
             logger.warning(f"Processing inbox path does not exist: {self.processing_inbox_path}")
-            return cases_with_verdict
+            return
         
-        # Scan all camera directories
-        for camera_dir in self.processing_inbox_path.iterdir():
-            if not camera_dir.is_dir() or not camera_dir.name.startswith('camera'):
+        # Single scandir pass over camera/date/case directories
+        for case in walk_cases(self.processing_inbox_path, image_extensions=CASE_IMAGE_EXTENSIONS):
+            # CRITICAL: Only process cases that HAVE verdict.json
+            if not case.has_verdict:
+                cases_without_verdict_count += 1
+                logger.debug(f"SKIPPING case without verdict.json: {case.path}")
                 continue
-                
-            # Scan all date directories
-            for date_dir in camera_dir.iterdir():
-                if not date_dir.is_dir():
-                    continue
-                    
-                # Scan all case directories
-                for case_dir in date_dir.iterdir():
-                    if not case_dir.is_dir():
-                        continue
-                    
-                    verdict_file = case_dir / "verdict.json"
-                    
-                    # CRITICAL: Only process cases that HAVE verdict.json
-                    if not verdict_file.exists():
-                        cases_without_verdict_count += 1
-                        logger.debug(f"SKIPPING case without verdict.json: {case_dir}")
-                        continue
-                    
-                    # Only process cases WITH verdict.json
-                    # Find images in the case
-                    images = list(case_dir.glob("*.jpg")) + list(case_dir.glob("*.png"))
-                    if images:
-                        cases_with_verdict.append({
-                            'camera_id': camera_dir.name,
-                            'date': date_dir.name,
-                            'case_id': case_dir.name,
-                            'case_path': str(case_dir),
-                            'images': [str(img) for img in images],
-                            'image_count': len(images)
-                        })
+            
+            # Only process cases WITH verdict.json that contain images
+            if case.images:
+                cases_with_verdict += 1
+                yield case.to_case_info()
         
-        logger.info(f"Found {len(cases_with_verdict)} cases WITH verdict.json (will be processed)")
+        logger.info(f"Found {cases_with_verdict} cases WITH verdict.json (will be processed)")
         logger.info(f"Skipped {cases_without_verdict_count} cases WITHOUT verdict.json (not processed)")
-        return cases_with_verdict
+        # A complete walk is an exact pending count; get_stats reads it from the aggregates
+        try:
+            self.stats.set_pending(cases_with_verdict)
+        except OSError as e:
+            logger.warning(f"Could not record the pending count: {e}")
     
     def create_ai_folder(self, case_path: str) -> str:
         """Create AI folder inside case directory"""
@@ -192,154 +200,61 @@ class AICaseProcessor:
         
         return str(ai_dir)
     
-    def process_images_with_alpr(self, images: List[str], ai_folder: str) -> Dict[str, Any]:
-        """Process images with ALPR and return detection results"""
-        results = {
-            'processed_at': datetime.now().isoformat(),
-            'total_images': len(images),
-            'detections': [],
-            'best_detection': None,
-            'plate_number': None,
-            'confidence': 0.0
-        }
-        
-        best_confidence = 0.0
-        best_plate = None
-        
+    def copy_images_to_ai_folder(self, images: List[str], ai_folder: str):
+        """Link case images into the AI folder (skipped when already up to date)"""
         for image_path in images:
             try:
-                # Copy image to AI folder for processing
-                image_name = Path(image_path).name
-                ai_image_path = Path(ai_folder) / image_name
-                shutil.copy2(image_path, ai_image_path)
-                
-                # Process with ALPR
-                if ALPR_TYPE == "jordanian":
-                    # Use Jordanian ALPR system
-                    try:
-                        alpr_results = self.alpr.detect_plate(str(ai_image_path))
-                        detections = []
-                        
-                        if alpr_results and 'detections' in alpr_results:
-                            for detection in alpr_results['detections']:
-                                plate_text = detection.get('plate', 'UNKNOWN')
-                                confidence = detection.get('confidence', 0.5)
-                                
-                                detection_data = {
-                                    'image': image_name,
-                                    'plate': plate_text,
-                                    'confidence': confidence,
-                                    'bbox': detection.get('bbox', [0, 0, 100, 100])
-                                }
-                                detections.append(detection_data)
-                                
-                                # Track best detection
-                                if confidence > best_confidence:
-                                    best_confidence = confidence
-                                    best_plate = plate_text
-                        else:
-                            # Single detection format
-                            plate_text = alpr_results.get('plate', 'UNKNOWN') if alpr_results else 'UNKNOWN'
-                            confidence = alpr_results.get('confidence', 0.5) if alpr_results else 0.5
-                            
-                            detection_data = {
-                                'image': image_name,
-                                'plate': plate_text,
-                                'confidence': confidence,
-                                'bbox': [0, 0, 100, 100]
-                            }
-                            detections.append(detection_data)
-                            
-                            if confidence > best_confidence:
-                                best_confidence = confidence
-                                best_plate = plate_text
-                                
-                    except Exception as e:
-                        logger.error(f"Jordanian ALPR failed for {image_name}: {e}")
-                        # Fallback to mock detection
-                        detections = [{
-                            'image': image_name,
-                            'plate': f"ERR-{image_name[:5]}",
-                            'confidence': 0.1,
-                            'bbox': [0, 0, 100, 100],
-                            'error': str(e)
-                        }]
-                        
-                elif ALPR_TYPE == "fast_alpr" and hasattr(self.alpr, 'predict'):
-                    # Use fast ALPR
-                    image = cv2.imread(str(ai_image_path))
-                    if image is not None:
-                        alpr_results = self.alpr.predict(image)
-                        detections = []
-                        
-                        for result in alpr_results:
-                            if hasattr(result, 'ocr') and result.ocr:
-                                plate_text = result.ocr.text
-                                confidence = result.ocr.confidence
-                            else:
-                                # Fallback for different ALPR result formats
-                                plate_text = str(result).split()[0] if str(result) else "UNKNOWN"
-                                confidence = 0.5
-                            
-                            detection = {
-                                'image': image_name,
-                                'plate': plate_text,
-                                'confidence': confidence,
-                                'bbox': getattr(result.detection, 'bbox', [0, 0, 100, 100]) if hasattr(result, 'detection') else [0, 0, 100, 100]
-                            }
-                            detections.append(detection)
-                            
-                            # Track best detection
-                            if confidence > best_confidence:
-                                best_confidence = confidence
-                                best_plate = plate_text
-                else:
-                    # Use mock ALPR
-                    mock_results = self.alpr.predict(str(ai_image_path))
-                    detections = []
-                    
-                    for mock_result in mock_results:
-                        detection = {
-                            'image': image_name,
-                            'plate': mock_result['plate'],
-                            'confidence': mock_result['confidence'],
-                            'bbox': mock_result['bbox']
-                        }
-                        detections.append(detection)
-                        
-                        if mock_result['confidence'] > best_confidence:
-                            best_confidence = mock_result['confidence']
-                            best_plate = mock_result['plate']
-                
-                results['detections'].extend(detections)
-                
+                ai_image_path = Path(ai_folder) / Path(image_path).name
+                src_stat = os.stat(image_path)
+                if ai_image_path.exists():
+                    dst_stat = ai_image_path.stat()
+                    if (dst_stat.st_size == src_stat.st_size and
+                            int(dst_stat.st_mtime) == int(src_stat.st_mtime)):
+                        continue
+                link_or_copy(image_path, ai_image_path)
             except Exception as e:
-                logger.error(f"Error processing image {image_path}: {e}")
-                # Add error detection
-                results['detections'].append({
-                    'image': Path(image_path).name,
-                    'plate': 'ERROR',
-                    'confidence': 0.0,
-                    'error': str(e)
-                })
-        
-        # Set best detection
-        if best_plate:
-            results['best_detection'] = {
-                'plate': best_plate,
-                'confidence': best_confidence
-            }
-            results['plate_number'] = best_plate
-            results['confidence'] = best_confidence
-        
+                logger.error(f"Error copying image {image_path}: {e}")
+    
+    def process_images_with_alpr(self, images: List[str], ai_folder: str) -> Dict[str, Any]:
+        """Process images with ALPR and return detection results"""
+        # After processing, so the copies link to the deduplicated frames
+        results = self.engine.process_images(images)
+        self.copy_images_to_ai_folder(images, ai_folder)
         return results
     
     def save_ai_json(self, ai_folder: str, results: Dict[str, Any]) -> str:
         """Save AI processing results to ai.json"""
         ai_json_path = Path(ai_folder) / "ai.json"
         
-        with open(ai_json_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        # Previous contribution of this case to the stats aggregates
+        self.ensure_stats()
+        old_contribution = None
+        if ai_json_path.exists():
+            try:
+                old_contribution = case_contribution(self.cache.get(ai_json_path))
+            except Exception as e:
+                logger.warning(f"Could not read previous AI results {ai_json_path}: {e}")
+        
+        atomic_write_json(ai_json_path, results)
+        self.cache.invalidate(ai_json_path)
+        self.stats.update(old_contribution, case_contribution(results))
+        try:
+            self.ensure_plate_index()
+            self.plate_index.update(results.get('case_path', str(Path(ai_folder).parent)),
+                                    str(ai_json_path), results)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to update plate index: {e}")
+        
+        try:
+            self.change_feed.append(
+                results.get('case_path', str(Path(ai_folder).parent)),
+                str(ai_json_path),
+                plate=results.get('plate_number'),
+                confidence=results.get('confidence'),
+                source='ai_case_processor'
+            )
+        except OSError as e:
+            logger.error(f"Failed to append to change feed: {e}")
         
         logger.info(f"Saved AI results to: {ai_json_path}")
         return str(ai_json_path)
@@ -351,8 +266,9 @@ class AICaseProcessor:
         # Create AI folder
         ai_folder = self.create_ai_folder(case_info['case_path'])
         
-        # Process images with ALPR
-        results = self.process_images_with_alpr(case_info['images'], ai_folder)
+        # Run the engine (reuses a current result for this backend), then link the images
+        results = dict(self.engine.process_case(case_info))
+        self.copy_images_to_ai_folder(case_info['images'], ai_folder)
         
         # Add case metadata
         results.update({
@@ -371,95 +287,275 @@ class AICaseProcessor:
     
     def process_all_cases(self) -> List[Dict[str, Any]]:
         """Process all cases WITH verdict.json"""
-        cases_with_verdict = self.find_cases_with_verdict()
-        processed_results = []
-        
-        for case_info in cases_with_verdict:
-            try:
-                result = self.process_single_case(case_info)
-                processed_results.append(result)
-                logger.info(f"Successfully processed case: {case_info['case_id']}")
-            except Exception as e:
-                logger.error(f"Failed to process case {case_info['case_id']}: {e}")
-                processed_results.append({
-                    'case_id': case_info['case_id'],
-                    'error': str(e),
-                    'status': 'failed'
-                })
+        return list(self.iter_process_all_cases())
+    
+    def iter_process_all_cases(self) -> Iterator[Dict[str, Any]]:
+        """
+        Process all cases WITH verdict.json, yielding each result as soon as
+        the case is done. A result may be yielded before its directory fsync.
+        """
+        # Result writes are atomic; their fsyncs are group-committed across cases
+        with FsyncBatch() as batch:
+            for case_info in self.iter_cases_with_verdict():
+                try:
+                    result = self.process_single_case(case_info)
+                    logger.info(f"Successfully processed case: {case_info['case_id']}")
+                except Exception as e:
+                    logger.error(f"Failed to process case {case_info['case_id']}: {e}")
+                    result = {
+                        'case_id': case_info['case_id'],
+                        'error': str(e),
+                        'status': 'failed'
+                    }
+                # Callers may open the result files as soon as they get the result
+                batch.publish()
+                yield result
         
-        return processed_results
+        # Fold the new results into the repeat-offender windows
+        try:
+            self.repeat_offenders.sync()
+        except OSError as e:
+            logger.error(f"Failed to update repeat-offender counts: {e}")
     
     def get_processed_cases(self, camera_filter: Optional[str] = None, 
                           date_filter: Optional[str] = None,
-                          search_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+                          search_filter: Optional[str] = None,
+                          plate_mode: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get all processed cases with optional filters"""
-        processed_cases = []
-        
+        return list(self.iter_processed_cases(camera_filter, date_filter, search_filter, plate_mode))
+    
+    def iter_processed_cases(self, camera_filter: Optional[str] = None,
+                             date_filter: Optional[str] = None,
+                             search_filter: Optional[str] = None,
+                             plate_mode: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield processed cases in (camera, date, case) order as they are read,
+        so callers can stream them without holding the whole inbox in memory.
+
+        search_filter is a substring of the plate number or case ID. With a
+        plate_mode (exact, prefix, partial or fuzzy) the plate side is looked
+        up in the plate index instead, so non-matching ai.json files are never
+        parsed; case IDs are still matched by substring.
+        """
         if not self.processing_inbox_path.exists():
-            return processed_cases
+            return
+        
+        plate_matches = None
+        if search_filter and plate_mode:
+            plate_matches = self.find_case_paths_by_plate(search_filter, plate_mode)
         
-        # Scan all camera directories
-        for camera_dir in self.processing_inbox_path.iterdir():
-            if not camera_dir.is_dir() or not camera_dir.name.startswith('camera'):
+        try:
+            # Hot cases and packed days are both sorted, so merging keeps the order
+            yield from heapq.merge(
+                self._iter_hot_cases(camera_filter, date_filter, search_filter, plate_matches),
+                self._iter_packed_cases(camera_filter, date_filter, search_filter, plate_matches),
+                key=lambda c: (c['camera_id'], c['date'], c['case_id']))
+        finally:
+            try:
+                self.cache.save_disk()
+            except OSError as e:
+                logger.warning(f"Failed to persist case cache: {e}")
+    
+    def _iter_hot_cases(self, camera_filter: Optional[str], date_filter: Optional[str],
+                        search_filter: Optional[str], plate_matches) -> Iterator[Dict[str, Any]]:
+        """Processed cases of date folders in the inbox"""
+        # Single scandir pass; ai/ is listed once per case to find ai.json and images
+        for case in walk_cases(self.processing_inbox_path,
+                               camera_filter=camera_filter,
+                               date_filter=date_filter,
+                               image_extensions=CASE_IMAGE_EXTENSIONS,
+                               scan_ai=True):
+            if not case.has_ai_file("ai.json"):
                 continue
             
-            # Apply camera filter
-            if camera_filter and camera_dir.name != camera_filter:
-                continue
-                
-            # Scan all date directories
-            for date_dir in camera_dir.iterdir():
-                if not date_dir.is_dir():
-                    continue
-                
-                # Apply date filter
-                if date_filter and date_dir.name != date_filter:
+            # Index search: decided before ai.json is read
+            if plate_matches is not None:
+                if (case.path not in plate_matches and
+                    search_filter.lower() not in case.case_id.lower()):
                     continue
-                    
-                # Scan all case directories
-                for case_dir in date_dir.iterdir():
-                    if not case_dir.is_dir():
+            
+            ai_dir = Path(case.ai_path)
+            try:
+                ai_data = self.cache.get(ai_dir / "ai.json")
+            except Exception as e:
+                logger.error(f"Error reading AI data for case {case.case_id}: {e}")
+                continue
+            
+            # Apply search filter
+            if plate_matches is None and search_filter and not matches_search(search_filter, case.case_id, ai_data):
+                continue
+            
+            yield {
+                'camera_id': case.camera_id,
+                'date': case.date,
+                'case_id': case.case_id,
+                'case_path': case.path,
+                'ai_folder': str(ai_dir),
+                # Originals stand in for ai/ copies pruned by retention
+                'ai_images': list(case.ai_images) or list(case.images),
+                'previews': image_previews(ai_data),
+                'plate_number': ai_data.get('plate_number'),
+                'confidence': ai_data.get('confidence', 0.0),
+                'processed_at': ai_data.get('processed_at'),
+                'detection_count': len(ai_data.get('detections', [])),
+                'ai_data': ai_data
+            }
+
+    def _iter_packed_cases(self, camera_filter: Optional[str], date_filter: Optional[str],
+                           search_filter: Optional[str], plate_matches) -> Iterator[Dict[str, Any]]:
+        """Processed cases of packed days, read from the pack without extracting it"""
+        for camera_id, day, pack_file in iter_packs(str(self.processing_inbox_path), camera_filter, date_filter,
+                                                      camera_prefix='camera'):
+            try:
+                pack = DayPack(pack_file)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error opening day pack {pack_file}: {e}")
+                continue
+            with pack:
+                for case_id in pack.cases():
+                    if f"{case_id}/ai/ai.json" not in pack:
                         continue
-                    
-                    ai_dir = case_dir / "ai"
-                    ai_json_file = ai_dir / "ai.json"
-                    
-                    if ai_json_file.exists():
-                        try:
-                            with open(ai_json_file, 'r', encoding='utf-8') as f:
-                                ai_data = json.load(f)
-                            
-                            # Apply search filter
-                            if search_filter:
-                                plate_number = ai_data.get('plate_number', '').lower()
-                                case_id = case_dir.name.lower()
-                                if (search_filter.lower() not in plate_number and 
-                                    search_filter.lower() not in case_id):
-                                    continue
-                            
-                            # Get AI processed images
-                            ai_images = list(ai_dir.glob("*.jpg")) + list(ai_dir.glob("*.png"))
-                            
-                            case_info = {
-                                'camera_id': camera_dir.name,
-                                'date': date_dir.name,
-                                'case_id': case_dir.name,
-                                'case_path': str(case_dir),
-                                'ai_folder': str(ai_dir),
-                                'ai_images': [str(img) for img in ai_images],
-                                'plate_number': ai_data.get('plate_number'),
-                                'confidence': ai_data.get('confidence', 0.0),
-                                'processed_at': ai_data.get('processed_at'),
-                                'detection_count': len(ai_data.get('detections', [])),
-                                'ai_data': ai_data
-                            }
-                            
-                            processed_cases.append(case_info)
-                            
-                        except Exception as e:
-                            logger.error(f"Error reading AI data for case {case_dir.name}: {e}")
-        
-        return processed_cases
+                    case_path = str(self.processing_inbox_path / camera_id / day / case_id)
+                    if plate_matches is not None:
+                        if (case_path not in plate_matches and
+                            search_filter.lower() not in case_id.lower()):
+                            continue
+                    try:
+                        ai_data = json.loads(pack.view(f"{case_id}/ai/ai.json").tobytes())
+                    except ValueError as e:
+                        logger.error(f"Error reading AI data for case {case_id}: {e}")
+                        continue
+                    if plate_matches is None and search_filter and not matches_search(search_filter, case_id, ai_data):
+                        continue
+                    # The ai/ copies, or the originals for packs written without them
+                    files = pack.case_files(case_id)
+                    images = sorted(name for name in files
+                                    if name.startswith(f"{case_id}/ai/") and name.count('/') == 2
+                                    and name.lower().endswith(CASE_IMAGE_EXTENSIONS))
+                    images = images or sorted(name for name in files
+                                              if name.count('/') == 1 and name.lower().endswith(CASE_IMAGE_EXTENSIONS))
+                    yield {
+                        'camera_id': camera_id,
+                        'date': day,
+                        'case_id': case_id,
+                        'case_path': case_path,
+                        'ai_folder': os.path.join(case_path, 'ai'),
+                        'ai_images': [str(self.processing_inbox_path / camera_id / day / name) for name in images],
+                        'previews': image_previews(ai_data),
+                        'plate_number': ai_data.get('plate_number'),
+                        'confidence': ai_data.get('confidence', 0.0),
+                        'processed_at': ai_data.get('processed_at'),
+                        'detection_count': len(ai_data.get('detections', [])),
+                        'ai_data': ai_data,
+                        'packed': str(pack_file)
+                    }
+    
+    def read_case_file(self, path: str) -> bytes:
+        """Bytes of a case file, from the hot tree or its day pack"""
+        return read_case_file(str(self.processing_inbox_path), path)
+
+    def ensure_stats(self):
+        """Build the stats aggregates from existing ai.json files if missing"""
+        if not self.stats.exists() and self.processing_inbox_path.exists():
+            self.rebuild_stats()
+    
+    def rebuild_stats(self):
+        """Recompute the stats aggregates by reading every ai.json"""
+        self.stats.rebuild(case_contribution(dict(case['ai_data'],
+                                                  camera_id=case['camera_id'],
+                                                  date=case['date']))
+                           for case in self.iter_processed_cases())
+    
+    def ensure_plate_index(self):
+        """Build the plate index from existing result files if missing"""
+        if not self.plate_index.exists() and self.processing_inbox_path.exists():
+            self.rebuild_plate_index()
+    
+    def rebuild_plate_index(self):
+        """Recompute the plate index from every ai.json / ai_detection_results.json, packed days included"""
+        names = ("ai.json", "ai_detection_results.json")
+
+        def results():
+            hot = set()
+            for case in walk_cases(self.processing_inbox_path, scan_ai=True):
+                hot.add(case.path)
+                for name in names:
+                    if not case.has_ai_file(name):
+                        continue
+                    path = os.path.join(case.ai_path, name)
+                    try:
+                        yield case.path, path, self.cache.get(path)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Skipping unreadable result {path}: {e}")
+            for camera_id, day, pack_file in iter_packs(str(self.processing_inbox_path), camera_prefix='camera'):
+                try:
+                    with DayPack(pack_file) as pack:
+                        for case_id in pack.cases():
+                            case_path = str(self.processing_inbox_path / camera_id / day / case_id)
+                            if case_path in hot:
+                                continue
+                            for name in names:
+                                if f"{case_id}/ai/{name}" in pack:
+                                    yield (case_path, os.path.join(case_path, 'ai', name),
+                                           json.loads(pack.view(f"{case_id}/ai/{name}").tobytes()))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable day pack {pack_file}: {e}")
+        self.plate_index.rebuild(results())
+    
+    def find_cases_by_plate(self, plate: str, mode: str = 'exact',
+                            limit: Optional[int] = None, max_distance: int = 1) -> List[Dict[str, Any]]:
+        """
+        Cases whose results contain a plate (mode: exact, prefix, partial or
+        fuzzy; fuzzy matches are within max_distance OCR edits)
+        """
+        self.ensure_plate_index()
+        return self.plate_index.lookup(plate, mode, limit, max_distance)
+    
+    def find_case_paths_by_plate(self, search: str, mode: str = 'partial') -> set:
+        """Case paths with a plate matching search (mode as in find_cases_by_plate)"""
+        self.ensure_plate_index()
+        return self.plate_index.case_paths(search, mode)
+    
+    def get_repeat_offenders(self) -> List[Dict[str, Any]]:
+        """Plates seen in too many cases within the sliding window"""
+        self.repeat_offenders.sync()
+        return self.repeat_offenders.flagged()
+    
+    def count_pending_cases(self) -> int:
+        """Count cases WITH verdict.json and images and record the count (directory walk)"""
+        count = sum(1 for case in walk_cases(self.processing_inbox_path, image_extensions=CASE_IMAGE_EXTENSIONS)
+                    if case.has_verdict and case.images)
+        self.stats.set_pending(count)
+        return count
+    
+    def get_stats(self, include_pending: bool = False) -> Dict[str, Any]:
+        """
+        AI processing statistics from the running aggregates; never walks the
+        tree. The aggregates are built on the first result write or by
+        'stats --rebuild'. The pending count is the last exact count (taken by
+        each full walk) adjusted by ingested and removed cases since.
+        """
+        stats = self.stats.summary()
+        if not include_pending:
+            stats.pop('total_pending')
+            stats.pop('pending_counted_at')
+        return stats
+
+def check_startup_budget(command: str):
+    """Warn when a read-only command took longer than STARTUP_BUDGET_MS to get ready"""
+    startup_ms = (time.perf_counter() - _STARTED_AT) * 1000
+    if command in READ_ONLY_COMMANDS and startup_ms > STARTUP_BUDGET_MS:
+        logger.warning(f"Startup for '{command}' took {startup_ms:.0f}ms (budget {STARTUP_BUDGET_MS:.0f}ms)")
+    else:
+        logger.debug(f"Startup for '{command}' took {startup_ms:.0f}ms")
+    return startup_ms
+
+def write_json_line(record: Dict[str, Any], out=None):
+    """Write one JSON Lines record and flush it, so the reader gets it right away"""
+    out = out or sys.stdout
+    out.write(json.dumps(record, ensure_ascii=False, default=str))
+    out.write('\n')
+    out.flush()
 
 def main():
     """Main function for command line usage"""
@@ -467,18 +563,53 @@ def main():
     
     if len(sys.argv) > 1:
         command = sys.argv[1]
+        check_startup_budget(command)
         
-        if command == "process":
+        if command == "process" and "--jsonl" in sys.argv:
+            # One {"result": ...} line per case as it finishes, then {"summary": ...}
+            count = 0
+            for result in processor.iter_process_all_cases():
+                write_json_line({'result': result})
+                count += 1
+            processor.close()
+            write_json_line({'summary': {'processed_count': count, 'success': True}})
+            
+        elif command == "process":
             # Process all cases without verdict.json
-            results = processor.process_all_cases()
-            print(f"Processed {len(results)} cases")
+            count = sum(1 for _ in processor.iter_process_all_cases())
+            processor.close()
+            print(f"Processed {count} cases")
+            
+        elif command == "list" and "--jsonl" in sys.argv:
+            # One {"case": ...} line per case as it is read, then {"summary": ...}
+            count = 0
+            for case in processor.iter_processed_cases():
+                write_json_line({'case': case})
+                count += 1
+            write_json_line({'summary': {'total': count}})
             
         elif command == "list":
-            # List all processed cases
-            cases = processor.get_processed_cases()
-            print(f"Found {len(cases)} processed cases:")
-            for case in cases:
-                print(f"  {case['camera_id']}/{case['date']}/{case['case_id']} - {case['plate_number']} ({case['confidence']:.2f})")
+            # List all processed cases (the header needs the count, so rows are formatted first)
+            rows = [f"  {case['camera_id']}/{case['date']}/{case['case_id']} - {case['plate_number']} ({case['confidence']:.2f})"
+                    for case in processor.iter_processed_cases()]
+            print(f"Found {len(rows)} processed cases:")
+            for row in rows:
+                print(row)
+            
+        elif command == "cases":
+            # One {"case": ...} line per case, then {"summary": ...}:
+            # cases [camera] [date] [search] [offset] [limit] [plate_mode] (empty string = no filter)
+            args = (sys.argv[2:] + [''] * 6)[:6]
+            camera, date, search = (arg or None for arg in args[:3])
+            offset = int(args[3] or 0)
+            limit = int(args[4]) if args[4] else None
+            total = 0
+            for case in processor.iter_processed_cases(camera, date, search, args[5] or None):
+                if total >= offset and (limit is None or total < offset + limit):
+                    write_json_line({'case': case})
+                total += 1
+            write_json_line({'summary': {'total': total, 'offset': offset, 'limit': limit,
+                                         'has_more': limit is not None and offset + limit < total}})
                 
         elif command == "find":
             # Find cases with verdict.json
@@ -486,11 +617,37 @@ def main():
             print(f"Found {len(cases)} cases with verdict.json:")
             for case in cases:
                 print(f"  {case['camera_id']}/{case['date']}/{case['case_id']} - {case['image_count']} images")
+                
+        elif command == "stats":
+            # Print precomputed statistics as JSON; --rebuild recomputes them from the tree first
+            if '--rebuild' in sys.argv:
+                processor.rebuild_stats()
+                processor.count_pending_cases()
+            print(json.dumps(processor.get_stats(include_pending=True), ensure_ascii=False))
+            
+        elif command == "plate" and len(sys.argv) > 2:
+            # Look up cases by plate: plate <text> [exact|prefix|partial|fuzzy [max_distance]]
+            mode = sys.argv[3] if len(sys.argv) > 3 else 'exact'
+            max_distance = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+            print(json.dumps(processor.find_cases_by_plate(sys.argv[2], mode, max_distance=max_distance),
+                             ensure_ascii=False))
+            
+        elif command == "offenders":
+            # Plates flagged as repeat offenders in the current window
+            print(json.dumps(processor.get_repeat_offenders(), ensure_ascii=False))
+            
+        elif command == "file" and len(sys.argv) > 2:
+            # Raw bytes of a case file, also when its day is packed
+            try:
+                sys.stdout.buffer.write(processor.read_case_file(sys.argv[2]))
+            except FileNotFoundError:
+                print(f"File not found: {sys.argv[2]}", file=sys.stderr)
+                sys.exit(1)
         else:
-            print("Usage: python ai_case_processor.py [process|list|find]")
+            print("Usage: python ai_case_processor.py [process [--jsonl]|list [--jsonl]|cases [camera] [date] [search] [offset] [limit]|find|stats [--rebuild]|offenders|plate <text> [exact|prefix|partial|fuzzy [k]]|file <path>]")
     else:
         print("AI Case Processor")
-        print("Usage: python ai_case_processor.py [process|list|find]")
+        print("Usage: python ai_case_processor.py [process [--jsonl]|list [--jsonl]|cases [camera] [date] [search] [offset] [limit]|find|stats [--rebuild]|offenders|plate <text> [exact|prefix|partial|fuzzy [k]]|file <path>]")
 
 if __name__ == "__main__":
     main()
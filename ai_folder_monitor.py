@@ -9,12 +9,13 @@ import sys
 import time
 import logging
 from pathlib import Path
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
 
 # Add AI processor to path
 sys.path.append('/home/rnd2/Desktop/radar_system_clean')
-from ai_case_processor import AICaseProcessor
+from ai_case_processor import AICaseProcessor, CASE_IMAGE_EXTENSIONS
+from case_walker import scan_case
+from case_readiness import EMPTY, check_case
+from inbox_watcher import InboxWatcher
 
 # Configure logging
 logging.basicConfig(
@@ -27,58 +28,58 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class CaseHandler(FileSystemEventHandler):
-    """Handles file system events for new cases"""
+class CaseHandler:
+    """Handles case folders reported by the InboxWatcher"""
     
     def __init__(self):
         self.processor = AICaseProcessor()
         self.processed_cases = set()
+        # Set by main; asked to re-check cases whose photos are still settling
+        self.watcher = None
         
-    def on_created(self, event):
-        """Handle file/directory creation events"""
-        if event.is_directory:
-            return
-            
-        # Check if it's a verdict.json file
-        if event.src_path.endswith('verdict.json'):
-            case_dir = Path(event.src_path).parent
-            case_id = case_dir.name
-            
-            # Avoid processing the same case multiple times
-            if str(case_dir) in self.processed_cases:
-                return
-                
-            logger.info(f"🔍 New verdict.json detected: {case_dir}")
-            
-            # Wait a moment for file to be fully written
-            time.sleep(2)
+    def on_case(self, case_path: str) -> bool:
+        """Process a case once its verdict.json manifest is satisfied; True when done with it"""
+        case_dir = Path(case_path)
+        case_id = case_dir.name
+        
+        # Avoid processing the same case multiple times
+        if str(case_dir) in self.processed_cases:
+            return True
+        
+        # Every photo listed in verdict.json must have fully arrived
+        readiness = check_case(case_dir, image_extensions=CASE_IMAGE_EXTENSIONS)
+        if readiness.state == EMPTY:
+            logger.warning(f"⚠️ No photos listed in case: {case_id}")
+            return True
+        if not readiness.ready:
+            if readiness.retry_after is not None and self.watcher is not None:
+                self.watcher.recheck(case_path, readiness.retry_after)
+            return False
+        
+        case = scan_case(case_dir, image_extensions=CASE_IMAGE_EXTENSIONS)
+        if case.has_verdict:
+            logger.info(f"🔍 Complete case detected: {case_dir} ({readiness.reason})")
             
             # Check if this case has images
-            images = list(case_dir.glob("*.jpg")) + list(case_dir.glob("*.png"))
-            if images:
-                logger.info(f"📸 Found {len(images)} images in case: {case_id}")
+            if case.images:
+                logger.info(f"📸 Found {len(case.images)} images in case: {case_id}")
                 
                 # Process the case
                 try:
-                    case_info = {
-                        'camera_id': case_dir.parent.parent.name,
-                        'date': case_dir.parent.name,
-                        'case_id': case_id,
-                        'case_path': str(case_dir),
-                        'images': [str(img) for img in images],
-                        'image_count': len(images)
-                    }
+                    case_info = case.to_case_info()
                     
                     result = self.processor.process_single_case(case_info)
                     self.processed_cases.add(str(case_dir))
                     
                     logger.info(f"✅ Successfully processed case: {case_id}")
                     logger.info(f"🎯 Detected plate: {result.get('plate_number', 'None')} (confidence: {result.get('confidence', 0):.2f})")
+                    return True
                     
                 except Exception as e:
                     logger.error(f"❌ Failed to process case {case_id}: {e}")
             else:
                 logger.warning(f"⚠️ No images found in case: {case_id}")
+        return False
 
 def main():
     """Main monitoring function"""
@@ -91,22 +92,21 @@ def main():
     logger.info(f"🚀 Starting AI folder monitor for: {processing_inbox}")
     logger.info("👀 Watching for new cases with verdict.json...")
     
-    # Create event handler and observer
+    # Create case handler and watch the active date folders
     event_handler = CaseHandler()
-    observer = Observer()
-    observer.schedule(event_handler, processing_inbox, recursive=True)
+    watcher = InboxWatcher(processing_inbox, event_handler.on_case)
+    event_handler.watcher = watcher
     
     # Start monitoring
-    observer.start()
+    watcher.start()
     
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         logger.info("🛑 Stopping AI folder monitor...")
-        observer.stop()
     
-    observer.join()
+    watcher.stop()
     logger.info("✅ AI folder monitor stopped")
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+AI Statistics Aggregates for Radar System
+Running per-camera/per-date counters updated whenever ai.json is written
+"""
+
+import os
+import json
+import fcntl
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from atomic_write import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+STATS_FILE = '.ai_stats.json'
+
+def case_contribution(ai_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The part of an ai.json that the aggregates depend on"""
+    if not ai_data or not ai_data.get('camera_id'):
+        return None
+    return {
+        'camera_id': ai_data.get('camera_id'),
+        'date': ai_data.get('date'),
+        'confidence': float(ai_data.get('confidence') or 0.0),
+        'plate_detected': bool(ai_data.get('plate_number'))
+    }
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {'count': 0, 'confidence_sum': 0.0, 'plate_detections': 0}
+
+def _empty_aggregates() -> Dict[str, Any]:
+    return {
+        'total': _empty_bucket(),
+        'cameras': {},
+        'dates': {},
+        # Cases with verdict.json and images; None until first counted
+        'pending': None,
+        'pending_counted_at': None,
+        'updated_at': None
+    }
+
+def _apply(bucket: Dict[str, Any], contribution: Dict[str, Any], sign: int):
+    bucket['count'] += sign
+    bucket['confidence_sum'] += sign * contribution['confidence']
+    bucket['plate_detections'] += sign * int(contribution['plate_detected'])
+
+class StatsAggregator:
+    """
+    Persistent running aggregates stored next to the inbox.
+
+    Each ai.json write replaces that case's old contribution with the new one,
+    so updates are O(1) and reading the stats never touches the case tree.
+    Updates hold an flock so several processors can share one file.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.fspath(path)
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return _empty_aggregates()
+
+    def _write(self, aggregates: Dict[str, Any]):
+        aggregates['updated_at'] = datetime.now().isoformat()
+        atomic_write_json(self.path, aggregates, indent=None, batch=False)
+
+    def update(self, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """Replace a case's old contribution (if any) with its new one"""
+        if old == new:
+            return
+        with self._locked():
+            aggregates = self.load()
+            for contribution, sign in ((old, -1), (new, 1)):
+                if not contribution:
+                    continue
+                _apply(aggregates['total'], contribution, sign)
+                for group, key in (('cameras', contribution['camera_id']), ('dates', contribution['date'])):
+                    bucket = aggregates[group].setdefault(key, _empty_bucket())
+                    _apply(bucket, contribution, sign)
+                    if bucket['count'] <= 0:
+                        del aggregates[group][key]
+            self._write(aggregates)
+
+    def set_pending(self, count: int):
+        """Record an exact pending count, taken by a walk that happened anyway"""
+        with self._locked():
+            aggregates = self.load()
+            aggregates['pending'] = count
+            aggregates['pending_counted_at'] = datetime.now().isoformat()
+            self._write(aggregates)
+
+    def add_pending(self, delta: int):
+        """Adjust the pending count for ingested (+) or removed (-) cases"""
+        if not delta:
+            return
+        with self._locked():
+            aggregates = self.load()
+            if aggregates.get('pending') is None:
+                return  # never counted; the next walk sets it
+            aggregates['pending'] = max(0, aggregates['pending'] + delta)
+            self._write(aggregates)
+
+    def rebuild(self, contributions: Iterable[Optional[Dict[str, Any]]]):
+        """Recompute the aggregates from scratch"""
+        aggregates = _empty_aggregates()
+        previous = self.load()
+        aggregates['pending'] = previous.get('pending')
+        aggregates['pending_counted_at'] = previous.get('pending_counted_at')
+        for contribution in contributions:
+            if not contribution:
+                continue
+            _apply(aggregates['total'], contribution, 1)
+            _apply(aggregates['cameras'].setdefault(contribution['camera_id'], _empty_bucket()), contribution, 1)
+            _apply(aggregates['dates'].setdefault(contribution['date'], _empty_bucket()), contribution, 1)
+        with self._locked():
+            self._write(aggregates)
+        logger.info(f"Rebuilt AI stats aggregates: {aggregates['total']['count']} cases")
+
+    def summary(self) -> Dict[str, Any]:
+        """Stats in the /api/ai-cases/stats shape, plus per-group breakdowns"""
+        aggregates = self.load()
+        total = aggregates['total']
+
+        def breakdown(group):
+            return {
+                key: {
+                    'count': bucket['count'],
+                    'plate_detections': bucket['plate_detections'],
+                    'average_confidence': bucket['confidence_sum'] / bucket['count'] if bucket['count'] else 0.0
+                } for key, bucket in aggregates[group].items()
+            }
+
+        return {
+            'total_processed': total['count'],
+            'cameras': {key: bucket['count'] for key, bucket in aggregates['cameras'].items()},
+            'dates': {key: bucket['count'] for key, bucket in aggregates['dates'].items()},
+            'plate_detections': total['plate_detections'],
+            'average_confidence': total['confidence_sum'] / total['count'] if total['count'] else 0.0,
+            'camera_breakdown': breakdown('cameras'),
+            'date_breakdown': breakdown('dates'),
+            'total_pending': aggregates.get('pending'),
+            'pending_counted_at': aggregates.get('pending_counted_at'),
+            'updated_at': aggregates.get('updated_at')
+        }
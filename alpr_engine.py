@@ -0,0 +1,897 @@
+#!/usr/bin/env python3
+"""
+ALPR Processing Engine for Radar System
+Single case-processing pipeline with pluggable detector backends and one result schema
+
+cv2 and the model libraries are imported inside the backends that need them,
+so importing this module stays cheap.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import random
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Union
+
+from atomic_write import atomic_write_json
+from blob_store import file_digest
+from case_walker import CaseEntry, IMAGE_EXTENSIONS, scan_case
+from resolution_policy import plate_height
+
+ALPR_PROJECT_PATH = '/home/rnd2/Desktop/radar_system_clean/Automatic-License-Plate-Recognition'
+JORDANIAN_MODEL_PATH = ALPR_PROJECT_PATH + '/quick_training/results/jordanian_plates/weights/best.pt'
+
+if ALPR_PROJECT_PATH not in sys.path:
+    sys.path.append(ALPR_PROJECT_PATH)
+
+# Canonical results are written to <case>/ai/engine/<backend>.json
+RESULT_SCHEMA_VERSION = 2  # 2: OCR text for detector crops (no placeholder plates)
+ENGINE_RESULTS_DIR = 'engine'
+
+logger = logging.getLogger(__name__)
+
+class MockALPR:
+    """Mock ALPR for testing when real ALPR is not available"""
+    def __init__(self):
+        # Realistic Jordanian plate patterns
+        self.jordanian_patterns = [
+            "1234567", "2345678", "3456789", "4567890", "5678901",
+            "6789012", "7890123", "8901234", "9012345", "0123456",
+            "1111111", "2222222", "3333333", "4444444", "5555555",
+            "1357924", "2468135", "9876543", "1122334", "5566778"
+        ]
+
+    def predict(self, image_path: str) -> List[Dict]:
+        # Use image path to generate consistent results
+        hash_obj = hashlib.md5(str(image_path).encode())
+        hash_int = int(hash_obj.hexdigest()[:8], 16)
+
+        # Select a pattern based on hash
+        pattern_idx = hash_int % len(self.jordanian_patterns)
+        base_plate = self.jordanian_patterns[pattern_idx]
+
+        # Add some variation based on image name
+        if 'camera001' in str(image_path):
+            # Camera 1 plates start with 1-3
+            plate_num = f"{random.choice(['1', '2', '3'])}{base_plate[1:]}"
+        elif 'camera002' in str(image_path):
+            # Camera 2 plates start with 4-6
+            plate_num = f"{random.choice(['4', '5', '6'])}{base_plate[1:]}"
+        else:
+            plate_num = base_plate
+
+        # Format as Jordanian plate (7 digits, sometimes with dash)
+        if len(plate_num) == 7:
+            # Sometimes add dash for readability: 123-4567
+            if hash_int % 3 == 0:
+                formatted_plate = f"{plate_num[:3]}-{plate_num[3:]}"
+            else:
+                formatted_plate = plate_num
+        else:
+            formatted_plate = plate_num[:7]  # Ensure 7 digits max
+
+        # Generate confidence based on image quality simulation
+        base_confidence = 0.75 + (hash_int % 20) / 100  # 0.75 to 0.94
+
+        return [{
+            'plate': formatted_plate,
+            'confidence': round(base_confidence, 2),
+            'bbox': [100 + (hash_int % 50), 100 + (hash_int % 30), 200, 150]
+        }]
+
+# ---------------------------------------------------------------------------
+# Detector backends
+# ---------------------------------------------------------------------------
+
+BACKENDS: Dict[str, type] = {}
+
+def register_backend(cls):
+    """Register a detector backend class under its name"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+class DetectorBackend:
+    """
+    Base class for detector backends.
+
+    detect() returns a list of detections with at least 'plate', 'confidence'
+    and 'bbox'; extra keys are kept in the result. Raise on failure.
+    """
+    name = 'base'
+    needs_image = False   # engine decodes the frame once and passes it in
+    simulated = False     # results are placeholders, not real detections
+    bbox_format = 'xyxy'  # or 'xywh'
+
+    def load(self) -> 'DetectorBackend':
+        """Load models; raise ImportError/RuntimeError when unavailable"""
+        return self
+
+    def detect(self, image_path: str, image=None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+@register_backend
+class MockBackend(DetectorBackend):
+    """Deterministic-ish mock plates for environments without ALPR"""
+    name = 'mock'
+
+    def load(self):
+        self.alpr = MockALPR()
+        return self
+
+    def detect(self, image_path, image=None):
+        return self.alpr.predict(image_path)
+
+@register_backend
+class JordanianBackend(DetectorBackend):
+    """Jordanian numbers-only ALPR system"""
+    name = 'jordanian'
+
+    def load(self):
+        from jordanian_numbers_only_alpr import JordanianNumbersOnlyALPR
+        self.alpr = JordanianNumbersOnlyALPR()
+        logger.info("Jordanian ALPR system initialized successfully")
+        return self
+
+    def detect(self, image_path, image=None):
+        alpr_results = self.alpr.detect_plate(image_path)
+        if alpr_results and 'detections' in alpr_results:
+            return [{
+                'plate': detection.get('plate', 'UNKNOWN'),
+                'confidence': detection.get('confidence', 0.5),
+                'bbox': detection.get('bbox', [0, 0, 100, 100])
+            } for detection in alpr_results['detections']]
+
+        # Single detection format
+        return [{
+            'plate': alpr_results.get('plate', 'UNKNOWN') if alpr_results else 'UNKNOWN',
+            'confidence': alpr_results.get('confidence', 0.5) if alpr_results else 0.5,
+            'bbox': [0, 0, 100, 100]
+        }]
+
+def _fast_alpr_detections(alpr_results) -> List[Dict[str, Any]]:
+    """Convert fast_alpr results (objects or dicts) to detections"""
+    detections = []
+    for result in alpr_results:
+        if isinstance(result, dict):
+            detections.append({
+                'plate': result.get('plate', 'UNKNOWN'),
+                'confidence': result.get('confidence', 0.0),
+                'bbox': result.get('bbox', [0, 0, 0, 0])
+            })
+            continue
+        if hasattr(result, 'ocr') and result.ocr:
+            plate_text = result.ocr.text
+            confidence = result.ocr.confidence
+        else:
+            # Fallback for different ALPR result formats
+            plate_text = str(result).split()[0] if str(result) else "UNKNOWN"
+            confidence = 0.5
+        detections.append({
+            'plate': plate_text,
+            'confidence': confidence,
+            'bbox': getattr(result.detection, 'bbox', [0, 0, 100, 100]) if hasattr(result, 'detection') else [0, 0, 100, 100]
+        })
+    return detections
+
+# fast_plate_ocr hub model used for plate text (shared by fast_alpr and the crop OCR)
+OCR_MODEL = "cct-xs-v1-global-model"
+
+# Crops are widened by this fraction of the box size so edge characters survive
+CROP_MARGIN = 0.05
+
+def crop_plates(image, boxes: List[List[float]], margin: float = CROP_MARGIN) -> List[Any]:
+    """Crop xyxy boxes from a BGR frame (clipped to the frame, padded by margin)"""
+    height, width = image.shape[:2]
+    crops = []
+    for x1, y1, x2, y2 in boxes:
+        dx, dy = (x2 - x1) * margin, (y2 - y1) * margin
+        left, top = max(0, int(x1 - dx)), max(0, int(y1 - dy))
+        right, bottom = min(width, int(round(x2 + dx))), min(height, int(round(y2 + dy)))
+        crops.append(image[top:bottom, left:right] if right > left and bottom > top else None)
+    return crops
+
+class PlateOCR:
+    """
+    Reads plate text from cropped plates with the fast_alpr / fast_plate_ocr
+    recognizer. All crops of a frame go through the model in one batch; the
+    per-crop fast_alpr API is the fallback for recognizer versions whose
+    run() does not take a list of arrays.
+    """
+
+    def __init__(self, ocr=None):
+        self.ocr = ocr
+
+    @classmethod
+    def from_alpr(cls, alpr) -> Optional['PlateOCR']:
+        """Reuse the OCR stage of an already loaded fast_alpr ALPR"""
+        ocr = getattr(alpr, 'ocr', None)
+        return cls(ocr) if ocr is not None else None
+
+    @classmethod
+    def load(cls, model: str = OCR_MODEL) -> 'PlateOCR':
+        from fast_alpr.default_ocr import DefaultOCR
+        return cls(DefaultOCR(hub_ocr_model=model))
+
+    def _color_mode(self, recognizer) -> str:
+        config = getattr(recognizer, 'config', None)
+        if isinstance(config, dict):
+            return config.get('image_color_mode', 'grayscale')
+        return getattr(config, 'image_color_mode', 'grayscale')
+
+    def _batch(self, crops: List[Any]) -> List[tuple]:
+        import cv2
+        import numpy as np
+
+        recognizer = getattr(self.ocr, 'ocr_model', None)
+        if recognizer is None or not hasattr(recognizer, 'run'):
+            raise TypeError('recognizer does not support batched run()')
+        mode = self._color_mode(recognizer)
+        if mode == 'rgb':
+            inputs = [cv2.cvtColor(crop, cv2.COLOR_BGR2RGB) for crop in crops]
+        else:
+            inputs = [cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop for crop in crops]
+
+        output = recognizer.run(inputs, return_confidence=True)
+        if isinstance(output, tuple):
+            # fast_plate_ocr < 1.0: (plates, confidences[N, slots])
+            texts, confidences = output
+            return [(text, float(np.mean(conf))) for text, conf in zip(texts, confidences)]
+        return [(prediction.plate,
+                 float(np.mean(prediction.char_probs)) if prediction.char_probs is not None else 0.0)
+                for prediction in output]
+
+    def read(self, crops: List[Any]) -> List[tuple]:
+        """(text, confidence) per crop; (None, 0.0) for empty crops or no text"""
+        results = [(None, 0.0)] * len(crops)
+        valid = [i for i, crop in enumerate(crops) if crop is not None and crop.size]
+        if not valid:
+            return results
+        try:
+            read = self._batch([crops[i] for i in valid])
+        except (TypeError, ValueError, AttributeError) as e:
+            logger.debug(f"Batched OCR unavailable ({e}), reading crops one by one")
+            read = []
+            for i in valid:
+                result = self.ocr.predict(crops[i])
+                confidence = getattr(result, 'confidence', 0.0) if result else 0.0
+                if isinstance(confidence, (list, tuple)):
+                    confidence = sum(confidence) / len(confidence) if confidence else 0.0
+                read.append((getattr(result, 'text', None) if result else None, float(confidence)))
+        for i, (text, confidence) in zip(valid, read):
+            text = (text or '').replace('_', '').strip()
+            results[i] = (text or None, round(confidence, 4))
+        return results
+
+@register_backend
+class FastALPRBackend(DetectorBackend):
+    """fast_alpr default detector + OCR"""
+    name = 'fast_alpr'
+    needs_image = True
+
+    def load(self):
+        from fast_alpr.alpr import ALPR
+        self.alpr = ALPR()
+        logger.info("Fast ALPR system initialized successfully")
+        return self
+
+    def detect(self, image_path, image=None):
+        return _fast_alpr_detections(self.alpr.predict(image))
+
+def read_plate_text(ocr: Optional[PlateOCR], image, plates: List[Dict[str, Any]]):
+    """Fill 'plate' / 'ocr_confidence' of xyxy detections from one batched OCR pass"""
+    if ocr is None or not plates:
+        return
+    try:
+        texts = ocr.read(crop_plates(image, [plate['bbox'] for plate in plates]))
+    except Exception as e:
+        logger.warning(f"Plate OCR failed: {e}")
+        return
+    for plate, (text, confidence) in zip(plates, texts):
+        plate['plate'] = text
+        plate['ocr_confidence'] = confidence
+
+@register_backend
+class YoloJordanianBackend(DetectorBackend):
+    """Enhanced Jordanian YOLO model with fast_alpr fallback"""
+    name = 'yolo_jordanian'
+    needs_image = True
+
+    def __init__(self, model_path: str = JORDANIAN_MODEL_PATH):
+        self.model_path = model_path
+        self.alpr = None
+        self.custom_model = None
+        self.ocr = None
+
+    def load(self):
+        try:
+            from ultralytics import YOLO
+            from fast_alpr import ALPR
+        except ImportError as e:
+            logger.warning(f"ALPR libraries not available, running in simulation mode: {e}")
+            self.simulated = True
+            return self
+
+        try:
+            # Try to load the enhanced Jordanian model first
+            if os.path.exists(self.model_path):
+                self.custom_model = YOLO(self.model_path)
+                logger.info("✅ Loaded enhanced Jordanian ALPR model")
+            else:
+                logger.warning("⚠️ Enhanced Jordanian model not found, using default")
+
+            # Initialize standard ALPR
+            self.alpr = ALPR(
+                detector_model="yolo-v9-t-384-license-plate-end2end",
+                ocr_model=OCR_MODEL,
+                detector_conf_thresh=0.1
+            )
+            # The custom detector's crops are read by the same OCR stage
+            self.ocr = PlateOCR.from_alpr(self.alpr)
+            logger.info("✅ Standard ALPR model initialized")
+
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize ALPR models: {e}")
+            self.alpr = None
+            self.custom_model = None
+
+        self.simulated = not self.alpr and not self.custom_model
+        return self
+
+    def detect(self, image_path, image=None):
+        if self.simulated:
+            return [{
+                'plate': 'SIMULATED-123',
+                'confidence': 0.85,
+                'bbox': [100, 100, 200, 150],
+                'method': 'simulation'
+            }]
+
+        plates = []
+
+        # Try custom model first if available; its boxes are OCR'd in one batch
+        if self.custom_model:
+            try:
+                for r in self.custom_model(image, verbose=False):
+                    boxes = r.boxes
+                    if boxes is not None:
+                        for box in boxes:
+                            plates.append({
+                                'plate': None,
+                                'confidence': box.conf[0].item(),
+                                'bbox': box.xyxy[0].tolist(),
+                                'method': 'enhanced_jordanian_model'
+                            })
+                read_plate_text(self.ocr, image, plates)
+                if any(plate['plate'] for plate in plates):
+                    return plates
+                if plates:
+                    # Boxes without text (no OCR, or it read nothing) are not a result yet
+                    logger.debug(f"No plate text read from {len(plates)} custom boxes, trying standard ALPR")
+            except Exception as e:
+                logger.warning(f"Custom model failed, trying standard ALPR: {e}")
+                plates = []
+
+        # Use standard ALPR if custom model failed or no plate was read
+        if self.alpr:
+            detections = _fast_alpr_detections(self.alpr.predict(image))
+            for detection in detections:
+                detection['method'] = 'standard_alpr'
+            if detections:
+                return detections
+
+        # Nothing read anywhere; keep the custom model's boxes
+        return plates
+
+# ONNX Runtime CPU settings (overridable per backend via options)
+ORT_INTRA_OP_THREADS = int(os.environ.get('ALPR_ORT_INTRA_OP_THREADS', '0'))  # 0 = onnxruntime default
+ORT_INTER_OP_THREADS = int(os.environ.get('ALPR_ORT_INTER_OP_THREADS', '1'))
+ORT_GRAPH_OPTIMIZATION = os.environ.get('ALPR_ORT_GRAPH_OPTIMIZATION', 'all')
+
+def _letterbox(image, size: int):
+    """Resize keeping aspect ratio and pad to size x size; returns (img, scale, pad_x, pad_y)"""
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    padded = cv2.copyMakeBorder(resized, pad_y, size - new_h - pad_y, pad_x, size - new_w - pad_x,
+                                cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, scale, pad_x, pad_y
+
+@register_backend
+class OnnxJordanianBackend(DetectorBackend):
+    """
+    Jordanian YOLO detector exported to ONNX and run with ONNX Runtime on CPU.
+
+    best.pt is exported once next to itself (best.onnx, re-exported when the
+    .pt is newer) and optionally dynamically quantized to INT8
+    (best.int8.onnx). Thread counts and graph optimization level are
+    configurable because the defaults oversubscribe small CPU servers.
+    Plate text comes from PlateOCR over the detected boxes when fast_alpr
+    is installed.
+    """
+    name = 'onnx_jordanian'
+    needs_image = True
+
+    def __init__(self, model_path: str = JORDANIAN_MODEL_PATH, onnx_path: Optional[str] = None,
+                 image_size: int = 640, quantize: bool = False,
+                 intra_op_threads: int = ORT_INTRA_OP_THREADS,
+                 inter_op_threads: int = ORT_INTER_OP_THREADS,
+                 graph_optimization: str = ORT_GRAPH_OPTIMIZATION,
+                 conf_thresh: float = 0.25, iou_thresh: float = 0.45, ocr: bool = True):
+        self.model_path = model_path
+        self.onnx_path = onnx_path or os.path.splitext(model_path)[0] + '.onnx'
+        self.image_size = int(image_size)
+        self.quantize = str(quantize).lower() in ('1', 'true', 'int8', 'yes')
+        self.intra_op_threads = int(intra_op_threads)
+        self.inter_op_threads = int(inter_op_threads)
+        self.graph_optimization = graph_optimization
+        self.conf_thresh = float(conf_thresh)
+        self.iou_thresh = float(iou_thresh)
+        self.use_ocr = str(ocr).lower() not in ('0', 'false', 'no')
+        self.session = None
+        self.ocr = None
+
+    def _export(self) -> str:
+        """Export best.pt to ONNX unless a current export is cached"""
+        if os.path.exists(self.onnx_path) and (
+                not os.path.exists(self.model_path) or
+                os.path.getmtime(self.onnx_path) >= os.path.getmtime(self.model_path)):
+            return self.onnx_path
+        from ultralytics import YOLO
+
+        logger.info(f"Exporting {self.model_path} to ONNX (imgsz={self.image_size})")
+        exported = YOLO(self.model_path).export(format='onnx', imgsz=self.image_size, dynamic=False)
+        if os.path.abspath(exported) != os.path.abspath(self.onnx_path):
+            os.replace(exported, self.onnx_path)
+        return self.onnx_path
+
+    def _quantized(self, onnx_path: str) -> str:
+        """INT8 dynamic quantization of the exported model (cached)"""
+        quantized_path = os.path.splitext(onnx_path)[0] + '.int8.onnx'
+        if not os.path.exists(quantized_path) or os.path.getmtime(quantized_path) < os.path.getmtime(onnx_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Quantizing {onnx_path} to INT8")
+            quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def load(self):
+        import onnxruntime as ort
+
+        model_file = self._export()
+        if self.quantize:
+            model_file = self._quantized(model_file)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = {
+            'disabled': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[self.graph_optimization]
+        self.session = ort.InferenceSession(model_file, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        if self.use_ocr:
+            try:
+                self.ocr = PlateOCR.load()
+            except ImportError as e:
+                logger.warning(f"Plate OCR not available, ONNX detections will have no text: {e}")
+        logger.info(f"✅ ONNX Runtime Jordanian model loaded ({os.path.basename(model_file)}, "
+                    f"intra={self.intra_op_threads or 'default'}, inter={self.inter_op_threads}, "
+                    f"opt={self.graph_optimization})")
+        return self
+
+    def detect(self, image_path, image=None):
+        import cv2
+        import numpy as np
+
+        padded, scale, pad_x, pad_y = _letterbox(image, self.image_size)
+        blob = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+        output = self.session.run(None, {self.input_name: blob})[0]
+
+        # YOLOv8 head: (1, 4 + classes, anchors) -> rows of cx, cy, w, h, class scores
+        predictions = output[0].T
+        scores = predictions[:, 4:].max(axis=1)
+        keep = scores >= self.conf_thresh
+        predictions, scores = predictions[keep], scores[keep]
+        if not len(scores):
+            return []
+
+        boxes = predictions[:, :4].copy()
+        boxes[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / scale
+        boxes[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / scale
+        boxes[:, 2] /= scale
+        boxes[:, 3] /= scale
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), self.conf_thresh, self.iou_thresh)
+
+        plates = []
+        for i in np.array(indices).flatten():
+            x, y, w, h = boxes[i]
+            plates.append({
+                'plate': None,
+                'confidence': float(scores[i]),
+                'bbox': [float(x), float(y), float(x + w), float(y + h)],
+                'method': 'onnx_jordanian_model'
+            })
+        plates.sort(key=lambda p: p['confidence'], reverse=True)
+        read_plate_text(self.ocr, image, plates)
+        return plates
+
+@register_backend
+class OpenCVContourBackend(DetectorBackend):
+    """
+    Contour/aspect-ratio plate localisation. With ocr=True the top
+    ocr_candidates regions are read by PlateOCR (one batch per frame).
+    """
+    name = 'opencv_contour'
+    needs_image = True
+    bbox_format = 'xywh'
+
+    def __init__(self, min_area: int = 1000, ocr: bool = False, ocr_candidates: int = 3):
+        self.min_area = min_area
+        self.use_ocr = str(ocr).lower() not in ('0', 'false', 'no')
+        self.ocr_candidates = int(ocr_candidates)
+        self.ocr = None
+        if self.use_ocr:
+            # Results with text must not be confused with box-only results
+            self.name = 'opencv_contour_ocr'
+
+    def load(self):
+        if self.use_ocr:
+            self.ocr = PlateOCR.load()
+        return self
+
+    def detect(self, image_path, image=None):
+        import cv2
+
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        edged = cv2.Canny(blurred, 50, 150)
+        contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # Filter contours that could be license plates
+        potential_plates = []
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area <= self.min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            aspect_ratio = w / h
+
+            # License plate aspect ratio is typically between 2:1 and 6:1
+            if 1.5 < aspect_ratio < 8.0:
+                area_score = min(area / 5000, 1.0)
+                aspect_score = 1.0 if 2.0 < aspect_ratio < 6.0 else 0.5
+                potential_plates.append({
+                    'plate': None,
+                    'confidence': round((area_score + aspect_score) / 2.0, 2),
+                    'bbox': [int(x), int(y), int(w), int(h)],
+                    'area': int(area),
+                    'aspect_ratio': round(aspect_ratio, 2)
+                })
+
+        potential_plates.sort(key=lambda x: x['confidence'], reverse=True)
+        if self.ocr is not None:
+            candidates = potential_plates[:self.ocr_candidates]
+            boxes = [[x, y, x + w, y + h] for x, y, w, h in (p['bbox'] for p in candidates)]
+            try:
+                texts = self.ocr.read(crop_plates(image, boxes))
+            except Exception as e:
+                logger.warning(f"Plate OCR failed: {e}")
+                texts = []
+            for plate, (text, confidence) in zip(candidates, texts):
+                plate['plate'] = text
+                plate['ocr_confidence'] = confidence
+        return potential_plates
+
+@register_backend
+class EnhancedBackend(DetectorBackend):
+    """EnhancedDynamicALPRSystem from the ALPR project"""
+    name = 'enhanced'
+
+    def load(self):
+        from enhanced_dynamic_alpr_system import EnhancedDynamicALPRSystem
+        self.alpr = EnhancedDynamicALPRSystem()
+        return self
+
+    def detect(self, image_path, image=None):
+        if hasattr(self.alpr, 'process_image_comprehensively'):
+            result = self.alpr.process_image_comprehensively(image_path)
+        else:
+            result = self.alpr.process_image(image_path)
+        if not result or 'plates' not in result:
+            return []
+        return [dict(plate, plate=plate.get('plate', plate.get('text')),
+                     confidence=plate.get('confidence', 0),
+                     bbox=plate.get('bbox', [0, 0, 0, 0]))
+                for plate in result['plates']]
+
+# Backend to try when a backend cannot be loaded
+BACKEND_FALLBACKS = {
+    'onnx_jordanian': 'yolo_jordanian',
+    'jordanian': 'fast_alpr',
+    'fast_alpr': 'mock',
+    'enhanced': 'opencv_contour',
+}
+
+def create_backend(name: str, fallback: bool = True, **options) -> DetectorBackend:
+    """
+    Instantiate and load a backend, walking BACKEND_FALLBACKS on failure.
+
+    options are passed to the backend constructor (e.g. model_path); fallbacks
+    are created with their defaults.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ALPR backend: {name}")
+    try:
+        return BACKENDS[name](**options).load()
+    except Exception as e:
+        next_name = BACKEND_FALLBACKS.get(name, 'mock' if name != 'mock' else None)
+        if not fallback or next_name is None:
+            raise
+        logger.warning(f"ALPR backend '{name}' unavailable ({e}), falling back to '{next_name}'")
+        return create_backend(next_name, fallback)
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+def _read_image(image_path: str, scale: float = 1.0):
+    """Decode a frame, letting libjpeg downscale by 1/2 or 1/4 while decoding"""
+    import cv2
+
+    flags = {0.5: cv2.IMREAD_REDUCED_COLOR_2, 0.25: cv2.IMREAD_REDUCED_COLOR_4}.get(scale)
+    image = cv2.imread(image_path, flags) if flags is not None else cv2.imread(image_path)
+    if image is not None and flags is None and scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image
+
+def _rescale_detection(detection: Dict[str, Any], factor: float):
+    """Map a detection found on a downscaled frame back to original pixels"""
+    bbox = detection.get('bbox')
+    if bbox:
+        detection['bbox'] = [round(v * factor, 1) for v in bbox]
+    if 'area' in detection:
+        detection['area'] = int(detection['area'] * factor * factor)
+
+def _image_fingerprint(image_path: str) -> Dict[str, Any]:
+    st = os.stat(image_path)
+    return {'image': os.path.basename(image_path), 'path': image_path,
+            'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+class ProcessingEngine:
+    """Runs one detector backend over cases and produces canonical results"""
+
+    def __init__(self, backend: Union[str, DetectorBackend] = 'mock',
+                 image_extensions=IMAGE_EXTENSIONS, resolution=None, blobs=None, previews=None):
+        self.backend = create_backend(backend) if isinstance(backend, str) else backend
+        self.image_extensions = tuple(image_extensions)
+        # Optional ResolutionPolicy: frames of cameras with large plates are downscaled
+        self.resolution = resolution
+        # Optional BlobStore: frames are deduplicated and a known frame reuses its detections
+        self.blobs = blobs
+        # Optional PreviewCache: thumbnails and annotated previews from the same decode
+        self.previews = previews
+
+    @property
+    def backend_name(self) -> str:
+        return self.backend.name
+
+    def result_path(self, case_path: str) -> Path:
+        """Canonical result file for this backend"""
+        return Path(case_path) / 'ai' / ENGINE_RESULTS_DIR / f"{self.backend_name}.json"
+
+    def load_result(self, case_path: str) -> Optional[Dict[str, Any]]:
+        """Load a previous canonical result for this backend, if any"""
+        try:
+            with open(self.result_path(case_path), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def process_image(self, image_path: str, camera_id: Optional[str] = None) -> Dict[str, Any]:
+        """Decode (once) and run the backend over a single image"""
+        digest = self.blobs.ingest(image_path) if self.blobs is not None else None
+        if digest is None and self.previews is not None:
+            try:
+                digest = file_digest(image_path)
+            except OSError as e:
+                logger.warning(f"Could not hash {image_path}: {e}")
+        entry = _image_fingerprint(image_path)
+        if digest is not None:
+            entry['sha256'] = digest
+        if digest is not None and self.blobs is not None:
+            cached = self.blobs.load_result(digest, self.backend_name)
+            if cached is not None and cached.get('schema_version') == RESULT_SCHEMA_VERSION:
+                entry = self._reuse_detections(entry, cached)
+                self._render_previews(entry, image_path)
+                return entry
+        started = time.time()
+        detections: List[Dict[str, Any]] = []
+        try:
+            image = None
+            scale = 1.0
+            if self.backend.needs_image:
+                if self.resolution is not None:
+                    scale = self.resolution.scale_for(camera_id)
+                image = _read_image(image_path, scale)
+                if image is None:
+                    raise ValueError('Could not load image')
+            for detection in self.backend.detect(image_path, image):
+                detection = dict(detection)
+                if scale < 1.0:
+                    _rescale_detection(detection, 1.0 / scale)
+                detection.setdefault('method', self.backend_name)
+                detection['image'] = entry['image']
+                detections.append(detection)
+            if scale < 1.0:
+                entry['scale'] = scale
+            if self.resolution is not None and image is not None and not self.backend.simulated:
+                # Only OCR-confirmed plates say anything about legible plate size
+                bbox_format = self.backend.bbox_format
+                heights = [plate_height(d, bbox_format) for d in detections if d.get('plate')]
+                self.resolution.record(camera_id, [h for h in heights if h], scale)
+            if self.backend.simulated:
+                entry['status'] = 'simulation'
+            else:
+                entry['status'] = 'success' if detections else 'no_plates_detected'
+        except Exception as e:
+            logger.error(f"Error processing image {image_path}: {e}")
+            entry['status'] = 'error'
+            entry['error'] = str(e)
+        entry['processing_time'] = round(time.time() - started, 4)
+        entry['detection_count'] = len(detections)
+        entry['detections'] = detections
+        if entry['status'] != 'error':
+            self._render_previews(entry, image_path, image, scale)
+        if self.blobs is not None and digest is not None and entry['status'] in ('success', 'no_plates_detected'):
+            self.blobs.save_result(digest, self.backend_name, {
+                'schema_version': RESULT_SCHEMA_VERSION,
+                'status': entry['status'],
+                'scale': entry.get('scale', 1.0),
+                'detections': detections
+            })
+        return entry
+
+    def _render_previews(self, entry: Dict[str, Any], image_path: str, image=None, scale: float = 1.0):
+        """Add the thumbnail and annotated preview keys of a frame to its entry"""
+        if self.previews is None or 'sha256' not in entry:
+            return
+        try:
+            entry.update(self.previews.render(entry['sha256'], self.backend_name, entry['detections'],
+                                              image, scale, image_path, self.backend.bbox_format))
+        except Exception as e:
+            logger.warning(f"Could not render previews of {image_path}: {e}")
+
+    def _reuse_detections(self, entry: Dict[str, Any], cached: Dict[str, Any]) -> Dict[str, Any]:
+        """Entry for a frame whose content this backend has already processed"""
+        detections = []
+        for detection in cached.get('detections', []):
+            detection = dict(detection)
+            detection['image'] = entry['image']
+            detections.append(detection)
+        if cached.get('scale', 1.0) < 1.0:
+            entry['scale'] = cached['scale']
+        entry['status'] = cached['status']
+        entry['deduplicated'] = True
+        entry['processing_time'] = 0.0
+        entry['detection_count'] = len(detections)
+        entry['detections'] = detections
+        return entry
+
+    def process_images(self, images: List[str], case_meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run the backend over a list of images and build a canonical result"""
+        result = {
+            'schema_version': RESULT_SCHEMA_VERSION,
+            'backend': self.backend_name,
+            'processed_at': datetime.now().isoformat(),
+        }
+        result.update(case_meta or {})
+        result.update({
+            'total_images': len(images),
+            'images': [],
+            'detections': [],
+            'best_detection': None,
+            'plate_number': None,
+            'confidence': 0.0,
+            'status_counts': {}
+        })
+
+        for image_path in images:
+            entry = self.process_image(str(image_path), result.get('camera_id'))
+            result['detections'].extend(entry.pop('detections'))
+            result['images'].append(entry)
+            result['status_counts'][entry['status']] = result['status_counts'].get(entry['status'], 0) + 1
+
+        # Best detection is the most confident one that carries plate text
+        with_text = [d for d in result['detections'] if d.get('plate')]
+        if with_text:
+            best = max(with_text, key=lambda d: d.get('confidence', 0.0))
+            result['best_detection'] = {
+                'plate': best['plate'],
+                'confidence': best['confidence'],
+                'image': best['image']
+            }
+            result['plate_number'] = best['plate']
+            result['confidence'] = best['confidence']
+
+        if self.resolution is not None:
+            self.resolution.save()
+        return result
+
+    def is_current(self, result: Optional[Dict[str, Any]], images: List[str]) -> bool:
+        """Check whether a stored result still matches the case images"""
+        if not result or result.get('schema_version') != RESULT_SCHEMA_VERSION:
+            return False
+        stored = {(img.get('path'), img.get('size'), img.get('mtime_ns')) for img in result.get('images', [])}
+        try:
+            current = {(fp['path'], fp['size'], fp['mtime_ns']) for fp in map(_image_fingerprint, images)}
+        except OSError:
+            return False
+        return stored == current
+
+    def process_case(self, case: Union[CaseEntry, Dict[str, Any], str, Path],
+                     force: bool = False, save: bool = True) -> Dict[str, Any]:
+        """
+        Process a case once for this backend.
+
+        A stored canonical result is reused when its image fingerprints still
+        match, so several front-ends sharing a backend do not redo inference.
+        """
+        if isinstance(case, dict):
+            case_meta = {k: case[k] for k in ('camera_id', 'date', 'case_id', 'case_path')}
+            images = list(case['images'])
+        else:
+            if not isinstance(case, CaseEntry):
+                case = scan_case(case, image_extensions=self.image_extensions)
+            case_meta = {'camera_id': case.camera_id, 'date': case.date,
+                         'case_id': case.case_id, 'case_path': case.path}
+            images = list(case.images)
+
+        if not force:
+            previous = self.load_result(case_meta['case_path'])
+            if self.is_current(previous, images):
+                logger.info(f"♻️ Reusing {self.backend_name} result for {case_meta['case_id']}")
+                return previous
+
+        result = self.process_images(images, case_meta)
+        if save:
+            self.save_result(result)
+        return result
+
+    def save_result(self, result: Dict[str, Any]) -> str:
+        """Write the canonical result file"""
+        path = self.result_path(result['case_path'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(path, result)
+        return str(path)
+
+def image_results(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Group a canonical result into the legacy per-image list (alpr_results.json)"""
+    per_image = []
+    for entry in result.get('images', []):
+        plates = [d for d in result.get('detections', []) if d.get('image') == entry['image']]
+        item = {
+            'image_path': entry['path'],
+            'plates_detected': len(plates),
+            'plates': plates,
+            'confidence_scores': [plate.get('confidence', 0) for plate in plates],
+            'processing_time': entry.get('processing_time', 0),
+            'status': entry['status'],
+            'method': result.get('backend')
+        }
+        if entry.get('error'):
+            item['error'] = entry['error']
+        per_image.append(item)
+    return per_image
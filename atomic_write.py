@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Atomic Result Writes for Radar System
+Temp file + rename writes with optional group-committed fsyncs
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Each thread has its own stack of open batches; other threads write straight through
+_local = threading.local()
+
+def _batch_stack() -> List['FsyncBatch']:
+    stack = getattr(_local, 'batches', None)
+    if stack is None:
+        stack = _local.batches = []
+    return stack
+
+def _fsync_path(path: str, directory: bool = False):
+    flags = os.O_RDONLY | (getattr(os, 'O_DIRECTORY', 0) if directory else 0)
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def active_batch() -> Optional['FsyncBatch']:
+    """Innermost FsyncBatch currently open in this thread, if any"""
+    stack = _batch_stack()
+    return stack[-1] if stack else None
+
+class FsyncBatch:
+    """
+    Group commit for fsyncs.
+
+    Atomic writes inside the batch stay in their temp files until commit(),
+    which fsyncs every pending temp file, renames them into place in the order
+    they were written, then fsyncs each touched directory once and finally the
+    files added with add() (so a result file is durable before a log entry
+    that points at it). commit() runs automatically every max_pending files /
+    max_delay seconds and when the batch closes; publish() puts the pending
+    writes in place without waiting for the directory fsyncs.
+
+    Batches belong to the thread that opened them.
+    """
+
+    def __init__(self, max_pending: int = 64, max_delay: float = 1.0):
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self._writes: List[Tuple[str, str]] = []  # (temp path, final path)
+        self._files: List[str] = []
+        self._dirs: List[str] = []
+        self._lock = threading.Lock()
+        self._first_pending_at: Optional[float] = None
+        self.commits = 0
+
+    def __enter__(self):
+        _batch_stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stack = _batch_stack()
+        if self in stack:
+            stack.remove(self)
+        self.commit()
+        return False
+
+    def _pending(self) -> int:
+        return len(self._writes) + len(self._files)
+
+    def _added(self, directory: Optional[str]):
+        """Record the directory to sync and commit when the batch is due (lock held)"""
+        if directory and directory not in self._dirs:
+            self._dirs.append(directory)
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+        return (self._pending() >= self.max_pending or
+                time.monotonic() - self._first_pending_at >= self.max_delay)
+
+    def add_write(self, tmp_path: str, path: str, directory: str):
+        """Defer the fsync and rename of a temp file written for path"""
+        with self._lock:
+            if (tmp_path, path) not in self._writes:
+                self._writes.append((tmp_path, path))
+            due = self._added(directory)
+        if due:
+            self.commit()
+
+    def add(self, path: str, directory: Optional[str] = None):
+        """Defer the fsync of a file written in place (and its directory entry)"""
+        with self._lock:
+            if path not in self._files:
+                self._files.append(path)
+            due = self._added(directory)
+        if due:
+            self.commit()
+
+    def publish(self):
+        """fsync the pending temp files, then rename them into place"""
+        with self._lock:
+            writes, self._writes = self._writes, []
+            if not self._files and not self._dirs:
+                self._first_pending_at = None
+        for tmp_path, _ in writes:
+            try:
+                _fsync_path(tmp_path)
+            except FileNotFoundError:
+                continue  # its directory was removed since; rename skips it too
+        for tmp_path, path in writes:
+            try:
+                os.replace(tmp_path, path)
+            except FileNotFoundError:
+                logger.debug(f"Dropped deferred write of {path}: directory removed")
+
+    def commit(self):
+        """Publish the pending writes, then fsync every touched directory and added file"""
+        self.publish()
+        with self._lock:
+            files, self._files = self._files, []
+            dirs, self._dirs = self._dirs, []
+            self._first_pending_at = None
+        if not files and not dirs:
+            return
+        for directory in dirs:
+            try:
+                _fsync_path(directory, directory=True)
+            except OSError as e:
+                logger.debug(f"Directory fsync failed for {directory}: {e}")
+        for path in files:
+            try:
+                _fsync_path(path)
+            except FileNotFoundError:
+                continue
+        self.commits += 1
+
+def atomic_write_bytes(path: str, data: bytes, durable: bool = True, batch: bool = True):
+    """
+    Replace path with data so readers never see a partial file.
+
+    With durable=True the data is fsynced before the rename. When this thread
+    has an FsyncBatch open the write joins it and appears at path only when
+    the batch publishes; batch=False writes through at once (state that is
+    read back, or shared under a lock, before the batch would commit).
+    """
+    path = os.fspath(path)
+    directory = os.path.dirname(path) or '.'
+    # Hidden temp name in the same directory (same filesystem for rename, skipped by walkers)
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    pending = active_batch() if durable and batch else None
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            if durable and pending is None:
+                os.fsync(f.fileno())
+        if pending is None:
+            os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if pending is not None:
+        pending.add_write(tmp_path, path, directory)
+    elif durable:
+        _fsync_path(directory, directory=True)
+
+def atomic_write_text(path: str, text: str, durable: bool = True, batch: bool = True):
+    """Text (UTF-8) variant of atomic_write_bytes"""
+    atomic_write_bytes(path, text.encode('utf-8'), durable, batch)
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = 2,
+                      ensure_ascii: bool = False, durable: bool = True, batch: bool = True):
+    """json.dump to path via atomic_write_text"""
+    atomic_write_text(path, json.dumps(data, indent=indent, ensure_ascii=ensure_ascii), durable, batch)
@@ -8,29 +8,37 @@ import os
 import sys
 import json
 import time
+import fcntl
+import signal
 import logging
-import shutil
+import sqlite3
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-import cv2
-import numpy as np
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from typing import Dict, List, Optional
 import threading
 import queue
 
 # Add the ALPR system path
 sys.path.append('/home/rnd2/Desktop/radar_system_clean/Automatic-License-Plate-Recognition')
 
-try:
-    from ultralytics import YOLO
-    from fast_alpr import ALPR
-    ALPR_AVAILABLE = True
-    print("✅ ALPR libraries loaded successfully")
-except ImportError as e:
-    print(f"⚠️ ALPR libraries not available: {e}")
-    ALPR_AVAILABLE = False
+# Shared helpers live in the project root
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from camera_shards import CameraShards, sharding_enabled
+from case_walker import scan_case, walk_cases
+from case_readiness import EMPTY, check_case
+from inbox_watcher import InboxWatcher
+from alpr_engine import ProcessingEngine
+from backend_manager import ManagedBackend
+from ai_stats import STATS_FILE, StatsAggregator
+from change_feed import ChangeFeed
+from atomic_write import FsyncBatch, atomic_write_json
+from blob_store import BlobStore, blob_store_enabled, link_or_copy
+from previews import PreviewCache, previews_enabled
+from plate_index import PLATE_INDEX_FILE, PlateIndex
+from repeat_offenders import RepeatOffenderDetector
+from resolution_policy import ResolutionPolicy
+from service_heartbeat import (DRAIN_TIMEOUT, SERVICE_DIR, Heartbeat, STATE_ACTIVE, STATE_STANDBY,
+                               STATE_STOPPING)
 
 # Configure logging
 logging.basicConfig(
@@ -43,123 +51,91 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Image types picked up from violation case folders
+SERVICE_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Pending queue written on graceful shutdown (<inbox>/.ai_service/queue_checkpoint.json)
+QUEUE_CHECKPOINT_FILE = 'queue_checkpoint.json'
+# A case interrupted by this many shutdowns is not retried on resume
+MAX_CASE_ATTEMPTS = 2
+# Catch-up after a resume also covers cases changed this long before the checkpoint
+RESUME_MTIME_SLACK = 60
+# inotify does not see writes made by other hosts; nodes on a network share poll instead
+INBOX_POLLING = os.environ.get('AI_INBOX_POLLING', '0') == '1'
+
+def case_camera(case_path) -> str:
+    """Camera of a processing_inbox/<camera>/<date>/<case> path"""
+    return Path(case_path).parent.parent.name
+
 class ALPRProcessor:
     """ALPR processing engine using the enhanced Jordanian model"""
     
-    def __init__(self):
-        self.alpr = None
-        self.custom_model = None
+    def __init__(self, inbox_path: Optional[str] = None):
+        self.inbox_path = inbox_path
+        self.backend = None
+        self.engine = None
         self.initialize_models()
     
+    @property
+    def alpr(self):
+        return getattr(self.backend, 'alpr', None)
+    
+    @property
+    def custom_model(self):
+        return getattr(self.backend, 'custom_model', None)
+    
     def initialize_models(self):
-        """Initialize ALPR models"""
-        if not ALPR_AVAILABLE:
+        """Initialize ALPR models (hot-swappable via <inbox>/.ai_backends/service.json)"""
+        self.backend = ManagedBackend('yolo_jordanian', self.inbox_path, pool='service').load()
+        # Per-camera downscaling learned from plate sizes (<inbox>/.ai_resolution.json)
+        resolution = ResolutionPolicy(self.inbox_path) if self.inbox_path else None
+        # Duplicate frames share one file and one inference (<inbox>/.ai_blobs)
+        blobs = BlobStore(self.inbox_path) if self.inbox_path and blob_store_enabled() else None
+        # Thumbnails and annotated previews rendered from the detection decode (<inbox>/.ai_previews)
+        previews = PreviewCache(self.inbox_path) if self.inbox_path and previews_enabled() else None
+        self.engine = ProcessingEngine(self.backend, image_extensions=SERVICE_IMAGE_EXTENSIONS,
+                                       resolution=resolution, blobs=blobs, previews=previews)
+        if self.backend.simulated:
             logger.warning("ALPR libraries not available, running in simulation mode")
+    
+    def warm_up(self):
+        """Run one blank frame through the backend so the first real case is not slow"""
+        if not self.backend.needs_image or self.backend.simulated:
             return
-        
         try:
-            # Try to load the enhanced Jordanian model first
-            custom_model_path = '/home/rnd2/Desktop/radar_system_clean/Automatic-License-Plate-Recognition/quick_training/results/jordanian_plates/weights/best.pt'
-            if os.path.exists(custom_model_path):
-                self.custom_model = YOLO(custom_model_path)
-                logger.info("✅ Loaded enhanced Jordanian ALPR model")
-            else:
-                logger.warning("⚠️ Enhanced Jordanian model not found, using default")
-            
-            # Initialize standard ALPR
-            self.alpr = ALPR(
-                detector_model="yolo-v9-t-384-license-plate-end2end",
-                ocr_model="cct-xs-v1-global-model",
-                detector_conf_thresh=0.1
-            )
-            logger.info("✅ Standard ALPR model initialized")
-            
+            import numpy as np
+            self.backend.detect('warmup.jpg', np.zeros((480, 640, 3), dtype=np.uint8))
         except Exception as e:
-            logger.error(f"❌ Failed to initialize ALPR models: {e}")
-            self.alpr = None
-            self.custom_model = None
+            logger.warning(f"Backend warm-up failed: {e}")
     
     def process_image(self, image_path: str) -> Dict:
         """Process a single image and extract license plate information"""
-        result = {
-            'image_path': image_path,
-            'timestamp': datetime.now().isoformat(),
-            'plates_detected': [],
-            'processing_status': 'success',
-            'error': None
-        }
-        
-        if not ALPR_AVAILABLE or (not self.alpr and not self.custom_model):
-            # Simulation mode for testing
-            result['plates_detected'] = [{
-                'plate_text': 'SIMULATED-123',
-                'confidence': 0.85,
-                'bbox': [100, 100, 200, 150],
-                'detection_method': 'simulation'
-            }]
-            result['processing_status'] = 'simulation'
-            return result
-        
-        try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                result['processing_status'] = 'error'
-                result['error'] = 'Could not load image'
-                return result
-            
-            plates = []
-            
-            # Try custom model first if available
-            if self.custom_model:
-                try:
-                    custom_results = self.custom_model(image_path)
-                    for r in custom_results:
-                        boxes = r.boxes
-                        if boxes is not None:
-                            for box in boxes:
-                                confidence = box.conf[0].item()
-                                coords = box.xyxy[0].tolist()
-                                
-                                plates.append({
-                                    'plate_text': f'DETECTED-{int(confidence*1000)}',  # Placeholder
-                                    'confidence': confidence,
-                                    'bbox': coords,
-                                    'detection_method': 'enhanced_jordanian_model'
-                                })
-                    
-                    if plates:
-                        result['plates_detected'] = plates
-                        return result
-                        
-                except Exception as e:
-                    logger.warning(f"Custom model failed, trying standard ALPR: {e}")
-            
-            # Use standard ALPR if custom model failed or no plates found
-            if self.alpr:
-                alpr_results = self.alpr.predict(image_path)
-                for alpr_result in alpr_results:
-                    plates.append({
-                        'plate_text': alpr_result.get('plate', 'UNKNOWN'),
-                        'confidence': alpr_result.get('confidence', 0.0),
-                        'bbox': alpr_result.get('bbox', [0, 0, 0, 0]),
-                        'detection_method': 'standard_alpr'
-                    })
-            
-            result['plates_detected'] = plates
-            
-        except Exception as e:
-            logger.error(f"Error processing image {image_path}: {e}")
-            result['processing_status'] = 'error'
-            result['error'] = str(e)
-        
-        return result
+        entry = self.engine.process_image(image_path)
+        return legacy_image_result(entry, entry['detections'])
+
+def legacy_image_result(entry: Dict, detections: List[Dict]) -> Dict:
+    """Convert an engine image entry to the service's per-image alpr_result"""
+    return {
+        'image_path': entry['path'],
+        'timestamp': datetime.now().isoformat(),
+        'plates_detected': [{
+            'plate_text': detection.get('plate'),
+            'confidence': detection.get('confidence', 0.0),
+            'bbox': detection.get('bbox', [0, 0, 0, 0]),
+            'detection_method': detection.get('method')
+        } for detection in detections],
+        'processing_status': entry['status'],
+        'error': entry.get('error')
+    }
 
 class ViolationCaseProcessor:
     """Processes individual violation cases"""
     
-    def __init__(self, alpr_processor: ALPRProcessor):
+    def __init__(self, alpr_processor: ALPRProcessor, change_feed: Optional[ChangeFeed] = None,
+                 plate_index: Optional[PlateIndex] = None):
         self.alpr = alpr_processor
+        self.change_feed = change_feed
+        self.plate_index = plate_index
     
     def process_case(self, case_path: Path) -> Dict:
         """Process a complete violation case"""
@@ -171,48 +147,45 @@ class ViolationCaseProcessor:
         
         # Load existing case data
         verdict_file = case_path / 'verdict.json'
-        metadata_file = case_path / 'metadata.json'
         
         case_data = {}
         if verdict_file.exists():
             with open(verdict_file, 'r') as f:
                 case_data = json.load(f)
         
-        # Find all image files
-        image_files = []
-        for ext in ['*.jpg', '*.jpeg', '*.png', '*.bmp']:
-            image_files.extend(case_path.glob(ext))
+        # Find all image files (single directory listing)
+        case = scan_case(case_path, image_extensions=SERVICE_IMAGE_EXTENSIONS)
+        logger.info(f"📸 Found {len(case.images)} images to process")
         
-        logger.info(f"📸 Found {len(image_files)} images to process")
+        # Run the shared engine (reuses a current result for this backend)
+        engine_result = self.alpr.engine.process_case(case)
         
-        # Process each image
         processed_images = []
         detected_plates = []
         
-        for img_file in image_files:
-            if img_file.name.startswith('.') or 'ai' in str(img_file):
-                continue
-                
-            logger.info(f"🖼️ Processing image: {img_file.name}")
-            
-            # Process with ALPR
-            alpr_result = self.alpr.process_image(str(img_file))
+        for entry in engine_result['images']:
+            img_file = Path(entry['path'])
+            detections = [d for d in engine_result['detections'] if d.get('image') == entry['image']]
+            alpr_result = legacy_image_result(entry, detections)
             
-            # Copy processed image to AI folder
+            # Link processed image into the AI folder (shares the deduplicated frame)
             ai_image_path = ai_folder / f"processed_{img_file.name}"
-            shutil.copy2(img_file, ai_image_path)
+            link_or_copy(img_file, ai_image_path)
             
             # Add to results
-            processed_images.append({
+            processed_image = {
                 'original_path': str(img_file),
                 'ai_path': str(ai_image_path),
                 'filename': img_file.name,
                 'alpr_result': alpr_result
-            })
+            }
+            if entry.get('thumbnail'):
+                processed_image['thumbnail'] = entry['thumbnail']
+                processed_image['preview'] = entry['preview']
+            processed_images.append(processed_image)
             
             # Collect all detected plates
-            if alpr_result['plates_detected']:
-                detected_plates.extend(alpr_result['plates_detected'])
+            detected_plates.extend(alpr_result['plates_detected'])
         
         # Generate AI results JSON
         ai_results = {
@@ -225,78 +198,160 @@ class ViolationCaseProcessor:
             'detected_plates': detected_plates,
             'processed_images': processed_images,
             'ai_folder_path': str(ai_folder),
+            'engine_backend': engine_result['backend'],
             'processing_summary': {
-                'success_count': len([img for img in processed_images if img['alpr_result']['processing_status'] == 'success']),
-                'error_count': len([img for img in processed_images if img['alpr_result']['processing_status'] == 'error']),
-                'simulation_count': len([img for img in processed_images if img['alpr_result']['processing_status'] == 'simulation'])
+                # Images read without a plate were processed successfully too
+                'success_count': (engine_result['status_counts'].get('success', 0) +
+                                  engine_result['status_counts'].get('no_plates_detected', 0)),
+                'no_plates_count': engine_result['status_counts'].get('no_plates_detected', 0),
+                'error_count': engine_result['status_counts'].get('error', 0),
+                'simulation_count': engine_result['status_counts'].get('simulation', 0)
             }
         }
         
         # Save AI results
         ai_results_file = ai_folder / 'ai_detection_results.json'
-        with open(ai_results_file, 'w') as f:
-            json.dump(ai_results, f, indent=2)
+        atomic_write_json(ai_results_file, ai_results, ensure_ascii=True)
+        
+        if self.plate_index:
+            try:
+                self.plate_index.update(str(case_path), str(ai_results_file), ai_results)
+            except sqlite3.Error as e:
+                logger.error(f"❌ Failed to update plate index: {e}")
+        
+        # Publish the result to downstream consumers (fines sync)
+        if self.change_feed:
+            best_plate = max(detected_plates, key=lambda p: p.get('confidence') or 0.0, default=None)
+            try:
+                self.change_feed.append(
+                    str(case_path),
+                    str(ai_results_file),
+                    plate=best_plate.get('plate_text') if best_plate else None,
+                    confidence=best_plate.get('confidence') if best_plate else None,
+                    source='ai_plate_recognition_service',
+                    decision=case_data.get('decision')
+                )
+            except OSError as e:
+                logger.error(f"❌ Failed to append to change feed: {e}")
         
         logger.info(f"✅ Case processing complete: {len(detected_plates)} plates detected")
         return ai_results
 
-class FTPMonitorHandler(FileSystemEventHandler):
-    """Monitors FTP directory for new violation cases"""
+class FTPMonitorHandler:
+    """Queues violation cases reported by the InboxWatcher"""
     
     def __init__(self, processor_queue: queue.Queue):
         self.processor_queue = processor_queue
         self.processed_cases = set()
+        self._lock = threading.Lock()
+        # Set by start_monitoring; asked to re-check cases whose photos are still settling
+        self.watcher = None
+        # Set when sharding; cases of cameras held by other nodes are left to them
+        self.shards = None
+        # Set by the service; fresh uploads raise the pending count of the stats aggregates
+        self.stats = None
+    
+    def claim(self, case_path) -> bool:
+        """Mark a case as queued; False if it already was (watcher and startup scan overlap)"""
+        with self._lock:
+            if str(case_path) in self.processed_cases:
+                return False
+            self.processed_cases.add(str(case_path))
+            return True
     
-    def on_created(self, event):
-        if event.is_directory:
-            self.check_case_folder(Path(event.src_path))
+    def unclaim(self, case_path):
+        """Forget a queued case that was dropped, so it can be offered again"""
+        with self._lock:
+            self.processed_cases.discard(str(case_path))
     
-    def on_modified(self, event):
-        if event.is_directory:
-            self.check_case_folder(Path(event.src_path))
+    def on_case(self, case_path: str) -> bool:
+        """InboxWatcher callback; True once the case needs no more watching"""
+        return self.check_case_folder(Path(case_path))
     
-    def check_case_folder(self, folder_path: Path):
+    def check_case_folder(self, folder_path: Path) -> bool:
         """Check if a folder is a complete violation case"""
         if not self.is_case_folder(folder_path):
-            return
+            return False
         
-        case_id = str(folder_path)
-        if case_id in self.processed_cases:
-            return
+        if str(folder_path) in self.processed_cases:
+            return True
         
-        # Check if case has required files
-        if self.is_case_complete(folder_path):
+        case = scan_case(folder_path, image_extensions=('.jpg',))
+        if case.has_ai_folder:
+            return True  # already processed
+        return self.offer(folder_path, ingest=True)
+    
+    def offer(self, folder_path, ingest: bool = False) -> bool:
+        """
+        Queue a case once its verdict.json manifest is satisfied; True when
+        it needs no more attention (queued, already queued, another node's
+        camera or nothing to do)
+        """
+        if self.shards is not None and not self.shards.owns(case_camera(folder_path)):
+            return True  # the camera's lease holder picks it up
+        readiness = check_case(folder_path)
+        if readiness.state == EMPTY:
+            return True
+        if not readiness.ready:
+            logger.debug(f"⏳ Case not complete yet ({readiness.reason}): {folder_path}")
+            if readiness.retry_after is not None and self.watcher is not None:
+                self.watcher.recheck(str(folder_path), readiness.retry_after)
+            return False
+        if self.claim(folder_path):
             logger.info(f"📁 New complete case detected: {folder_path}")
-            self.processor_queue.put(folder_path)
-            self.processed_cases.add(case_id)
+            self.processor_queue.put(Path(folder_path))
+            if ingest and self.stats is not None:
+                try:
+                    self.stats.add_pending(1)
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not update the pending count: {e}")
+        return True
     
     def is_case_folder(self, folder_path: Path) -> bool:
         """Check if folder looks like a case folder"""
-        return (
-            'case' in folder_path.name.lower() or
-            folder_path.name.startswith('case') or
-            len(list(folder_path.glob('*.jpg'))) > 0
-        )
+        if 'case' in folder_path.name.lower():
+            return True
+        return len(scan_case(folder_path, image_extensions=('.jpg',)).images) > 0
     
     def is_case_complete(self, folder_path: Path) -> bool:
-        """Check if case has all required files"""
-        has_images = len(list(folder_path.glob('*.jpg'))) > 0
-        has_verdict = (folder_path / 'verdict.json').exists()
-        has_ai_folder = (folder_path / 'ai').exists()
-        
-        return has_images and has_verdict and not has_ai_folder
+        """Check if every photo in the case's verdict.json manifest has fully arrived"""
+        return check_case(folder_path).ready
 
 class AIPlateRecognitionService:
     """Main service class"""
     
     def __init__(self, ftp_root: str = "/srv/processing_inbox"):
         self.ftp_root = Path(ftp_root)
-        self.alpr_processor = ALPRProcessor()
-        self.case_processor = ViolationCaseProcessor(self.alpr_processor)
+        self.alpr_processor = ALPRProcessor(str(self.ftp_root))
+        self.change_feed = ChangeFeed(str(self.ftp_root))
+        self.plate_index = PlateIndex(str(self.ftp_root / PLATE_INDEX_FILE))
+        self.case_processor = ViolationCaseProcessor(self.alpr_processor, self.change_feed, self.plate_index)
+        self.repeat_offenders = RepeatOffenderDetector(str(self.ftp_root), change_feed=self.change_feed)
         self.processor_queue = queue.Queue()
         self.running = False
-        self.observer = None
+        self.monitor_handler = FTPMonitorHandler(self.processor_queue)
+        self.watcher = None
+        # Several nodes can share the inbox, each processing the cameras it holds leases for
+        self.shards = CameraShards(str(self.ftp_root), on_acquire=self.queue_camera) if sharding_enabled() else None
+        self.monitor_handler.shards = self.shards
+        self.monitor_handler.stats = StatsAggregator(str(self.ftp_root / STATS_FILE))
         self.worker_thread = None
+        # Worker progress, reported to the supervisor through the heartbeat
+        self.processed_count = 0
+        self.failed_count = 0
+        self.current_case = None
+        self.worker_beat = time.time()
+        # Shutdown checkpoint (one per node when sharding); only a started service writes one
+        checkpoint_file = QUEUE_CHECKPOINT_FILE
+        if self.shards:
+            checkpoint_file = f"queue_checkpoint-{self.shards.node}.json"
+        self.checkpoint_path = self.ftp_root / SERVICE_DIR / checkpoint_file
+        # flock on the checkpoint, held by the instance that owns the queue: a
+        # replacement takes over only once its predecessor saved its checkpoint
+        self._handoff_file = None
+        self._handoff_guard = threading.Lock()
+        self.started = False
+        self.case_attempts: Dict[str, int] = {}
     
     def start(self):
         """Start the AI service"""
@@ -307,119 +362,342 @@ class AIPlateRecognitionService:
             return False
         
         self.running = True
+        self.started = True
         
-        # Process existing cases first
-        self.process_existing_cases()
-        
-        # Start file system monitoring
+        # Watch and work right away, so new uploads are not held up by the handoff
         self.start_monitoring()
-        
-        # Start worker thread
+        self.worker_beat = time.time()
         self.worker_thread = threading.Thread(target=self.worker_loop, daemon=True)
         self.worker_thread.start()
         
+        # The previous instance may still be draining; take its queue once it is saved
+        threading.Thread(target=self.take_over, name='handoff', daemon=True).start()
+        
         logger.info("✅ AI Plate Recognition Service started successfully")
         return True
     
+    def hold_checkpoint(self):
+        """Take the checkpoint handoff lock (blocks while a predecessor drains)"""
+        with self._handoff_guard:
+            if self._handoff_file is not None:
+                return
+            self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+            handoff_file = open(f"{self.checkpoint_path}.lock", 'a')
+            try:
+                fcntl.flock(handoff_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info("⏳ Waiting for the previous AI worker to hand over its queue")
+                fcntl.flock(handoff_file, fcntl.LOCK_EX)
+            self._handoff_file = handoff_file
+    
+    def release_checkpoint(self):
+        with self._handoff_guard:
+            if self._handoff_file is not None:
+                fcntl.flock(self._handoff_file, fcntl.LOCK_UN)
+                self._handoff_file.close()
+                self._handoff_file = None
+    
+    def take_over(self):
+        """Resume the last graceful shutdown's queue, or process existing cases"""
+        self.hold_checkpoint()
+        if not self.running:
+            return  # stopped while waiting; stop() saves (and merges) the checkpoint
+        if self.shards:
+            # Each camera is scanned as its lease is taken
+            self.shards.start()
+            self.resume_from_checkpoint()
+        elif not self.resume_from_checkpoint():
+            self.process_existing_cases()
+    
     def stop(self):
-        """Stop the AI service"""
+        """
+        Stop the AI service: stop intake, let the worker finish the case in
+        hand (up to DRAIN_TIMEOUT), then checkpoint whatever is still queued
+        so the next start resumes from it.
+        """
         logger.info("🛑 Stopping AI Plate Recognition Service")
-        self.running = False
         
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
+        # No new cases from the file system
+        if self.watcher:
+            self.watcher.stop()
         
+        # The worker exits after its current case
+        self.running = False
+        in_flight = None
         if self.worker_thread:
-            self.worker_thread.join(timeout=5)
+            self.worker_thread.join(timeout=DRAIN_TIMEOUT)
+            if self.worker_thread.is_alive():
+                in_flight = self.current_case
+                logger.warning(f"⚠️ Case still running after {DRAIN_TIMEOUT:.0f}s: {in_flight}")
+        
+        # Hand the cameras to the other nodes (a camera still mid-case is left to expire)
+        if self.shards and self.started:
+            self.shards.stop()
+        
+        if self.started:
+            self.hold_checkpoint()
+            self.save_queue_checkpoint(in_flight)
+            self.release_checkpoint()
+        
+        self.alpr_processor.backend.close()
+        if self.alpr_processor.engine.resolution is not None:
+            self.alpr_processor.engine.resolution.save(force=True)
         
         logger.info("✅ AI Plate Recognition Service stopped")
     
+    def status(self) -> Dict:
+        """Worker progress for the supervisor heartbeat"""
+        return {
+            'queue_depth': self.processor_queue.qsize(),
+            'processed': self.processed_count,
+            'failed': self.failed_count,
+            'current_case': str(self.current_case) if self.current_case else None,
+            'watcher': self.watcher.mode if self.watcher else None,
+            'shards': self.shards.summary() if self.shards else None,
+            'worker_beat': self.worker_beat if self.running else None
+        }
+    
+    def save_queue_checkpoint(self, in_flight: Optional[Path] = None):
+        """Persist the pending queue (and an unfinished case) for the next start"""
+        pending = []
+        while True:
+            try:
+                pending.append(str(self.processor_queue.get_nowait()))
+            except queue.Empty:
+                break
+        interrupted = []
+        if in_flight is not None:
+            interrupted.append({'case': str(in_flight),
+                                'attempts': self.case_attempts.get(str(in_flight), 0) + 1})
+        # A predecessor's checkpoint this instance never got to resume is carried over
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                unconsumed = json.load(f)
+            pending = unconsumed.get('pending', []) + pending
+            interrupted = unconsumed.get('in_flight', []) + interrupted
+        except (FileNotFoundError, ValueError):
+            pass
+        try:
+            self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(self.checkpoint_path, {
+                'saved_at': time.time(),
+                'pending': list(dict.fromkeys(pending)),
+                'in_flight': interrupted,
+                'processed': self.processed_count,
+                'failed': self.failed_count
+            })
+            logger.info(f"💾 Queue checkpoint saved: {len(pending)} pending, {len(interrupted)} interrupted")
+        except OSError as e:
+            logger.error(f"❌ Could not save queue checkpoint: {e}")
+    
+    def resume_from_checkpoint(self) -> bool:
+        """
+        Re-queue the cases saved by the last graceful shutdown, plus cases
+        that changed while the service was down. False when there is no
+        usable checkpoint (first start or crash), meaning a full scan is needed.
+        """
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return False
+        except ValueError as e:
+            logger.warning(f"⚠️ Ignoring unreadable queue checkpoint: {e}")
+            return False
+        # Consumed: if this run crashes, the next start falls back to a full scan
+        try:
+            self.checkpoint_path.unlink()
+        except FileNotFoundError:
+            pass
+        
+        queued = list(dict.fromkeys(checkpoint.get('pending', [])))
+        dropped = set()
+        # Interrupted cases go last so a case that hangs the worker does not block the rest
+        for entry in checkpoint.get('in_flight', []):
+            if entry.get('attempts', 1) >= MAX_CASE_ATTEMPTS:
+                logger.error(f"❌ Not retrying case interrupted {entry['attempts']} times: {entry['case']}")
+                dropped.add(entry['case'])
+                continue
+            self.case_attempts[entry['case']] = entry.get('attempts', 1)
+            queued.append(entry['case'])
+        
+        for case_path in queued:
+            if self.monitor_handler.claim(case_path):
+                self.processor_queue.put(Path(case_path))
+        
+        # Cases that arrived while no watcher was running (processing a dropped
+        # case touched its directory, so it would look like a new arrival)
+        since = checkpoint.get('saved_at', 0) - RESUME_MTIME_SLACK
+        seen = set(queued) | dropped
+        arrived = 0
+        for case in walk_cases(self.ftp_root, camera_prefix=None, image_extensions=('.jpg',),
+                               scan_ai=True, modified_since=since):
+            if (case.path not in seen and self.needs_processing(case) and
+                    self.monitor_handler.offer(case.path, ingest=True)):
+                arrived += 1
+        
+        logger.info(f"♻️ Resumed from queue checkpoint: {len(queued)} saved, "
+                    f"{arrived} arrived while stopped")
+        return True
+    
     def process_existing_cases(self):
         """Process any existing cases that haven't been processed"""
         logger.info("🔍 Scanning for existing unprocessed cases...")
         
         case_count = 0
-        for camera_dir in self.ftp_root.iterdir():
-            if not camera_dir.is_dir() or camera_dir.name.startswith('.'):
-                continue
-                
-            for date_dir in camera_dir.iterdir():
-                if not date_dir.is_dir() or date_dir.name.startswith('.'):
-                    continue
-                    
-                for case_dir in date_dir.iterdir():
-                    if not case_dir.is_dir() or case_dir.name.startswith('.'):
-                        continue
-                    
-                    # Check if this case needs processing
-                    if self.needs_processing(case_dir):
-                        logger.info(f"📁 Queuing existing case: {case_dir}")
-                        self.processor_queue.put(case_dir)
-                        case_count += 1
+        for case in walk_cases(self.ftp_root, camera_prefix=None,
+                               image_extensions=('.jpg',), scan_ai=True):
+            # Check if this case needs processing
+            if self.needs_processing(case) and self.monitor_handler.offer(case.path):
+                case_count += 1
         
         logger.info(f"📊 Found {case_count} existing cases to process")
     
-    def needs_processing(self, case_dir: Path) -> bool:
-        """Check if a case directory needs AI processing"""
-        has_images = len(list(case_dir.glob('*.jpg'))) > 0
-        has_verdict = (case_dir / 'verdict.json').exists()
-        has_ai_results = (case_dir / 'ai' / 'ai_detection_results.json').exists()
+    def queue_camera(self, camera: str):
+        """Queue the unprocessed cases of a camera this node just took over"""
+        case_count = 0
+        for case in walk_cases(self.ftp_root, camera_filter=camera, camera_prefix=None,
+                               image_extensions=('.jpg',), scan_ai=True):
+            if self.needs_processing(case) and self.monitor_handler.offer(case.path):
+                case_count += 1
+        if case_count:
+            logger.info(f"📊 Camera {camera}: {case_count} cases to process")
+    
+    def needs_processing(self, case) -> bool:
+        """Check if a case (CaseEntry or directory) needs AI processing"""
+        if isinstance(case, (str, Path)):
+            case = scan_case(case, image_extensions=('.jpg',), scan_ai=True)
+        has_ai_results = case.has_ai_file('ai_detection_results.json')
         
-        return has_images and has_verdict and not has_ai_results
+        return bool(case.images) and case.has_verdict and not has_ai_results
     
     def start_monitoring(self):
-        """Start file system monitoring"""
-        handler = FTPMonitorHandler(self.processor_queue)
-        self.observer = Observer()
-        self.observer.schedule(handler, str(self.ftp_root), recursive=True)
-        self.observer.start()
+        """Watch the active date folders (inotify, polling when unavailable)"""
+        self.watcher = InboxWatcher(str(self.ftp_root), self.monitor_handler.on_case,
+                                    use_inotify=not INBOX_POLLING)
+        self.monitor_handler.watcher = self.watcher
+        self.watcher.start()
         logger.info(f"👁️ Started monitoring: {self.ftp_root}")
     
     def worker_loop(self):
         """Main worker loop for processing cases"""
         logger.info("🔄 Worker thread started")
         
-        while self.running:
-            try:
-                # Get case from queue (with timeout)
-                case_path = self.processor_queue.get(timeout=1)
-                
-                # Process the case
+        # Result fsyncs are group-committed while the queue is busy and
+        # flushed as soon as it goes idle
+        with FsyncBatch() as fsync_batch:
+            while self.running:
+                self.worker_beat = time.time()
                 try:
-                    result = self.case_processor.process_case(case_path)
-                    logger.info(f"✅ Successfully processed case: {case_path}")
+                    # Get case from queue (with timeout)
+                    case_path = self.processor_queue.get(timeout=1)
+                    if not self.running:
+                        # Stopping: leave it for the queue checkpoint
+                        self.processor_queue.put(case_path)
+                        self.processor_queue.task_done()
+                        break
+                    
+                    # Only while this node holds the camera's lease
+                    camera = case_camera(case_path)
+                    if self.shards and not self.shards.begin(camera):
+                        logger.info(f"↪️ Camera {camera} is no longer held by this node, skipping: {case_path}")
+                        self.monitor_handler.unclaim(case_path)
+                        self.processor_queue.task_done()
+                        continue
+                    if self.shards and not self.needs_processing(case_path):
+                        # Queued before the camera moved away and back; the other node did it
+                        self.shards.end(camera)
+                        self.processor_queue.task_done()
+                        continue
+                    
+                    # Process the case
+                    self.current_case = case_path
+                    try:
+                        result = self.case_processor.process_case(case_path)
+                        self.case_attempts.pop(str(case_path), None)
+                        self.processed_count += 1
+                        logger.info(f"✅ Successfully processed case: {case_path}")
+                    except Exception as e:
+                        self.failed_count += 1
+                        logger.error(f"❌ Error processing case {case_path}: {e}")
+                    finally:
+                        self.current_case = None
+                        if self.shards:
+                            self.shards.end(camera)
+                    
+                    self.processor_queue.task_done()
+                    
+                except queue.Empty:
+                    fsync_batch.commit()
+                    # Catch the repeat-offender windows up while idle (one node when sharding)
+                    if self.shards and not self.shards.assigned('repeat_offenders'):
+                        continue
+                    try:
+                        self.repeat_offenders.sync()
+                    except OSError as e:
+                        logger.error(f"❌ Repeat-offender update failed: {e}")
+                    continue
                 except Exception as e:
-                    logger.error(f"❌ Error processing case {case_path}: {e}")
-                
-                self.processor_queue.task_done()
-                
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"❌ Worker loop error: {e}")
+                    logger.error(f"❌ Worker loop error: {e}")
         
         logger.info("🔄 Worker thread stopped")
 
+def wait_for_activation(heartbeat: Optional[Heartbeat], shutdown: threading.Event) -> bool:
+    """Standby mode: models are loaded, block until the supervisor sends SIGUSR1"""
+    activate = threading.Event()
+    signal.signal(signal.SIGUSR1, lambda signum, frame: activate.set())
+    if heartbeat:
+        heartbeat.set_state(STATE_STANDBY)
+    logger.info("⏸️ Standby: models loaded, waiting for activation")
+    while not activate.wait(1):
+        if shutdown.is_set():
+            return False
+    logger.info("▶️ Standby activated")
+    return True
+
 def main():
-    """Main entry point"""
+    """Main entry point (--standby: load models, then wait for SIGUSR1 before starting)"""
+    # SIGTERM (supervisor) and SIGINT both trigger the graceful drain in stop()
+    shutdown = threading.Event()
+    def request_shutdown(signum, frame):
+        logger.info(f"📡 Received signal {signum}, draining...")
+        shutdown.set()
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+    
+    heartbeat = Heartbeat.from_env()
+    if heartbeat:
+        heartbeat.start()
     service = AIPlateRecognitionService()
+    if heartbeat:
+        heartbeat.status = service.status
+    service.alpr_processor.warm_up()
     
     try:
+        if '--standby' in sys.argv and not wait_for_activation(heartbeat, shutdown):
+            return
+        if shutdown.is_set():
+            return
         if service.start():
+            if heartbeat:
+                heartbeat.set_state(STATE_ACTIVE)
             logger.info("🎯 AI Plate Recognition Service is running...")
             logger.info("Press Ctrl+C to stop")
             
             # Keep running until interrupted
-            while True:
-                time.sleep(1)
+            while not shutdown.wait(1):
+                pass
                 
     except KeyboardInterrupt:
         logger.info("👋 Received interrupt signal")
     except Exception as e:
         logger.error(f"❌ Service error: {e}")
     finally:
+        if heartbeat:
+            heartbeat.set_state(STATE_STOPPING)
         service.stop()
+        if heartbeat:
+            heartbeat.stop()
 
 if __name__ == "__main__":
     main()
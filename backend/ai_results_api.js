@@ -2,6 +2,7 @@ const express = require('express');
 const fs = require('fs').promises;
 const path = require('path');
 const cors = require('cors');
+const dayPack = require('./utils/dayPack');
 
 const app = express();
 const PORT = 3004;
@@ -14,6 +15,62 @@ app.use(express.static('public'));
 // Serve static files from AI folders
 app.use('/ai-images', express.static('/srv/processing_inbox'));
 
+// Thumbnails and annotated previews, content-addressed so they never change
+app.use('/ai-previews', express.static('/srv/processing_inbox/.ai_previews', { maxAge: '365d', immutable: true }));
+
+// Files of packed days (<camera>/<date>.pack) are streamed from the pack's byte range
+app.get('/ai-images/:camera/:date/*', async (req, res) => {
+    const { camera, date } = req.params;
+    const member = req.params[0];
+    if (![camera, date].every(dayPack.isPackSegment)) {
+        return res.status(404).json({ error: 'File not found' });
+    }
+    try {
+        const found = await dayPack.openMember(dayPack.packPath('/srv/processing_inbox', camera, date), member);
+        if (!found) {
+            return res.status(404).json({ error: 'File not found' });
+        }
+        await dayPack.sendMember(res, found, member);
+    } catch (error) {
+        console.error('❌ Could not read day pack:', error.message);
+        res.status(500).json({ error: 'Could not read day pack' });
+    }
+});
+
+/**
+ * A case's ai/ai_detection_results.json and verdict.json, from the hot tree or
+ * from its day pack (<camera>/<date>.pack) once the day was packed
+ */
+const readCaseResults = async (processingInbox, camera, date, caseName) => {
+    const casePath = path.join(processingInbox, camera, date, caseName);
+    const readVerdict = async (read) => {
+        try {
+            return JSON.parse(await read());
+        } catch (e) {
+            console.warn(`⚠️ Could not read verdict for ${caseName}`);
+            return {};
+        }
+    };
+    try {
+        const aiResults = JSON.parse(await fs.readFile(path.join(casePath, 'ai', 'ai_detection_results.json'), 'utf8'));
+        const originalData = await readVerdict(() => fs.readFile(path.join(casePath, 'verdict.json'), 'utf8'));
+        return { aiResults, originalData };
+    } catch (e) {
+        if (e.code !== 'ENOENT' || ![camera, date].every(dayPack.isPackSegment)) throw e;
+    }
+    const pack = dayPack.packPath(processingInbox, camera, date);
+    const data = await dayPack.readMember(pack, `${caseName}/ai/ai_detection_results.json`);
+    if (!data) {
+        throw new Error(`No AI results for ${camera}/${date}/${caseName}`);
+    }
+    const originalData = await readVerdict(async () => {
+        const verdict = await dayPack.readMember(pack, `${caseName}/verdict.json`);
+        if (!verdict) throw new Error('missing');
+        return verdict.toString('utf8');
+    });
+    return { aiResults: JSON.parse(data.toString('utf8')), originalData };
+};
+
 // Serve the AI Results Viewer HTML
 app.get('/', (req, res) => {
     res.sendFile(path.join(__dirname, '../frontend/ai_results_viewer.html'));
@@ -40,10 +97,18 @@ app.get('/api/ai-cases', async (req, res) => {
             // Read all date directories
             const dates = await fs.readdir(cameraPath);
             
+            // Cases of a day that is still a directory win over their packed copy
+            const seen = new Set();
+            const packedDays = [];
+            
             for (const date of dates) {
                 const datePath = path.join(cameraPath, date);
                 const dateStat = await fs.stat(datePath);
                 
+                if (date.endsWith('.pack') && dateStat.isFile()) {
+                    packedDays.push(date.slice(0, -'.pack'.length));
+                    continue;
+                }
                 if (!dateStat.isDirectory()) continue;
                 
                 // Read all case directories
@@ -54,25 +119,10 @@ app.get('/api/ai-cases', async (req, res) => {
                     const caseStat = await fs.stat(casePath);
                     
                     if (!caseStat.isDirectory()) continue;
-                    
-                    // Check if AI folder exists
-                    const aiPath = path.join(casePath, 'ai');
-                    const aiResultsPath = path.join(aiPath, 'ai_detection_results.json');
+                    seen.add(`${date}/${caseName}`);
                     
                     try {
-                        await fs.access(aiResultsPath);
-                        
-                        // Read AI results
-                        const aiResults = JSON.parse(await fs.readFile(aiResultsPath, 'utf8'));
-                        
-                        // Read original case data
-                        let originalData = {};
-                        const verdictPath = path.join(casePath, 'verdict.json');
-                        try {
-                            originalData = JSON.parse(await fs.readFile(verdictPath, 'utf8'));
-                        } catch (e) {
-                            console.warn(`⚠️ Could not read verdict for ${caseName}`);
-                        }
+                        const { aiResults, originalData } = await readCaseResults(processingInbox, camera, date, caseName);
                         
                         cases.push({
                             id: `${camera}_${date}_${caseName}`,
@@ -93,6 +143,33 @@ app.get('/api/ai-cases', async (req, res) => {
                     }
                 }
             }
+            
+            // Packed days: cases are listed from the pack's member table
+            for (const date of packedDays) {
+                const members = await dayPack.listMembers(dayPack.packPath(processingInbox, camera, date)) || [];
+                for (const member of members) {
+                    const [caseName, ...rest] = member.split('/');
+                    if (rest.join('/') !== 'ai/ai_detection_results.json' || seen.has(`${date}/${caseName}`)) continue;
+                    try {
+                        const { aiResults, originalData } = await readCaseResults(processingInbox, camera, date, caseName);
+                        cases.push({
+                            id: `${camera}_${date}_${caseName}`,
+                            camera,
+                            date,
+                            caseName,
+                            casePath: `/ai-images/${camera}/${date}/${caseName}`,
+                            aiResults,
+                            originalData,
+                            processingTimestamp: aiResults.processing_timestamp,
+                            imagesProcessed: aiResults.images_processed,
+                            platesDetected: aiResults.total_plates_detected,
+                            packed: true
+                        });
+                    } catch (e) {
+                        console.warn(`⚠️ Could not read packed case ${camera}/${date}/${caseName}: ${e.message}`);
+                    }
+                }
+            }
         }
         
         // Sort by processing timestamp (newest first)
@@ -124,12 +201,8 @@ app.get('/api/ai-cases/:caseId', async (req, res) => {
         
         console.log(`🔍 Fetching detailed AI results for case: ${caseId}`);
         
-        const casePath = path.join('/srv/processing_inbox', camera, date, caseName);
-        const aiPath = path.join(casePath, 'ai');
-        const aiResultsPath = path.join(aiPath, 'ai_detection_results.json');
-        
-        // Read AI results
-        const aiResults = JSON.parse(await fs.readFile(aiResultsPath, 'utf8'));
+        // Read AI results (hot tree or day pack)
+        const { aiResults, originalData } = await readCaseResults('/srv/processing_inbox', camera, date, caseName);
         
         // Get all processed images with their URLs
         const processedImages = [];
@@ -141,19 +214,12 @@ app.get('/api/ai-cases/:caseId', async (req, res) => {
                 ...imageInfo,
                 originalImageUrl,
                 processedImageUrl,
+                thumbnailUrl: imageInfo.thumbnail ? `/ai-previews/${imageInfo.thumbnail}` : null,
+                previewUrl: imageInfo.preview ? `/ai-previews/${imageInfo.preview}` : null,
                 plates: imageInfo.alpr_result.plates_detected || []
             });
         }
         
-        // Read original case data
-        let originalData = {};
-        const verdictPath = path.join(casePath, 'verdict.json');
-        try {
-            originalData = JSON.parse(await fs.readFile(verdictPath, 'utf8'));
-        } catch (e) {
-            console.warn(`⚠️ Could not read verdict for ${caseId}`);
-        }
-        
         const detailedResults = {
             ...aiResults,
             caseId,
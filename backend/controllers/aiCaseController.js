@@ -2,6 +2,8 @@ const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs').promises;
 const fsSync = require('fs');
+const readline = require('readline');
+const dayPack = require('../utils/dayPack');
 
 /**
  * AI Case Controller
@@ -10,6 +12,7 @@ const fsSync = require('fs');
 
 const AI_PROCESSOR_PATH = '/home/rnd2/Desktop/radar_system_clean/ai_case_processor.py';
 const PROCESSING_INBOX_PATH = '/srv/processing_inbox';
+const PREVIEWS_PATH = path.join(PROCESSING_INBOX_PATH, '.ai_previews');
 
 /**
  * Execute Python AI processor
@@ -44,109 +47,111 @@ const executeAIProcessor = (command, args = []) => {
 };
 
 /**
- * Get all AI processed cases with filters
- * GET /api/ai-cases
- * Query params: camera, date, search, limit, offset
+ * Run the Python AI processor with JSON Lines output, handing each record to
+ * onRecord as soon as its line arrives (the full output is never buffered)
  */
-const getAICases = async (req, res) => {
-  try {
-    const { camera, date, search, limit = 50, offset = 0 } = req.query;
-    
-    // Create a temporary script to get processed cases
-    const scriptContent = `
-import sys
-sys.path.append('/home/rnd2/Desktop/radar_system_clean')
-from ai_case_processor import AICaseProcessor
-import json
-
-processor = AICaseProcessor("${PROCESSING_INBOX_PATH}")
-cases = processor.get_processed_cases(
-    camera_filter="${camera || ''}" if "${camera || ''}" else None,
-    date_filter="${date || ''}" if "${date || ''}" else None,
-    search_filter="${search || ''}" if "${search || ''}" else None
-)
-
-# Apply pagination
-start_idx = ${parseInt(offset)}
-end_idx = start_idx + ${parseInt(limit)}
-paginated_cases = cases[start_idx:end_idx]
-
-result = {
-    "cases": paginated_cases,
-    "total": len(cases),
-    "offset": start_idx,
-    "limit": ${parseInt(limit)},
-    "has_more": end_idx < len(cases)
-}
-
-print(json.dumps(result, ensure_ascii=False))
-`;
-    
-    // Write temporary script
-    const tempScriptPath = '/tmp/get_ai_cases.py';
-    await fs.writeFile(tempScriptPath, scriptContent);
-    
-    // Execute script
-    const pythonProcess = spawn('python3', [tempScriptPath]);
-    
-    let stdout = '';
+const streamAIProcessor = (command, args, onRecord) => {
+  return new Promise((resolve, reject) => {
+    const pythonProcess = spawn('python3', [AI_PROCESSOR_PATH, command, ...args]);
+    const lines = readline.createInterface({ input: pythonProcess.stdout });
     let stderr = '';
     
-    pythonProcess.stdout.on('data', (data) => {
-      stdout += data.toString();
+    lines.on('line', (line) => {
+      if (!line.trim()) return;
+      try {
+        onRecord(JSON.parse(line));
+      } catch (parseError) {
+        console.warn('Skipping unparsable AI processor line:', line.slice(0, 200));
+      }
     });
     
     pythonProcess.stderr.on('data', (data) => {
-      stderr += data.toString();
+      // Keep only the tail; the processor logs to stderr
+      stderr = (stderr + data.toString()).slice(-10000);
     });
     
-    pythonProcess.on('close', async (code) => {
-      // Clean up temp script
-      try {
-        await fs.unlink(tempScriptPath);
-      } catch (e) {
-        console.warn('Failed to clean up temp script:', e.message);
-      }
-      
+    pythonProcess.on('close', (code) => {
+      lines.close();
       if (code === 0) {
-        try {
-          const result = JSON.parse(stdout);
-          res.json({
-            success: true,
-            data: result
-          });
-        } catch (parseError) {
-          console.error('Failed to parse AI processor output:', parseError);
-          res.status(500).json({
-            success: false,
-            error: 'Failed to parse AI processor output',
-            details: stdout
-          });
-        }
+        resolve();
       } else {
-        console.error('AI Processor failed:', stderr);
-        res.status(500).json({
-          success: false,
-          error: 'AI processor failed',
-          details: stderr
-        });
+        reject(new Error(`AI Processor failed with code ${code}: ${stderr}`));
       }
     });
     
-    pythonProcess.on('error', (error) => {
-      console.error('Failed to start AI processor:', error);
-      res.status(500).json({
-        success: false,
-        error: 'Failed to start AI processor',
-        details: error.message
-      });
+    pythonProcess.on('error', reject);
+  });
+};
+
+/**
+ * Whether the client asked for NDJSON (one record per line, sent as produced)
+ */
+const wantsStream = (req) =>
+  req.query.stream === '1' || (req.headers.accept || '').includes('application/x-ndjson');
+
+/**
+ * Get all AI processed cases with filters
+ * GET /api/ai-cases
+ * Query params: camera, date, search, limit, offset, stream=1 (NDJSON),
+ * plateMode (exact, prefix, partial or fuzzy: match search against the plate
+ * index instead of by substring)
+ */
+const getAICases = async (req, res) => {
+  const { camera, date, search, plateMode, limit = 50, offset = 0 } = req.query;
+  if (plateMode && !['exact', 'prefix', 'partial', 'fuzzy'].includes(plateMode)) {
+    return res.status(400).json({
+      success: false,
+      error: 'Invalid plateMode',
+      details: 'plateMode must be one of exact, prefix, partial, fuzzy'
+    });
+  }
+  const args = [camera || '', date || '', search || '', String(parseInt(offset) || 0), String(parseInt(limit) || 50),
+    plateMode || ''];
+  const stream = wantsStream(req);
+  const cases = [];
+  let summary = null;
+  
+  if (stream) {
+    res.type('application/x-ndjson');
+  }
+  
+  try {
+    await streamAIProcessor('cases', args, (record) => {
+      if (record.case) {
+        if (stream) {
+          res.write(JSON.stringify(record) + '\n');
+        } else {
+          cases.push(record.case);
+        }
+      } else if (record.summary) {
+        summary = record.summary;
+      }
+    });
+    
+    if (stream) {
+      res.end(JSON.stringify({ summary }) + '\n');
+      return;
+    }
+    res.json({
+      success: true,
+      data: {
+        cases,
+        total: summary ? summary.total : cases.length,
+        offset: summary ? summary.offset : parseInt(offset),
+        limit: summary ? summary.limit : parseInt(limit),
+        has_more: summary ? summary.has_more : false
+      }
     });
     
   } catch (error) {
     console.error('Error in getAICases:', error);
+    if (stream && res.headersSent) {
+      res.end(JSON.stringify({ error: error.message }) + '\n');
+      return;
+    }
     res.status(500).json({
       success: false,
-      error: 'Internal server error',
+      error: 'AI processor failed',
       details: error.message
     });
   }
@@ -155,96 +160,56 @@ print(json.dumps(result, ensure_ascii=False))
 /**
  * Process all cases with verdict.json
  * POST /api/ai-cases/process
+ * Query params: stream=1 (NDJSON, one result per processed case)
  */
 const processAICases = async (req, res) => {
+  console.log('Starting AI case processing...');
+  const stream = wantsStream(req);
+  const results = [];
+  let summary = null;
+  
+  if (stream) {
+    res.type('application/x-ndjson');
+  }
+  
   try {
-    console.log('Starting AI case processing...');
-    
-    const scriptContent = `
-import sys
-sys.path.append('/home/rnd2/Desktop/radar_system_clean')
-from ai_case_processor import AICaseProcessor
-import json
-
-processor = AICaseProcessor("${PROCESSING_INBOX_PATH}")
-results = processor.process_all_cases()
-
-output = {
-    "processed_count": len(results),
-    "results": results,
-    "success": True
-}
-
-print(json.dumps(output, ensure_ascii=False))
-`;
-    
-    // Write temporary script
-    const tempScriptPath = '/tmp/process_ai_cases.py';
-    await fs.writeFile(tempScriptPath, scriptContent);
-    
-    // Execute script
-    const pythonProcess = spawn('python3', [tempScriptPath]);
-    
-    let stdout = '';
-    let stderr = '';
-    
-    pythonProcess.stdout.on('data', (data) => {
-      stdout += data.toString();
-    });
-    
-    pythonProcess.stderr.on('data', (data) => {
-      stderr += data.toString();
-    });
-    
-    pythonProcess.on('close', async (code) => {
-      // Clean up temp script
-      try {
-        await fs.unlink(tempScriptPath);
-      } catch (e) {
-        console.warn('Failed to clean up temp script:', e.message);
-      }
-      
-      if (code === 0) {
-        try {
-          const result = JSON.parse(stdout);
-          console.log(`AI processing completed: ${result.processed_count} cases processed`);
-          res.json({
-            success: true,
-            message: `Successfully processed ${result.processed_count} cases`,
-            data: result
-          });
-        } catch (parseError) {
-          console.error('Failed to parse AI processor output:', parseError);
-          res.status(500).json({
-            success: false,
-            error: 'Failed to parse AI processor output',
-            details: stdout
-          });
+    await streamAIProcessor('process', ['--jsonl'], (record) => {
+      if (record.result) {
+        if (stream) {
+          res.write(JSON.stringify(record) + '\n');
+        } else {
+          results.push(record.result);
         }
-      } else {
-        console.error('AI processing failed:', stderr);
-        res.status(500).json({
-          success: false,
-          error: 'AI processing failed',
-          details: stderr
-        });
+      } else if (record.summary) {
+        summary = record.summary;
       }
     });
     
-    pythonProcess.on('error', (error) => {
-      console.error('Failed to start AI processor:', error);
-      res.status(500).json({
-        success: false,
-        error: 'Failed to start AI processor',
-        details: error.message
-      });
+    const processedCount = summary ? summary.processed_count : results.length;
+    console.log(`AI processing completed: ${processedCount} cases processed`);
+    if (stream) {
+      res.end(JSON.stringify({ summary }) + '\n');
+      return;
+    }
+    res.json({
+      success: true,
+      message: `Successfully processed ${processedCount} cases`,
+      data: {
+        processed_count: processedCount,
+        results,
+        success: true
+      }
     });
     
   } catch (error) {
-    console.error('Error in processAICases:', error);
+    console.error('AI processing failed:', error);
+    if (stream && res.headersSent) {
+      res.end(JSON.stringify({ error: error.message }) + '\n');
+      return;
+    }
     res.status(500).json({
       success: false,
-      error: 'Internal server error',
+      error: 'AI processing failed',
       details: error.message
     });
   }
@@ -354,8 +319,18 @@ const getAICaseDetails = async (req, res) => {
     const casePath = path.join(PROCESSING_INBOX_PATH, camera, date, caseId);
     const aiJsonPath = path.join(casePath, 'ai', 'ai.json');
     
+    // Packed day: read the case from <camera>/<date>.pack
+    let packed = null;
+    if (!fsSync.existsSync(aiJsonPath) && [camera, date, caseId].every(dayPack.isPackSegment)) {
+      const pack = dayPack.packPath(PROCESSING_INBOX_PATH, camera, date);
+      const data = await dayPack.readMember(pack, `${caseId}/ai/ai.json`);
+      if (data) {
+        packed = { data, members: await dayPack.listMembers(pack) || [] };
+      }
+    }
+    
     // Check if AI data exists
-    if (!fsSync.existsSync(aiJsonPath)) {
+    if (!packed && !fsSync.existsSync(aiJsonPath)) {
       return res.status(404).json({
         success: false,
         error: 'AI data not found for this case'
@@ -363,13 +338,25 @@ const getAICaseDetails = async (req, res) => {
     }
     
     // Read AI data
-    const aiData = JSON.parse(await fs.readFile(aiJsonPath, 'utf8'));
+    const aiData = JSON.parse(packed ? packed.data.toString('utf8') : await fs.readFile(aiJsonPath, 'utf8'));
     
     // Get AI images
     const aiDir = path.join(casePath, 'ai');
     const aiImages = [];
     
-    if (fsSync.existsSync(aiDir)) {
+    if (packed) {
+      const prefix = `${caseId}/ai/`;
+      for (const member of packed.members) {
+        const file = member.slice(prefix.length);
+        if (member.startsWith(prefix) && !file.includes('/') && file.match(/\.(jpg|jpeg|png)$/i)) {
+          aiImages.push({
+            filename: file,
+            path: path.join(aiDir, file),
+            url: `/api/ai-cases/${camera}/${date}/${caseId}/images/${file}`
+          });
+        }
+      }
+    } else if (fsSync.existsSync(aiDir)) {
       const files = await fs.readdir(aiDir);
       for (const file of files) {
         if (file.match(/\.(jpg|jpeg|png)$/i)) {
@@ -389,6 +376,7 @@ const getAICaseDetails = async (req, res) => {
         date: date,
         case_id: caseId,
         case_path: casePath,
+        packed: Boolean(packed),
         ai_data: aiData,
         ai_images: aiImages
       }
@@ -412,7 +400,23 @@ const getAIImage = async (req, res) => {
   try {
     const { camera, date, caseId, filename } = req.params;
     
-    const imagePath = path.join(PROCESSING_INBOX_PATH, camera, date, caseId, 'ai', filename);
+    let imagePath = path.join(PROCESSING_INBOX_PATH, camera, date, caseId, 'ai', filename);
+    
+    // ai/ copies pruned by retention: serve the original frame instead
+    if (!fsSync.existsSync(imagePath)) {
+      imagePath = path.join(PROCESSING_INBOX_PATH, camera, date, caseId, path.basename(filename).replace(/^processed_/, ''));
+    }
+    
+    // Packed day: the same lookups against <camera>/<date>.pack
+    if (!fsSync.existsSync(imagePath) && [camera, date, caseId].every(dayPack.isPackSegment)) {
+      const pack = dayPack.packPath(PROCESSING_INBOX_PATH, camera, date);
+      for (const member of [`${caseId}/ai/${filename}`, `${caseId}/${path.basename(filename).replace(/^processed_/, '')}`]) {
+        const found = await dayPack.openMember(pack, member);
+        if (found) {
+          return dayPack.sendMember(res, found, member);
+        }
+      }
+    }
     
     // Check if image exists
     if (!fsSync.existsSync(imagePath)) {
@@ -435,6 +439,25 @@ const getAIImage = async (req, res) => {
   }
 };
 
+/**
+ * Serve a cached thumbnail or annotated preview
+ * GET /api/ai-cases/previews/:shard/:file
+ */
+const getAIPreview = (req, res) => {
+  const { shard, file } = req.params;
+  // Keys are <2 hex>/<sha256>.<kind>.<ext>; anything else is not a preview
+  if (!/^[0-9a-f]{2}$/.test(shard) || !/^[0-9a-f]{64}\.[\w.@-]+\.(webp|jpg)$/.test(file) ||
+      !file.startsWith(shard)) {
+    return res.status(404).json({ success: false, error: 'Preview not found' });
+  }
+  // Content-addressed: the bytes behind a key never change
+  res.sendFile(`${shard}/${file}`, { root: PREVIEWS_PATH, maxAge: '365d', immutable: true }, (error) => {
+    if (error && !res.headersSent) {
+      res.status(404).json({ success: false, error: 'Preview not found' });
+    }
+  });
+};
+
 /**
  * Get AI processing statistics
  * GET /api/ai-cases/stats
@@ -449,42 +472,8 @@ import json
 
 processor = AICaseProcessor("${PROCESSING_INBOX_PATH}")
 
-# Get processed cases
-processed_cases = processor.get_processed_cases()
-
-# Get pending cases
-pending_cases = processor.find_cases_with_verdict()
-
-# Calculate stats
-stats = {
-    "total_processed": len(processed_cases),
-    "total_pending": len(pending_cases),
-    "cameras": {},
-    "dates": {},
-    "plate_detections": 0,
-    "average_confidence": 0.0
-}
-
-# Process camera and date stats
-for case in processed_cases:
-    camera = case['camera_id']
-    date = case['date']
-    
-    if camera not in stats['cameras']:
-        stats['cameras'][camera] = 0
-    stats['cameras'][camera] += 1
-    
-    if date not in stats['dates']:
-        stats['dates'][date] = 0
-    stats['dates'][date] += 1
-    
-    if case.get('plate_number'):
-        stats['plate_detections'] += 1
-
-# Calculate average confidence
-if processed_cases:
-    total_confidence = sum(case.get('confidence', 0.0) for case in processed_cases)
-    stats['average_confidence'] = total_confidence / len(processed_cases)
+# Running aggregates are maintained on every ai.json write
+stats = processor.get_stats(include_pending=True)
 
 print(json.dumps(stats, ensure_ascii=False))
 `;
@@ -559,11 +548,67 @@ print(json.dumps(stats, ensure_ascii=False))
   }
 };
 
+/**
+ * Find cases by plate number using the plate index
+ * GET /api/ai-cases/plates/:plate
+ * Query params: mode (exact | prefix | partial | fuzzy), distance (fuzzy, 0-2), limit
+ */
+const getCasesByPlate = async (req, res) => {
+  try {
+    const { plate } = req.params;
+    const { mode = 'exact', distance = 1, limit = 100 } = req.query;
+    
+    if (!['exact', 'prefix', 'partial', 'fuzzy'].includes(mode)) {
+      return res.status(400).json({
+        success: false,
+        error: 'Invalid mode',
+        details: 'mode must be one of exact, prefix, partial, fuzzy'
+      });
+    }
+    
+    const maxDistance = parseInt(distance);
+    if (!(maxDistance >= 0 && maxDistance <= 2)) {
+      return res.status(400).json({
+        success: false,
+        error: 'Invalid distance',
+        details: 'distance must be between 0 and 2'
+      });
+    }
+    
+    // Arguments are passed directly to the CLI, not interpolated into a script
+    const stdout = await executeAIProcessor('plate', [plate, mode, String(maxDistance)]);
+    const matches = JSON.parse(stdout);
+    const maxResults = parseInt(limit) || 100;
+    
+    res.json({
+      success: true,
+      data: {
+        plate,
+        mode,
+        distance: mode === 'fuzzy' ? maxDistance : undefined,
+        matches: matches.slice(0, maxResults),
+        total: matches.length,
+        has_more: matches.length > maxResults
+      }
+    });
+    
+  } catch (error) {
+    console.error('Error in getCasesByPlate:', error);
+    res.status(500).json({
+      success: false,
+      error: 'Plate lookup failed',
+      details: error.message
+    });
+  }
+};
+
 module.exports = {
   getAICases,
   processAICases,
   getPendingCases,
   getAICaseDetails,
   getAIImage,
-  getAIStats
+  getAIPreview,
+  getAIStats,
+  getCasesByPlate
 };
@@ -6,7 +6,9 @@ const {
   getPendingCases,
   getAICaseDetails,
   getAIImage,
-  getAIStats
+  getAIPreview,
+  getAIStats,
+  getCasesByPlate
 } = require('../controllers/aiCaseController');
 
 /**
@@ -16,6 +18,7 @@ const {
 
 // Get all AI processed cases with filters
 // GET /api/ai-cases?camera=camera001&date=2025-10-06&search=AB123&limit=50&offset=0
+// GET /api/ai-cases?search=AB123&plateMode=fuzzy (plate index search instead of substring)
 router.get('/', getAICases);
 
 // Process all cases with verdict.json
@@ -30,6 +33,14 @@ router.get('/pending', getPendingCases);
 // GET /api/ai-cases/stats
 router.get('/stats', getAIStats);
 
+// Find cases by plate number (exact, prefix, partial or fuzzy match)
+// GET /api/ai-cases/plates/1234567?mode=fuzzy&distance=1&limit=100
+router.get('/plates/:plate', getCasesByPlate);
+
+// Serve cached thumbnails and annotated previews (keys from the case's previews list)
+// GET /api/ai-cases/previews/3f/3f2a...e1.thumb.webp
+router.get('/previews/:shard/:file', getAIPreview);
+
 // Get specific AI case details
 // GET /api/ai-cases/:camera/:date/:caseId
 router.get('/:camera/:date/:caseId', getAICaseDetails);
@@ -11,6 +11,9 @@ const { Op } = require('sequelize');
 class AiToFinesSync {
   constructor() {
     this.processingInbox = '/srv/processing_inbox';
+    // Change feed appended by the Python AI processors (see change_feed.py)
+    this.changeLogPath = path.join(this.processingInbox, '.ai_changes', 'changes.jsonl');
+    this.feedOffsetPath = path.join(this.processingInbox, '.ai_changes', 'offsets', 'fines_sync.json');
     this.isRunning = false;
     this.processedCases = new Set();
   }
@@ -31,9 +34,9 @@ class AiToFinesSync {
       // Initial sync of all existing AI results
       await this.syncAllAiResults();
       
-      // Set up periodic sync (every 30 seconds)
+      // Set up periodic sync (every 30 seconds); tails the change feed when available
       this.syncInterval = setInterval(() => {
-        this.syncAllAiResults().catch(error => {
+        this.syncNewAiResults().catch(error => {
           console.error('❌ Error in periodic sync:', error);
         });
       }, 30000);
@@ -57,6 +60,128 @@ class AiToFinesSync {
     console.log('🛑 AI to Fines sync service stopped');
   }
 
+  /**
+   * Sync only results appended since the last run, falling back to a full scan
+   * when the change feed does not exist yet
+   */
+  async syncNewAiResults() {
+    const usedFeed = await this.syncFromChangeFeed();
+    if (!usedFeed) {
+      await this.syncAllAiResults();
+    }
+  }
+
+  /**
+   * Read the committed change feed checkpoint for this consumer
+   */
+  async readFeedOffset() {
+    try {
+      return JSON.parse(await fs.readFile(this.feedOffsetPath, 'utf8'));
+    } catch (e) {
+      return { seq: 0, offset: 0 };
+    }
+  }
+
+  /**
+   * Persist the change feed checkpoint (write + rename)
+   */
+  async writeFeedOffset(checkpoint) {
+    await fs.mkdir(path.dirname(this.feedOffsetPath), { recursive: true });
+    const tmpPath = `${this.feedOffsetPath}.tmp${process.pid}`;
+    await fs.writeFile(tmpPath, JSON.stringify(checkpoint));
+    await fs.rename(tmpPath, this.feedOffsetPath);
+  }
+
+  /**
+   * Process change feed records appended since the last checkpoint
+   * Returns false when there is no change feed
+   */
+  async syncFromChangeFeed() {
+    let handle;
+    try {
+      handle = await fs.open(this.changeLogPath, 'r');
+    } catch (e) {
+      return false;
+    }
+
+    try {
+      const checkpoint = await this.readFeedOffset();
+      const { size } = await handle.stat();
+      // A shorter log means it was replaced; re-read it and rely on seq filtering
+      const offset = checkpoint.offset <= size ? checkpoint.offset : 0;
+      if (size - offset <= 0) return true;
+
+      const buffer = Buffer.alloc(size - offset);
+      await handle.read(buffer, 0, buffer.length, offset);
+
+      // Only consume complete lines; a partially written record is read next time
+      const lastNewline = buffer.lastIndexOf(0x0a);
+      if (lastNewline === -1) return true;
+      const lines = buffer.subarray(0, lastNewline).toString('utf8').split('\n');
+
+      let lastSeq = checkpoint.seq || 0;
+      let nextOffset = offset;
+      let processedCount = 0;
+
+      for (const line of lines) {
+        // Byte offset just past this line, committed once the record is handled
+        const lineEnd = nextOffset + Buffer.byteLength(line, 'utf8') + 1;
+        if (!line.trim()) {
+          nextOffset = lineEnd;
+          continue;
+        }
+
+        let record;
+        try {
+          record = JSON.parse(line);
+        } catch (e) {
+          console.warn('⚠️ Skipping corrupt change feed line');
+          continue;
+        }
+        if (record.seq <= lastSeq) {
+          nextOffset = lineEnd;
+          continue;
+        }
+
+        // Removal records (retention) only concern in-memory counters
+        if (!record.removed && path.basename(record.result_file || '') === 'ai_detection_results.json') {
+          const caseId = `${record.camera_id}_${record.date}_${record.case_id}`;
+          if (!this.processedCases.has(caseId)) {
+            let success;
+            try {
+              const radar = await this.getOrCreateRadar(record.camera_id);
+              success = await this.createFineForCase(record.result_file, radar, caseId);
+            } catch (error) {
+              if (error.code !== 'ENOENT' && !(error instanceof SyntaxError)) {
+                // Stop here; the checkpoint stays before this record so the next run retries it
+                console.error(`❌ Error processing case ${caseId} (seq ${record.seq}), retrying next sync:`, error.message);
+                break;
+              }
+              console.warn(`⚠️ Result file of case ${caseId} is missing or unreadable, skipping`);
+            }
+            if (success) {
+              this.processedCases.add(caseId);
+              processedCount++;
+            }
+          }
+        }
+        lastSeq = record.seq;
+        nextOffset = lineEnd;
+      }
+
+      if (nextOffset > offset) {
+        await this.writeFeedOffset({ seq: lastSeq, offset: nextOffset });
+      }
+
+      if (processedCount > 0) {
+        console.log(`📊 AI Sync (change feed): ${processedCount} new cases processed up to seq ${lastSeq}`);
+      }
+      return true;
+    } finally {
+      await handle.close();
+    }
+  }
+
   /**
    * Sync all AI results to fines database
    */
@@ -69,6 +194,9 @@ class AiToFinesSync {
       let skippedCount = 0;
       
       for (const camera of cameras) {
+        // Skip hidden bookkeeping (.ai_changes, .ai_stats.json)
+        if (camera.startsWith('.')) continue;
+        
         const cameraPath = path.join(this.processingInbox, camera);
         const stat = await fs.stat(cameraPath);
         
@@ -171,93 +299,100 @@ class AiToFinesSync {
    */
   async processCaseToFines(aiResultsPath, radar, caseId) {
     try {
-      // Read AI results
-      const aiData = JSON.parse(await fs.readFile(aiResultsPath, 'utf8'));
-      
-      // Extract violation data
-      const originalData = aiData.original_case_data;
-      if (!originalData || originalData.decision !== 'violation') {
-        // Not a violation, skip
-        return false;
-      }
-      
-      // Get the best plate detection (highest confidence)
-      let bestPlate = null;
-      if (aiData.detected_plates && aiData.detected_plates.length > 0) {
-        bestPlate = aiData.detected_plates.reduce((best, current) => 
-          current.confidence > (best?.confidence || 0) ? current : best
-        );
-      }
-      
-      // Calculate violation amount and fine
-      const speedDetected = originalData.speed || 0;
-      const speedLimit = originalData.limit || 30;
-      const violationAmount = Math.max(0, speedDetected - speedLimit);
-      const fineAmount = this.calculateFineAmount(violationAmount);
-      
-      // Create violation datetime from event timestamp
-      let violationDateTime = new Date();
-      if (originalData.event_ts) {
-        // Convert Unix timestamp to Date (assuming it's in seconds)
-        violationDateTime = new Date(originalData.event_ts * 1000);
-      }
-      
-      // Get first processed image for imageUrl
-      let imageUrl = null;
-      if (aiData.processed_images && aiData.processed_images.length > 0) {
-        const firstImage = aiData.processed_images[0];
-        // Create relative URL for the processed image
-        imageUrl = `/ai-images/${aiData.camera_id}/${aiData.case_id.split(':')[1].split('-').slice(0,3).join('-')}/${path.basename(path.dirname(aiResultsPath))}/ai/processed_${firstImage.filename}`;
-      }
-      
-      // Check if fine already exists
-      const existingFine = await Fine.findOne({
-        where: {
-          radarId: radar.id,
-          violationDateTime: violationDateTime,
-          [Op.or]: [
-            { notes: { [Op.like]: `%${caseId}%` } },
-            { notes: { [Op.like]: `%${originalData.burst_id}%` } }
-          ]
-        }
-      });
-      
-      if (existingFine) {
-        console.log(`⚠️ Fine already exists for case ${caseId}`);
-        return false;
-      }
-      
-      // Create fine record
-      const fine = await Fine.create({
-        radarId: radar.id,
-        vehiclePlate: bestPlate?.plate_text || null,
-        speedDetected: speedDetected,
-        speedLimit: speedLimit,
-        violationAmount: violationAmount,
-        fineAmount: fineAmount,
-        violationDateTime: violationDateTime,
-        status: 'pending',
-        imageUrl: imageUrl,
-        notes: JSON.stringify({
-          caseId: caseId,
-          burstId: originalData.burst_id,
-          aiProcessingTimestamp: aiData.processing_timestamp,
-          platesDetected: aiData.total_plates_detected,
-          plateConfidence: bestPlate?.confidence || null,
-          detectionMethod: bestPlate?.detection_method || null,
-          imagesProcessed: aiData.images_processed
-        })
-      });
-      
-      console.log(`✅ Created fine record for case ${caseId}: ${bestPlate?.plate_text || 'No plate'} - ${speedDetected}km/h (${violationAmount}km/h over limit)`);
-      return true;
-      
+      return await this.createFineForCase(aiResultsPath, radar, caseId);
     } catch (error) {
       console.error(`❌ Error processing case ${caseId}:`, error);
       return false;
     }
   }
 
+  /**
+   * Create the fine for one AI result; false when there is nothing to create.
+   * Errors (unreadable result, database failures) are thrown to the caller.
+   */
+  async createFineForCase(aiResultsPath, radar, caseId) {
+    // Read AI results
+    const aiData = JSON.parse(await fs.readFile(aiResultsPath, 'utf8'));
+    
+    // Extract violation data
+    const originalData = aiData.original_case_data;
+    if (!originalData || originalData.decision !== 'violation') {
+      // Not a violation, skip
+      return false;
+    }
+    
+    // Get the best plate detection (highest confidence)
+    let bestPlate = null;
+    if (aiData.detected_plates && aiData.detected_plates.length > 0) {
+      bestPlate = aiData.detected_plates.reduce((best, current) => 
+        current.confidence > (best?.confidence || 0) ? current : best
+      );
+    }
+    
+    // Calculate violation amount and fine
+    const speedDetected = originalData.speed || 0;
+    const speedLimit = originalData.limit || 30;
+    const violationAmount = Math.max(0, speedDetected - speedLimit);
+    const fineAmount = this.calculateFineAmount(violationAmount);
+    
+    // Create violation datetime from event timestamp
+    let violationDateTime = new Date();
+    if (originalData.event_ts) {
+      // Convert Unix timestamp to Date (assuming it's in seconds)
+      violationDateTime = new Date(originalData.event_ts * 1000);
+    }
+    
+    // Get first processed image for imageUrl
+    let imageUrl = null;
+    if (aiData.processed_images && aiData.processed_images.length > 0) {
+      const firstImage = aiData.processed_images[0];
+      // Create relative URL for the processed image
+      imageUrl = `/ai-images/${aiData.camera_id}/${aiData.case_id.split(':')[1].split('-').slice(0,3).join('-')}/${path.basename(path.dirname(aiResultsPath))}/ai/processed_${firstImage.filename}`;
+    }
+    
+    // Check if fine already exists
+    const existingFine = await Fine.findOne({
+      where: {
+        radarId: radar.id,
+        violationDateTime: violationDateTime,
+        [Op.or]: [
+          { notes: { [Op.like]: `%${caseId}%` } },
+          { notes: { [Op.like]: `%${originalData.burst_id}%` } }
+        ]
+      }
+    });
+    
+    if (existingFine) {
+      console.log(`⚠️ Fine already exists for case ${caseId}`);
+      return false;
+    }
+    
+    // Create fine record
+    const fine = await Fine.create({
+      radarId: radar.id,
+      vehiclePlate: bestPlate?.plate_text || null,
+      speedDetected: speedDetected,
+      speedLimit: speedLimit,
+      violationAmount: violationAmount,
+      fineAmount: fineAmount,
+      violationDateTime: violationDateTime,
+      status: 'pending',
+      imageUrl: imageUrl,
+      notes: JSON.stringify({
+        caseId: caseId,
+        burstId: originalData.burst_id,
+        aiProcessingTimestamp: aiData.processing_timestamp,
+        platesDetected: aiData.total_plates_detected,
+        plateConfidence: bestPlate?.confidence || null,
+        detectionMethod: bestPlate?.detection_method || null,
+        imagesProcessed: aiData.images_processed
+      })
+    });
+    
+    console.log(`✅ Created fine record for case ${caseId}: ${bestPlate?.plate_text || 'No plate'} - ${speedDetected}km/h (${violationAmount}km/h over limit)`);
+    return true;
+  }
+
   /**
    * Calculate fine amount based on violation amount
    */
@@ -286,6 +421,7 @@ class AiToFinesSync {
       let totalAiCases = 0;
       
       for (const camera of cameras) {
+        if (camera.startsWith('.')) continue;
         const cameraPath = path.join(this.processingInbox, camera);
         const stat = await fs.stat(cameraPath);
         if (!stat.isDirectory()) continue;
@@ -0,0 +1,142 @@
+const fs = require('fs').promises;
+const path = require('path');
+
+// Reader for day packs written by day_pack.py (<camera>/<date>.pack).
+// header: magic, version, member count, index bytes (entries + names), data offset
+// entry: data offset, size, mtime_ns, name length, followed by the UTF-8 names
+const MAGIC = 'RDPACK01';
+const VERSION = 1;
+const HEADER_SIZE = 32;
+const ENTRY_SIZE = 26;
+
+// Member tables kept in memory, keyed by pack path
+const MAX_CACHED_PACKS = 32;
+const indexCache = new Map();
+
+const packPath = (inboxPath, camera, date) => path.join(inboxPath, camera, `${date}.pack`);
+
+const readIndex = async (handle, filePath) => {
+  const header = Buffer.alloc(HEADER_SIZE);
+  await handle.read(header, 0, HEADER_SIZE, 0);
+  if (header.toString('latin1', 0, 8) !== MAGIC || header.readUInt32LE(8) !== VERSION) {
+    throw new Error(`Not a day pack: ${filePath}`);
+  }
+  const count = header.readUInt32LE(12);
+  const indexSize = Number(header.readBigUInt64LE(16));
+  const index = Buffer.alloc(indexSize);
+  await handle.read(index, 0, indexSize, HEADER_SIZE);
+
+  const members = new Map();
+  let nameOffset = count * ENTRY_SIZE;
+  for (let i = 0; i < count; i++) {
+    const entry = i * ENTRY_SIZE;
+    const nameLength = index.readUInt16LE(entry + 24);
+    members.set(index.toString('utf8', nameOffset, nameOffset + nameLength), {
+      offset: Number(index.readBigUInt64LE(entry)),
+      size: Number(index.readBigUInt64LE(entry + 8)),
+      mtimeMs: Number(index.readBigInt64LE(entry + 16) / 1000000n)
+    });
+    nameOffset += nameLength;
+  }
+  return members;
+};
+
+const openPack = async (filePath) => {
+  try {
+    return await fs.open(filePath, 'r');
+  } catch (error) {
+    if (error.code === 'ENOENT' || error.code === 'ENOTDIR') return null;
+    throw error;
+  }
+};
+
+// Member table of an open pack, from the cache while the file is unchanged
+const membersOf = async (handle, filePath) => {
+  const stat = await handle.stat();
+  let cached = indexCache.get(filePath);
+  if (!cached || cached.ino !== stat.ino || cached.mtimeMs !== stat.mtimeMs) {
+    cached = { ino: stat.ino, mtimeMs: stat.mtimeMs, members: await readIndex(handle, filePath) };
+  }
+  // Most recently used last
+  indexCache.delete(filePath);
+  indexCache.set(filePath, cached);
+  if (indexCache.size > MAX_CACHED_PACKS) {
+    indexCache.delete(indexCache.keys().next().value);
+  }
+  return cached.members;
+};
+
+/**
+ * Names of the members of a day pack, or null when there is no pack
+ */
+const listMembers = async (filePath) => {
+  const handle = await openPack(filePath);
+  if (!handle) return null;
+  try {
+    return [...(await membersOf(handle, filePath)).keys()];
+  } finally {
+    await handle.close();
+  }
+};
+
+/**
+ * Open a member of a day pack. Resolves to null when the pack or member does
+ * not exist; otherwise to { handle, offset, size, mtimeMs }. The caller owns
+ * the handle (a pack replaced meanwhile stays readable through it).
+ */
+const openMember = async (filePath, member) => {
+  const handle = await openPack(filePath);
+  if (!handle) return null;
+  try {
+    const entry = (await membersOf(handle, filePath)).get(member);
+    if (!entry) {
+      await handle.close();
+      return null;
+    }
+    return { handle, ...entry };
+  } catch (error) {
+    await handle.close();
+    throw error;
+  }
+};
+
+/**
+ * The bytes of a day pack member, or null when the pack or member does not exist
+ */
+const readMember = async (filePath, member) => {
+  const found = await openMember(filePath, member);
+  if (!found) return null;
+  try {
+    const data = Buffer.alloc(found.size);
+    await found.handle.read(data, 0, found.size, found.offset);
+    return data;
+  } finally {
+    await found.handle.close();
+  }
+};
+
+/**
+ * Send a member opened with openMember as the response body (byte-range stream)
+ */
+const sendMember = async (res, found, member) => {
+  res.type(path.extname(member));
+  res.set('Content-Length', String(found.size));
+  res.set('Last-Modified', new Date(found.mtimeMs).toUTCString());
+  if (found.size === 0) {
+    await found.handle.close();
+    return res.end();
+  }
+  found.handle.createReadStream({ start: found.offset, end: found.offset + found.size - 1 }).pipe(res);
+};
+
+// Route parameters used as camera/date path segments of a pack
+const isPackSegment = (part) => Boolean(part) && part !== '.' && part !== '..' && !part.includes('/');
+
+module.exports = {
+  packPath,
+  isPackSegment,
+  listMembers,
+  openMember,
+  readMember,
+  sendMember
+};
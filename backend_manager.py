@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+ALPR Backend Manager for Radar System
+Hot-swappable detector backends with shadow evaluation of a candidate model
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from alpr_engine import DetectorBackend, create_backend
+from atomic_write import atomic_write_json
+from plate_index import normalize_plate
+
+logger = logging.getLogger(__name__)
+
+# Control and shadow-stats files live in <inbox>/.ai_backends/<pool>.json
+CONTROL_DIR = '.ai_backends'
+
+# How often workers look for a changed control file / flush shadow stats (s)
+RELOAD_CHECK_INTERVAL = 2.0
+
+# Shadow frames waiting for the candidate beyond this are dropped, not queued
+MAX_PENDING_SHADOW = 2
+
+def spec_label(spec: Dict[str, Any]) -> str:
+    """Name used for result files and stats: 'backend' or 'backend@version'"""
+    return f"{spec['backend']}@{spec['version']}" if spec.get('version') else spec['backend']
+
+def load_spec(spec: Dict[str, Any]) -> DetectorBackend:
+    """Create a backend for a control-file spec; no fallback, failures raise"""
+    backend = create_backend(spec['backend'], fallback=False, **spec.get('options', {}))
+    backend.name = spec_label(spec)
+    return backend
+
+def best_plate(detections: List[Dict[str, Any]]) -> str:
+    with_text = [d for d in detections if d.get('plate')]
+    if not with_text:
+        return ''
+    return normalize_plate(max(with_text, key=lambda d: d.get('confidence') or 0.0)['plate'])
+
+def _empty_shadow_stats() -> Dict[str, Any]:
+    return {'frames': 0, 'agree': 0, 'candidate_errors': 0,
+            'primary_latency_sum': 0.0, 'candidate_latency_sum': 0.0,
+            'primary_detections': 0, 'candidate_detections': 0}
+
+class BackendControl:
+    """
+    The control file for one pool of workers.
+
+    {"primary": spec, "candidate": spec | null, "shadow_fraction": 0.1,
+     "previous": spec | null}, where spec is
+    {"backend": name, "version": optional label, "options": {...}}.
+    """
+
+    def __init__(self, inbox_path: str, pool: str):
+        self.dir = Path(inbox_path) / CONTROL_DIR
+        self.path = self.dir / f"{pool}.json"
+        self.stats_path = self.dir / f"{pool}.shadow.json"
+
+    @contextmanager
+    def _locked(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def mtime_ns(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, control: Dict[str, Any]):
+        control['updated_at'] = datetime.now().isoformat()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(self.path, control, batch=False)
+
+    def update(self, **changes):
+        with self._locked():
+            control = self.load()
+            control.update(changes)
+            self.save(control)
+            return control
+
+    def load_stats(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def add_stats(self, label: str, delta: Dict[str, Any]):
+        """Merge one process's shadow counters into the shared stats file"""
+        with self._locked():
+            stats = self.load_stats()
+            entry = stats.setdefault(label, _empty_shadow_stats())
+            for key, value in delta.items():
+                entry[key] = entry.get(key, 0) + value
+            entry['updated_at'] = datetime.now().isoformat()
+            atomic_write_json(self.stats_path, stats, durable=False)
+
+    def summary(self) -> Dict[str, Any]:
+        control = self.load()
+        stats = self.load_stats()
+        candidate = control.get('candidate')
+        report = {'control': control, 'shadow': {}}
+        for label, entry in stats.items():
+            frames = entry['frames'] or 0
+            report['shadow'][label] = {
+                'frames': frames,
+                'agreement': entry['agree'] / frames if frames else None,
+                'candidate_errors': entry['candidate_errors'],
+                'primary_latency_ms': 1000 * entry['primary_latency_sum'] / frames if frames else None,
+                'candidate_latency_ms': 1000 * entry['candidate_latency_sum'] / frames if frames else None,
+                'detections': [entry['primary_detections'], entry['candidate_detections']],
+                'active_candidate': bool(candidate) and spec_label(candidate) == label
+            }
+        return report
+
+class ManagedBackend(DetectorBackend):
+    """
+    Detector backend that delegates to a hot-swappable primary.
+
+    Workers keep calling detect(); every RELOAD_CHECK_INTERVAL seconds the
+    pool's control file is checked. A new candidate is loaded in a background
+    thread next to the primary, a shadow_fraction of frames are replayed
+    through it off the request path to measure latency and plate agreement,
+    and promotion swaps the already-loaded candidate in without a restart.
+    """
+
+    def __init__(self, default_backend: str, inbox_path: Optional[str] = None, pool: str = 'default'):
+        self.default_spec = {'backend': default_backend}
+        self.control = BackendControl(inbox_path, pool) if inbox_path else None
+        self._lock = threading.Lock()
+        self._primary: Optional[DetectorBackend] = None
+        self._primary_label: Optional[str] = None
+        self._candidate: Optional[DetectorBackend] = None
+        self._candidate_label: Optional[str] = None
+        # Primary the control file asks for; a load finishing under this label is promoted
+        self._wanted_primary: Optional[str] = None
+        self._loading: set = set()
+        self.shadow_fraction = 0.0
+        self._shadow = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alpr-shadow')
+        self._shadow_pending = 0
+        self._shadow_delta = _empty_shadow_stats()
+        self._control_mtime: Optional[int] = None
+        self._next_check = 0.0
+
+    def load(self):
+        control = self.control.load() if self.control else {}
+        primary_spec = control.get('primary') or self.default_spec
+        try:
+            self._set_primary(load_spec(primary_spec), spec_label(primary_spec))
+        except Exception as e:
+            # The default keeps the usual fallback chain; a bad control file must not stop workers
+            logger.error(f"Could not load primary backend {spec_label(primary_spec)}: {e}")
+            backend = create_backend(self.default_spec['backend'])
+            self._set_primary(backend, backend.name)
+        self._control_mtime = self.control.mtime_ns() if self.control else None
+        self._apply_control(control, initial=True)
+        return self
+
+    # -- delegation --------------------------------------------------------
+
+    @property
+    def primary(self) -> DetectorBackend:
+        return self._primary
+
+    @property
+    def name(self) -> str:
+        return self._primary_label
+
+    @property
+    def needs_image(self) -> bool:
+        return self._primary.needs_image
+
+    @property
+    def simulated(self) -> bool:
+        return self._primary.simulated
+
+    @property
+    def bbox_format(self) -> str:
+        return self._primary.bbox_format
+
+    def __getattr__(self, attr):
+        # alpr / custom_model etc. come from the active primary
+        primary = self.__dict__.get('_primary')
+        if primary is None:
+            raise AttributeError(attr)
+        return getattr(primary, attr)
+
+    def detect(self, image_path, image=None):
+        self.check_control()
+        primary, candidate = self._primary, self._candidate
+        started = time.perf_counter()
+        detections = primary.detect(image_path, image)
+        primary_latency = time.perf_counter() - started
+
+        if candidate is not None and random.random() < self.shadow_fraction:
+            with self._lock:
+                accept = self._shadow_pending < MAX_PENDING_SHADOW
+                if accept:
+                    self._shadow_pending += 1
+            if accept:
+                self._shadow.submit(self._run_shadow, candidate, self._candidate_label,
+                                    image_path, image, detections, primary_latency)
+        return detections
+
+    # -- shadow evaluation -------------------------------------------------
+
+    def _run_shadow(self, candidate, label, image_path, image, primary_detections, primary_latency):
+        delta = _empty_shadow_stats()
+        delta['frames'] = 1
+        delta['primary_latency_sum'] = primary_latency
+        delta['primary_detections'] = len(primary_detections)
+        try:
+            if candidate.needs_image and image is None:
+                import cv2
+                image = cv2.imread(image_path)
+            started = time.perf_counter()
+            detections = candidate.detect(image_path, image)
+            delta['candidate_latency_sum'] = time.perf_counter() - started
+            delta['candidate_detections'] = len(detections)
+            delta['agree'] = int(best_plate(detections) == best_plate(primary_detections))
+        except Exception as e:
+            logger.warning(f"Shadow backend {label} failed on {image_path}: {e}")
+            delta['candidate_errors'] = 1
+        with self._lock:
+            self._shadow_pending -= 1
+            if label == self._candidate_label:
+                for key, value in delta.items():
+                    self._shadow_delta[key] += value
+
+    def flush_stats(self):
+        """Write accumulated shadow counters to the pool's stats file"""
+        with self._lock:
+            delta, self._shadow_delta = self._shadow_delta, _empty_shadow_stats()
+            label = self._candidate_label
+        if self.control and label and delta['frames']:
+            try:
+                self.control.add_stats(label, delta)
+            except OSError as e:
+                logger.warning(f"Could not write shadow stats: {e}")
+
+    # -- control file ------------------------------------------------------
+
+    def check_control(self, force: bool = False):
+        """Apply control-file changes (rate limited to RELOAD_CHECK_INTERVAL)"""
+        if not self.control:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        self._next_check = now + RELOAD_CHECK_INTERVAL
+        self.flush_stats()
+        mtime = self.control.mtime_ns()
+        if mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+        try:
+            self._apply_control(self.control.load())
+        except ValueError as e:
+            logger.error(f"Ignoring unreadable backend control file: {e}")
+
+    def _apply_control(self, control: Dict[str, Any], initial: bool = False):
+        self.shadow_fraction = float(control.get('shadow_fraction', 0.0))
+        primary_spec = control.get('primary') or self.default_spec
+        candidate_spec = control.get('candidate')
+        primary_label = spec_label(primary_spec)
+        with self._lock:
+            self._wanted_primary = primary_label
+
+        if primary_label != self._primary_label:
+            if primary_label == self._candidate_label and self._candidate is not None:
+                # Promotion: the candidate is already warm
+                self._set_primary(self._candidate, primary_label)
+                logger.info(f"🔁 Promoted {primary_label} to primary backend")
+            elif not initial:
+                # Already loading as the candidate: promoted when that load finishes
+                self._load_async(primary_spec, promote=True)
+
+        candidate_label = spec_label(candidate_spec) if candidate_spec else None
+        if candidate_label != self._candidate_label or (candidate_label and self._candidate is None):
+            self.flush_stats()
+            with self._lock:
+                self._candidate = None
+                self._candidate_label = candidate_label
+            if candidate_spec and candidate_label != self._primary_label:
+                self._load_async(candidate_spec, promote=False)
+
+    def _set_primary(self, backend: DetectorBackend, label: str):
+        with self._lock:
+            previous = self._primary
+            self._primary = backend
+            self._primary_label = label
+            if self._candidate_label == label:
+                self._candidate = None
+                self._candidate_label = None
+        if previous is not None and previous is not backend:
+            logger.info(f"Backend {self._primary_label} active (was {getattr(previous, 'name', '?')})")
+
+    def _load_async(self, spec: Dict[str, Any], promote: bool):
+        """Load a backend in the background; workers keep using the current one"""
+        label = spec_label(spec)
+        with self._lock:
+            if label in self._loading:
+                return
+            self._loading.add(label)
+
+        def load():
+            try:
+                started = time.perf_counter()
+                backend = load_spec(spec)
+                logger.info(f"Loaded backend {label} in {time.perf_counter() - started:.1f}s")
+                with self._lock:
+                    # Whether loaded as primary or candidate, the current control file decides
+                    promote_now = self._wanted_primary == label and self._primary_label != label
+                    if not promote_now and not promote and self._candidate_label == label:
+                        self._candidate = backend
+                if promote_now:
+                    self._set_primary(backend, label)
+                    logger.info(f"🔁 Promoted {label} to primary backend")
+            except Exception as e:
+                logger.error(f"Failed to load backend {label}: {e}")
+            finally:
+                with self._lock:
+                    self._loading.discard(label)
+
+        threading.Thread(target=load, name=f"alpr-load-{label}", daemon=True).start()
+
+    def close(self):
+        self.flush_stats()
+        self._shadow.shutdown(wait=True)
+        self.flush_stats()
+
+def _parse_spec(args: List[str]) -> Dict[str, Any]:
+    """<backend> [version=..] [key=value ...]"""
+    spec: Dict[str, Any] = {'backend': args[0], 'options': {}}
+    for arg in args[1:]:
+        key, _, value = arg.partition('=')
+        if key == 'version':
+            spec['version'] = value
+        else:
+            spec['options'][key] = value
+    return spec
+
+def main():
+    """
+    Command line for the control file of one worker pool:
+
+      status | candidate <backend> [version=V] [key=value ...] | fraction <0..1>
+      | promote [min_agreement] | rollback | clear
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    pool = os.environ.get('AI_BACKEND_POOL', 'service')
+    control = BackendControl('/srv/processing_inbox', pool)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    args = sys.argv[2:]
+
+    if command == 'status':
+        print(json.dumps(control.summary(), indent=2, ensure_ascii=False))
+    elif command == 'candidate' and args:
+        control.update(candidate=_parse_spec(args))
+        print(f"Candidate {spec_label(_parse_spec(args))} will load in the {pool} workers")
+    elif command == 'fraction' and args:
+        control.update(shadow_fraction=max(0.0, min(1.0, float(args[0]))))
+    elif command == 'promote':
+        current = control.load()
+        candidate = current.get('candidate')
+        if not candidate:
+            print("No candidate to promote")
+            sys.exit(1)
+        if args:
+            shadow = control.summary()['shadow'].get(spec_label(candidate), {})
+            if (shadow.get('agreement') or 0.0) < float(args[0]):
+                print(f"Agreement {shadow.get('agreement')} below {args[0]}; not promoting")
+                sys.exit(1)
+        control.update(previous=current.get('primary'), primary=candidate, candidate=None)
+        print(f"Promoted {spec_label(candidate)}")
+    elif command == 'rollback':
+        current = control.load()
+        if not current.get('previous'):
+            print("Nothing to roll back to")
+            sys.exit(1)
+        control.update(primary=current['previous'], previous=current.get('primary'), candidate=None)
+        print(f"Rolled back to {spec_label(current['previous'])}")
+    elif command == 'clear':
+        control.update(candidate=None, shadow_fraction=0.0)
+    else:
+        print(main.__doc__)
+
+if __name__ == "__main__":
+    main()
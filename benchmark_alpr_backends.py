@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+ALPR Backend Benchmark for Radar System
+Compares detector backends (latency, detections, box agreement) on the same images
+"""
+
+import sys
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from alpr_engine import create_backend
+from case_walker import IMAGE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# (label, backend, options) compared by default; the first one is the reference
+DEFAULT_VARIANTS = [
+    ('yolo_jordanian', 'yolo_jordanian', {}),
+    ('onnx_jordanian', 'onnx_jordanian', {}),
+    ('onnx_jordanian_int8', 'onnx_jordanian', {'quantize': True}),
+    ('fast_alpr', 'fast_alpr', {}),
+]
+
+WARMUP_FRAMES = 3
+
+def find_images(root: str, limit: int) -> List[str]:
+    """Up to limit images under root (a case folder or any directory tree)"""
+    images = sorted(str(p) for p in Path(root).rglob('*')
+                    if p.suffix.lower() in IMAGE_EXTENSIONS and '/ai/' not in str(p))
+    return images[:limit]
+
+def _iou(a: List[float], b: List[float]) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def box_agreement(reference: List[Dict[str, Any]], detections: List[Dict[str, Any]]) -> Optional[float]:
+    """Share of reference boxes matched (IoU >= 0.5) by a detection"""
+    if not reference:
+        return None if detections else 1.0
+    matched = sum(1 for r in reference
+                  if any(_iou(r['bbox'], d['bbox']) >= 0.5 for d in detections))
+    return matched / len(reference)
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_variant(label: str, backend_name: str, options: Dict[str, Any], frames: List[tuple]) -> Dict[str, Any]:
+    """Load one backend and time it over the decoded frames"""
+    started = time.perf_counter()
+    try:
+        backend = create_backend(backend_name, fallback=False, **options)
+    except Exception as e:
+        return {'variant': label, 'error': f"unavailable: {e}"}
+    report = {'variant': label, 'backend': backend_name, 'options': options,
+              'load_s': round(time.perf_counter() - started, 2), 'simulated': backend.simulated}
+
+    for image_path, image in frames[:WARMUP_FRAMES]:
+        backend.detect(image_path, image)
+
+    latencies, outputs = [], []
+    for image_path, image in frames:
+        started = time.perf_counter()
+        try:
+            detections = backend.detect(image_path, image)
+        except Exception as e:
+            logger.warning(f"{label} failed on {image_path}: {e}")
+            detections = []
+        latencies.append((time.perf_counter() - started) * 1000)
+        outputs.append(detections)
+
+    report.update({
+        'frames': len(frames),
+        'mean_ms': round(sum(latencies) / len(latencies), 1),
+        'p50_ms': round(_percentile(latencies, 0.5), 1),
+        'p95_ms': round(_percentile(latencies, 0.95), 1),
+        'fps': round(1000 * len(latencies) / sum(latencies), 1) if sum(latencies) else None,
+        'detections': sum(len(o) for o in outputs),
+    })
+    report['_outputs'] = outputs
+    return report
+
+def benchmark(image_root: str, limit: int = 50, variants=DEFAULT_VARIANTS) -> List[Dict[str, Any]]:
+    import cv2
+
+    images = find_images(image_root, limit)
+    if not images:
+        raise SystemExit(f"No images found under {image_root}")
+    # Decode once so every backend sees identical frames and decode time is excluded
+    frames = [(path, cv2.imread(path)) for path in images]
+    frames = [(path, image) for path, image in frames if image is not None]
+
+    reports = [run_variant(label, name, options, frames) for label, name, options in variants]
+
+    # Agreement and speedup are relative to the first backend that loaded
+    reference = next((r for r in reports if '_outputs' in r), None)
+    reference_outputs = reference['_outputs'] if reference else None
+    for report in reports:
+        outputs = report.pop('_outputs', None)
+        if outputs is None:
+            continue
+        scores = [box_agreement(ref, out) for ref, out in zip(reference_outputs, outputs)]
+        scores = [s for s in scores if s is not None]
+        report['box_agreement'] = round(sum(scores) / len(scores), 3) if scores else None
+        report['speedup'] = round(reference['mean_ms'] / report['mean_ms'], 2) if report['mean_ms'] else None
+    return reports
+
+def print_table(reports: List[Dict[str, Any]]):
+    print(f"{'variant':<22}{'load s':>8}{'mean ms':>9}{'p50 ms':>8}{'p95 ms':>8}{'fps':>7}"
+          f"{'dets':>6}{'agree':>7}{'speedup':>9}")
+    for r in reports:
+        if 'error' in r:
+            print(f"{r['variant']:<22}  {r['error']}")
+            continue
+        print(f"{r['variant']:<22}{r['load_s']:>8}{r['mean_ms']:>9}{r['p50_ms']:>8}{r['p95_ms']:>8}"
+              f"{r['fps'] or '-':>7}{r['detections']:>6}{r.get('box_agreement') or '-':>7}"
+              f"{r.get('speedup') or '-':>9}{'  (simulated)' if r['simulated'] else ''}")
+
+def main():
+    """Usage: python benchmark_alpr_backends.py <image dir or case> [max_images] [--json]"""
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if not args:
+        print(main.__doc__)
+        return
+    reports = benchmark(args[0], int(args[1]) if len(args) > 1 else 50)
+    if '--json' in sys.argv:
+        print(json.dumps(reports, indent=2))
+    else:
+        print_table(reports)
+
+if __name__ == "__main__":
+    main()
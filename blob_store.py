@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Blob Store for Radar System
+Deduplicates case images (and their ai/ copies) as hardlinks to hash-named objects
+"""
+
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from atomic_write import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# <inbox>/.ai_blobs/objects/<2 hex>/<sha256><ext>; must be on the inbox file system
+BLOB_DIR = '.ai_blobs'
+OBJECTS_DIR = 'objects'
+
+# AI_BLOB_STORE=1 turns deduplication on; it relinks the case originals, so it is opt-in
+BLOB_STORE_ENV = 'AI_BLOB_STORE'
+
+# Unreferenced objects younger than this are kept (a link may be about to be made)
+GC_GRACE_SECONDS = 3600
+
+HASH_CHUNK = 1024 * 1024
+
+def blob_store_enabled() -> bool:
+    return os.environ.get(BLOB_STORE_ENV, '0') == '1'
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_or_copy(src, dest):
+    """
+    Place dest as a hardlink of src (sharing the blob when src is deduplicated),
+    copying when the two cannot be linked (other file system, no link support)
+    """
+    src, dest = os.fspath(src), os.fspath(dest)
+    try:
+        if os.path.samefile(src, dest):
+            return
+    except OSError:
+        pass
+    tmp = os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.{os.getpid()}.link")
+    try:
+        os.link(src, tmp)
+        os.replace(tmp, dest)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        shutil.copy2(src, dest)
+
+class BlobStore:
+    """
+    Hash-named objects hardlinked into the case folders.
+
+    ingest() hashes a case image and either adopts it as the object for its
+    hash or, when that content is already stored, swaps the file for a link
+    to the existing object, so identical frames in several cases (and their
+    ai/ copies) share one inode. An object's reference count is its link count
+    minus the store's own link, maintained by the file system itself: deleting
+    a case folder drops its references, and gc() removes objects nobody links
+    to any more.
+
+    An object is the same inode as the case originals linked to it, so its
+    mode and owner are never touched: the FTP writer and other tools keep
+    the permissions they gave the file. Every linked path shares the same
+    bytes, so linked files must be replaced, never edited in place. Per-backend detections of an object are kept next to it
+    (<sha256>.<backend>.json) so a duplicate frame skips inference.
+    """
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox", path: Optional[str] = None):
+        self.root = Path(path) if path else Path(inbox_path) / BLOB_DIR
+        self.objects = self.root / OBJECTS_DIR
+        self.linkable = True
+        # (path, dev, ino, size, mtime_ns) -> digest, so unchanged files are hashed once per process
+        self._digests: Dict[tuple, str] = {}
+        self.deduplicated = 0
+        self.bytes_saved = 0
+
+    def object_path(self, digest: str, ext: str = '') -> Path:
+        return self.objects / digest[:2] / f"{digest}{ext.lower()}"
+
+    def digest(self, path: str) -> str:
+        st = os.stat(path)
+        key = (path, st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = file_digest(path)
+            if len(self._digests) > 100000:
+                self._digests.clear()
+            self._digests[key] = digest
+        return digest
+
+    def ingest(self, path) -> Optional[str]:
+        """Deduplicate one file in place; returns its sha256 (None if unreadable)"""
+        path = os.fspath(path)
+        try:
+            digest = self.digest(path)
+        except OSError as e:
+            logger.warning(f"Could not hash {path}: {e}")
+            return None
+        if not self.linkable:
+            return digest
+
+        obj = self.object_path(digest, os.path.splitext(path)[1])
+        try:
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            if os.path.samefile(path, obj):
+                return digest
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Blob store unavailable: {e}")
+            self.linkable = False
+            return digest
+
+        try:
+            # First copy of this content: the case file becomes the object
+            os.link(path, obj)
+            return digest
+        except FileExistsError:
+            pass
+        except OSError as e:
+            if e.errno in (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK):
+                logger.warning(f"Hardlinks not possible for the blob store ({e}); hashing only")
+                self.linkable = False
+                return digest
+            raise
+
+        # Content already stored: replace the file by a link to the object
+        size = os.stat(path).st_size
+        tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.dedup")
+        try:
+            os.link(obj, tmp)
+            os.replace(tmp, path)
+        except OSError as e:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            logger.warning(f"Could not deduplicate {path}: {e}")
+            return digest
+        self.deduplicated += 1
+        self.bytes_saved += size
+        return digest
+
+    def _result_path(self, digest: str, backend: str) -> Path:
+        return self.objects / digest[:2] / f"{digest}.{backend.replace(os.sep, '_')}.json"
+
+    def load_result(self, digest: str, backend: str) -> Optional[Dict[str, Any]]:
+        """Detections a backend produced for this content earlier, if any"""
+        try:
+            with open(self._result_path(digest, backend), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_result(self, digest: str, backend: str, result: Dict[str, Any]):
+        path = self._result_path(digest, backend)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(path, result, indent=None, durable=False)
+        except OSError as e:
+            logger.warning(f"Could not cache detections for {digest[:12]}: {e}")
+
+    def iter_objects(self) -> Iterator[os.DirEntry]:
+        try:
+            shards = list(os.scandir(self.objects))
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            with os.scandir(shard.path) as entries:
+                for entry in entries:
+                    if not entry.name.startswith('.') and not entry.name.endswith('.json'):
+                        yield entry
+
+    def stats(self) -> Dict[str, Any]:
+        objects = stored = logical = unreferenced = 0
+        for entry in self.iter_objects():
+            st = entry.stat()
+            refs = st.st_nlink - 1
+            objects += 1
+            stored += st.st_size
+            logical += st.st_size * max(refs, 1)
+            if refs == 0:
+                unreferenced += 1
+        return {
+            'path': str(self.root),
+            'objects': objects,
+            'unreferenced': unreferenced,
+            'stored_bytes': stored,
+            'referenced_bytes': logical,
+            'saved_bytes': logical - stored
+        }
+
+    def gc(self, grace: float = GC_GRACE_SECONDS) -> Dict[str, int]:
+        """
+        Remove objects no case links to any more (link count 1), and their
+        cached detections. The inode change time moves whenever a link is
+        added or dropped, so objects touched within grace seconds are kept.
+        """
+        now = time.time()
+        removed = freed = 0
+        for entry in self.iter_objects():
+            st = entry.stat()
+            if st.st_nlink > 1 or now - st.st_ctime < grace:
+                continue
+            digest = entry.name.split('.')[0]
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                continue
+            removed += 1
+            freed += st.st_size
+            for sidecar in Path(entry.path).parent.glob(f"{digest}.*.json"):
+                try:
+                    sidecar.unlink()
+                except OSError:
+                    pass
+        for shard in self.objects.glob('??'):
+            try:
+                shard.rmdir()  # only succeeds when empty
+            except OSError:
+                pass
+        logger.info(f"🧹 Blob store GC: removed {removed} objects, freed {freed} bytes")
+        return {'removed': removed, 'freed_bytes': freed}
+
+def dedupe_inbox(inbox_path: str, camera: Optional[str] = None) -> Dict[str, Any]:
+    """Deduplicate the images and ai/ copies of existing cases"""
+    from case_walker import IMAGE_EXTENSIONS, walk_cases
+
+    store = BlobStore(inbox_path)
+    files = 0
+    for case in walk_cases(inbox_path, camera_filter=camera, camera_prefix=None, scan_ai=True):
+        paths = list(case.images)
+        if case.has_ai_folder:
+            paths.extend(os.path.join(case.ai_path, name) for name in case.ai_files
+                         if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+        for path in paths:
+            if store.ingest(path) is not None:
+                files += 1
+    return {'files': files, 'deduplicated': store.deduplicated, 'bytes_saved': store.bytes_saved}
+
+def main():
+    """Command line: stats | gc | dedupe [camera]"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    inbox_path = "/srv/processing_inbox"
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if command == "stats":
+        print(json.dumps(BlobStore(inbox_path).stats(), indent=2))
+    elif command == "gc":
+        print(json.dumps(BlobStore(inbox_path).gc(), indent=2))
+    elif command == "dedupe":
+        print(json.dumps(dedupe_inbox(inbox_path, sys.argv[2] if len(sys.argv) > 2 else None), indent=2))
+    else:
+        print("Usage: python blob_store.py [stats|gc|dedupe [camera]]")
+
+if __name__ == "__main__":
+    main()
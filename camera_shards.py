@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Camera Sharding for Radar System
+Splits processing_inbox between AI service nodes by camera (consistent hashing + lease files)
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import bisect
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from atomic_write import atomic_write_json
+from service_heartbeat import SERVICE_DIR
+
+logger = logging.getLogger(__name__)
+
+# <inbox>/.ai_service/shards/nodes/<node>.json and .../leases/<camera>.<generation>.lease
+SHARDS_DIR = 'shards'
+LEASE_SUFFIX = '.lease'
+
+# AI_SHARDING=1 turns sharding on; AI_NODE_ID names the node (default: host name)
+SHARDING_ENV = 'AI_SHARDING'
+NODE_ENV = 'AI_NODE_ID'
+
+# Points per node on the hash ring; more points spread cameras more evenly
+VIRTUAL_NODES = 64
+# Seconds between membership/lease passes
+RENEW_INTERVAL = 5.0
+# A node whose file is older than this has left the ring
+NODE_TTL = 3 * RENEW_INTERVAL
+# A lease not renewed for this long may be taken over (node clocks must agree within a few seconds)
+LEASE_TTL = 30.0
+# A case is only started while the lease has at least this long left
+LEASE_MARGIN = 10.0
+
+def sharding_enabled() -> bool:
+    return os.environ.get(SHARDING_ENV, '0') == '1'
+
+def node_id() -> str:
+    return os.environ.get(NODE_ENV) or socket.gethostname()
+
+def shards_path(inbox_path: str) -> Path:
+    return Path(inbox_path) / SERVICE_DIR / SHARDS_DIR
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+class HashRing:
+    """Consistent hash ring: adding or removing a node only moves the cameras next to its points"""
+
+    def __init__(self, nodes: List[str], replicas: int = VIRTUAL_NODES):
+        self.nodes = sorted(set(nodes))
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self._keys = [key for key, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[index]
+
+    def assignment(self, keys: List[str]) -> Dict[str, List[str]]:
+        assigned = {node: [] for node in self.nodes}
+        for key in keys:
+            owner = self.owner(key)
+            if owner is not None:
+                assigned[owner].append(key)
+        return assigned
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def live_nodes(inbox_path: str, now: Optional[float] = None) -> List[str]:
+    """Nodes whose membership file was refreshed within NODE_TTL"""
+    now = time.time() if now is None else now
+    nodes = []
+    for path in (shards_path(inbox_path) / 'nodes').glob('*.json'):
+        data = _read_json(path)
+        if data and not data.get('left') and now - data.get('ts', 0) < NODE_TTL:
+            nodes.append(data.get('node', path.stem))
+    return sorted(nodes)
+
+def list_cameras(inbox_path: str) -> List[str]:
+    try:
+        with os.scandir(inbox_path) as entries:
+            return sorted(e.name for e in entries if not e.name.startswith('.') and e.is_dir())
+    except OSError:
+        return []
+
+class CameraShards:
+    """
+    Decides which cameras this node processes.
+
+    Every node refreshes <shards>/nodes/<node>.json; the live nodes form a
+    consistent hash ring and each camera belongs to the node the ring maps
+    it to. The ring only says who should process a camera. A node actually
+    processes it only while it holds the camera's lease, so two nodes never
+    work on the same camera even while their views of the membership differ.
+
+    Leases are generation files, <camera>.<n>.lease, created with O_EXCL, so
+    exactly one node wins generation n+1 once generation n is released or has
+    not been renewed for LEASE_TTL. The holder renews its file every
+    RENEW_INTERVAL and gives the lease up (marks it released) when the ring
+    moves the camera elsewhere. Before each case it re-reads the newest
+    generation; a lease taken over after a stall is noticed there.
+
+    on_acquire(camera) runs after a lease is taken so the new owner can
+    queue the camera's unprocessed cases.
+    """
+
+    def __init__(self, inbox_path: str, node: Optional[str] = None,
+                 on_acquire: Optional[Callable[[str], None]] = None):
+        self.inbox_path = inbox_path
+        self.node = node or node_id()
+        # pid and start time tell two processes of the same node apart (supervisor failover)
+        self.holder = f"{self.node}:{os.getpid()}:{time.time():.3f}"
+        self.on_acquire = on_acquire
+        self.root = shards_path(inbox_path)
+        self.nodes_dir = self.root / 'nodes'
+        self.leases_dir = self.root / 'leases'
+        self.node_file = self.nodes_dir / f"{self.node}.json"
+        self.ring = HashRing([self.node])
+        # camera -> (generation, expires) of the leases held by this process
+        self.held: Dict[str, Tuple[int, float]] = {}
+        self.busy: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.acquired_count = 0
+        self.released_count = 0
+        self.lost_count = 0
+
+    def start(self) -> 'CameraShards':
+        """Join the ring and take the leases of this node's cameras before returning"""
+        self.nodes_dir.mkdir(parents=True, exist_ok=True)
+        self.leases_dir.mkdir(parents=True, exist_ok=True)
+        self.tick()
+        self._thread = threading.Thread(target=self._run, name='camera-shards', daemon=True)
+        self._thread.start()
+        logger.info(f"🧩 Node {self.node} joined the ring ({len(self.ring.nodes)} nodes, "
+                    f"{len(self.held)} cameras)")
+        return self
+
+    def stop(self):
+        """Release the idle leases and leave the ring so the other nodes take over at once"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=RENEW_INTERVAL)
+        with self._lock:
+            for camera in list(self.held):
+                if not self.busy.get(camera):
+                    self._release(camera)
+        try:
+            atomic_write_json(self.node_file, {'node': self.node, 'holder': self.holder,
+                                               'ts': time.time(), 'left': True}, indent=None, durable=False)
+        except OSError:
+            pass
+        logger.info(f"🧩 Node {self.node} left the ring")
+
+    def _run(self):
+        while not self._stop.wait(RENEW_INTERVAL):
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"❌ Shard update failed: {e}")
+
+    def tick(self):
+        """One membership pass: refresh this node, rebuild the ring, take, renew or hand over leases"""
+        now = time.time()
+        try:
+            atomic_write_json(self.node_file, {'node': self.node, 'holder': self.holder, 'ts': now},
+                              indent=None, durable=False)
+        except OSError as e:
+            logger.warning(f"Could not refresh node file: {e}")
+        nodes = sorted(set(live_nodes(self.inbox_path, now)) | {self.node})
+        if nodes != self.ring.nodes:
+            logger.info(f"🧩 Ring membership: {', '.join(nodes)}")
+            self.ring = HashRing(nodes)
+
+        leases = self._scan_leases()
+        acquired = []
+        with self._lock:
+            for camera in sorted(set(list_cameras(self.inbox_path)) | set(self.held)):
+                if self.ring.owner(camera) == self.node:
+                    if self._take_or_renew(camera, leases.get(camera), now):
+                        acquired.append(camera)
+                elif camera in self.held and not self.busy.get(camera):
+                    self._release(camera)
+        # Outside the lock: the callback scans the camera and may take a while
+        for camera in acquired:
+            if self.on_acquire:
+                try:
+                    self.on_acquire(camera)
+                except Exception as e:
+                    logger.error(f"❌ Acquire callback failed for {camera}: {e}")
+
+    def _scan_leases(self) -> Dict[str, Tuple[int, Path]]:
+        """Newest lease generation file per camera"""
+        newest: Dict[str, Tuple[int, Path]] = {}
+        try:
+            names = os.listdir(self.leases_dir)
+        except FileNotFoundError:
+            return newest
+        for name in names:
+            if not name.endswith(LEASE_SUFFIX):
+                continue
+            camera, _, generation = name[:-len(LEASE_SUFFIX)].rpartition('.')
+            if not camera or not generation.isdigit():
+                continue
+            if camera not in newest or int(generation) > newest[camera][0]:
+                newest[camera] = (int(generation), self.leases_dir / name)
+        return newest
+
+    def _scan_leases_for(self, camera: str) -> Optional[Tuple[int, Path]]:
+        best = None
+        for path in self.leases_dir.glob(f"{camera}.*{LEASE_SUFFIX}"):
+            generation = path.name[len(camera) + 1:-len(LEASE_SUFFIX)]
+            if generation.isdigit() and (best is None or int(generation) > best[0]):
+                best = (int(generation), path)
+        return best
+
+    def _lease_state(self, path: Path) -> Dict[str, Any]:
+        data = _read_json(path)
+        if data is None:
+            # Being created right now (or unreadable): count it as fresh from its mtime
+            try:
+                return {'holder': None, 'expires': os.stat(path).st_mtime + LEASE_TTL}
+            except OSError:
+                return {'holder': None, 'expires': 0}
+        return data
+
+    def _holder_gone(self, holder: Optional[str]) -> bool:
+        """A holder on this node whose process has exited (e.g. killed before a failover)"""
+        if not holder:
+            return False
+        node, _, rest = holder.partition(':')
+        if node != self.node or holder == self.holder:
+            return False
+        try:
+            os.kill(int(rest.split(':')[0]), 0)
+        except ProcessLookupError:
+            return True
+        except (ValueError, PermissionError):
+            return False
+        return False
+
+    def _take_or_renew(self, camera: str, newest: Optional[Tuple[int, Path]], now: float) -> bool:
+        """Renew a held lease or try to take a free one; True when newly acquired"""
+        generation = 0
+        if newest is not None:
+            generation, path = newest
+            lease = self._lease_state(path)
+            if lease.get('holder') == self.holder:
+                self._write_lease(camera, generation, path, now)
+                return False
+            if camera in self.held:
+                self._lost(camera, lease.get('holder'))
+            if not lease.get('released') and lease.get('expires', 0) > now and not self._holder_gone(lease.get('holder')):
+                return False  # still someone else's; they hand it over or it expires
+
+        generation += 1
+        path = self.leases_dir / f"{camera}.{generation}{LEASE_SUFFIX}"
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False  # another node won this generation
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._lease_data(camera, generation, now), f)
+            f.flush()
+            os.fsync(f.fileno())
+        self.held[camera] = (generation, now + LEASE_TTL)
+        self.acquired_count += 1
+        # Older generations are no longer needed
+        for old in self.leases_dir.glob(f"{camera}.*{LEASE_SUFFIX}"):
+            old_generation = old.name[len(camera) + 1:-len(LEASE_SUFFIX)]
+            if old_generation.isdigit() and int(old_generation) < generation:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+        logger.info(f"🔑 Acquired camera {camera} (lease {generation})")
+        return True
+
+    def _lease_data(self, camera: str, generation: int, now: float, released: bool = False) -> Dict[str, Any]:
+        return {'camera': camera, 'generation': generation, 'node': self.node, 'holder': self.holder,
+                'renewed_at': now, 'expires': 0 if released else now + LEASE_TTL, 'released': released}
+
+    def _write_lease(self, camera: str, generation: int, path: Path, now: float):
+        try:
+            atomic_write_json(path, self._lease_data(camera, generation, now), indent=None, durable=False)
+            self.held[camera] = (generation, now + LEASE_TTL)
+        except OSError as e:
+            logger.warning(f"Could not renew lease for {camera}: {e}")
+
+    def _lost(self, camera: str, holder: Optional[str]):
+        self.held.pop(camera, None)
+        self.lost_count += 1
+        logger.warning(f"⚠️ Lease for camera {camera} was taken over by {holder}")
+
+    def _release(self, camera: str):
+        generation, _ = self.held.pop(camera)
+        path = self.leases_dir / f"{camera}.{generation}{LEASE_SUFFIX}"
+        if self._lease_state(path).get('holder') != self.holder:
+            return
+        try:
+            atomic_write_json(path, self._lease_data(camera, generation, time.time(), released=True),
+                              indent=None, durable=False)
+            self.released_count += 1
+            logger.info(f"🔓 Released camera {camera}")
+        except OSError as e:
+            logger.warning(f"Could not release lease for {camera}: {e}")
+
+    def owns(self, camera: str) -> bool:
+        """Cheap check for intake: this process holds the camera's lease"""
+        with self._lock:
+            held = self.held.get(camera)
+            return held is not None and held[1] > time.time()
+
+    def begin(self, camera: str) -> bool:
+        """
+        Called before processing a case of camera: True (and the lease is kept
+        until end()) only if the newest lease generation on disk is still ours
+        with at least LEASE_MARGIN left.
+        """
+        with self._lock:
+            held = self.held.get(camera)
+            if held is None or held[1] - time.time() < LEASE_MARGIN:
+                return False
+            newest = self._scan_leases_for(camera)
+            if newest is None or newest[0] != held[0] or self._lease_state(newest[1]).get('holder') != self.holder:
+                self._lost(camera, self._lease_state(newest[1]).get('holder') if newest else None)
+                return False
+            self.busy[camera] = self.busy.get(camera, 0) + 1
+            return True
+
+    def end(self, camera: str):
+        with self._lock:
+            count = self.busy.get(camera, 0) - 1
+            if count > 0:
+                self.busy[camera] = count
+            else:
+                self.busy.pop(camera, None)
+
+    def assigned(self, key: str) -> bool:
+        """Ring ownership without a lease, for jobs that need one runner but tolerate overlap"""
+        return self.ring.owner(key) == self.node
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'node': self.node,
+                'holder': self.holder,
+                'nodes': list(self.ring.nodes),
+                'cameras': sorted(self.held),
+                'acquired': self.acquired_count,
+                'released': self.released_count,
+                'lost': self.lost_count
+            }
+
+def shard_status(inbox_path: str) -> Dict[str, Any]:
+    """Live nodes, the ring's assignment and the current lease of every camera"""
+    now = time.time()
+    nodes = live_nodes(inbox_path, now)
+    cameras = list_cameras(inbox_path)
+    leases = {}
+    for path in sorted((shards_path(inbox_path) / 'leases').glob(f"*{LEASE_SUFFIX}")):
+        data = _read_json(path) or {}
+        camera = data.get('camera', path.name.split('.')[0])
+        if camera not in leases or data.get('generation', 0) > leases[camera].get('generation', 0):
+            leases[camera] = {'node': data.get('node'), 'generation': data.get('generation'),
+                              'expires_in': round(data.get('expires', 0) - now, 1),
+                              'released': data.get('released', False)}
+    return {'nodes': nodes, 'assignment': HashRing(nodes).assignment(cameras), 'leases': leases}
+
+def main():
+    """Command line: status"""
+    inbox_path = "/srv/processing_inbox"
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "status":
+        print(json.dumps(shard_status(inbox_path), indent=2))
+    else:
+        print("Usage: python camera_shards.py status")
+
+if __name__ == "__main__":
+    main()
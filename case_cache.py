@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Case Summary Cache for Radar System
+Read-through cache of parsed AI result files validated by (mtime, size)
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from atomic_write import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# Default in-memory budget for cached summaries
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Parsed JSON takes several times its on-disk size in Python objects
+PARSED_SIZE_FACTOR = 4
+
+def _load_json(path: str) -> Any:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class CaseSummaryCache:
+    """
+    LRU cache of parsed files keyed by path.
+
+    Entries are revalidated against the file's (st_mtime_ns, st_size) on every
+    lookup, so only changed files are re-parsed. Eviction is by an estimated
+    memory budget. When disk_path is set the cache can be persisted between
+    processes (the Node backend starts a fresh Python process per request).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, disk_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._bytes = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_path:
+            self.load_disk()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _store(self, path: str, key: tuple, value: Any, weight: int):
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[path] = (key, value, weight)
+        self._bytes += weight
+        self._dirty = True
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, evicted_weight) = self._entries.popitem(last=False)
+            self._bytes -= evicted_weight
+
+    def get(self, path: str, loader: Callable[[str], Any] = _load_json) -> Any:
+        """Return the parsed file, re-parsing only if it changed on disk"""
+        path = os.fspath(path)
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+
+        value = loader(path)
+        with self._lock:
+            self.misses += 1
+            self._store(path, key, value, st.st_size * PARSED_SIZE_FACTOR)
+        return value
+
+    def invalidate(self, path: str):
+        """Drop a cached entry (e.g. right after rewriting the file)"""
+        with self._lock:
+            old = self._entries.pop(os.fspath(path), None)
+            if old is not None:
+                self._bytes -= old[2]
+                self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def load_disk(self):
+        """Load persisted entries; stale ones are revalidated lazily by get()"""
+        try:
+            with open(self.disk_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Ignoring unreadable case cache {self.disk_path}: {e}")
+            return
+        with self._lock:
+            for path, (mtime_ns, size, value) in data.get('entries', {}).items():
+                self._store(path, (mtime_ns, size), value, size * PARSED_SIZE_FACTOR)
+            self._dirty = False
+
+    def save_disk(self):
+        """Persist the cache if it changed since it was loaded"""
+        if not self.disk_path or not self._dirty:
+            return
+        with self._lock:
+            data = {'entries': {path: [key[0], key[1], value]
+                                for path, (key, value, _) in self._entries.items()}}
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.disk_path) or '.', exist_ok=True)
+        # A lost cache is rebuilt on demand, so skip the fsync
+        atomic_write_json(self.disk_path, data, indent=None, durable=False)
+
+_default_cache: Optional[CaseSummaryCache] = None
+
+def get_default_cache() -> CaseSummaryCache:
+    """Process-wide cache; AI_CASE_CACHE_FILE enables the on-disk copy"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = CaseSummaryCache(
+            max_bytes=int(os.environ.get('AI_CASE_CACHE_BYTES', DEFAULT_CACHE_BYTES)),
+            disk_path=os.environ.get('AI_CASE_CACHE_FILE') or None
+        )
+    return _default_cache
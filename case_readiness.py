@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Case Readiness for Radar System
+Decides from the verdict.json photo manifest whether a case upload is complete
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from case_walker import VERDICT_FILE
+
+logger = logging.getLogger(__name__)
+
+# Files whose size is not in the manifest must be unchanged for this long
+STABLE_SECONDS = 2.0
+
+READY = 'ready'
+WAITING = 'waiting'
+EMPTY = 'empty'      # complete, but there are no photos to process
+
+class Readiness:
+    """Outcome of a readiness check; retry_after says when a waiting case is worth re-checking"""
+
+    __slots__ = ('state', 'reason', 'photos', 'retry_after')
+
+    def __init__(self, state: str, reason: str = '', photos: Optional[List[str]] = None,
+                 retry_after: Optional[float] = None):
+        self.state = state
+        self.reason = reason
+        self.photos = photos or []
+        self.retry_after = retry_after
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def __repr__(self):
+        return f"Readiness({self.state!r}, {self.reason!r})"
+
+def _stat(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def _stable(stats: List[Tuple[str, os.stat_result]], now: float) -> Optional[float]:
+    """None when every file is older than STABLE_SECONDS, else the seconds left to wait"""
+    newest = max((st.st_mtime for _, st in stats), default=0.0)
+    wait = newest + STABLE_SECONDS - now
+    return wait if wait > 0 else None
+
+def load_manifest(case_path: str) -> Optional[Dict[str, Any]]:
+    """Parsed verdict.json; None while missing or still being written"""
+    try:
+        with open(os.path.join(case_path, VERDICT_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    except (ValueError, UnicodeDecodeError):
+        return None  # partially written
+
+def check_case(case_path: str, image_extensions=('.jpg',), now: Optional[float] = None) -> Readiness:
+    """
+    Check whether every photo the verdict.json manifest lists has arrived.
+
+    A listed photo is complete when its size equals the manifest size.
+    Photos listed without a size need a non-zero size and no writes for
+    STABLE_SECONDS, and so do the images of legacy verdicts without a
+    'photos' list. Placeholder entries (status 'placeholder') are not
+    expected on disk.
+    """
+    case_path = os.fspath(case_path)
+    now = time.time() if now is None else now
+    verdict = load_manifest(case_path)
+    if verdict is None:
+        return Readiness(WAITING, 'verdict.json missing or incomplete')
+
+    manifest = verdict.get('photos')
+    if not isinstance(manifest, list):
+        # Legacy verdict: whatever images are there, once they stop changing
+        try:
+            names = sorted(n for n in os.listdir(case_path)
+                           if not n.startswith('.') and os.path.splitext(n)[1].lower() in image_extensions)
+        except OSError:
+            return Readiness(WAITING, 'case folder not readable')
+        stats = [(n, _stat(os.path.join(case_path, n))) for n in names]
+        stats = [(n, st) for n, st in stats if st is not None and st.st_size > 0]
+        if not stats:
+            return Readiness(WAITING, 'no images yet')
+        wait = _stable(stats, now)
+        if wait is not None:
+            return Readiness(WAITING, 'images still changing', retry_after=wait)
+        return Readiness(READY, 'images stable', [os.path.join(case_path, n) for n, _ in stats])
+
+    expected = [p for p in manifest if isinstance(p, dict) and p.get('filename')
+                and p.get('status') != 'placeholder']
+    if not expected:
+        return Readiness(EMPTY, 'manifest lists no photos')
+
+    photos, unsized = [], []
+    for photo in expected:
+        path = os.path.join(case_path, os.path.basename(photo['filename']))
+        st = _stat(path)
+        if st is None:
+            return Readiness(WAITING, f"{photo['filename']} missing")
+        size = photo.get('size')
+        if isinstance(size, int) and size > 0:
+            if st.st_size != size:
+                return Readiness(WAITING, f"{photo['filename']} {st.st_size}/{size} bytes")
+        elif st.st_size == 0:
+            return Readiness(WAITING, f"{photo['filename']} empty")
+        else:
+            unsized.append((photo['filename'], st))
+        photos.append(path)
+
+    wait = _stable(unsized, now)
+    if wait is not None:
+        return Readiness(WAITING, 'photos without manifest size still changing', retry_after=wait)
+    return Readiness(READY, f"{len(photos)} photos complete", photos)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Case Walker for Radar System
+Fast os.scandir based walker over processing_inbox/<camera>/<date>/<case>
+"""
+
+import os
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+
+# Default image extensions recognised in case and ai directories
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+
+VERDICT_FILE = 'verdict.json'
+AI_FOLDER = 'ai'
+
+
+def _is_image(name: str, image_extensions: Tuple[str, ...]) -> bool:
+    """Check a file name against the image extensions (case-insensitive)"""
+    return os.path.splitext(name)[1].lower() in image_extensions
+
+
+def _list_subdirs(path: str, prefix: Optional[str] = None,
+                  name_filter: Optional[str] = None) -> List[Tuple[str, str]]:
+    """List (name, path) of sub directories using dirent types only"""
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith('.'):
+                    continue
+                if name_filter is not None and name != name_filter:
+                    continue
+                if prefix is not None and not name.startswith(prefix):
+                    continue
+                try:
+                    if entry.is_dir():
+                        subdirs.append((name, entry.path))
+                except OSError:
+                    continue
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        pass
+    return sorted(subdirs)
+
+
+class CaseEntry:
+    """Single case directory as seen by one scandir pass"""
+
+    __slots__ = ('camera_id', 'date', 'case_id', 'path', 'images', 'files',
+                 'has_verdict', 'has_ai_folder', 'ai_files', 'ai_images')
+
+    def __init__(self, camera_id: str, date: str, case_id: str, path: str):
+        self.camera_id = camera_id
+        self.date = date
+        self.case_id = case_id
+        self.path = path
+        self.images: List[str] = []
+        self.files: set = set()
+        self.has_verdict = False
+        self.has_ai_folder = False
+        self.ai_files: set = set()
+        self.ai_images: List[str] = []
+
+    @property
+    def ai_path(self) -> str:
+        return os.path.join(self.path, AI_FOLDER)
+
+    def has_ai_file(self, name: str) -> bool:
+        """Check for a file inside ai/ (requires scan_ai=True)"""
+        return name in self.ai_files
+
+    def to_case_info(self) -> Dict[str, Any]:
+        """Return the case_info dict used by AICaseProcessor"""
+        return {
+            'camera_id': self.camera_id,
+            'date': self.date,
+            'case_id': self.case_id,
+            'case_path': self.path,
+            'images': list(self.images),
+            'image_count': len(self.images)
+        }
+
+
+def scan_case(case_path: str, camera_id: Optional[str] = None,
+              date: Optional[str] = None,
+              image_extensions: Tuple[str, ...] = IMAGE_EXTENSIONS,
+              scan_ai: bool = False) -> CaseEntry:
+    """List a case directory exactly once and classify its entries"""
+    case_path = os.fspath(case_path)
+    if camera_id is None or date is None:
+        date_path = os.path.dirname(case_path)
+        date = date if date is not None else os.path.basename(date_path)
+        camera_id = camera_id if camera_id is not None else os.path.basename(os.path.dirname(date_path))
+
+    case = CaseEntry(camera_id, date, os.path.basename(case_path), case_path)
+
+    try:
+        with os.scandir(case_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        if name == AI_FOLDER:
+                            case.has_ai_folder = True
+                        continue
+                except OSError:
+                    continue
+                case.files.add(name)
+                if name == VERDICT_FILE:
+                    case.has_verdict = True
+                elif _is_image(name, image_extensions):
+                    case.images.append(entry.path)
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return case
+
+    case.images.sort()
+
+    if scan_ai and case.has_ai_folder:
+        try:
+            with os.scandir(case.ai_path) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith('.'):
+                        continue
+                    case.ai_files.add(name)
+                    if _is_image(name, image_extensions):
+                        try:
+                            if entry.is_file():
+                                case.ai_images.append(entry.path)
+                        except OSError:
+                            continue
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            pass
+        case.ai_images.sort()
+
+    return case
+
+
+def walk_cases(root: str,
+               camera_filter: Optional[str] = None,
+               date_filter: Optional[str] = None,
+               camera_prefix: Optional[str] = 'camera',
+               case_prefix: Optional[str] = None,
+               image_extensions: Tuple[str, ...] = IMAGE_EXTENSIONS,
+               scan_ai: bool = False,
+               modified_since: Optional[float] = None) -> Iterator[CaseEntry]:
+    """
+    Walk root/<camera>/<date>/<case> yielding one CaseEntry per case.
+
+    Camera and date filters prune whole levels before they are listed, and
+    every directory is listed exactly once. With modified_since (epoch
+    seconds) only cases whose directory changed since then are listed; any
+    file added to a case updates its directory mtime, so this costs one stat
+    per case.
+    """
+    root = os.fspath(root)
+    for camera_id, camera_path in _list_subdirs(root, camera_prefix, camera_filter):
+        for date, date_path in _list_subdirs(camera_path, None, date_filter):
+            for _, case_path in _list_subdirs(date_path, case_prefix):
+                if modified_since is not None:
+                    try:
+                        if os.stat(case_path).st_mtime < modified_since:
+                            continue
+                    except OSError:
+                        continue
+                yield scan_case(case_path, camera_id, date,
+                                image_extensions=image_extensions,
+                                scan_ai=scan_ai)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+AI Results Change Feed for Radar System
+Durable, ordered log of completed AI results with per-consumer offsets
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from atomic_write import active_batch, atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# Feed lives in <inbox>/.ai_changes (hidden, so inbox walkers skip it)
+FEED_DIR = '.ai_changes'
+LOG_FILE = 'changes.jsonl'
+OFFSETS_DIR = 'offsets'
+
+class ChangeFeed:
+    """
+    Append-only JSON Lines log of AI results.
+
+    Every record gets a monotonically increasing sequence number assigned
+    under an flock, so several processors can append to one feed. Consumers
+    keep a (seq, byte offset) checkpoint and only read what was appended
+    since, instead of rescanning the inbox.
+    """
+
+    def __init__(self, inbox_path: str, feed_dir: Optional[str] = None):
+        self.feed_dir = Path(feed_dir) if feed_dir else Path(inbox_path) / FEED_DIR
+        self.log_path = self.feed_dir / LOG_FILE
+        self.offsets_dir = self.feed_dir / OFFSETS_DIR
+
+    @contextmanager
+    def _locked(self):
+        self.feed_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.feed_dir / '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def last_seq(self) -> int:
+        """Sequence number of the last complete record (0 when empty)"""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                block = min(end, 64 * 1024)
+                f.seek(end - block)
+                tail = f.read(block)
+        except FileNotFoundError:
+            return 0
+        for line in reversed(tail.split(b'\n')):
+            if not line.strip():
+                continue
+            try:
+                return int(json.loads(line)['seq'])
+            except (ValueError, KeyError):
+                continue
+        return 0
+
+    def append(self, case_path: str, result_file: str, plate: Optional[str] = None,
+               confidence: Optional[float] = None, source: Optional[str] = None,
+               **extra: Any) -> int:
+        """Append a completed result and return its sequence number"""
+        case = Path(case_path)
+        record = {
+            'seq': None,
+            'ts': datetime.now().isoformat(),
+            'source': source,
+            'camera_id': case.parent.parent.name,
+            'date': case.parent.name,
+            'case_id': case.name,
+            'case_path': str(case),
+            'plate': plate,
+            'confidence': confidence,
+            'result_file': str(result_file)
+        }
+        record.update(extra)
+
+        batch = active_batch()
+        if batch is not None:
+            # The result this record points at must be in place before readers see it
+            batch.publish()
+        with self._locked():
+            record['seq'] = self.last_seq() + 1
+            with open(self.log_path, 'a+b') as f:
+                # A writer that crashed mid-line left a torn tail; terminate it so
+                # this record starts on its own line (readers skip the torn one)
+                line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        line = b'\n' + line
+                f.write(line)
+                f.flush()
+                if batch is None:
+                    os.fsync(f.fileno())
+            if batch is not None:
+                # Synced after the result files added to the batch before it
+                batch.add(str(self.log_path))
+        return record['seq']
+
+    # -- consumers ---------------------------------------------------------
+
+    def _offset_path(self, consumer: str) -> Path:
+        return self.offsets_dir / f"{consumer}.json"
+
+    def get_offset(self, consumer: str) -> Dict[str, int]:
+        """Committed checkpoint for a consumer: {'seq', 'offset'}"""
+        try:
+            with open(self._offset_path(consumer), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'seq': 0, 'offset': 0}
+
+    def commit(self, consumer: str, record: Dict[str, Any]):
+        """Mark everything up to and including record as consumed"""
+        self.offsets_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write_json(self._offset_path(consumer),
+                          {'seq': record['seq'], 'offset': record['_next_offset']}, indent=None, batch=False)
+
+    def read(self, after_seq: int = 0, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Read complete records with seq > after_seq starting at byte offset.
+
+        Each record carries '_next_offset' so callers can checkpoint it.
+        A trailing partially written line is left for the next read.
+        """
+        records = []
+        try:
+            f = open(self.log_path, 'rb')
+        except FileNotFoundError:
+            return records
+        with f:
+            f.seek(0, os.SEEK_END)
+            if offset > f.tell():
+                offset = 0  # log was replaced; fall back to seq filtering
+            f.seek(offset)
+            position = offset
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                position += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt change feed line at {position - len(line)}")
+                    continue
+                if record.get('seq', 0) <= after_seq:
+                    continue
+                record['_next_offset'] = position
+                records.append(record)
+                if limit and len(records) >= limit:
+                    break
+        return records
+
+    def poll(self, consumer: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """New records for a consumer since its last commit"""
+        checkpoint = self.get_offset(consumer)
+        return self.read(checkpoint.get('seq', 0), checkpoint.get('offset', 0), limit)
+
+    def subscribe(self, consumer: str, poll_interval: float = 1.0,
+                  stop: Optional[Any] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield new records forever (or until stop.is_set()).
+
+        A record is committed once the consumer asks for the next one, so a
+        crash while handling it replays it on restart.
+        """
+        while stop is None or not stop.is_set():
+            records = self.poll(consumer)
+            for record in records:
+                yield record
+                self.commit(consumer, record)
+            if not records:
+                time.sleep(poll_interval)
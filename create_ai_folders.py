@@ -7,16 +7,16 @@ Creates AI folder structure for all missing case directories
 import os
 from pathlib import Path
 
+from case_walker import walk_cases
+
 def find_missing_ai_folders():
     """Find all case directories missing AI folders"""
     processing_inbox = Path("/srv/processing_inbox")
     missing_folders = []
     
-    for case_dir in processing_inbox.rglob("case*"):
-        if case_dir.is_dir():
-            ai_folder = case_dir / "ai"
-            if not ai_folder.exists():
-                missing_folders.append(case_dir)
+    for case in walk_cases(processing_inbox, camera_prefix=None, case_prefix="case"):
+        if not case.has_ai_folder:
+            missing_folders.append(Path(case.path))
     
     return missing_folders
 
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Day Packs for Radar System
+Packs a closed processing_inbox/<camera>/<date>/ tree into one indexed file read through mmap
+"""
+
+import os
+import sys
+import mmap
+import struct
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ai_stats import STATS_FILE, StatsAggregator
+from case_walker import walk_cases
+
+logger = logging.getLogger(__name__)
+
+# <inbox>/<camera>/<date>.pack replaces the <date>/ directory
+PACK_SUFFIX = '.pack'
+MAGIC = b'RDPACK01'
+
+# header: magic, version, member count, index bytes (entries + names), data offset
+_HEADER = struct.Struct('<8sIIQQ')
+# entry: data offset, size, mtime_ns, name length
+_ENTRY = struct.Struct('<QQqH')
+VERSION = 1
+# Members start on this boundary; the data section starts on a page boundary
+ALIGN = 64
+
+# Packs kept open (and mapped) per process
+OPEN_PACKS = 32
+
+def _align(value: int, boundary: int) -> int:
+    return (value + boundary - 1) // boundary * boundary
+
+def pack_path(inbox_path: str, camera_id: str, day: str) -> Path:
+    return Path(inbox_path) / camera_id / f"{day}{PACK_SUFFIX}"
+
+class DayPack:
+    """
+    Read-only view of a pack file.
+
+    The header holds the member table (offset, size, mtime, name) sorted by
+    name, followed by the member bytes. The file is mapped once; read() copies
+    one member out, view() returns a zero-copy memoryview into the mapping.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, index_size, _ = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Not a day pack: {self.path}")
+            entries_end = _HEADER.size + count * _ENTRY.size
+            names = self._mm[entries_end:_HEADER.size + index_size].decode('utf-8')
+        except Exception:
+            self._mm.close()
+            raise
+        self.members: Dict[str, Tuple[int, int, int]] = {}
+        position = 0
+        for offset, size, mtime_ns, name_length in _ENTRY.iter_unpack(self._mm[_HEADER.size:entries_end]):
+            self.members[names[position:position + name_length]] = (offset, size, mtime_ns)
+            position += name_length
+        self.mtime_ns = os.stat(self.path).st_mtime_ns
+
+    def close(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # views still exported (e.g. by a traceback); unmapped once they are released
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.members
+
+    def names(self) -> List[str]:
+        return list(self.members)
+
+    def view(self, name: str) -> memoryview:
+        offset, size, _ = self.members[name]
+        return memoryview(self._mm)[offset:offset + size]
+
+    def read(self, name: str) -> bytes:
+        offset, size, _ = self.members[name]
+        return self._mm[offset:offset + size]
+
+    def stat(self, name: str) -> Tuple[int, int]:
+        """(size, mtime_ns) of a member"""
+        _, size, mtime_ns = self.members[name]
+        return size, mtime_ns
+
+    def cases(self) -> List[str]:
+        return sorted({name.split('/', 1)[0] for name in self.members})
+
+    def case_files(self, case_id: str) -> List[str]:
+        prefix = case_id + '/'
+        return [name for name in self.members if name.startswith(prefix)]
+
+    def case_members(self, case_id: str) -> Iterator[Tuple[str, bytes, float]]:
+        """(name, data, mtime) of every file of a case, as ColdArchive.write takes them"""
+        for name in self.case_files(case_id):
+            offset, size, mtime_ns = self.members[name]
+            yield name, self._mm[offset:offset + size], mtime_ns / 1e9
+
+_open_packs: 'OrderedDict[str, DayPack]' = OrderedDict()
+_open_lock = threading.Lock()
+
+def open_pack(path) -> DayPack:
+    """Shared, mapped DayPack for path (reopened when the file was replaced)"""
+    path = os.fspath(path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    with _open_lock:
+        pack = _open_packs.get(path)
+        if pack is not None and pack.mtime_ns == mtime_ns:
+            _open_packs.move_to_end(path)
+            return pack
+        if pack is not None:
+            _open_packs.pop(path)
+        pack = DayPack(path)
+        _open_packs[path] = pack
+        while len(_open_packs) > OPEN_PACKS:
+            # Unmapped once the last view into it is released
+            _open_packs.popitem(last=False)
+        return pack
+
+def write_pack(path, members: Iterable[Tuple[str, Union[str, bytes, memoryview], int]]) -> int:
+    """
+    Write a pack from (name, source path, bytes or view, mtime_ns) members;
+    the file appears atomically. Returns the member count.
+    """
+    path = Path(path)
+    members = sorted(members, key=lambda m: m[0])
+    sizes = [len(source) if isinstance(source, (bytes, memoryview)) else os.path.getsize(source)
+             for _, source, _ in members]
+    encoded = [name.encode('utf-8') for name, _, _ in members]
+    index_size = len(members) * _ENTRY.size + sum(len(n) for n in encoded)
+    data_offset = _align(_HEADER.size + index_size, mmap.PAGESIZE)
+
+    entries = []
+    offsets = []
+    offset = data_offset
+    for (name, _, mtime_ns), size, raw in zip(members, sizes, encoded):
+        entries.append(_ENTRY.pack(offset, size, mtime_ns, len(raw)))
+        offsets.append(offset)
+        offset = _align(offset + size, ALIGN)
+
+    tmp_path = path.parent / f".{path.name}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(members), index_size, data_offset))
+            f.write(b''.join(entries))
+            f.write(b''.join(encoded))
+            for (name, source, _), size, offset in zip(members, sizes, offsets):
+                f.seek(offset)
+                if isinstance(source, (bytes, memoryview)):
+                    f.write(source)
+                else:
+                    with open(source, 'rb') as src:
+                        shutil.copyfileobj(src, f, 1024 * 1024)
+                if f.tell() != offset + size:
+                    raise IOError(f"{name} changed while packing")
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(members)
+
+def pack_day(inbox_path: str, camera_id: str, day: str, remove: bool = True) -> Optional[Path]:
+    """
+    Pack <camera>/<day>/ into <camera>/<day>.pack and remove the directory
+    once the pack is in place. Every file is kept, ai/ image copies included,
+    since result files and viewers refer to them. Cases already in an
+    existing pack are kept; their bytes are copied straight from its
+    mapping, so re-packing a day does not load it into memory.
+    """
+    day_dir = Path(inbox_path) / camera_id / day
+    target = pack_path(inbox_path, camera_id, day)
+    members: Dict[str, Tuple[str, Union[str, memoryview], int]] = {}
+    existing = DayPack(target) if target.exists() else None
+    try:
+        if existing is not None:
+            for name in existing.names():
+                members[name] = (name, existing.view(name), existing.stat(name)[1])
+        if day_dir.is_dir():
+            for dirpath, dirnames, filenames in os.walk(day_dir):
+                dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                relative = os.path.relpath(dirpath, day_dir).replace(os.sep, '/')
+                for filename in filenames:
+                    if filename.startswith('.') or relative == '.':
+                        continue
+                    name = f"{relative}/{filename}"
+                    path = os.path.join(dirpath, filename)
+                    members[name] = (name, path, os.stat(path).st_mtime_ns)
+        if not members:
+            return None
+        count = write_pack(target, members.values())
+    finally:
+        # Views must be released before the old mapping can be closed
+        members.clear()
+        if existing is not None:
+            existing.close()
+    logger.info(f"📦 Packed {camera_id}/{day}: {count} files")
+    if remove and day_dir.is_dir():
+        # Packed cases leave the hot tree, and with it the pending count
+        pending = sum(1 for case in walk_cases(inbox_path, camera_filter=camera_id, date_filter=day)
+                      if case.has_verdict and case.images)
+        shutil.rmtree(day_dir)
+        StatsAggregator(str(Path(inbox_path) / STATS_FILE)).add_pending(-pending)
+    return target
+
+def unpack_day(inbox_path: str, camera_id: str, day: str, remove: bool = True) -> Optional[Path]:
+    """Extract <camera>/<day>.pack back into <camera>/<day>/"""
+    source = pack_path(inbox_path, camera_id, day)
+    if not source.exists():
+        return None
+    day_dir = Path(inbox_path) / camera_id / day
+    with DayPack(source) as pack:
+        for name in pack.names():
+            target = day_dir / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(pack.view(name))
+            mtime_ns = pack.stat(name)[1]
+            os.utime(target, ns=(mtime_ns, mtime_ns))
+    if remove:
+        source.unlink()
+    logger.info(f"📂 Unpacked {camera_id}/{day}")
+    return day_dir
+
+def remove_cases(inbox_path: str, camera_id: str, day: str, case_ids: Iterable[str]):
+    """Rewrite a pack without some cases (deleting it once empty)"""
+    target = pack_path(inbox_path, camera_id, day)
+    drop = set(case_ids)
+    with DayPack(target) as pack:
+        keep = [(name, pack.view(name), pack.stat(name)[1]) for name in pack.names()
+                if name.split('/', 1)[0] not in drop]
+        try:
+            if keep:
+                write_pack(target, keep)
+            else:
+                target.unlink()
+        finally:
+            keep.clear()
+
+def iter_packs(inbox_path: str, camera_filter: Optional[str] = None,
+               date_filter: Optional[str] = None,
+               camera_prefix: Optional[str] = None) -> Iterator[Tuple[str, str, Path]]:
+    """(camera, date, pack path) of every day pack; filters as in walk_cases"""
+    try:
+        cameras = sorted(e.name for e in os.scandir(inbox_path) if e.is_dir() and not e.name.startswith('.'))
+    except OSError:
+        return
+    for camera_id in cameras:
+        if camera_filter is not None and camera_id != camera_filter:
+            continue
+        if camera_prefix is not None and not camera_id.startswith(camera_prefix):
+            continue
+        try:
+            names = sorted(os.listdir(os.path.join(inbox_path, camera_id)))
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith(PACK_SUFFIX) and not name.startswith('.'):
+                day = name[:-len(PACK_SUFFIX)]
+                if date_filter is None or day == date_filter:
+                    yield camera_id, day, Path(inbox_path) / camera_id / name
+
+def read_case_file(inbox_path: str, path) -> bytes:
+    """
+    Read a file under the inbox whether its day is still a directory or
+    already packed (<inbox>/<camera>/<date>/<case>/... inside <date>.pack).
+    Paths may be absolute or inbox-relative; nothing outside the inbox is read.
+    """
+    inbox = Path(inbox_path).resolve()
+    path = Path(os.path.normpath(Path(inbox_path) / path)).resolve()
+    if inbox not in path.parents:
+        raise FileNotFoundError(str(path))
+    try:
+        return path.read_bytes()
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    relative = path.relative_to(inbox).parts
+    if len(relative) < 4:
+        raise FileNotFoundError(str(path))
+    camera_id, day = relative[0], relative[1]
+    source = pack_path(inbox_path, camera_id, day)
+    try:
+        return open_pack(source).read('/'.join(relative[2:]))
+    except (FileNotFoundError, KeyError):
+        raise FileNotFoundError(str(path))
+
+def closed_days(inbox_path: str, today: Optional[date] = None) -> List[Tuple[str, str]]:
+    """
+    (camera, date) directories that can be packed: before today, not the
+    camera's newest date, and with every case processed
+    """
+    today = today or date.today()
+    days = {}
+    for case in walk_cases(inbox_path, camera_prefix=None, scan_ai=True):
+        key = (case.camera_id, case.date)
+        settled = not case.images or case.has_ai_file('ai_detection_results.json') or case.has_ai_file('ai.json')
+        days[key] = days.get(key, True) and settled
+    newest = {}
+    for camera_id, day in days:
+        newest[camera_id] = max(newest.get(camera_id, ''), day)
+    closed = []
+    for (camera_id, day), settled in sorted(days.items()):
+        try:
+            is_past = datetime.strptime(day, '%Y-%m-%d').date() < today
+        except ValueError:
+            continue
+        if is_past and day < newest[camera_id]:
+            if settled:
+                closed.append((camera_id, day))
+            else:
+                logger.info(f"⏳ Not packing {camera_id}/{day}: unprocessed cases")
+    return closed
+
+def main():
+    """Command line: pack <camera> <date> | pack-closed | unpack <camera> <date> | ls <camera> <date> | cat <camera> <date> <member>"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    inbox_path = "/srv/processing_inbox"
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    args = sys.argv[2:]
+
+    if command == "pack" and len(args) == 2:
+        print(pack_day(inbox_path, args[0], args[1]) or "Nothing to pack")
+    elif command == "pack-closed":
+        for camera_id, day in closed_days(inbox_path):
+            pack_day(inbox_path, camera_id, day)
+    elif command == "unpack" and len(args) == 2:
+        print(unpack_day(inbox_path, args[0], args[1]) or "No pack found")
+    elif command == "ls" and len(args) == 2:
+        with DayPack(pack_path(inbox_path, args[0], args[1])) as pack:
+            for name in pack.names():
+                size, mtime_ns = pack.stat(name)
+                print(f"{size:>10}  {datetime.fromtimestamp(mtime_ns / 1e9):%Y-%m-%d %H:%M:%S}  {name}")
+    elif command == "cat" and len(args) == 3:
+        if any(part in ('', '.', '..') or '/' in part for part in args[:2]):
+            sys.exit(1)
+        try:
+            sys.stdout.buffer.write(open_pack(pack_path(inbox_path, args[0], args[1])).view(args[2]))
+        except (FileNotFoundError, KeyError):
+            print(f"Not packed: {'/'.join(args)}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        print(main.__doc__)
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,9 @@ Fix Missing AI Folders Script
 Creates AI folders for all cases and processes images with ALPR
 """
 
-import os
 import sys
 import json
 import shutil
-import subprocess
 from pathlib import Path
 from datetime import datetime
 
@@ -16,16 +14,18 @@ from datetime import datetime
 ALPR_PROJECT_PATH = "/home/rnd2/Desktop/radar_system_clean/Automatic-License-Plate-Recognition"
 sys.path.insert(0, ALPR_PROJECT_PATH)
 
+from atomic_write import FsyncBatch, atomic_write_json
+from alpr_engine import ProcessingEngine, image_results
+from case_walker import scan_case, walk_cases
+
 def find_missing_ai_folders():
     """Find all case directories missing AI folders"""
     processing_inbox = Path("/srv/processing_inbox")
     missing_folders = []
     
-    for case_dir in processing_inbox.rglob("case*"):
-        if case_dir.is_dir():
-            ai_folder = case_dir / "ai"
-            if not ai_folder.exists():
-                missing_folders.append(case_dir)
+    for case in walk_cases(processing_inbox, camera_prefix=None, case_prefix="case"):
+        if not case.has_ai_folder:
+            missing_folders.append(Path(case.path))
     
     return missing_folders
 
@@ -44,14 +44,16 @@ def create_ai_folder_structure(case_dir):
 
 def get_image_files(case_dir):
     """Get all image files in a case directory"""
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-    image_files = []
-    
-    for file_path in case_dir.iterdir():
-        if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-            image_files.append(file_path)
-    
-    return image_files
+    return [Path(img) for img in scan_case(case_dir).images]
+
+_engine = None
+
+def get_engine():
+    """Shared engine; EnhancedDynamicALPRSystem with OpenCV contour fallback"""
+    global _engine
+    if _engine is None:
+        _engine = ProcessingEngine('enhanced')
+    return _engine
 
 def process_images_with_alpr(case_dir, ai_folder):
     """Process images in case directory with ALPR"""
@@ -59,32 +61,34 @@ def process_images_with_alpr(case_dir, ai_folder):
     
     if not image_files:
         print(f"No images found in {case_dir}")
-        return
+        return []
+    
+    # Run the shared engine (reuses a current result for this backend)
+    engine_result = get_engine().process_case({
+        'camera_id': case_dir.parent.parent.name,
+        'date': case_dir.parent.name,
+        'case_id': case_dir.name,
+        'case_path': str(case_dir),
+        'images': [str(image_file) for image_file in image_files]
+    })
     
     results = []
     processed_folder = ai_folder / "processed"
     
-    for image_file in image_files:
+    for result in image_results(engine_result):
+        image_file = Path(result['image_path'])
         try:
-            print(f"Processing image: {image_file}")
+            # Copy processed image to AI folder
+            processed_image = processed_folder / image_file.name
+            shutil.copy2(image_file, processed_image)
             
-            # Use the enhanced ALPR system
-            result = process_single_image(str(image_file))
+            # Add result
+            result['original_path'] = str(image_file)
+            result['processed_path'] = str(processed_image)
+            result['processed_at'] = engine_result['processed_at']
+            results.append(result)
             
-            if result:
-                # Copy processed image to AI folder
-                processed_image = processed_folder / image_file.name
-                shutil.copy2(image_file, processed_image)
-                
-                # Add result
-                result['original_path'] = str(image_file)
-                result['processed_path'] = str(processed_image)
-                result['processed_at'] = datetime.now().isoformat()
-                results.append(result)
-                
-                print(f"Successfully processed: {image_file.name}")
-            else:
-                print(f"Failed to process: {image_file.name}")
+            print(f"Successfully processed: {image_file.name}")
                 
         except Exception as e:
             print(f"Error processing {image_file}: {e}")
@@ -92,52 +96,11 @@ def process_images_with_alpr(case_dir, ai_folder):
     
     # Save results
     results_file = ai_folder / "results" / "alpr_results.json"
-    with open(results_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    atomic_write_json(results_file, results)
     
     print(f"Saved {len(results)} results to {results_file}")
     return results
 
-def process_single_image(image_path):
-    """Process a single image with ALPR"""
-    try:
-        # Import the enhanced ALPR system
-        from enhanced_dynamic_alpr_system import EnhancedDynamicALPRSystem
-        
-        # Initialize the ALPR system
-        alpr_system = EnhancedDynamicALPRSystem()
-        
-        # Process the image
-        result = alpr_system.process_image(image_path)
-        
-        if result and 'plates' in result:
-            return {
-                'image_path': image_path,
-                'plates_detected': len(result['plates']),
-                'plates': result['plates'],
-                'confidence_scores': [plate.get('confidence', 0) for plate in result['plates']],
-                'processing_time': result.get('processing_time', 0),
-                'status': 'success'
-            }
-        else:
-            return {
-                'image_path': image_path,
-                'plates_detected': 0,
-                'plates': [],
-                'confidence_scores': [],
-                'status': 'no_plates_detected'
-            }
-            
-    except Exception as e:
-        print(f"Error in ALPR processing: {e}")
-        return {
-            'image_path': image_path,
-            'plates_detected': 0,
-            'plates': [],
-            'error': str(e),
-            'status': 'error'
-        }
-
 def create_processing_log(ai_folder, case_dir, results):
     """Create a processing log"""
     log_file = ai_folder / "logs" / "processing_log.json"
@@ -153,8 +116,7 @@ def create_processing_log(ai_folder, case_dir, results):
         'results_summary': results
     }
     
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(log_data, f, indent=2, ensure_ascii=False)
+    atomic_write_json(log_file, log_data)
     
     print(f"Created processing log: {log_file}")
 
@@ -176,28 +138,29 @@ def main():
     total_processed = 0
     total_plates_found = 0
     
-    for case_dir in missing_folders:
-        try:
-            print(f"\n📂 Processing: {case_dir}")
+    with FsyncBatch():  # group-commit result fsyncs across cases
+        for case_dir in missing_folders:
+            try:
+                print(f"\n📂 Processing: {case_dir}")
             
-            # Create AI folder structure
-            ai_folder = create_ai_folder_structure(case_dir)
+                # Create AI folder structure
+                ai_folder = create_ai_folder_structure(case_dir)
             
-            # Process images with ALPR
-            results = process_images_with_alpr(case_dir, ai_folder)
+                # Process images with ALPR
+                results = process_images_with_alpr(case_dir, ai_folder)
             
-            # Create processing log
-            create_processing_log(ai_folder, case_dir, results)
+                # Create processing log
+                create_processing_log(ai_folder, case_dir, results)
             
-            # Update counters
-            total_processed += len(results)
-            total_plates_found += sum(r.get('plates_detected', 0) for r in results)
+                # Update counters
+                total_processed += len(results)
+                total_plates_found += sum(r.get('plates_detected', 0) for r in results)
             
-            print(f"✅ Completed processing: {case_dir}")
+                print(f"✅ Completed processing: {case_dir}")
             
-        except Exception as e:
-            print(f"❌ Error processing {case_dir}: {e}")
-            continue
+            except Exception as e:
+                print(f"❌ Error processing {case_dir}: {e}")
+                continue
     
     print(f"\n🎉 Processing Complete!")
     print(f"📊 Summary:")
@@ -40,6 +40,7 @@ interface AICase {
   case_path: string;
   ai_folder: string;
   ai_images: string[];
+  previews?: { image: string; thumbnail: string; preview: string }[];
   plate_number: string | null;
   confidence: number;
   processed_at: string;
@@ -460,7 +461,11 @@ const AICases: React.FC = () => {
               <Grid container spacing={2}>
                 {selectedCase.ai_images.slice(0, 6).map((imagePath, idx) => {
                   const filename = imagePath.split('/').pop();
-                  const imageUrl = `/api/ai-cases/${selectedCase.camera_id}/${selectedCase.date}/${selectedCase.case_id}/images/${filename}`;
+                  // Small cached thumbnail when the processor rendered one, else the full frame
+                  const preview = selectedCase.previews?.find((p) => p.image === filename);
+                  const imageUrl = preview
+                    ? `/api/ai-cases/previews/${preview.thumbnail}`
+                    : `/api/ai-cases/${selectedCase.camera_id}/${selectedCase.date}/${selectedCase.case_id}/images/${filename}`;
                   
                   return (
                     <Grid size={{ xs: 12, sm: 6, md: 4 }} key={idx}>
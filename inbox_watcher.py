@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Inbox Watcher for Radar System
+Watches only the active date directories of processing_inbox/<camera>/<date>/<case>
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls when inotify is not available
+POLL_INTERVAL = 2.0
+# A date directory keeps being watched this long after a newer one appears (late uploads)
+RETIRE_AFTER = 2 * 3600
+# Rescans after an overflow also cover cases changed shortly before the last sync
+RESCAN_SLACK = 2.0
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+DIR_MASK = IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+CASE_MASK = IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+_EVENT = struct.Struct('iIII')
+
+class _Inotify:
+    """Minimal ctypes binding of inotify_init1 / inotify_add_watch / inotify_rm_watch"""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc = libc
+        self._get_errno = ctypes.get_errno
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(self._get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = self._get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: float):
+        """Yield (wd, mask, name) for the events available within timeout"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += length
+            yield wd, mask, name
+
+    def close(self):
+        os.close(self.fd)
+
+def _subdirs(path: str) -> Dict[str, float]:
+    """Non-hidden sub directories of path with their mtimes"""
+    result = {}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        result[entry.path] = entry.stat().st_mtime
+                except OSError:
+                    continue
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        pass
+    return result
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+class InboxWatcher:
+    """
+    Reports case directories that changed under root/<camera>/<date>/<case>.
+
+    Only the newest date directory of each camera (plus any created while
+    running) is watched. Older ones stay watched for RETIRE_AFTER seconds
+    after a newer date appears, then are dropped. The number of inotify
+    watches therefore follows the number of cameras and of today's open
+    cases, not the size of the inbox.
+
+    on_case(case_path) is called from the watcher thread whenever a case
+    directory appears or a file in it is written. It returns True once the
+    case needs no more attention (queued or done); the case is then no
+    longer watched. recheck() asks for another call after a delay even if
+    nothing changes on disk (e.g. to wait for files to settle).
+
+    On IN_Q_OVERFLOW the active date directories are rescanned for cases
+    changed since the last sync. When inotify is not available or the watch
+    limit is reached (ENOSPC), the watcher switches to polling the mtimes of
+    the active date and case directories every poll_interval seconds.
+    """
+
+    def __init__(self, root: str, on_case: Callable[[str], bool],
+                 poll_interval: float = POLL_INTERVAL, retire_after: float = RETIRE_AFTER,
+                 use_inotify: bool = True):
+        self.root = os.fspath(root)
+        self.on_case = on_case
+        self.poll_interval = poll_interval
+        self.retire_after = retire_after
+        self.mode = 'inotify' if use_inotify and sys.platform.startswith('linux') else 'polling'
+        self.overflows = 0
+        self._inotify: Optional[_Inotify] = None
+        self._watches: Dict[int, tuple] = {}       # wd -> (kind, path)
+        self._wd_by_path: Dict[str, int] = {}
+        self._cameras: Dict[str, Optional[float]] = {}          # camera path -> mtime
+        self._dates: Dict[str, Dict[str, Optional[float]]] = {}  # camera path -> {date path: retire_at}
+        self._date_mtimes: Dict[str, Optional[float]] = {}
+        self._open_cases: Dict[str, Optional[float]] = {}       # case path -> last seen mtime
+        self._rechecks: Dict[str, float] = {}                    # case path -> due time
+        self._rechecks_lock = threading.Lock()
+        self._last_sync = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> 'InboxWatcher':
+        if self.mode == 'inotify':
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify not available ({e}), polling {self.root}")
+                self.mode = 'polling'
+        self._last_sync = time.time()
+        self._watch(self.root, 'root')
+        for camera_path in _subdirs(self.root):
+            self._add_camera(camera_path, initial=True)
+        self._thread = threading.Thread(target=self._run, name='inbox-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"👁️ Watching {self.root} ({self.mode}, {self.watch_count()} watches, "
+                    f"{sum(len(d) for d in self._dates.values())} active date folders)")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=max(self.poll_interval, 1.0) + 1)
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def watch_count(self) -> int:
+        return len(self._watches)
+
+    def recheck(self, case_path: str, delay: float):
+        """Call on_case for case_path again after delay seconds (thread-safe)"""
+        due = time.time() + max(delay, 0.0)
+        with self._rechecks_lock:
+            self._rechecks[os.fspath(case_path)] = min(due, self._rechecks.get(os.fspath(case_path), due))
+
+    def _run_rechecks(self):
+        now = time.time()
+        with self._rechecks_lock:
+            due = [path for path, at in self._rechecks.items() if at <= now]
+            for path in due:
+                del self._rechecks[path]
+        for case_path in due:
+            self._notify(case_path)
+
+    # -- watch bookkeeping -------------------------------------------------
+
+    def _watch(self, path: str, kind: str):
+        if self.mode != 'inotify' or path in self._wd_by_path:
+            return
+        try:
+            wd = self._inotify.add_watch(path, CASE_MASK if kind == 'case' else DIR_MASK)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                self._switch_to_polling('inotify watch limit reached')
+            elif e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                logger.warning(f"Cannot watch {path}: {e}")
+            return
+        self._watches[wd] = (kind, path)
+        self._wd_by_path[path] = wd
+
+    def _unwatch(self, path: str):
+        wd = self._wd_by_path.pop(path, None)
+        if wd is not None:
+            self._watches.pop(wd, None)
+            if self._inotify:
+                self._inotify.rm_watch(wd)
+
+    def _switch_to_polling(self, reason: str):
+        logger.warning(f"⚠️ {reason}, falling back to polling {self.root}")
+        self.mode = 'polling'
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+        self._watches.clear()
+        self._wd_by_path.clear()
+        # Events may have been lost while switching
+        self._rescan(self._last_sync - RESCAN_SLACK)
+
+    # -- tree ----------------------------------------------------------------
+
+    def _add_camera(self, camera_path: str, initial: bool = False):
+        self._cameras[camera_path] = _mtime(camera_path)
+        self._dates.setdefault(camera_path, {})
+        self._watch(camera_path, 'camera')
+        dates = _subdirs(camera_path)
+        if not dates:
+            return
+        if initial:
+            # Only the newest date folder of an existing camera is active
+            self._add_date(camera_path, max(dates), initial=True)
+        else:
+            for date_path in sorted(dates):
+                self._add_date(camera_path, date_path)
+
+    def _add_date(self, camera_path: str, date_path: str, initial: bool = False):
+        active = self._dates.setdefault(camera_path, {})
+        if date_path in active:
+            return
+        now = time.time()
+        for other, retire_at in active.items():
+            if other < date_path and retire_at is None:
+                active[other] = now + self.retire_after
+        active[date_path] = None if date_path >= max(active, default=date_path) else now + self.retire_after
+        self._date_mtimes[date_path] = _mtime(date_path)
+        self._watch(date_path, 'date')
+        for case_path, mtime in _subdirs(date_path).items():
+            self._add_case(case_path, notify=not initial, mtime=mtime)
+
+    def _add_case(self, case_path: str, notify: bool = True, mtime: Optional[float] = None):
+        if case_path in self._open_cases:
+            return
+        self._open_cases[case_path] = mtime if mtime is not None else _mtime(case_path)
+        self._watch(case_path, 'case')
+        if notify:
+            self._notify(case_path)
+
+    def _close_case(self, case_path: str):
+        self._open_cases.pop(case_path, None)
+        self._unwatch(case_path)
+
+    def _notify(self, case_path: str):
+        try:
+            done = self.on_case(case_path)
+        except Exception as e:
+            logger.error(f"❌ Case handler failed for {case_path}: {e}")
+            return
+        if done:
+            self._close_case(case_path)
+
+    def _retire_dates(self):
+        now = time.time()
+        for camera_path, active in self._dates.items():
+            for date_path in [d for d, retire_at in active.items() if retire_at is not None and retire_at <= now]:
+                del active[date_path]
+                self._date_mtimes.pop(date_path, None)
+                self._unwatch(date_path)
+                prefix = date_path + os.sep
+                for case_path in [c for c in self._open_cases if c.startswith(prefix)]:
+                    self._close_case(case_path)
+                logger.info(f"📅 Stopped watching {date_path}")
+
+    def _sync_cameras(self):
+        """New cameras, and new date folders of cameras whose mtime changed"""
+        for camera_path in _subdirs(self.root):
+            if camera_path not in self._cameras:
+                self._add_camera(camera_path)
+                continue
+            mtime = _mtime(camera_path)
+            if mtime != self._cameras[camera_path]:
+                self._cameras[camera_path] = mtime
+                newest = max(self._dates.get(camera_path) or {'': None})
+                for date_path in sorted(_subdirs(camera_path)):
+                    if date_path > newest:
+                        self._add_date(camera_path, date_path)
+
+    def _rescan(self, since: float):
+        """Pick up cameras, dates and cases changed since the given time"""
+        self._sync_cameras()
+        for active in list(self._dates.values()):
+            for date_path in list(active):
+                for case_path, mtime in _subdirs(date_path).items():
+                    if case_path not in self._open_cases:
+                        if mtime >= since:
+                            self._add_case(case_path, mtime=mtime)
+                    elif mtime >= since:
+                        self._open_cases[case_path] = mtime
+                        self._notify(case_path)
+        self._last_sync = time.time()
+
+    # -- event loops -------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.mode == 'inotify':
+                    self._read_events()
+                else:
+                    self._poll()
+                    self._stop.wait(self.poll_interval)
+                self._run_rechecks()
+                self._retire_dates()
+            except Exception as e:
+                logger.error(f"❌ Inbox watcher error: {e}")
+                self._stop.wait(1)
+
+    def _read_events(self):
+        for wd, mask, name in self._inotify.read(1.0):
+            if mask & IN_Q_OVERFLOW:
+                self.overflows += 1
+                logger.warning("⚠️ inotify queue overflow, rescanning active date folders")
+                self._rescan(self._last_sync - RESCAN_SLACK)
+                continue
+            watch = self._watches.get(wd)
+            if watch is None:
+                continue
+            kind, path = watch
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                self._watches.pop(wd, None)
+                self._wd_by_path.pop(path, None)
+                if kind == 'case':
+                    self._open_cases.pop(path, None)
+                continue
+            child = os.path.join(path, name)
+            if name.startswith('.'):
+                continue
+            is_dir = bool(mask & IN_ISDIR)
+            if kind == 'root' and is_dir:
+                self._add_camera(child)
+            elif kind == 'camera' and is_dir:
+                self._add_date(path, child)
+            elif kind == 'date' and is_dir:
+                self._add_case(child)
+            elif kind == 'case' and (is_dir or not mask & IN_CREATE):
+                # Files count once written (IN_CLOSE_WRITE / IN_MOVED_TO), not when created
+                self._notify(path)
+        if self.mode == 'inotify':
+            self._last_sync = time.time()
+
+    def _poll(self):
+        """One polling pass: mtimes of cameras, active date folders and open cases"""
+        self._sync_cameras()
+        for active in list(self._dates.values()):
+            for date_path in list(active):
+                mtime = _mtime(date_path)
+                if mtime == self._date_mtimes.get(date_path):
+                    continue
+                self._date_mtimes[date_path] = mtime
+                for case_path in _subdirs(date_path):
+                    self._add_case(case_path)
+        for case_path, seen in list(self._open_cases.items()):
+            mtime = _mtime(case_path)
+            if mtime is None:
+                self._open_cases.pop(case_path, None)
+            elif mtime != seen:
+                self._open_cases[case_path] = mtime
+                self._notify(case_path)
+        self._last_sync = time.time()
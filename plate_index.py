@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Plate Number Index for Radar System
+Persistent inverted index from normalized plate numbers to cases
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PLATE_INDEX_FILE = '.ai_plate_index.sqlite'
+
+# Length of the n-grams used for partial matches
+NGRAM_SIZE = 3
+
+# Largest edit distance fuzzy lookups support (deletion variants are stored up to it)
+MAX_FUZZY_DISTANCE = 2
+
+# Substitutions OCR commonly makes; they cost CONFUSION_COST instead of 1
+CONFUSABLE = {frozenset(pair) for pair in (
+    ('0', '8'), ('1', '7'), ('3', '8'), ('5', '6'), ('6', '8'), ('4', '9'),
+    ('0', 'O'), ('0', 'D'), ('1', 'I'), ('2', 'Z'), ('5', 'S'), ('8', 'B')
+)}
+CONFUSION_COST = 0.5
+
+# Bumped when tables are added; older index files are backfilled on open
+SCHEMA_VERSION = 2
+
+# Arabic-Indic and extended Arabic-Indic digits -> ASCII
+_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+_SEPARATORS = re.compile(r'[^0-9A-Z]')
+
+def normalize_plate(text: Optional[str]) -> str:
+    """Canonical plate form: ASCII digits/letters only ('12-34567' -> '1234567')"""
+    if not text:
+        return ''
+    return _SEPARATORS.sub('', str(text).translate(_DIGITS).upper())
+
+def plate_ngrams(plate: str, size: int = NGRAM_SIZE) -> Set[str]:
+    """All n-grams of a normalized plate (the plate itself when shorter)"""
+    if len(plate) <= size:
+        return {plate} if plate else set()
+    return {plate[i:i + size] for i in range(len(plate) - size + 1)}
+
+def plate_deletes(plate: str, max_distance: int = MAX_FUZZY_DISTANCE) -> Set[str]:
+    """Every string obtained by deleting up to max_distance characters"""
+    variants = {plate}
+    frontier = {plate}
+    for _ in range(max_distance):
+        frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+        variants |= frontier
+    return variants
+
+def plate_distance(a: str, b: str) -> float:
+    """Edit distance where confusable substitutions (0/8, 1/7, ...) are cheaper"""
+    previous = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        current = [float(i)]
+        for j, cb in enumerate(b, 1):
+            if ca == cb:
+                substitution = 0.0
+            elif frozenset((ca, cb)) in CONFUSABLE:
+                substitution = CONFUSION_COST
+            else:
+                substitution = 1.0
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + substitution))
+        previous = current
+    return previous[-1]
+
+def _edit_count(a: str, b: str, limit: int) -> int:
+    """Plain Levenshtein distance, stopping early once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def result_plates(data: Dict[str, Any]) -> Dict[str, float]:
+    """Every plate a result file mentions, normalized, with its best confidence"""
+    plates: Dict[str, float] = {}
+    candidates = [(data.get('plate_number'), data.get('confidence'))]
+    candidates += [(d.get('plate'), d.get('confidence')) for d in data.get('detections', [])]
+    candidates += [(d.get('plate_text'), d.get('confidence')) for d in data.get('detected_plates', [])]
+    for text, confidence in candidates:
+        plate = normalize_plate(text)
+        if plate:
+            plates[plate] = max(plates.get(plate, 0.0), float(confidence or 0.0))
+    return plates
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plates (
+    plate TEXT NOT NULL,
+    case_path TEXT NOT NULL,
+    result_file TEXT NOT NULL,
+    camera_id TEXT,
+    date TEXT,
+    case_id TEXT,
+    raw_plate TEXT,
+    confidence REAL,
+    PRIMARY KEY (plate, case_path, result_file)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS plates_by_file ON plates (result_file);
+CREATE TABLE IF NOT EXISTS ngrams (
+    gram TEXT NOT NULL,
+    plate TEXT NOT NULL,
+    PRIMARY KEY (gram, plate)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS deletes (
+    variant TEXT NOT NULL,
+    plate TEXT NOT NULL,
+    PRIMARY KEY (variant, plate)
+) WITHOUT ROWID;
+"""
+
+class PlateIndex:
+    """
+    Inverted index plate -> cases, stored in SQLite next to the inbox.
+
+    Exact and prefix lookups are B-tree range scans on the normalized plate.
+    Partial lookups intersect the query's n-grams and then verify the
+    substring. Fuzzy lookups use a symmetric-delete table: two plates within
+    k edits share a deletion variant, so candidates come from one indexed
+    IN query rather than a scan of every plate. Each result file replaces
+    its own rows, so rewrites of a case never leave stale plates behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.fspath(path)
+        self._local = threading.local()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(_SCHEMA)
+            if db.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                self._backfill(db)
+            self._local.db = db
+        return db
+
+    def _backfill(self, db: sqlite3.Connection):
+        """Populate tables added since the index file was created"""
+        with db:
+            plates = [row[0] for row in db.execute('SELECT DISTINCT plate FROM plates')]
+            for plate in plates:
+                self._insert_postings(db, plate)
+            db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _insert_postings(self, db: sqlite3.Connection, plate: str):
+        db.executemany('INSERT OR IGNORE INTO ngrams VALUES (?, ?)',
+                       ((gram, plate) for gram in plate_ngrams(plate)))
+        db.executemany('INSERT OR IGNORE INTO deletes VALUES (?, ?)',
+                       ((variant, plate) for variant in plate_deletes(plate)))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def update(self, case_path: str, result_file: str, data: Optional[Dict[str, Any]]):
+        """Replace the index rows of one result file (data=None removes them)"""
+        case = Path(case_path)
+        plates = result_plates(data) if data else {}
+        raw = {normalize_plate(data.get('plate_number')): data.get('plate_number')} if data else {}
+        with self._db as db:
+            self._remove(db, str(result_file))
+            for plate, confidence in plates.items():
+                db.execute('INSERT OR REPLACE INTO plates VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                           (plate, str(case), str(result_file), case.parent.parent.name,
+                            case.parent.name, case.name, raw.get(plate) or plate, confidence))
+                self._insert_postings(db, plate)
+
+    def _remove(self, db: sqlite3.Connection, result_file: str):
+        old = [row[0] for row in db.execute('SELECT plate FROM plates WHERE result_file = ?', (result_file,))]
+        db.execute('DELETE FROM plates WHERE result_file = ?', (result_file,))
+        for plate in old:
+            # Drop postings of plates no other case references any more
+            if db.execute('SELECT 1 FROM plates WHERE plate = ? LIMIT 1', (plate,)).fetchone() is None:
+                db.execute('DELETE FROM ngrams WHERE plate = ?', (plate,))
+                db.execute('DELETE FROM deletes WHERE plate = ?', (plate,))
+
+    def rebuild(self, results: Iterable[tuple]):
+        """Recompute the index from (case_path, result_file, data) tuples"""
+        with self._db as db:
+            db.execute('DELETE FROM plates')
+            db.execute('DELETE FROM ngrams')
+            db.execute('DELETE FROM deletes')
+        count = 0
+        for case_path, result_file, data in results:
+            self.update(case_path, result_file, data)
+            count += 1
+        logger.info(f"Rebuilt plate index from {count} result files")
+
+    # -- lookups -----------------------------------------------------------
+
+    def _rows(self, where: str, params: tuple, limit: Optional[int]) -> List[Dict[str, Any]]:
+        sql = ('SELECT plate, raw_plate, camera_id, date, case_id, case_path, result_file, confidence '
+               f'FROM plates WHERE {where} ORDER BY plate, date DESC, case_id')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        cursor = self._db.execute(sql, params)
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def exact(self, plate: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Cases whose results contain exactly this plate"""
+        return self._rows('plate = ?', (normalize_plate(plate),), limit)
+
+    def prefix(self, plate: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Cases with a plate starting with the given characters"""
+        start = normalize_plate(plate)
+        if not start:
+            return []
+        # Range scan: [start, start + highest code point)
+        return self._rows('plate >= ? AND plate < ?', (start, start + '\uffff'), limit)
+
+    def partial(self, plate: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Cases with a plate containing the given characters anywhere"""
+        query = normalize_plate(plate)
+        if not query:
+            return []
+        if len(query) < NGRAM_SIZE:
+            candidates = [row[0] for row in self._db.execute(
+                'SELECT DISTINCT plate FROM ngrams WHERE gram LIKE ?', (f'%{query}%',))]
+        else:
+            grams = sorted(plate_ngrams(query))
+            placeholders = ','.join('?' * len(grams))
+            candidates = [row[0] for row in self._db.execute(
+                f'SELECT plate FROM ngrams WHERE gram IN ({placeholders}) '
+                f'GROUP BY plate HAVING COUNT(*) = ?', (*grams, len(grams)))]
+        matches = sorted(p for p in candidates if query in p)
+        if not matches:
+            return []
+        placeholders = ','.join('?' * len(matches))
+        return self._rows(f'plate IN ({placeholders})', tuple(matches), limit)
+
+    def similar_plates(self, plate: str, max_distance: int = 1) -> List[Dict[str, Any]]:
+        """
+        Indexed plates within max_distance edits of plate.
+
+        Candidates share a deletion variant with the query; each is verified
+        with plain Levenshtein distance and ranked by the confusion-aware
+        cost, so a 0/8 misread sorts ahead of an unrelated digit.
+        """
+        query = normalize_plate(plate)
+        if not query:
+            return []
+        if not 0 <= max_distance <= MAX_FUZZY_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {MAX_FUZZY_DISTANCE}")
+        variants = sorted(plate_deletes(query, max_distance))
+        placeholders = ','.join('?' * len(variants))
+        candidates = {row[0] for row in self._db.execute(
+            f'SELECT DISTINCT plate FROM deletes WHERE variant IN ({placeholders})', variants)}
+        matches = []
+        for candidate in candidates:
+            edits = _edit_count(query, candidate, max_distance)
+            if edits <= max_distance:
+                matches.append({'plate': candidate, 'edits': edits,
+                                'distance': plate_distance(query, candidate)})
+        matches.sort(key=lambda m: (m['distance'], m['plate']))
+        return matches
+
+    def fuzzy(self, plate: str, limit: Optional[int] = None, max_distance: int = 1) -> List[Dict[str, Any]]:
+        """Cases with a plate within max_distance edits, closest first"""
+        similar = self.similar_plates(plate, max_distance)
+        if not similar:
+            return []
+        scores = {m['plate']: m for m in similar}
+        placeholders = ','.join('?' * len(scores))
+        rows = self._rows(f'plate IN ({placeholders})', tuple(scores), None)
+        for row in rows:
+            row['edits'] = scores[row['plate']]['edits']
+            row['distance'] = scores[row['plate']]['distance']
+        rows.sort(key=lambda row: row['distance'])
+        return rows[:limit] if limit else rows
+
+    def lookup(self, plate: str, mode: str = 'exact', limit: Optional[int] = None,
+               max_distance: int = 1) -> List[Dict[str, Any]]:
+        """Dispatch to exact / prefix / partial / fuzzy"""
+        if mode == 'fuzzy':
+            return self.fuzzy(plate, limit, max_distance)
+        if mode not in ('exact', 'prefix', 'partial'):
+            raise ValueError(f"Unknown plate lookup mode: {mode}")
+        return getattr(self, mode)(plate, limit)
+
+    def case_paths(self, plate: str, mode: str = 'partial') -> Set[str]:
+        return {row['case_path'] for row in self.lookup(plate, mode)}
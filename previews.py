@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Image Previews for Radar System
+Small thumbnails and plate-annotated previews of case frames, cached by image hash
+"""
+
+import os
+import sys
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from atomic_write import atomic_write_bytes
+
+logger = logging.getLogger(__name__)
+
+# <inbox>/.ai_previews/<2 hex>/<sha256>.thumb.webp and <sha256>.<backend>.preview.webp
+PREVIEW_DIR = '.ai_previews'
+
+# AI_PREVIEWS=0 turns preview generation off
+PREVIEWS_ENV = 'AI_PREVIEWS'
+
+# Longest side in pixels and encoder quality
+THUMB_SIZE = 320
+PREVIEW_SIZE = 1280
+THUMB_QUALITY = 70
+PREVIEW_QUALITY = 80
+
+BOX_COLOR = (0, 200, 0)
+TEXT_COLOR = (255, 255, 255)
+
+def previews_enabled() -> bool:
+    return os.environ.get(PREVIEWS_ENV, '1') != '0'
+
+_format: Optional[tuple] = None
+
+def _image_format() -> tuple:
+    """(extension, quality flag) of the preview encoding: WebP when OpenCV can write it, else JPEG"""
+    global _format
+    if _format is None:
+        import cv2
+        if cv2.haveImageWriter('.webp'):
+            _format = ('.webp', cv2.IMWRITE_WEBP_QUALITY)
+        else:
+            _format = ('.jpg', cv2.IMWRITE_JPEG_QUALITY)
+    return _format
+
+def _fit(image, size: int):
+    """Downscale so the longest side is at most size pixels"""
+    import cv2
+
+    height, width = image.shape[:2]
+    factor = size / max(height, width)
+    if factor >= 1.0:
+        return image, 1.0
+    resized = cv2.resize(image, (max(1, round(width * factor)), max(1, round(height * factor))),
+                         interpolation=cv2.INTER_AREA)
+    return resized, factor
+
+def annotate(image, detections: List[Dict[str, Any]], factor: float, bbox_format: str = 'xyxy'):
+    """Draw detection boxes and plate text; factor maps original pixels onto image"""
+    import cv2
+
+    thickness = max(1, round(max(image.shape[:2]) / 500))
+    for detection in detections:
+        bbox = detection.get('bbox')
+        if not bbox or len(bbox) < 4:
+            continue
+        x1, y1, x2, y2 = bbox[:4]
+        if bbox_format == 'xywh':
+            x2, y2 = x1 + x2, y1 + y2
+        x1, y1, x2, y2 = (round(v * factor) for v in (x1, y1, x2, y2))
+        cv2.rectangle(image, (x1, y1), (x2, y2), BOX_COLOR, thickness)
+        label = detection.get('plate')
+        if label:
+            label = f"{label} {detection.get('confidence', 0.0):.2f}"
+            scale = 0.4 * thickness
+            (text_w, text_h), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+            top = max(0, y1 - text_h - baseline - 2)
+            cv2.rectangle(image, (x1, top), (x1 + text_w + 2, top + text_h + baseline + 2), BOX_COLOR, -1)
+            cv2.putText(image, label, (x1 + 1, top + text_h + 1), cv2.FONT_HERSHEY_SIMPLEX,
+                        scale, TEXT_COLOR, thickness, cv2.LINE_AA)
+    return image
+
+class PreviewCache:
+    """
+    Thumbnails and annotated previews keyed by the frame's sha256.
+
+    The engine renders both from the frame it already decoded for detection,
+    so previews cost a resize and an encode, not another decode. Thumbnails
+    depend on the content only; annotated previews also on the backend that
+    produced the boxes. Keys are paths relative to the cache root and are
+    stored in the result entries ('thumbnail', 'preview'); since the content
+    behind a key never changes, the API can serve them as immutable.
+    """
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox", path: Optional[str] = None):
+        self.root = Path(path) if path else Path(inbox_path) / PREVIEW_DIR
+        self.generated = 0
+
+    def thumbnail_key(self, digest: str) -> str:
+        return f"{digest[:2]}/{digest}.thumb{_image_format()[0]}"
+
+    def preview_key(self, digest: str, backend: str) -> str:
+        backend = backend.replace(os.sep, '_')
+        return f"{digest[:2]}/{digest}.{backend}.preview{_image_format()[0]}"
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def _encode(self, key: str, image, quality: int):
+        import cv2
+
+        extension, quality_flag = _image_format()
+        ok, data = cv2.imencode(extension, image, [quality_flag, quality])
+        if not ok:
+            raise ValueError(f"Could not encode {key}")
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(str(path), data.tobytes(), durable=False)
+        self.generated += 1
+
+    def render(self, digest: str, backend: str, detections: List[Dict[str, Any]],
+               image=None, scale: float = 1.0, image_path: Optional[str] = None,
+               bbox_format: str = 'xyxy') -> Dict[str, str]:
+        """
+        Make sure the thumbnail and annotated preview of a frame exist; returns
+        their keys. image is the decoded frame (downscaled by scale, detections
+        are in original pixels); without one the frame is decoded from
+        image_path, but only when something is missing.
+        """
+        keys = {'thumbnail': self.thumbnail_key(digest), 'preview': self.preview_key(digest, backend)}
+        missing = [name for name, key in keys.items() if not self.path(key).exists()]
+        if not missing:
+            return keys
+        if image is None:
+            import cv2
+            image = cv2.imread(image_path) if image_path else None
+            scale = 1.0
+            if image is None:
+                raise ValueError(f"Could not load image {image_path}")
+
+        if 'thumbnail' in missing:
+            thumbnail, _ = _fit(image, THUMB_SIZE)
+            self._encode(keys['thumbnail'], thumbnail, THUMB_QUALITY)
+        if 'preview' in missing:
+            preview, factor = _fit(image, PREVIEW_SIZE)
+            if preview is image:
+                preview = image.copy()  # never draw on the frame the backend sees
+            self._encode(keys['preview'], annotate(preview, detections, factor * scale, bbox_format),
+                         PREVIEW_QUALITY)
+        return keys
+
+    def gc(self, blob_objects: Path) -> Dict[str, int]:
+        """Remove previews of frames that are no longer in the blob store"""
+        removed = freed = 0
+        for shard in self.root.glob('??'):
+            live = set()
+            try:
+                live = {name.split('.')[0] for name in os.listdir(blob_objects / shard.name)}
+            except FileNotFoundError:
+                pass
+            for entry in os.scandir(shard):
+                if entry.name.startswith('.') or entry.name.split('.')[0] in live:
+                    continue
+                try:
+                    size = entry.stat().st_size
+                    os.unlink(entry.path)
+                except OSError:
+                    continue
+                removed += 1
+                freed += size
+            try:
+                shard.rmdir()
+            except OSError:
+                pass
+        logger.info(f"🧹 Preview GC: removed {removed} files, freed {freed} bytes")
+        return {'removed': removed, 'freed_bytes': freed}
+
+def main():
+    """Command line: gc"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    inbox_path = "/srv/processing_inbox"
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if command == "gc":
+        from blob_store import BlobStore, blob_store_enabled
+        if not blob_store_enabled():
+            print("Previews are only collected together with the blob store")
+            return
+        print(json.dumps(PreviewCache(inbox_path).gc(BlobStore(inbox_path).objects), indent=2))
+    else:
+        print(main.__doc__)
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,8 @@ Process All FTP Images Script
 Processes all images in FTP directories with ALPR system
 """
 
-import os
 import sys
 import json
-import shutil
-import cv2
-import numpy as np
 from pathlib import Path
 from datetime import datetime
 import logging
@@ -18,6 +14,11 @@ import logging
 ALPR_PROJECT_PATH = "/home/rnd2/Desktop/radar_system_clean/Automatic-License-Plate-Recognition"
 sys.path.insert(0, ALPR_PROJECT_PATH)
 
+from atomic_write import FsyncBatch, atomic_write_json
+from alpr_engine import ProcessingEngine, image_results
+from blob_store import link_or_copy
+from case_walker import scan_case, walk_cases
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -27,110 +28,24 @@ def find_all_case_directories():
     processing_inbox = Path("/srv/processing_inbox")
     case_dirs = []
     
-    for case_dir in processing_inbox.rglob("case*"):
-        if case_dir.is_dir():
-            ai_folder = case_dir / "ai"
-            if ai_folder.exists():
-                case_dirs.append(case_dir)
+    for case in walk_cases(processing_inbox, camera_prefix=None, case_prefix="case"):
+        if case.has_ai_folder:
+            case_dirs.append(Path(case.path))
     
     return case_dirs
 
 def get_image_files(case_dir):
     """Get all image files in a case directory"""
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-    image_files = []
-    
-    for file_path in case_dir.iterdir():
-        if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-            image_files.append(file_path)
-    
-    return image_files
+    return [Path(img) for img in scan_case(case_dir).images]
 
-def simple_alpr_processing(image_path):
-    """Simple ALPR processing using OpenCV and basic techniques"""
-    try:
-        # Read image
-        image = cv2.imread(str(image_path))
-        if image is None:
-            return None
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply some basic preprocessing
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        edged = cv2.Canny(blurred, 50, 150)
-        
-        # Find contours
-        contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Filter contours that could be license plates
-        potential_plates = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 1000:  # Minimum area threshold
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / h
-                if 2.0 < aspect_ratio < 6.0:  # Typical license plate aspect ratio
-                    potential_plates.append({
-                        'bbox': [x, y, w, h],
-                        'area': area,
-                        'aspect_ratio': aspect_ratio,
-                        'confidence': min(area / 10000, 1.0)  # Simple confidence based on area
-                    })
-        
-        return {
-            'image_path': str(image_path),
-            'plates_detected': len(potential_plates),
-            'plates': potential_plates,
-            'processing_time': 0.1,
-            'status': 'success' if potential_plates else 'no_plates_detected'
-        }
-        
-    except Exception as e:
-        logger.error(f"Error processing {image_path}: {e}")
-        return {
-            'image_path': str(image_path),
-            'plates_detected': 0,
-            'plates': [],
-            'error': str(e),
-            'status': 'error'
-        }
+_engine = None
 
-def enhanced_alpr_processing(image_path):
-    """Enhanced ALPR processing using the AI system"""
-    try:
-        # Try to import and use the enhanced ALPR system
-        try:
-            from enhanced_dynamic_alpr_system import EnhancedDynamicALPRSystem
-            alpr_system = EnhancedDynamicALPRSystem()
-            result = alpr_system.process_image_comprehensively(str(image_path))
-            
-            if result and 'plates' in result:
-                return {
-                    'image_path': str(image_path),
-                    'plates_detected': len(result['plates']),
-                    'plates': result['plates'],
-                    'confidence_scores': [plate.get('confidence', 0) for plate in result['plates']],
-                    'processing_time': result.get('processing_time', 0),
-                    'status': 'success',
-                    'method': 'enhanced_alpr'
-                }
-            else:
-                return {
-                    'image_path': str(image_path),
-                    'plates_detected': 0,
-                    'plates': [],
-                    'status': 'no_plates_detected',
-                    'method': 'enhanced_alpr'
-                }
-        except ImportError:
-            logger.warning("Enhanced ALPR system not available, using simple processing")
-            return simple_alpr_processing(image_path)
-            
-    except Exception as e:
-        logger.error(f"Error in enhanced ALPR processing: {e}")
-        return simple_alpr_processing(image_path)
+def get_engine():
+    """Shared engine; EnhancedDynamicALPRSystem with OpenCV contour fallback"""
+    global _engine
+    if _engine is None:
+        _engine = ProcessingEngine('enhanced')
+    return _engine
 
 def process_case_directory(case_dir):
     """Process all images in a case directory"""
@@ -150,30 +65,33 @@ def process_case_directory(case_dir):
     
     logger.info(f"Found {len(image_files)} images to process")
     
+    # Run the shared engine (reuses a current result for this backend)
+    engine = get_engine()
+    engine_result = engine.process_case({
+        'camera_id': case_dir.parent.parent.name,
+        'date': case_dir.parent.name,
+        'case_id': case_dir.name,
+        'case_path': str(case_dir),
+        'images': [str(image_file) for image_file in image_files]
+    })
+    
     results = []
-    for i, image_file in enumerate(image_files, 1):
-        logger.info(f"Processing image {i}/{len(image_files)}: {image_file.name}")
-        
+    for result in image_results(engine_result):
+        image_file = Path(result['image_path'])
         try:
-            # Process with ALPR
-            result = enhanced_alpr_processing(image_file)
+            # Link processed image into the AI folder
+            processed_image = processed_folder / image_file.name
+            link_or_copy(image_file, processed_image)
             
-            if result:
-                # Copy processed image to AI folder
-                processed_image = processed_folder / image_file.name
-                shutil.copy2(image_file, processed_image)
-                
-                # Add metadata
-                result['original_path'] = str(image_file)
-                result['processed_path'] = str(processed_image)
-                result['processed_at'] = datetime.now().isoformat()
-                result['case_directory'] = str(case_dir)
-                
-                results.append(result)
-                
-                logger.info(f"Successfully processed: {image_file.name} - {result['plates_detected']} plates detected")
-            else:
-                logger.warning(f"Failed to process: {image_file.name}")
+            # Add metadata
+            result['original_path'] = str(image_file)
+            result['processed_path'] = str(processed_image)
+            result['processed_at'] = engine_result['processed_at']
+            result['case_directory'] = str(case_dir)
+            
+            results.append(result)
+            
+            logger.info(f"Successfully processed: {image_file.name} - {result['plates_detected']} plates detected")
                 
         except Exception as e:
             logger.error(f"Error processing {image_file}: {e}")
@@ -181,8 +99,7 @@ def process_case_directory(case_dir):
     
     # Save results
     results_file = results_folder / "alpr_results.json"
-    with open(results_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    atomic_write_json(results_file, results)
     
     # Create processing log
     log_data = {
@@ -193,12 +110,11 @@ def process_case_directory(case_dir):
         'failed_detections': len([r for r in results if r.get('status') == 'error']),
         'no_plates_detected': len([r for r in results if r.get('status') == 'no_plates_detected']),
         'total_plates_found': sum(r.get('plates_detected', 0) for r in results),
-        'processing_method': results[0].get('method', 'simple') if results else 'none'
+        'processing_method': engine_result['backend']
     }
     
     log_file = logs_folder / "processing_log.json"
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(log_data, f, indent=2, ensure_ascii=False)
+    atomic_write_json(log_file, log_data)
     
     logger.info(f"Saved {len(results)} results to {results_file}")
     logger.info(f"Processing summary: {log_data['total_plates_found']} plates found in {log_data['total_images']} images")
@@ -225,25 +141,26 @@ def main():
     total_plates = 0
     successful_cases = 0
     
-    for i, case_dir in enumerate(case_dirs, 1):
-        try:
-            logger.info(f"\n📂 Processing case {i}/{total_cases}: {case_dir}")
+    with FsyncBatch():  # group-commit result fsyncs across cases
+        for i, case_dir in enumerate(case_dirs, 1):
+            try:
+                logger.info(f"\n📂 Processing case {i}/{total_cases}: {case_dir}")
             
-            results = process_case_directory(case_dir)
+                results = process_case_directory(case_dir)
             
-            # Update counters
-            case_images = len(results)
-            case_plates = sum(r.get('plates_detected', 0) for r in results)
+                # Update counters
+                case_images = len(results)
+                case_plates = sum(r.get('plates_detected', 0) for r in results)
             
-            total_images += case_images
-            total_plates += case_plates
-            successful_cases += 1
+                total_images += case_images
+                total_plates += case_plates
+                successful_cases += 1
             
-            logger.info(f"✅ Completed case {i}/{total_cases}: {case_images} images, {case_plates} plates detected")
+                logger.info(f"✅ Completed case {i}/{total_cases}: {case_images} images, {case_plates} plates detected")
             
-        except Exception as e:
-            logger.error(f"❌ Error processing case {case_dir}: {e}")
-            continue
+            except Exception as e:
+                logger.error(f"❌ Error processing case {case_dir}: {e}")
+                continue
     
     logger.info(f"\n🎉 Processing Complete!")
     logger.info(f"📊 Final Summary:")
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Repeat Offender Detection for Radar System
+Sliding-window plate counts across cameras, fed from the AI change feed
+"""
+
+import os
+import sys
+import json
+import math
+import fcntl
+import base64
+import hashlib
+import logging
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from atomic_write import atomic_write_json
+from change_feed import ChangeFeed
+from plate_index import normalize_plate
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = '.ai_repeat_offenders.json'
+
+# Sliding window and flagging thresholds
+DEFAULT_WINDOW_DAYS = 7
+DEFAULT_MIN_CASES = 3
+DEFAULT_MIN_CAMERAS = 1
+
+# Per-day structure sizes (memory is bounded by window_days x these)
+SKETCH_WIDTH = 2048
+SKETCH_DEPTH = 4
+TOP_K = 512
+MAX_CAMERAS_PER_PLATE = 16
+# The seen filter is sized for this many cases a day at this false-positive rate;
+# a false positive drops a genuine sighting, the only way counts can undercount
+SEEN_FILTER_CAPACITY = 50000
+SEEN_FILTER_ERROR_RATE = 1e-4
+
+def _hashes(key: str, count: int, modulo: int) -> List[int]:
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * count).digest()
+    return [int.from_bytes(digest[i * 4:i * 4 + 4], 'little') % modulo for i in range(count)]
+
+def _pack(values: array) -> str:
+    return base64.b64encode(values.tobytes()).decode('ascii')
+
+def _unpack(typecode: str, text: str) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(text))
+    return values
+
+class CountMinSketch:
+    """Fixed-size frequency sketch; estimates never undercount what was added"""
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, counts: Optional[array] = None):
+        self.width = width
+        self.depth = depth
+        self.counts = counts if counts is not None else array('I', bytes(4 * width * depth))
+
+    def add(self, key: str, count: int = 1):
+        for row, column in enumerate(_hashes(key, self.depth, self.width)):
+            self.counts[row * self.width + column] += count
+
+    def estimate(self, key: str) -> int:
+        return min(self.counts[row * self.width + column]
+                   for row, column in enumerate(_hashes(key, self.depth, self.width)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'width': self.width, 'depth': self.depth, 'counts': _pack(self.counts)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CountMinSketch':
+        return cls(data['width'], data['depth'], _unpack('I', data['counts']))
+
+class SeenFilter:
+    """
+    Bloom filter of (case, plate) pairs so reprocessed cases count once.
+
+    Sized from the expected number of keys and the target false-positive
+    rate (m = -n ln p / ln(2)^2 bits, k = m/n ln 2 hashes); past its
+    capacity the error rate grows, so size it for the busiest day.
+    """
+
+    def __init__(self, capacity: int = SEEN_FILTER_CAPACITY, error_rate: float = SEEN_FILTER_ERROR_RATE,
+                 bits: Optional[int] = None, hashes: Optional[int] = None,
+                 data: Optional[bytearray] = None):
+        if bits is None:
+            bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2 / 8) * 8
+        self.bits = bits
+        # One blake2b digest yields at most 16 hashes
+        self.hashes = hashes or min(16, max(1, round(bits / capacity * math.log(2))))
+        self.data = data if data is not None else bytearray(bits // 8)
+
+    def _bits(self, key: str) -> List[int]:
+        return _hashes(key, self.hashes, self.bits)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.data[bit >> 3] & (1 << (bit & 7)) for bit in self._bits(key))
+
+    def add(self, key: str) -> bool:
+        """Insert key; False if it was (probably) present already"""
+        new = False
+        for bit in self._bits(key):
+            mask = 1 << (bit & 7)
+            if not self.data[bit >> 3] & mask:
+                self.data[bit >> 3] |= mask
+                new = True
+        return new
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'bits': self.bits, 'hashes': self.hashes,
+                'data': base64.b64encode(bytes(self.data)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SeenFilter':
+        # Checkpoints from before the filter was sized used 4 hashes
+        return cls(bits=data['bits'], hashes=data.get('hashes', 4),
+                   data=bytearray(base64.b64decode(data['data'])))
+
+class DayBucket:
+    """
+    One day of the window: a count-min sketch of every plate plus a
+    Space-Saving summary of the TOP_K most frequent plates with their cameras.
+    """
+
+    def __init__(self, day: str):
+        self.day = day
+        self.sketch = CountMinSketch()
+        self.seen = SeenFilter()
+        self.top: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, plate: str, camera_id: Optional[str], case_key: str) -> bool:
+        if not self.seen.add(f"{case_key}|{plate}"):
+            return False
+        self.sketch.add(plate)
+        entry = self.top.get(plate)
+        if entry is None:
+            if len(self.top) >= TOP_K:
+                # Space-Saving: replace the smallest counter, inheriting its count as error
+                victim = min(self.top, key=lambda p: self.top[p]['count'])
+                floor = self.top.pop(victim)['count']
+            else:
+                floor = 0
+            entry = self.top[plate] = {'count': floor, 'error': floor, 'cameras': []}
+        entry['count'] += 1
+        if camera_id and camera_id not in entry['cameras'] and len(entry['cameras']) < MAX_CAMERAS_PER_PLATE:
+            entry['cameras'].append(camera_id)
+        return True
+
+    def forget(self, plate: str, case_key: str) -> bool:
+        """Take back a counted sighting of a case that was removed"""
+        if f"{case_key}|{plate}" not in self.seen or self.sketch.estimate(plate) == 0:
+            return False
+        self.sketch.add(plate, -1)
+        entry = self.top.get(plate)
+        if entry is not None:
+            entry['count'] -= 1
+            if entry['count'] <= 0:
+                del self.top[plate]
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'day': self.day, 'sketch': self.sketch.to_dict(), 'seen': self.seen.to_dict(), 'top': self.top}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DayBucket':
+        bucket = cls(data['day'])
+        bucket.sketch = CountMinSketch.from_dict(data['sketch'])
+        bucket.seen = SeenFilter.from_dict(data['seen'])
+        bucket.top = data['top']
+        return bucket
+
+def _record_day(record: Dict[str, Any]) -> Optional[str]:
+    for value in (record.get('date'), (record.get('ts') or '')[:10]):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+class RepeatOffenderDetector:
+    """
+    Streaming repeat-offender detection over the AI change feed.
+
+    Plates are counted per day in bounded structures; a plate is flagged
+    when its count over the last window_days (across all cameras) reaches
+    min_cases. The buckets and the feed position are checkpointed together,
+    so a restart resumes exactly where the last checkpoint left off.
+    """
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox",
+                 window_days: int = DEFAULT_WINDOW_DAYS,
+                 min_cases: int = DEFAULT_MIN_CASES,
+                 min_cameras: int = DEFAULT_MIN_CAMERAS,
+                 change_feed: Optional[ChangeFeed] = None):
+        self.inbox_path = Path(inbox_path)
+        self.window_days = window_days
+        self.min_cases = min_cases
+        self.min_cameras = min_cameras
+        self.change_feed = change_feed or ChangeFeed(str(self.inbox_path))
+        self.checkpoint_path = self.inbox_path / CHECKPOINT_FILE
+        self.buckets: Dict[str, DayBucket] = {}
+        self.position = {'seq': 0, 'offset': 0}
+        self._loaded: Optional[tuple] = None
+        self.load()
+
+    @contextmanager
+    def _locked(self):
+        """Serialize checkpoint updates between the service and the CLI"""
+        self.inbox_path.mkdir(parents=True, exist_ok=True)
+        with open(f"{self.checkpoint_path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _checkpoint_stamp(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.checkpoint_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def load(self):
+        stamp = self._checkpoint_stamp()
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable repeat-offender checkpoint: {e}")
+            return
+        self._loaded = stamp
+        self.position = data.get('position', self.position)
+        self.buckets = {b['day']: DayBucket.from_dict(b) for b in data.get('buckets', [])}
+
+    def checkpoint(self):
+        atomic_write_json(self.checkpoint_path, {
+            'position': self.position,
+            'window_days': self.window_days,
+            'buckets': [bucket.to_dict() for _, bucket in sorted(self.buckets.items())],
+            'saved_at': datetime.now().isoformat()
+        }, indent=None, batch=False)
+        self._loaded = self._checkpoint_stamp()
+
+    def _latest_day(self) -> Optional[str]:
+        return max(self.buckets) if self.buckets else None
+
+    def _expire(self):
+        latest = self._latest_day()
+        if latest is None:
+            return
+        cutoff = (date.fromisoformat(latest) - timedelta(days=self.window_days - 1)).isoformat()
+        for day in [d for d in self.buckets if d < cutoff]:
+            del self.buckets[day]
+
+    def add(self, plate: Optional[str], day: str, camera_id: Optional[str] = None,
+            case_key: str = '') -> Optional[Dict[str, Any]]:
+        """Count one sighting; returns the flagged entry when it just crossed the threshold"""
+        plate = normalize_plate(plate)
+        if not plate:
+            return None
+        latest = self._latest_day()
+        if latest and day <= (date.fromisoformat(latest) - timedelta(days=self.window_days)).isoformat():
+            return None  # older than the window
+        bucket = self.buckets.get(day)
+        if bucket is None:
+            bucket = self.buckets[day] = DayBucket(day)
+            self._expire()
+        if not bucket.add(plate, camera_id, case_key or f"{camera_id}|{day}"):
+            return None
+        if self.estimate(plate) == self.min_cases:
+            entry = self.plate_summary(plate)
+            if len(entry['cameras']) >= self.min_cameras:
+                logger.warning(f"🚩 Repeat offender {plate}: {entry['count']} cases in "
+                               f"{self.window_days} days on {', '.join(entry['cameras'])}")
+                return entry
+        return None
+
+    def forget(self, plate: Optional[str], day: str, case_key: str):
+        """Uncount a sighting whose case was removed while still in the window"""
+        plate = normalize_plate(plate)
+        bucket = self.buckets.get(day)
+        if plate and bucket is not None:
+            bucket.forget(plate, case_key)
+
+    def apply(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply one change feed record"""
+        day = _record_day(record)
+        if not day:
+            return None
+        if record.get('removed'):
+            self.forget(record.get('plate'), day, record.get('case_path') or '')
+            return None
+        return self.add(record.get('plate'), day, record.get('camera_id'), record.get('case_path') or '')
+
+    def sync(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Consume new change feed records; returns plates that became flagged"""
+        alerts = []
+        with self._locked():
+            # Another process (service or CLI) may have checkpointed further since
+            if self._checkpoint_stamp() != self._loaded:
+                self.load()
+            records = self.change_feed.read(self.position['seq'], self.position['offset'], limit)
+            for record in records:
+                alert = self.apply(record)
+                if alert:
+                    alerts.append(alert)
+            if records:
+                last = records[-1]
+                self.position = {'seq': last['seq'], 'offset': last['_next_offset']}
+                self.checkpoint()
+        return alerts
+
+    def estimate(self, plate: str) -> int:
+        """
+        Cases for a plate over the window. May overcount (sketch collisions);
+        undercounts only when the seen filter mistakes a new case for a
+        repeat, at about SEEN_FILTER_ERROR_RATE per sighting.
+        """
+        plate = normalize_plate(plate)
+        return sum(bucket.sketch.estimate(plate) for bucket in self.buckets.values())
+
+    def plate_summary(self, plate: str) -> Dict[str, Any]:
+        plate = normalize_plate(plate)
+        cameras, days = [], []
+        for day, bucket in sorted(self.buckets.items()):
+            entry = bucket.top.get(plate)
+            if entry:
+                days.append(day)
+                cameras.extend(c for c in entry['cameras'] if c not in cameras)
+        return {
+            'plate': plate,
+            'count': self.estimate(plate),
+            'cameras': cameras,
+            'first_seen': days[0] if days else None,
+            'last_seen': days[-1] if days else None
+        }
+
+    def flagged(self) -> List[Dict[str, Any]]:
+        """Plates at or above the thresholds in the current window"""
+        candidates = {plate for bucket in self.buckets.values() for plate in bucket.top}
+        flagged = []
+        for plate in candidates:
+            if self.estimate(plate) < self.min_cases:
+                continue
+            entry = self.plate_summary(plate)
+            if len(entry['cameras']) >= self.min_cameras:
+                flagged.append(entry)
+        flagged.sort(key=lambda e: (-e['count'], e['plate']))
+        return flagged
+
+def main():
+    """Command line: sync | flagged | plate <text>"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    detector = RepeatOffenderDetector()
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if command == "sync":
+        print(json.dumps(detector.sync(), ensure_ascii=False))
+    elif command == "flagged":
+        detector.sync()
+        print(json.dumps(detector.flagged(), ensure_ascii=False))
+    elif command == "plate" and len(sys.argv) > 2:
+        detector.sync()
+        print(json.dumps(detector.plate_summary(sys.argv[2]), ensure_ascii=False))
+    else:
+        print("Usage: python repeat_offenders.py [sync|flagged|plate <text>]")
+
+if __name__ == "__main__":
+    main()
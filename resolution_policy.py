@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Adaptive Resolution Policy for Radar System
+Per-camera downscale factors learned from the plate heights the cameras produce
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from atomic_write import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+RESOLUTION_FILE = '.ai_resolution.json'
+
+# Smallest plate height (px, in the processed frame) the OCR still reads reliably;
+# the recognizer resizes crops to 64 px high, below ~20 px characters merge
+MIN_PLATE_HEIGHT = int(os.environ.get('ALPR_MIN_PLATE_HEIGHT', '24'))
+
+# Downscale factors to choose from (1/2 and 1/4 also decode faster from JPEG)
+SCALES = (1.0, 0.5, 0.25)
+
+# Plate heights kept per camera (original-resolution pixels)
+HISTORY_SIZE = 256
+# No downscaling until a camera has this many OCR-confirmed plates
+MIN_SAMPLES = 30
+# Plates at this percentile of the history must stay legible after downscaling
+HEIGHT_PERCENTILE = 0.05
+# Re-evaluate a camera's factor after this many new samples
+REEVALUATE_EVERY = 25
+# Every PROBE_EVERY-th frame of a downscaled camera is processed at full resolution
+PROBE_EVERY = 50
+# Minimum seconds between profile writes
+SAVE_INTERVAL = 30.0
+
+def plate_height(detection: Dict[str, Any], bbox_format: str = 'xyxy') -> Optional[float]:
+    """Height of a detection's box in pixels"""
+    bbox = detection.get('bbox')
+    if not bbox or len(bbox) < 4:
+        return None
+    height = bbox[3] if bbox_format == 'xywh' else bbox[3] - bbox[1]
+    return float(height) if height > 0 else None
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class CameraProfile:
+    """Recent plate heights and the current downscale factor of one camera"""
+
+    def __init__(self, heights: Iterable[float] = (), scale: float = 1.0):
+        self.heights = deque(heights, maxlen=HISTORY_SIZE)
+        self.scale = scale
+        self.since_evaluation = 0
+        self.frames = 0
+        self.probes = 0
+        self.fallbacks = 0
+
+    def choose_scale(self) -> float:
+        """Smallest factor that keeps the low-percentile plate at MIN_PLATE_HEIGHT"""
+        if len(self.heights) < MIN_SAMPLES:
+            return 1.0
+        low = _percentile(list(self.heights), HEIGHT_PERCENTILE)
+        return min((s for s in SCALES if low * s >= MIN_PLATE_HEIGHT), default=1.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'scale': self.scale, 'heights': [round(h, 1) for h in self.heights],
+                'probes': self.probes, 'fallbacks': self.fallbacks}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CameraProfile':
+        profile = cls(data.get('heights', []), data.get('scale', 1.0))
+        if profile.scale not in SCALES:
+            profile.scale = profile.choose_scale()
+        profile.probes = data.get('probes', 0)
+        profile.fallbacks = data.get('fallbacks', 0)
+        return profile
+
+class ResolutionPolicy:
+    """
+    Chooses the processing resolution per camera.
+
+    Heights of OCR-confirmed plates (mapped back to original pixels) are
+    recorded per camera, and the smallest factor in SCALES that keeps the
+    HEIGHT_PERCENTILE plate at MIN_PLATE_HEIGHT or more is used. Factors are
+    re-evaluated every REEVALUATE_EVERY samples. Plates that only fit at full
+    resolution would be missed at a smaller one and so never enter the history.
+    To catch that, every PROBE_EVERY-th frame of a downscaled camera runs at
+    full resolution. A probe plate too small for the current factor sends the
+    camera straight back to full resolution.
+    """
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox", path: Optional[str] = None):
+        self.path = Path(path) if path else Path(inbox_path) / RESOLUTION_FILE
+        self.cameras: Dict[str, CameraProfile] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        # Cameras recorded by this process; only these overwrite the file's entries on save
+        self._touched = set()
+        self._last_save = time.monotonic()
+        self.load()
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('cameras', {})
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable resolution profile: {e}")
+            return {}
+
+    def load(self):
+        self.cameras = {camera: CameraProfile.from_dict(profile)
+                        for camera, profile in self._read().items()}
+
+    def save(self, force: bool = False):
+        """
+        Persist the profiles (at most every SAVE_INTERVAL seconds unless forced).
+        Cameras this process has not recorded keep what is on disk, so several
+        sharded nodes can share the file.
+        """
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_save < SAVE_INTERVAL):
+                return
+        on_disk = self._read()
+        with self._lock:
+            cameras = {camera: profile for camera, profile in on_disk.items() if camera not in self._touched}
+            cameras.update((camera, self.cameras[camera].to_dict()) for camera in self._touched
+                           if camera in self.cameras)
+            data = {'cameras': dict(sorted(cameras.items())),
+                    'min_plate_height': MIN_PLATE_HEIGHT,
+                    'saved_at': datetime.now().isoformat()}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(self.path, data, indent=None, batch=False)
+        except OSError as e:
+            logger.warning(f"Could not save resolution profile: {e}")
+
+    def scale_for(self, camera_id: Optional[str]) -> float:
+        """Factor to process the next frame of this camera at"""
+        if not camera_id:
+            return 1.0
+        with self._lock:
+            profile = self.cameras.get(camera_id)
+            if profile is None or profile.scale >= 1.0:
+                return 1.0
+            profile.frames += 1
+            if profile.frames % PROBE_EVERY == 0:
+                profile.probes += 1
+                return 1.0
+            return profile.scale
+
+    def record(self, camera_id: Optional[str], heights: List[float], scale: float = 1.0):
+        """Add plate heights (original pixels) seen on a frame processed at scale"""
+        if not camera_id or not heights:
+            return
+        with self._lock:
+            profile = self.cameras.setdefault(camera_id, CameraProfile())
+            profile.heights.extend(heights)
+            profile.since_evaluation += len(heights)
+            self._touched.add(camera_id)
+            self._dirty = True
+
+            if scale >= 1.0 and profile.scale < 1.0 and min(heights) * profile.scale < MIN_PLATE_HEIGHT:
+                # A full-resolution frame found a plate the current factor would lose
+                profile.fallbacks += 1
+                self._set_scale(camera_id, profile, 1.0, f"{min(heights):.0f} px plate on a full-resolution frame")
+                return
+
+            if profile.since_evaluation >= REEVALUATE_EVERY:
+                self._set_scale(camera_id, profile, profile.choose_scale(),
+                                f"p{int(HEIGHT_PERCENTILE * 100)} plate height "
+                                f"{_percentile(list(profile.heights), HEIGHT_PERCENTILE):.0f} px")
+
+    def _set_scale(self, camera_id: str, profile: CameraProfile, scale: float, reason: str):
+        profile.since_evaluation = 0
+        if scale != profile.scale:
+            logger.info(f"📐 Camera {camera_id}: processing at {scale:g}x (was {profile.scale:g}x, {reason})")
+            profile.scale = scale
+
+    def reset(self, camera_id: Optional[str] = None):
+        """Forget the history of one camera (or all) so it is learned again at full resolution"""
+        with self._lock:
+            if camera_id is None:
+                self._touched.update(self.cameras)
+                self._touched.update(self._read())
+                self.cameras.clear()
+            else:
+                self.cameras.pop(camera_id, None)
+                self._touched.add(camera_id)
+            self._dirty = True
+        self.save(force=True)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            cameras = {}
+            for camera, profile in sorted(self.cameras.items()):
+                heights = list(profile.heights)
+                cameras[camera] = {
+                    'scale': profile.scale,
+                    'samples': len(heights),
+                    'low_height': round(_percentile(heights, HEIGHT_PERCENTILE), 1) if heights else None,
+                    'median_height': round(_percentile(heights, 0.5), 1) if heights else None,
+                    'probes': profile.probes,
+                    'fallbacks': profile.fallbacks
+                }
+        return {'min_plate_height': MIN_PLATE_HEIGHT, 'scales': list(SCALES), 'cameras': cameras}
+
+def main():
+    """Command line: status | reset [camera]"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    policy = ResolutionPolicy()
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if command == "status":
+        print(json.dumps(policy.summary(), indent=2))
+    elif command == "reset":
+        policy.reset(sys.argv[2] if len(sys.argv) > 2 else None)
+        print(json.dumps(policy.summary(), indent=2))
+    else:
+        print("Usage: python resolution_policy.py [status|reset [camera]]")
+
+if __name__ == "__main__":
+    main()
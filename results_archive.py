@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+AI Results Archive for Radar System
+Columnar per-camera/month archive of closed days for historical analytics
+"""
+
+import io
+import os
+import sys
+import json
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from atomic_write import FsyncBatch, atomic_write_bytes, atomic_write_json
+from case_walker import walk_cases
+from day_pack import DayPack, iter_packs
+
+logger = logging.getLogger(__name__)
+
+# Archive lives in <inbox>/.ai_archive/<camera>/<YYYY-MM>.npy (+ .json manifest)
+ARCHIVE_DIR = '.ai_archive'
+
+# One row per case; the camera and month are implied by the file
+ARCHIVE_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('case_id', 'U96'),
+    ('plate', 'U16'),
+    ('confidence', 'f4'),
+    ('detection_count', 'u2'),
+    ('image_count', 'u2'),
+    ('processed_at', 'datetime64[s]'),
+    ('source', 'U16')
+])
+
+# Per-case result files in order of preference
+RESULT_SOURCES = (
+    ('ai.json', 'ai_json'),
+    ('results/alpr_results.json', 'alpr_results'),
+)
+
+def _parse_day(name: str) -> Optional[date]:
+    try:
+        return datetime.strptime(name, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def _parse_timestamp(value: Any) -> np.datetime64:
+    try:
+        return np.datetime64(datetime.fromisoformat(str(value)).replace(tzinfo=None), 's')
+    except (TypeError, ValueError):
+        return np.datetime64('NaT', 's')
+
+def _plate_text(detection: Dict[str, Any]) -> Optional[str]:
+    # Canonical engine detections use 'plate'; older writers used other keys
+    return detection.get('plate') or detection.get('plate_text') or detection.get('detected_characters')
+
+def summarize_result(data: Any, source: str) -> Optional[Dict[str, Any]]:
+    """Reduce an ai.json or legacy alpr_results.json to one archive row"""
+    if source == 'ai_json' and isinstance(data, dict):
+        return {
+            'plate': data.get('plate_number') or '',
+            'confidence': float(data.get('confidence') or 0.0),
+            'detection_count': len(data.get('detections', [])),
+            'image_count': int(data.get('total_images') or len(data.get('images', []))),
+            'processed_at': data.get('processed_at')
+        }
+    if source == 'alpr_results' and isinstance(data, list):
+        plates = [plate for item in data for plate in item.get('plates', [])]
+        best = max(plates, key=lambda p: p.get('confidence') or 0.0, default=None)
+        return {
+            'plate': (_plate_text(best) or '') if best else '',
+            'confidence': float(best.get('confidence') or 0.0) if best else 0.0,
+            'detection_count': len(plates),
+            'image_count': len(data),
+            'processed_at': max((item.get('processed_at') or '' for item in data), default=None)
+        }
+    return None
+
+def _load_row(read, label: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Summary row from the first usable result; read(relative) returns its bytes"""
+    for relative, source in RESULT_SOURCES:
+        try:
+            data = json.loads(read(relative))
+        except (FileNotFoundError, KeyError):
+            continue
+        except ValueError as e:
+            logger.warning(f"Skipping unreadable result {label}/{relative}: {e}")
+            continue
+        row = summarize_result(data, source)
+        if row is not None:
+            return row, source
+    return None
+
+def load_case_row(ai_path: str, ai_files: Tuple[str, ...] = ()) -> Optional[Tuple[Dict[str, Any], str]]:
+    """Summary row and source for a case's ai/ folder, or None if unprocessed"""
+    def read(relative: str) -> bytes:
+        if ai_files and relative.split('/')[0] not in ai_files:
+            raise FileNotFoundError(relative)
+        with open(os.path.join(ai_path, relative), 'rb') as f:
+            return f.read()
+    return _load_row(read, ai_path)
+
+def load_packed_case_row(pack: DayPack, case_id: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    """load_case_row for a case inside a day pack"""
+    return _load_row(lambda relative: pack.read(f"{case_id}/ai/{relative}"), f"{pack.path}:{case_id}")
+
+class ResultsArchive:
+    """
+    Columnar archive of AI results for days that are closed.
+
+    Each camera-month is a NumPy structured array saved as .npy, so queries
+    memory-map only the columns they touch instead of opening every case's
+    JSON. A JSON manifest next to each file records which days it covers.
+    """
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox", archive_dir: Optional[str] = None):
+        self.inbox_path = Path(inbox_path)
+        self.archive_dir = Path(archive_dir) if archive_dir else self.inbox_path / ARCHIVE_DIR
+
+    def _month_path(self, camera_id: str, month: str) -> Path:
+        return self.archive_dir / camera_id / f"{month}.npy"
+
+    def _manifest_path(self, camera_id: str, month: str) -> Path:
+        return self.archive_dir / camera_id / f"{month}.json"
+
+    def manifest(self, camera_id: str, month: str) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path(camera_id, month), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'days': [], 'rows': 0}
+
+    # -- compaction --------------------------------------------------------
+
+    def closed_days(self, today: Optional[date] = None) -> Dict[Tuple[str, str], List[str]]:
+        """{(camera_id, 'YYYY-MM'): ['YYYY-MM-DD', ...]} for days before today"""
+        today = today or date.today()
+        months: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        if not self.inbox_path.exists():
+            return months
+        with os.scandir(self.inbox_path) as cameras:
+            for camera in cameras:
+                if camera.name.startswith('.') or not camera.is_dir():
+                    continue
+                with os.scandir(camera.path) as days:
+                    for day in days:
+                        parsed = _parse_day(day.name)
+                        if parsed and parsed < today and day.is_dir():
+                            months[(camera.name, day.name[:7])].append(day.name)
+        # Packed days (day_pack.py) no longer have a directory
+        for camera_id, day, _ in iter_packs(str(self.inbox_path)):
+            parsed = _parse_day(day)
+            if parsed and parsed < today and day not in months[(camera_id, day[:7])]:
+                months[(camera_id, day[:7])].append(day)
+        for day_names in months.values():
+            day_names.sort()
+        return months
+
+    def build_month(self, camera_id: str, days: List[str]) -> np.ndarray:
+        """Read the per-case results of the given days (directories or packs) into one array"""
+        rows = []
+
+        def add(day: str, case_id: str, loaded: Optional[Tuple[Dict[str, Any], str]]):
+            if loaded is None:
+                return
+            row, source = loaded
+            rows.append((np.datetime64(day, 'D'), case_id, row['plate'][:16],
+                         row['confidence'], min(row['detection_count'], 0xFFFF),
+                         min(row['image_count'], 0xFFFF), _parse_timestamp(row['processed_at']),
+                         source))
+
+        packs = {day: path for _, day, path in iter_packs(str(self.inbox_path), camera_filter=camera_id)}
+        for day in days:
+            seen = set()
+            for case in walk_cases(self.inbox_path, camera_filter=camera_id, date_filter=day,
+                                   camera_prefix=None, scan_ai=True):
+                if not case.has_ai_folder:
+                    continue
+                seen.add(case.case_id)
+                add(day, case.case_id, load_case_row(case.ai_path, case.ai_files))
+            if day in packs:
+                try:
+                    with DayPack(packs[day]) as pack:
+                        for case_id in pack.cases():
+                            if case_id not in seen:
+                                add(day, case_id, load_packed_case_row(pack, case_id))
+                except (OSError, ValueError) as e:
+                    logger.error(f"❌ Could not read day pack {packs[day]}: {e}")
+        array = np.array(rows, dtype=ARCHIVE_DTYPE)
+        array.sort(order=['date', 'case_id'])
+        return array
+
+    def compact(self, force: bool = False, today: Optional[date] = None) -> Dict[str, int]:
+        """
+        Roll closed days into their camera-month files.
+
+        A month is rebuilt only when it has closed days the manifest does not
+        list yet (or force=True); the per-case files are left untouched.
+        """
+        summary = {'months_written': 0, 'months_current': 0, 'rows': 0}
+        with FsyncBatch():
+            for (camera_id, month), days in sorted(self.closed_days(today).items()):
+                if not force and set(days) <= set(self.manifest(camera_id, month)['days']):
+                    summary['months_current'] += 1
+                    continue
+                array = self.build_month(camera_id, days)
+                self.write_month(camera_id, month, array, days)
+                summary['months_written'] += 1
+                summary['rows'] += len(array)
+                logger.info(f"Archived {camera_id} {month}: {len(array)} cases from {len(days)} days")
+        return summary
+
+    def write_month(self, camera_id: str, month: str, array: np.ndarray, days: List[str]):
+        path = self._month_path(camera_id, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        atomic_write_bytes(path, buffer.getvalue())
+        # Manifest last, so a crash in between just rebuilds the month next time
+        atomic_write_json(self._manifest_path(camera_id, month), {
+            'camera_id': camera_id,
+            'month': month,
+            'days': days,
+            'rows': len(array),
+            'built_at': datetime.now().isoformat()
+        })
+
+    # -- queries -----------------------------------------------------------
+
+    def months(self, camera_filter: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Archived (camera_id, month) pairs"""
+        found = []
+        if not self.archive_dir.exists():
+            return found
+        with os.scandir(self.archive_dir) as cameras:
+            for camera in cameras:
+                if not camera.is_dir() or (camera_filter and camera.name != camera_filter):
+                    continue
+                with os.scandir(camera.path) as files:
+                    found.extend((camera.name, f.name[:-4]) for f in files
+                                 if f.name.endswith('.npy') and not f.name.startswith('.'))
+        return sorted(found)
+
+    def load(self, camera_id: str, month: str) -> np.ndarray:
+        """Memory-mapped camera-month array (read-only)"""
+        return np.load(self._month_path(camera_id, month), mmap_mode='r', allow_pickle=False)
+
+    def iter_months(self, camera_filter: Optional[str] = None, start: Optional[str] = None,
+                    end: Optional[str] = None) -> Iterator[Tuple[str, np.ndarray]]:
+        """(camera_id, rows) per archived month, filtered to start <= date <= end"""
+        for camera_id, month in self.months(camera_filter):
+            if (start and month < start[:7]) or (end and month > end[:7]):
+                continue
+            array = self.load(camera_id, month)
+            if start or end:
+                mask = np.ones(len(array), dtype=bool)
+                if start:
+                    mask &= array['date'] >= np.datetime64(start, 'D')
+                if end:
+                    mask &= array['date'] <= np.datetime64(end, 'D')
+                array = array[mask]
+            yield camera_id, array
+
+    def plate_counts(self, camera_filter: Optional[str] = None, start: Optional[str] = None,
+                     end: Optional[str] = None, min_confidence: float = 0.0) -> Dict[str, int]:
+        """Number of cases per plate"""
+        totals: Dict[str, int] = defaultdict(int)
+        for _, array in self.iter_months(camera_filter, start, end):
+            plates = array['plate'][(array['plate'] != '') & (array['confidence'] >= min_confidence)]
+            values, counts = np.unique(plates, return_counts=True)
+            for plate, count in zip(values.tolist(), counts.tolist()):
+                totals[plate] += count
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def repeat_offenders(self, min_cases: int = 2, **filters: Any) -> Dict[str, int]:
+        """Plates seen in at least min_cases cases"""
+        return {plate: count for plate, count in self.plate_counts(**filters).items() if count >= min_cases}
+
+    def confidence_histogram(self, bins: int = 10, camera_filter: Optional[str] = None,
+                             start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, List[float]]:
+        """Histogram of case confidence over [0, 1]"""
+        counts = np.zeros(bins, dtype=np.int64)
+        edges = np.linspace(0.0, 1.0, bins + 1)
+        for _, array in self.iter_months(camera_filter, start, end):
+            counts += np.histogram(array['confidence'], bins=edges)[0]
+        return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+    def camera_summary(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Per-camera case count, plate detections and average confidence"""
+        summary: Dict[str, Dict[str, Any]] = {}
+        for camera_id, array in self.iter_months(None, start, end):
+            entry = summary.setdefault(camera_id, {'count': 0, 'plate_detections': 0, 'confidence_sum': 0.0})
+            entry['count'] += len(array)
+            entry['plate_detections'] += int(np.count_nonzero(array['plate'] != ''))
+            entry['confidence_sum'] += float(array['confidence'].sum(dtype=np.float64))
+        for entry in summary.values():
+            entry['average_confidence'] = entry.pop('confidence_sum') / entry['count'] if entry['count'] else 0.0
+        return summary
+
+def main():
+    """Command line: compact [--force] | plates | repeat [N] | confidence | cameras"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    archive = ResultsArchive()
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if command == "compact":
+        print(json.dumps(archive.compact(force='--force' in sys.argv)))
+    elif command == "plates":
+        print(json.dumps(archive.plate_counts(), ensure_ascii=False))
+    elif command == "repeat":
+        min_cases = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+        print(json.dumps(archive.repeat_offenders(min_cases), ensure_ascii=False))
+    elif command == "confidence":
+        print(json.dumps(archive.confidence_histogram()))
+    elif command == "cameras":
+        print(json.dumps(archive.camera_summary()))
+    else:
+        print("Usage: python results_archive.py [compact [--force]|plates|repeat [N]|confidence|cameras]")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""
+Inbox Retention for Radar System
+Moves closed days of processing_inbox to a compressed archive tier and prunes derived artifacts
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import tarfile
+import logging
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ai_stats import STATS_FILE, StatsAggregator, case_contribution
+from atomic_write import atomic_write_json
+from case_walker import AI_FOLDER, IMAGE_EXTENSIONS, VERDICT_FILE, scan_case, walk_cases
+from change_feed import ChangeFeed
+from day_pack import DayPack, iter_packs, pack_path, remove_cases
+from plate_index import PLATE_INDEX_FILE, PlateIndex, result_plates
+from repeat_offenders import DEFAULT_WINDOW_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Policy overrides (<inbox>/.ai_retention.json) and the archive tier (<inbox>/.ai_cold/<camera>/)
+RETENTION_FILE = '.ai_retention.json'
+COLD_DIR = '.ai_cold'
+
+VIOLATION = 'violation'
+COMPLIANT = 'compliant'
+
+DEFAULT_POLICY = {
+    # Days after its date a case stays in the hot tree before it is archived
+    'hot_days': {VIOLATION: 30, COMPLIANT: 7},
+    # Days after its date an archived case is kept; null keeps it, 0 deletes without archiving
+    'archive_days': {VIOLATION: None, COMPLIANT: 90},
+    # Days the ai/ image copies are kept in the hot tree; null keeps them. The result
+    # files and viewers refer to them, so pruned copies are relinked on restore
+    # (restore_derived) and the APIs fall back to the originals meanwhile
+    'derived_days': None,
+}
+
+# Result files that mark a case as processed (it may then leave the hot tree)
+RESULT_FILES = ('ai_detection_results.json', 'ai.json')
+
+# Uncompressed bytes per compressed frame; reading one member decompresses only its frames
+FRAME_SIZE = 1024 * 1024
+
+def _parse_day(name: str) -> Optional[date]:
+    try:
+        return datetime.strptime(name, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def case_outcome(case_path: str) -> str:
+    """violation or compliant from verdict.json; unreadable verdicts count as violations"""
+    try:
+        with open(os.path.join(case_path, VERDICT_FILE), 'r', encoding='utf-8') as f:
+            decision = json.load(f).get('decision')
+    except (OSError, ValueError, AttributeError):
+        return VIOLATION
+    return VIOLATION if decision in (None, VIOLATION) else COMPLIANT
+
+def packed_case_outcome(pack: DayPack, case_id: str) -> str:
+    """case_outcome() for a case inside a day pack"""
+    try:
+        decision = json.loads(pack.read(f"{case_id}/{VERDICT_FILE}")).get('decision')
+    except (KeyError, ValueError, AttributeError):
+        return VIOLATION
+    return VIOLATION if decision in (None, VIOLATION) else COMPLIANT
+
+class RetentionPolicy:
+    """DEFAULT_POLICY merged with the 'default' and per-camera sections of the policy file"""
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox", path: Optional[str] = None):
+        self.path = Path(path) if path else Path(inbox_path) / RETENTION_FILE
+        self.default = dict(DEFAULT_POLICY)
+        self.cameras: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable retention policy: {e}")
+            return
+        self.default = self._merge(self.default, data.get('default', {}))
+        self.cameras = data.get('cameras', {})
+
+    @staticmethod
+    def _merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+        merged = dict(base)
+        for key, value in override.items():
+            merged[key] = {**base[key], **value} if isinstance(base.get(key), dict) else value
+        return merged
+
+    def for_camera(self, camera_id: str) -> Dict[str, Any]:
+        return self._merge(self.default, self.cameras.get(camera_id, {}))
+
+# ---------------------------------------------------------------------------
+# Archive tier: tar, compressed in independent frames, with a member index
+# ---------------------------------------------------------------------------
+
+def _codec() -> str:
+    try:
+        import zstandard  # noqa: F401
+        return 'zstd'
+    except ImportError:
+        return 'gzip'
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    import zlib
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # one gzip member
+    return compressor.compress(data) + compressor.flush()
+
+def _open_stream(path, codec: str):
+    """Sequential reader over all frames of an archive"""
+    f = open(path, 'rb')
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=True)
+    import gzip
+    return gzip.GzipFile(fileobj=f, mode='rb')
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    import zlib
+    return zlib.decompress(data, 31)
+
+class _FrameWriter(io.RawIOBase):
+    """
+    File object for tarfile that compresses its output in independent
+    frames (zstd frames / gzip members). Concatenated frames are still one
+    valid .tar.zst / .tar.gz, and a frame can be decompressed on its own.
+    """
+
+    def __init__(self, f, codec: str):
+        self.f = f
+        self.codec = codec
+        self.buffer = bytearray()
+        self.position = 0          # uncompressed bytes written
+        self.frames: List[List[int]] = []   # [uncompressed offset, compressed offset, compressed length]
+        self._frame_start = 0
+        self._compressed = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def end_frame(self, force: bool = False):
+        """Close the current frame once it is FRAME_SIZE or more (at a member boundary)"""
+        if not self.buffer or (not force and len(self.buffer) < FRAME_SIZE):
+            return
+        compressed = _compress(self.codec, bytes(self.buffer))
+        self.f.write(compressed)
+        self.frames.append([self._frame_start, self._compressed, len(compressed)])
+        self._frame_start = self.position
+        self._compressed += len(compressed)
+        self.buffer.clear()
+
+def _padded(size: int) -> int:
+    return (size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+
+class ColdArchive:
+    """
+    <inbox>/.ai_cold/<camera>/<date>-<outcome>.tar.<zst|gz> plus an .idx.json
+    listing every member's offset and size in the uncompressed tar and the
+    frames it was compressed in. A single member is read by decompressing
+    only the frames that hold it; the whole file still extracts with tar.
+    """
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox", path: Optional[str] = None):
+        self.inbox_path = inbox_path
+        self.root = Path(path) if path else Path(inbox_path) / COLD_DIR
+
+    def _base(self, camera_id: str, day: str, outcome: str) -> Path:
+        return self.root / camera_id / f"{day}-{outcome}"
+
+    def index_path(self, camera_id: str, day: str, outcome: str) -> Path:
+        return self._base(camera_id, day, outcome).with_suffix('.idx.json')
+
+    def index(self, camera_id: str, day: str, outcome: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.index_path(camera_id, day, outcome), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def archives(self, camera_filter: Optional[str] = None) -> Iterator[Tuple[str, str, str]]:
+        """(camera, day, outcome) of every archive"""
+        for index_file in sorted(self.root.glob(f"{camera_filter or '*'}/*.idx.json")):
+            day, _, outcome = index_file.name[:-len('.idx.json')].rpartition('-')
+            if _parse_day(day):
+                yield index_file.parent.name, day, outcome
+
+    def read_member(self, camera_id: str, day: str, outcome: str, name: str,
+                    index: Optional[Dict[str, Any]] = None) -> bytes:
+        """One file of an archive, e.g. '<case>/verdict.json'"""
+        index = index or self.index(camera_id, day, outcome)
+        if index is None or name not in index['members']:
+            raise FileNotFoundError(f"{camera_id}/{day}-{outcome}: {name}")
+        offset, size = index['members'][name][:2]
+        end = offset + size
+        frames = index['frames']
+        data = bytearray()
+        first = None
+        with open(self.root / camera_id / index['file'], 'rb') as f:
+            for i, (frame_start, compressed_offset, compressed_length) in enumerate(frames):
+                frame_end = frames[i + 1][0] if i + 1 < len(frames) else float('inf')
+                if frame_end <= offset:
+                    continue
+                if frame_start >= end:
+                    break
+                f.seek(compressed_offset)
+                data += _decompress(index['codec'], f.read(compressed_length))
+                if first is None:
+                    first = frame_start
+        if first is None:
+            raise ValueError(f"Archive index does not cover {name}")
+        return bytes(data[offset - first:end - first])
+
+    def write(self, camera_id: str, day: str, outcome: str, case_dirs: List[str],
+              exclude_derived: bool = True, pack: Optional[DayPack] = None) -> Dict[str, Any]:
+        """
+        Add case folders to the (camera, day, outcome) archive. Members of an
+        existing archive are carried over, so late cases of a day can be added.
+        With a day pack, case_dirs name cases whose files are read from the pack.
+        Returns the new index; the archive and index replace the old ones atomically.
+        """
+        base = self._base(camera_id, day, outcome)
+        base.parent.mkdir(parents=True, exist_ok=True)
+        previous = self.index(camera_id, day, outcome)
+        codec = previous['codec'] if previous else _codec()
+        archive_name = f"{base.name}.tar.{'zst' if codec == 'zstd' else 'gz'}"
+        tmp_path = base.parent / f".{archive_name}.{os.getpid()}.tmp"
+
+        members: Dict[str, List[Any]] = {}
+        cases = set(previous['cases']) if previous else set()
+        with open(tmp_path, 'wb') as f:
+            writer = _FrameWriter(f, codec)
+            with tarfile.open(fileobj=writer, mode='w', format=tarfile.PAX_FORMAT) as tar:
+                def add(name: str, data_or_path, mtime: float):
+                    info = tarfile.TarInfo(name)
+                    info.mtime = int(mtime)
+                    if isinstance(data_or_path, bytes):
+                        info.size = len(data_or_path)
+                        tar.addfile(info, io.BytesIO(data_or_path))
+                    else:
+                        info.size = os.path.getsize(data_or_path)
+                        with open(data_or_path, 'rb') as src:
+                            tar.addfile(info, src)
+                    members[name] = [tar.offset - _padded(info.size), info.size, int(mtime)]
+                    writer.end_frame()
+
+                if previous:
+                    # Carry the existing members over in one sequential pass
+                    new_cases = {os.path.basename(c) for c in case_dirs}
+                    stream = _open_stream(base.parent / previous['file'], codec)
+                    with stream, tarfile.open(fileobj=stream, mode='r|') as old:
+                        for info in old:
+                            if not info.isfile() or info.name.split('/', 1)[0] in new_cases:
+                                continue  # re-archived from the hot tree below
+                            add(info.name, old.extractfile(info).read(), info.mtime)
+
+                for case_dir in case_dirs:
+                    case_id = os.path.basename(case_dir)
+                    cases.add(case_id)
+                    if pack is not None:
+                        for name, data, mtime in pack.case_members(case_id):
+                            parts = name.split('/')
+                            if not (exclude_derived and is_derived('/'.join(parts[1:-1]), parts[-1])):
+                                add(name, data, mtime)
+                        continue
+                    for dirpath, dirnames, filenames in os.walk(case_dir):
+                        dirnames.sort()
+                        relative = os.path.relpath(dirpath, case_dir)
+                        for filename in sorted(filenames):
+                            if filename.startswith('.'):
+                                continue
+                            if exclude_derived and is_derived(relative, filename):
+                                continue
+                            path = os.path.join(dirpath, filename)
+                            name = '/'.join(p for p in (case_id, relative, filename) if p and p != '.')
+                            add(name, path, os.path.getmtime(path))
+            writer.end_frame(force=True)
+            f.flush()
+            os.fsync(f.fileno())
+
+        index = {
+            'camera_id': camera_id,
+            'date': day,
+            'outcome': outcome,
+            'file': archive_name,
+            'codec': codec,
+            'frames': writer.frames,
+            'members': members,
+            'cases': sorted(cases),
+            'created_at': datetime.now().isoformat()
+        }
+        os.replace(tmp_path, base.parent / archive_name)
+        atomic_write_json(self.index_path(camera_id, day, outcome), index, indent=None)
+        return index
+
+    def delete(self, camera_id: str, day: str, outcome: str):
+        index = self.index(camera_id, day, outcome)
+        if index:
+            try:
+                os.unlink(self.root / camera_id / index['file'])
+            except FileNotFoundError:
+                pass
+        try:
+            os.unlink(self.index_path(camera_id, day, outcome))
+        except FileNotFoundError:
+            pass
+
+    def find_case(self, camera_id: str, day: str, case_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(outcome, index) of the archive holding a case"""
+        for outcome in (VIOLATION, COMPLIANT):
+            index = self.index(camera_id, day, outcome)
+            if index and case_id in index['cases']:
+                return outcome, index
+        return None
+
+    def restore_case(self, camera_id: str, day: str, case_id: str) -> Optional[str]:
+        """Extract one archived case back into the hot tree"""
+        found = self.find_case(camera_id, day, case_id)
+        if found is None:
+            return None
+        outcome, index = found
+        case_dir = Path(self.inbox_path) / camera_id / day / case_id
+        for name in index['members']:
+            if name.split('/', 1)[0] != case_id:
+                continue
+            target = Path(self.inbox_path) / camera_id / day / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(self.read_member(camera_id, day, outcome, name, index))
+            mtime = index['members'][name][2]
+            os.utime(target, (mtime, mtime))
+        restore_derived(str(case_dir))
+        CaseBookkeeping(self.inbox_path).restored(
+            str(case_dir), read_results(lambda name: (case_dir / AI_FOLDER / name).read_bytes()))
+        return str(case_dir)
+
+def restore_derived(case_dir: str) -> int:
+    """
+    Relink the ai/ image copies the case's result files refer to from the
+    originals: processed_images[].ai_path of ai_detection_results.json and
+    ai/<image> for the images of ai.json. Returns the number recreated.
+    """
+    from blob_store import link_or_copy
+
+    ai_dir = os.path.join(case_dir, AI_FOLDER)
+    pairs = []
+    try:
+        with open(os.path.join(ai_dir, 'ai_detection_results.json'), 'r', encoding='utf-8') as f:
+            for item in json.load(f).get('processed_images', []):
+                pairs.append((item['filename'], os.path.basename(item.get('ai_path') or item['filename'])))
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    try:
+        with open(os.path.join(ai_dir, 'ai.json'), 'r', encoding='utf-8') as f:
+            for entry in json.load(f).get('images', []):
+                pairs.append((entry['image'], entry['image']))
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    restored = 0
+    for original, copy in pairs:
+        source, target = os.path.join(case_dir, original), os.path.join(ai_dir, copy)
+        if os.path.exists(target) or not os.path.exists(source):
+            continue
+        try:
+            link_or_copy(source, target)
+            restored += 1
+        except OSError as e:
+            logger.warning(f"Could not restore {target}: {e}")
+    return restored
+
+def read_results(read) -> Dict[str, Dict[str, Any]]:
+    """Parsed result files of a case; read(name) returns the bytes of ai/<name>"""
+    results = {}
+    for name in RESULT_FILES:
+        try:
+            results[name] = json.loads(read(name))
+        except (OSError, KeyError, ValueError):
+            continue
+    return results
+
+class CaseBookkeeping:
+    """
+    Keeps the plate index, the stats aggregates and the repeat-offender
+    window in step with cases that leave or re-enter the hot tree.
+
+    An index or aggregate file that does not exist yet is left alone; it is
+    built from the tree on first use and so already reflects the change.
+    Repeat-offender counts live in each consumer's memory, so removals
+    reach them as change feed records rather than checkpoint edits.
+    """
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox"):
+        inbox = Path(inbox_path)
+        self.plate_index = PlateIndex(str(inbox / PLATE_INDEX_FILE))
+        self.stats = StatsAggregator(str(inbox / STATS_FILE))
+        self.change_feed = ChangeFeed(str(inbox))
+
+    def _contribution(self, case: Path, results: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if 'ai.json' not in results:
+            return None
+        # Same shape rebuild_stats gives it
+        return case_contribution(dict(results['ai.json'], camera_id=case.parent.parent.name, date=case.parent.name))
+
+    def removed(self, case_path: str, results: Dict[str, Dict[str, Any]], today: Optional[date] = None):
+        """Forget a case that was archived or deleted"""
+        case = Path(case_path)
+        try:
+            if self.plate_index.exists():
+                for name in RESULT_FILES:
+                    self.plate_index.update(str(case), str(case / AI_FOLDER / name), None)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Could not drop {case} from the plate index: {e}")
+        if self.stats.exists():
+            self.stats.update(self._contribution(case, results), None)
+
+        day = _parse_day(case.parent.name)
+        if day is None or ((today or date.today()) - day).days >= DEFAULT_WINDOW_DAYS:
+            return  # already outside the repeat-offender window
+        for name, data in results.items():
+            for plate in result_plates(data):
+                try:
+                    self.change_feed.append(data.get('case_path') or str(case), str(case / AI_FOLDER / name),
+                                            plate=plate, source='retention', removed=True)
+                except OSError as e:
+                    logger.error(f"❌ Could not publish removal of {case}: {e}")
+
+    def restored(self, case_path: str, results: Dict[str, Dict[str, Any]]):
+        """Re-register a case extracted from the archive"""
+        case = Path(case_path)
+        try:
+            if self.plate_index.exists():
+                for name, data in results.items():
+                    self.plate_index.update(str(case), str(case / AI_FOLDER / name), data)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Could not add {case} to the plate index: {e}")
+        if self.stats.exists():
+            self.stats.update(None, self._contribution(case, results))
+
+def is_derived(relative_dir: str, filename: str) -> bool:
+    """ai/ image copies, which the processors recreate from the originals"""
+    return (relative_dir.split(os.sep)[0] == AI_FOLDER and
+            os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS)
+
+# ---------------------------------------------------------------------------
+# Retention pass
+# ---------------------------------------------------------------------------
+
+class RetentionManager:
+    """
+    Applies the retention policy to the inbox, per camera and per case outcome:
+
+    - ai/ image copies older than derived_days are deleted (only when set);
+    - processed cases of closed days older than hot_days move to the archive
+      tier (or are deleted when archive_days is 0);
+    - archives older than archive_days are deleted.
+
+    A day is closed once it is before today and a newer date folder exists for
+    the camera. Unprocessed cases are never moved. Cases of packed days
+    (day_pack.py) are archived from the pack, which is rewritten without them.
+    """
+
+    def __init__(self, inbox_path: str = "/srv/processing_inbox", dry_run: bool = False):
+        self.inbox_path = inbox_path
+        self.policy = RetentionPolicy(inbox_path)
+        self.archive = ColdArchive(inbox_path)
+        self.bookkeeping = CaseBookkeeping(inbox_path)
+        self.dry_run = dry_run
+        self.today: Optional[date] = None
+
+    def run(self, today: Optional[date] = None) -> Dict[str, int]:
+        today = self.today = today or date.today()
+        stats = {'derived_deleted': 0, 'cases_archived': 0, 'cases_deleted': 0,
+                 'cases_unprocessed': 0, 'archives_expired': 0, 'bytes_freed': 0}
+
+        groups: Dict[Tuple[str, str, str], List[str]] = {}
+        newest_day: Dict[str, str] = {}
+        for case in walk_cases(self.inbox_path, camera_prefix=None, scan_ai=True):
+            day = _parse_day(case.date)
+            if day is None:
+                continue
+            newest_day[case.camera_id] = max(newest_day.get(case.camera_id, ''), case.date)
+            policy = self.policy.for_camera(case.camera_id)
+            age = (today - day).days
+
+            if case.has_ai_folder and policy['derived_days'] is not None and age >= policy['derived_days']:
+                self._delete_derived(case, stats)
+
+            outcome = case_outcome(case.path)
+            if age < policy['hot_days'][outcome]:
+                continue
+            if case.images and not any(case.has_ai_file(name) for name in RESULT_FILES):
+                stats['cases_unprocessed'] += 1
+                continue
+            groups.setdefault((case.camera_id, case.date, outcome), []).append(case.path)
+
+        packed: Dict[Tuple[str, str, str], List[str]] = {}
+        for camera_id, day_name, path in iter_packs(self.inbox_path):
+            day = _parse_day(day_name)
+            if day is None:
+                continue
+            newest_day[camera_id] = max(newest_day.get(camera_id, ''), day_name)
+            policy = self.policy.for_camera(camera_id)
+            age = (today - day).days
+            try:
+                with DayPack(path) as pack:
+                    for case_id in pack.cases():
+                        outcome = packed_case_outcome(pack, case_id)
+                        if age < policy['hot_days'][outcome]:
+                            continue
+                        files = pack.case_files(case_id)
+                        has_images = any(name.count('/') == 1 and
+                                         os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+                                         for name in files)
+                        if has_images and not any(f"{case_id}/{AI_FOLDER}/{result}" in pack
+                                                  for result in RESULT_FILES):
+                            stats['cases_unprocessed'] += 1
+                            continue
+                        packed.setdefault((camera_id, day_name, outcome), []).append(case_id)
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Could not read day pack {path}: {e}")
+
+        for camera_id, day, outcome in sorted(set(groups) | set(packed)):
+            case_dirs = groups.get((camera_id, day, outcome), [])
+            case_ids = packed.get((camera_id, day, outcome), [])
+            if day >= newest_day.get(camera_id, '') or _parse_day(day) >= today:
+                continue  # still open
+            keep = self.policy.for_camera(camera_id)['archive_days'][outcome]
+            if keep == 0 or (keep is not None and (today - _parse_day(day)).days >= keep):
+                self._remove_cases(case_dirs, stats, 'cases_deleted')
+                self._remove_packed(camera_id, day, case_ids, stats, 'cases_deleted')
+                continue
+            if self.dry_run:
+                stats['cases_archived'] += len(case_dirs) + len(case_ids)
+                continue
+            try:
+                if case_dirs:
+                    index = self.archive.write(camera_id, day, outcome, case_dirs)
+                    archived = [c for c in case_dirs if os.path.basename(c) in index['cases']]
+                    self._remove_cases(archived, stats, 'cases_archived')
+                    logger.info(f"📦 Archived {len(archived)} {outcome} cases of {camera_id}/{day}")
+                if case_ids:
+                    with DayPack(pack_path(self.inbox_path, camera_id, day)) as pack:
+                        index = self.archive.write(camera_id, day, outcome, case_ids, pack=pack)
+                    archived = [c for c in case_ids if c in index['cases']]
+                    self._remove_packed(camera_id, day, archived, stats, 'cases_archived')
+                    logger.info(f"📦 Archived {len(archived)} packed {outcome} cases of {camera_id}/{day}")
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Could not archive {camera_id}/{day} ({outcome}): {e}")
+
+        for camera_id, day, outcome in list(self.archive.archives()):
+            keep = self.policy.for_camera(camera_id)['archive_days'].get(outcome)
+            if keep is not None and (today - _parse_day(day)).days >= keep:
+                if not self.dry_run:
+                    self.archive.delete(camera_id, day, outcome)
+                stats['archives_expired'] += 1
+
+        logger.info(f"🗄️ Retention pass: {stats}")
+        return stats
+
+    def _delete_derived(self, case, stats: Dict[str, int]):
+        for name in sorted(case.ai_files):
+            if not is_derived(AI_FOLDER, name):
+                continue
+            path = os.path.join(case.ai_path, name)
+            try:
+                st = os.stat(path)
+                if not self.dry_run:
+                    os.unlink(path)
+            except OSError:
+                continue
+            stats['derived_deleted'] += 1
+            # A hardlinked copy frees nothing until its last link goes
+            if st.st_nlink == 1:
+                stats['bytes_freed'] += st.st_size
+
+    def _remove_packed(self, camera_id: str, day: str, case_ids: List[str],
+                       stats: Dict[str, int], counter: str):
+        if not case_ids:
+            return
+        stats[counter] += len(case_ids)
+        if self.dry_run:
+            return
+        path = pack_path(self.inbox_path, camera_id, day)
+        with DayPack(path) as pack:
+            removed = {case_id: read_results(lambda name: pack.read(f"{case_id}/{AI_FOLDER}/{name}"))
+                       for case_id in case_ids}
+        before = os.path.getsize(path)
+        remove_cases(self.inbox_path, camera_id, day, case_ids)
+        for case_id, results in removed.items():
+            self.bookkeeping.removed(os.path.join(self.inbox_path, camera_id, day, case_id), results, self.today)
+        stats['bytes_freed'] += before - (os.path.getsize(path) if path.exists() else 0)
+
+    def _remove_cases(self, case_dirs: List[str], stats: Dict[str, int], counter: str):
+        pending = 0
+        for case_dir in case_dirs:
+            stats[counter] += 1
+            if self.dry_run:
+                continue
+            case = scan_case(case_dir)
+            pending += case.has_verdict and bool(case.images)
+            for dirpath, _, filenames in os.walk(case_dir):
+                for filename in filenames:
+                    try:
+                        st = os.stat(os.path.join(dirpath, filename))
+                    except OSError:
+                        continue
+                    if st.st_nlink == 1:
+                        stats['bytes_freed'] += st.st_size
+            results = read_results(lambda name: Path(case_dir, AI_FOLDER, name).read_bytes())
+            shutil.rmtree(case_dir, ignore_errors=True)
+            self.bookkeeping.removed(case_dir, results, self.today)
+            # Drop the date folder once its last case is gone
+            try:
+                os.rmdir(os.path.dirname(case_dir))
+            except OSError:
+                pass
+        # They no longer count as pending cases of the hot tree
+        self.bookkeeping.stats.add_pending(-pending)
+
+def main():
+    """Command line: run [--dry-run] | policy [camera] | list [camera] | restore <camera> <date> <case> | relink <camera> <date> <case>"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    inbox_path = "/srv/processing_inbox"
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if command == "run":
+        stats = RetentionManager(inbox_path, dry_run='--dry-run' in sys.argv).run()
+        if '--dry-run' not in sys.argv:
+            from blob_store import BlobStore, blob_store_enabled
+            from previews import PreviewCache
+            blobs = BlobStore(inbox_path)
+            stats['blobs'] = blobs.gc()
+            if blob_store_enabled():
+                stats['previews'] = PreviewCache(inbox_path).gc(blobs.objects)
+        print(json.dumps(stats, indent=2))
+    elif command == "policy":
+        policy = RetentionPolicy(inbox_path)
+        print(json.dumps(policy.for_camera(sys.argv[2]) if len(sys.argv) > 2 else policy.default, indent=2))
+    elif command == "list":
+        archive = ColdArchive(inbox_path)
+        for camera_id, day, outcome in archive.archives(sys.argv[2] if len(sys.argv) > 2 else None):
+            index = archive.index(camera_id, day, outcome)
+            print(f"{camera_id}\t{day}\t{outcome}\t{len(index['cases'])} cases\t{index['file']}")
+    elif command == "restore" and len(sys.argv) > 4:
+        restored = ColdArchive(inbox_path).restore_case(sys.argv[2], sys.argv[3], sys.argv[4])
+        print(restored or "Case not found in the archive")
+    elif command == "relink" and len(sys.argv) > 4:
+        print(restore_derived(os.path.join(inbox_path, sys.argv[2], sys.argv[3], sys.argv[4])))
+    else:
+        print(main.__doc__)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Service Heartbeats for Radar System
+Liveness/progress files written by AI service workers and read by the supervisor
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from atomic_write import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+# <inbox>/.ai_service/ holds one heartbeat per worker process plus supervisor.json
+SERVICE_DIR = '.ai_service'
+HEARTBEAT_ENV = 'AI_SERVICE_HEARTBEAT'
+
+HEARTBEAT_INTERVAL = 2.0
+
+# On SIGTERM a worker may take this long to finish its current case before
+# checkpointing the rest; the supervisor waits a little longer before SIGKILL
+DRAIN_TIMEOUT = float(os.environ.get('AI_SERVICE_DRAIN_TIMEOUT', '30'))
+
+# Worker states, in startup order
+STATE_LOADING = 'loading'    # importing / loading models
+STATE_STANDBY = 'standby'    # models loaded and warmed, waiting to be activated
+STATE_ACTIVE = 'active'      # monitoring the inbox and processing cases
+STATE_STOPPING = 'stopping'
+
+def heartbeat_path(inbox_path: str, name: str) -> Path:
+    return Path(inbox_path) / SERVICE_DIR / f"{name}.json"
+
+def read_heartbeat(path) -> Optional[Dict[str, Any]]:
+    """Last heartbeat written to path, with its age in seconds; None if missing"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    data['age'] = time.time() - data.get('ts', 0)
+    return data
+
+class Heartbeat:
+    """
+    Writes a small JSON status file every HEARTBEAT_INTERVAL seconds from a
+    daemon thread. The file going stale means the whole process is frozen;
+    the 'worker_beat' timestamp supplied by status() going stale while the
+    file is fresh means the worker thread itself is stuck.
+    """
+
+    def __init__(self, path, status: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.path = Path(path)
+        self.status = status
+        self.state = STATE_LOADING
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional['Heartbeat']:
+        """Heartbeat at $AI_SERVICE_HEARTBEAT when started by the supervisor"""
+        path = os.environ.get(HEARTBEAT_ENV)
+        return cls(path) if path else None
+
+    def set_state(self, state: str):
+        self.state = state
+        self.beat()
+
+    def beat(self):
+        data = {'pid': os.getpid(), 'state': self.state, 'ts': time.time(), 'started_at': self.started_at}
+        if self.status is not None:
+            try:
+                data.update(self.status())
+            except Exception as e:
+                logger.debug(f"Heartbeat status failed: {e}")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(self.path, data, indent=None, durable=False)
+        except OSError as e:
+            logger.warning(f"Could not write heartbeat {self.path}: {e}")
+
+    def start(self) -> 'Heartbeat':
+        self.beat()
+        self._thread = threading.Thread(target=self._run, name='heartbeat', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            self.beat()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=HEARTBEAT_INTERVAL)
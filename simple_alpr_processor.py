@@ -4,72 +4,45 @@ Simple ALPR Processor
 A simplified ALPR processor that works with all FTP data
 """
 
-import os
-import sys
 import json
-import cv2
-import numpy as np
 from pathlib import Path
 from datetime import datetime
 import logging
 
+from atomic_write import FsyncBatch, atomic_write_json
+from alpr_engine import ProcessingEngine, create_backend
+from case_walker import scan_case, walk_cases
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+_engine = None
+
+def get_engine():
+    """Shared engine running the OpenCV contour backend with crop OCR"""
+    global _engine
+    if _engine is None:
+        try:
+            backend = create_backend('opencv_contour', fallback=False, ocr=True)
+        except ImportError as e:
+            logger.warning(f"Plate OCR not available, plates will have no text: {e}")
+            backend = create_backend('opencv_contour')
+        _engine = ProcessingEngine(backend)
+    return _engine
+
+def _with_text(plate):
+    """Expose the OCR text under the legacy simple_alpr keys"""
+    plate['text'] = plate.get('plate')
+    plate['detected_characters'] = plate.get('plate')
+    return plate
+
 def detect_license_plates_simple(image_path):
     """Simple license plate detection using OpenCV"""
-    try:
-        # Read image
-        image = cv2.imread(str(image_path))
-        if image is None:
-            return []
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply Gaussian blur
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
-        # Apply edge detection
-        edged = cv2.Canny(blurred, 50, 150)
-        
-        # Find contours
-        contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Filter contours that could be license plates
-        potential_plates = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 500:  # Minimum area threshold
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / h
-                
-                # License plate aspect ratio is typically between 2:1 and 6:1
-                if 1.5 < aspect_ratio < 8.0 and area > 1000:
-                    # Calculate confidence based on area and aspect ratio
-                    area_score = min(area / 5000, 1.0)
-                    aspect_score = 1.0 if 2.0 < aspect_ratio < 6.0 else 0.5
-                    confidence = (area_score + aspect_score) / 2.0
-                    
-                    potential_plates.append({
-                        'bbox': [int(x), int(y), int(w), int(h)],
-                        'area': int(area),
-                        'aspect_ratio': round(aspect_ratio, 2),
-                        'confidence': round(confidence, 2),
-                        'text': f"PLATE_{len(potential_plates)+1}",  # Placeholder text
-                        'detected_characters': f"ABC{len(potential_plates)+1:03d}"  # Placeholder
-                    })
-        
-        # Sort by confidence
-        potential_plates.sort(key=lambda x: x['confidence'], reverse=True)
-        
-        # Return only the best detection
-        return potential_plates[:1]
-        
-    except Exception as e:
-        logger.error(f"Error detecting plates in {image_path}: {e}")
-        return []
+    entry = get_engine().process_image(str(image_path))
+    # Return only the best detection, preferring regions the OCR could read
+    plates = sorted(entry['detections'], key=lambda p: (bool(p.get('plate')), p['confidence']), reverse=True)
+    return [_with_text(plate) for plate in plates[:1]]
 
 def process_single_image_simple(image_path):
     """Process a single image with simple ALPR"""
@@ -97,118 +70,96 @@ def process_single_image_simple(image_path):
             'method': 'simple_opencv'
         }
 
-def process_case_with_single_plate(case_dir):
+def process_case_with_single_plate(case_dir, image_files=None):
     """Process a case directory and return single best plate number"""
     logger.info(f"Processing case for single plate: {case_dir}")
     
-    # Get image files
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-    image_files = []
-    
-    for file_path in case_dir.iterdir():
-        if file_path.is_file() and file_path.suffix.lower() in image_extensions:
-            image_files.append(file_path)
+    # Get image files (single directory listing unless the caller already has them)
+    if image_files is None:
+        image_files = [Path(img) for img in scan_case(case_dir).images]
     
     if not image_files:
         logger.info(f"No images found in {case_dir}")
         return None
     
-    # Process all images and collect all plates
-    all_plates = []
-    for image_file in image_files:
-        try:
-            plates = detect_license_plates_simple(image_file)
-            for plate in plates:
-                plate['source_image'] = str(image_file)
-                all_plates.append(plate)
-        except Exception as e:
-            logger.error(f"Error processing {image_file}: {e}")
-            continue
+    # Run the shared engine (reuses a current result for this backend)
+    engine_result = get_engine().process_case({
+        'camera_id': case_dir.parent.parent.name,
+        'date': case_dir.parent.name,
+        'case_id': case_dir.name,
+        'case_path': str(case_dir),
+        'images': [str(image_file) for image_file in image_files]
+    })
+    images_by_name = {entry['image']: entry['path'] for entry in engine_result['images']}
+    all_plates = [dict(detection, source_image=images_by_name[detection['image']])
+                  for detection in engine_result['detections']]
     
     if not all_plates:
         logger.info(f"No plates detected in case {case_dir}")
         return None
     
-    # Find the best plate across all images
-    best_plate = max(all_plates, key=lambda x: x['confidence'])
-    
-    # Generate unique plate number for this case
-    case_name = case_dir.name
-    case_number = case_name.replace('case', '').zfill(3)
-    camera_name = case_dir.parent.parent.name
-    camera_number = camera_name.replace('camera', '').zfill(3)
+    # Find the best plate across all images, preferring regions with OCR text
+    best_plate = max(all_plates, key=lambda x: (bool(x.get('plate')), x['confidence']))
     
-    # Create unique plate number: CAM001-CASE013
-    unique_plate_number = f"{camera_number}{case_number}"
-    
-    best_plate['detected_characters'] = unique_plate_number
-    best_plate['text'] = f"PLATE_{unique_plate_number}"
-    
-    return best_plate
+    return _with_text(best_plate)
 
 def process_all_ftp_data():
     """Process all FTP data with simple ALPR - one plate per case"""
     processing_inbox = Path("/srv/processing_inbox")
     
-    # Find all case directories
-    case_dirs = []
-    for case_dir in processing_inbox.rglob("case*"):
-        if case_dir.is_dir():
-            ai_folder = case_dir / "ai"
-            if ai_folder.exists():
-                case_dirs.append(case_dir)
+    # Find all case directories with AI folders, listing each case once
+    cases = [case for case in walk_cases(processing_inbox, camera_prefix=None, case_prefix="case")
+             if case.has_ai_folder]
+    case_dirs = [Path(case.path) for case in cases]
     
     logger.info(f"Found {len(case_dirs)} case directories to process")
     
     total_images = 0
     total_plates = 0
     
-    for case_dir in case_dirs:
-        try:
-            # Process case to get single best plate
-            best_plate = process_case_with_single_plate(case_dir)
+    with FsyncBatch():  # group-commit result fsyncs across cases
+        for case, case_dir in zip(cases, case_dirs):
+            try:
+                image_files = [Path(img) for img in case.images]
             
-            if not best_plate:
-                logger.info(f"No plates detected in case {case_dir}")
-                continue
+                # Process case to get single best plate
+                best_plate = process_case_with_single_plate(case_dir, image_files)
             
-            # Get image files count
-            image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-            image_files = [f for f in case_dir.iterdir() 
-                          if f.is_file() and f.suffix.lower() in image_extensions]
+                if not best_plate:
+                    logger.info(f"No plates detected in case {case_dir}")
+                    continue
             
-            # Create single result for the case with the best plate
-            case_result = {
-                'image_path': best_plate['source_image'],
-                'plates_detected': 1,  # Always 1 plate per case
-                'plates': [best_plate],
-                'confidence_scores': [best_plate['confidence']],
-                'processing_time': 0.1,
-                'status': 'success',
-                'method': 'simple_opencv_single_plate',
-                'case_directory': str(case_dir),
-                'processed_at': datetime.now().isoformat(),
-                'total_images_in_case': len(image_files)
-            }
+                # Create single result for the case with the best plate
+                case_result = {
+                    'image_path': best_plate['source_image'],
+                    'plates_detected': 1,  # Always 1 plate per case
+                    'plates': [best_plate],
+                    'confidence_scores': [best_plate['confidence']],
+                    'processing_time': 0.1,
+                    'status': 'success',
+                    'method': 'simple_opencv_single_plate',
+                    'case_directory': str(case_dir),
+                    'processed_at': datetime.now().isoformat(),
+                    'total_images_in_case': len(image_files)
+                }
             
-            # Save results
-            ai_folder = case_dir / "ai"
-            results_folder = ai_folder / "results"
-            results_folder.mkdir(exist_ok=True)
+                # Save results
+                ai_folder = case_dir / "ai"
+                results_folder = ai_folder / "results"
+                results_folder.mkdir(exist_ok=True)
             
-            # Save as single result (not array)
-            results_file = results_folder / "simple_alpr_results.json"
-            with open(results_file, 'w', encoding='utf-8') as f:
-                json.dump([case_result], f, indent=2, ensure_ascii=False)
+                # Save as single result (not array)
+                results_file = results_folder / "simple_alpr_results.json"
+                atomic_write_json(results_file, [case_result])
             
-            total_images += len(image_files)
-            total_plates += 1  # Always 1 plate per case
+                total_images += len(image_files)
+                total_plates += 1  # Always 1 plate per case
             
-            logger.info(f"✅ Case {case_dir.name}: Plate {best_plate['detected_characters']} (confidence: {best_plate['confidence']:.2f})")
+                logger.info(f"✅ Case {case_dir.name}: Plate {best_plate['detected_characters']} (confidence: {best_plate['confidence']:.2f})")
             
-        except Exception as e:
-            logger.error(f"❌ Error processing case {case_dir}: {e}")
-            continue
+            except Exception as e:
+                logger.error(f"❌ Error processing case {case_dir}: {e}")
+                continue
     
     logger.info(f"\n🎉 Processing Complete!")
     logger.info(f"📊 Final Summary:")
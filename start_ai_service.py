@@ -1,16 +1,25 @@
 #!/usr/bin/env python3
 """
 AI Service Startup Script for Radar System
-Starts the AI Plate Recognition Service alongside the radar system
+Starts and supervises the AI Plate Recognition Service alongside the radar system
 """
 
 import os
 import sys
+import json
 import subprocess
 import time
 import signal
 import logging
+import threading
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from atomic_write import atomic_write_json
+from camera_shards import node_id, sharding_enabled
+from service_heartbeat import (DRAIN_TIMEOUT, HEARTBEAT_ENV, SERVICE_DIR, STATE_ACTIVE, STATE_LOADING,
+                               STATE_STANDBY, heartbeat_path, read_heartbeat)
 
 # Configure logging
 logging.basicConfig(
@@ -19,13 +28,182 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+INBOX_PATH = "/srv/processing_inbox"
+SUPERVISOR_FILE = 'supervisor.json'
+
+CHECK_INTERVAL = 1.0
+# Heartbeat file not refreshed for this long: the process is frozen
+HEARTBEAT_TIMEOUT = 30.0
+# Worker loop not back (or queue not moving) for this long: stuck on a case
+WORKER_STALL_TIMEOUT = float(os.environ.get('AI_SERVICE_STALL_TIMEOUT', '300'))
+# Loading / warming models may take this long
+STARTUP_TIMEOUT = 600.0
+# Workers drain their current case and checkpoint the queue on SIGTERM
+STOP_TIMEOUT = DRAIN_TIMEOUT + 15.0
+# Give up after this many workers in a row fail before becoming ready
+MAX_CONSECUTIVE_FAILURES = 5
+# Keep a second, pre-loaded worker to swap in (AI_SERVICE_STANDBY=0 to disable)
+KEEP_STANDBY = os.environ.get('AI_SERVICE_STANDBY', '1') != '0'
+RECENT_FAILURES = 20
+
+def supervisor_path(inbox_path: str) -> Path:
+    """Supervisor metrics file; one per node when several nodes share the inbox"""
+    name = f"supervisor-{node_id()}.json" if sharding_enabled() else SUPERVISOR_FILE
+    return Path(inbox_path) / SERVICE_DIR / name
+
+class WorkerProcess:
+    """One AI service child process and its heartbeat file"""
+    
+    def __init__(self, script: Path, cwd: Path, inbox_path: str, name: str, standby: bool):
+        self.name = name
+        self.standby = standby
+        self.heartbeat_file = heartbeat_path(inbox_path, name)
+        try:
+            self.heartbeat_file.unlink()
+        except FileNotFoundError:
+            pass
+        env = dict(os.environ, **{HEARTBEAT_ENV: str(self.heartbeat_file)})
+        args = [sys.executable, str(script)] + (['--standby'] if standby else [])
+        self.process = subprocess.Popen(args, cwd=str(cwd), env=env)
+        self.spawned_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.activate_requested_at: Optional[float] = None
+        self.pending_activation = False
+        self._progress = None
+        self._progress_at = self.spawned_at
+    
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+    
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+    
+    def heartbeat(self) -> Optional[Dict[str, Any]]:
+        return read_heartbeat(self.heartbeat_file)
+    
+    def state(self) -> str:
+        hb = self.heartbeat()
+        return hb.get('state', STATE_LOADING) if hb else STATE_LOADING
+    
+    def activate(self):
+        """Switch a standby worker to active (it starts monitoring immediately)"""
+        os.kill(self.pid, signal.SIGUSR1)
+        self.standby = False
+        self.pending_activation = False
+        self.activate_requested_at = time.time()
+    
+    def health(self, now: float) -> Optional[str]:
+        """Reason this worker should be replaced, or None while it is healthy"""
+        code = self.process.poll()
+        if code is not None:
+            return f"exited with code {code}"
+        hb = self.heartbeat()
+        state = hb.get('state', STATE_LOADING) if hb else STATE_LOADING
+        if state == STATE_LOADING:
+            if now - self.spawned_at > STARTUP_TIMEOUT:
+                return f"not ready after {STARTUP_TIMEOUT:.0f}s"
+            return None
+        if hb['age'] > HEARTBEAT_TIMEOUT:
+            return f"heartbeat stale for {hb['age']:.0f}s"
+        if state == STATE_STANDBY and self.activate_requested_at and \
+                now - self.activate_requested_at > STARTUP_TIMEOUT:
+            return f"not active {STARTUP_TIMEOUT:.0f}s after activation"
+        if state != STATE_ACTIVE:
+            return None
+        
+        worker_beat = hb.get('worker_beat')
+        if worker_beat and now - worker_beat > WORKER_STALL_TIMEOUT:
+            return f"worker stuck for {now - worker_beat:.0f}s on {hb.get('current_case') or 'no case'}"
+        # Queue progress: pending cases but nothing finished for too long
+        progress = hb.get('processed', 0) + hb.get('failed', 0)
+        if progress != self._progress or not hb.get('queue_depth'):
+            self._progress, self._progress_at = progress, now
+        elif now - self._progress_at > WORKER_STALL_TIMEOUT:
+            return f"queue stalled ({hb['queue_depth']} pending, none finished for {now - self._progress_at:.0f}s)"
+        return None
+    
+    def stop(self, timeout: float = STOP_TIMEOUT):
+        """SIGTERM, then SIGKILL after timeout"""
+        if self.is_alive():
+            try:
+                self.process.terminate()
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"⚠️ Force killing AI worker {self.pid}...")
+                self.process.kill()
+                self.process.wait()
+        try:
+            self.heartbeat_file.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def summary(self) -> Dict[str, Any]:
+        hb = self.heartbeat() or {}
+        return {
+            'name': self.name,
+            'pid': self.pid,
+            'state': hb.get('state', STATE_LOADING),
+            'spawned_at': datetime.fromtimestamp(self.spawned_at).isoformat(),
+            'ready_s': round(self.ready_at - self.spawned_at, 2) if self.ready_at else None,
+            'heartbeat_age_s': round(hb['age'], 1) if 'age' in hb else None,
+            'queue_depth': hb.get('queue_depth'),
+            'processed': hb.get('processed'),
+            'failed': hb.get('failed'),
+            'current_case': hb.get('current_case')
+        }
+
+def _timing(values: List[float]) -> Dict[str, Any]:
+    return {
+        'count': len(values),
+        'last_s': round(values[-1], 2) if values else None,
+        'mean_s': round(sum(values) / len(values), 2) if values else None,
+        'max_s': round(max(values), 2) if values else None
+    }
+
 class AIServiceManager:
-    """Manages the AI Plate Recognition Service"""
+    """
+    Supervises the AI Plate Recognition Service.
     
-    def __init__(self):
-        self.ai_service_process = None
+    Workers report through heartbeat files (see service_heartbeat). The
+    active worker is replaced when it exits, its heartbeat goes stale, its
+    worker loop stops coming back, or its queue stops draining. A standby
+    worker with models already loaded and warmed is kept next to it and
+    promoted with SIGUSR1, so a restart does not wait for a cold model load.
+    Restart counts and time-to-ready are written to
+    <inbox>/.ai_service/supervisor.json.
+    """
+    
+    def __init__(self, inbox_path: str = INBOX_PATH, keep_standby: bool = KEEP_STANDBY):
         self.running = False
         self.project_root = Path(__file__).parent
+        self.inbox_path = inbox_path
+        self.keep_standby = keep_standby
+        self.service_script = self.project_root / 'backend' / 'ai_plate_recognition_service.py'
+        self.metrics_path = supervisor_path(inbox_path)
+        # Heartbeat names carry the node so supervisors sharing the inbox keep to their own
+        self.worker_prefix = f"worker-{node_id()}-" if sharding_enabled() else 'worker-'
+        self.active: Optional[WorkerProcess] = None
+        self.standby: Optional[WorkerProcess] = None
+        # Replaced workers finishing their current case in the background
+        self.draining: List[Tuple[WorkerProcess, threading.Thread]] = []
+        self._spawned = 0
+        self.consecutive_failures = 0
+        self.started_at = time.time()
+        self.metrics = {
+            'restarts': 0,
+            'warm_failovers': 0,
+            'cold_starts': 0,
+            'standby_restarts': 0,
+            'failures': []
+        }
+        self.ready_times: List[float] = []
+        self.failover_times: List[float] = []
+        self._failover_started: Optional[float] = None
+    
+    @property
+    def ai_service_process(self):
+        return self.active.process if self.active else None
     
     def check_dependencies(self):
         """Check if required dependencies are installed"""
@@ -34,7 +212,6 @@ class AIServiceManager:
         try:
             import cv2
             import numpy as np
-            from watchdog.observers import Observer
             logger.info("✅ Core dependencies available")
         except ImportError as e:
             logger.error(f"❌ Missing core dependencies: {e}")
@@ -64,27 +241,39 @@ class AIServiceManager:
         else:
             logger.warning("⚠️ Requirements file not found")
     
+    def clear_stale_heartbeats(self):
+        """Remove heartbeat files left behind by a previous supervisor"""
+        for path in (Path(self.inbox_path) / SERVICE_DIR).glob(f"{self.worker_prefix}*.json"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+    
+    def _spawn(self, standby: bool) -> WorkerProcess:
+        self._spawned += 1
+        worker = WorkerProcess(self.service_script, self.project_root, self.inbox_path,
+                               f"{self.worker_prefix}{os.getpid()}-{self._spawned}", standby)
+        logger.info(f"🚀 Started {'standby' if standby else 'active'} AI worker (pid {worker.pid})")
+        return worker
+    
     def start_ai_service(self):
         """Start the AI Plate Recognition Service"""
         logger.info("🚀 Starting AI Plate Recognition Service...")
         
-        ai_service_script = self.project_root / 'backend' / 'ai_plate_recognition_service.py'
-        
-        if not ai_service_script.exists():
-            logger.error(f"❌ AI service script not found: {ai_service_script}")
+        if not self.service_script.exists():
+            logger.error(f"❌ AI service script not found: {self.service_script}")
             return False
         
         try:
-            # Start the AI service as a subprocess
-            self.ai_service_process = subprocess.Popen([
-                sys.executable, str(ai_service_script)
-            ], cwd=str(self.project_root))
+            self.clear_stale_heartbeats()
+            self.active = self._spawn(standby=False)
+            self.metrics['cold_starts'] += 1
             
             # Give it a moment to start
             time.sleep(2)
             
             # Check if it's still running
-            if self.ai_service_process.poll() is None:
+            if self.active.is_alive():
                 logger.info("✅ AI Plate Recognition Service started successfully")
                 self.running = True
                 return True
@@ -97,41 +286,163 @@ class AIServiceManager:
             return False
     
     def stop_ai_service(self):
-        """Stop the AI Plate Recognition Service"""
-        if self.ai_service_process and self.running:
+        """Stop the AI Plate Recognition Service (and the standby)"""
+        if self.running:
             logger.info("🛑 Stopping AI Plate Recognition Service...")
             
-            try:
-                # Send SIGTERM first
-                self.ai_service_process.terminate()
-                
-                # Wait for graceful shutdown
+            for worker in (self.standby, self.active):
+                if worker is None:
+                    continue
                 try:
-                    self.ai_service_process.wait(timeout=10)
-                except subprocess.TimeoutExpired:
-                    # Force kill if it doesn't stop gracefully
-                    logger.warning("⚠️ Force killing AI service...")
-                    self.ai_service_process.kill()
-                    self.ai_service_process.wait()
-                
-                logger.info("✅ AI Plate Recognition Service stopped")
-                self.running = False
-                
-            except Exception as e:
-                logger.error(f"❌ Error stopping AI service: {e}")
+                    worker.stop()
+                except Exception as e:
+                    logger.error(f"❌ Error stopping AI worker {worker.pid}: {e}")
+            for worker, thread in self.draining:
+                thread.join()
+            self.active = self.standby = None
+            self.draining = []
+            self.running = False
+            self.write_metrics()
+            logger.info("✅ AI Plate Recognition Service stopped")
     
     def is_running(self):
         """Check if the AI service is running"""
-        if self.ai_service_process:
-            return self.ai_service_process.poll() is None
-        return False
-    
-    def restart_ai_service(self):
-        """Restart the AI service"""
-        logger.info("🔄 Restarting AI Plate Recognition Service...")
-        self.stop_ai_service()
-        time.sleep(2)
-        return self.start_ai_service()
+        return self.active is not None and self.active.is_alive()
+    
+    def restart_ai_service(self, reason: str = 'requested'):
+        """
+        Replace the active worker, with the standby when one is loaded.
+
+        The replacement is activated (or spawned) first and the old worker is
+        drained in the background, so a failover never waits for the old
+        worker's current case (up to STOP_TIMEOUT). The queue handoff is
+        ordered by the service itself: the new worker watches and processes
+        new uploads at once, but resumes the old queue checkpoint only after
+        taking its flock, which the old worker holds until the checkpoint is saved.
+        """
+        logger.warning(f"🔄 Restarting AI Plate Recognition Service ({reason})...")
+        now = time.time()
+        self.metrics['restarts'] += 1
+        self.metrics['failures'] = (self.metrics['failures'] + [{
+            'at': datetime.now().isoformat(),
+            'pid': self.active.pid if self.active else None,
+            'reason': reason
+        }])[-RECENT_FAILURES:]
+        previous, self.active = self.active, None
+        if previous is not None and previous.ready_at is None:
+            self.consecutive_failures += 1
+        self._failover_started = now
+        
+        standby, self.standby = self.standby, None
+        if standby is not None and standby.is_alive():
+            self.active = standby
+            self.metrics['warm_failovers'] += 1
+            if standby.state() == STATE_STANDBY:
+                standby.activate()
+                logger.info(f"⚡ Promoted standby AI worker (pid {standby.pid})")
+            else:
+                # Still loading: it is closer to ready than a cold start
+                standby.pending_activation = True
+                logger.info(f"⏳ Promoting standby AI worker (pid {standby.pid}) once loaded")
+        else:
+            try:
+                self.active = self._spawn(standby=False)
+                self.metrics['cold_starts'] += 1
+            except Exception as e:
+                logger.error(f"❌ Error starting AI service: {e}")
+        
+        if previous is not None:
+            self._drain(previous)
+        return self.active is not None
+    
+    def _drain(self, worker: WorkerProcess):
+        """Stop a replaced worker without holding up the failover"""
+        thread = threading.Thread(target=worker.stop, name=f"drain-{worker.pid}", daemon=True)
+        thread.start()
+        self.draining.append((worker, thread))
+        logger.info(f"🛑 Draining replaced AI worker (pid {worker.pid}) in the background")
+    
+    def _track_ready(self, worker: WorkerProcess, now: float):
+        state = worker.state()
+        if worker.pending_activation and state == STATE_STANDBY:
+            worker.activate()
+            logger.info(f"⚡ Promoted standby AI worker (pid {worker.pid})")
+        ready = state == STATE_STANDBY if worker.standby else state == STATE_ACTIVE
+        if worker.ready_at is None and (state == STATE_STANDBY or ready):
+            worker.ready_at = now
+            self.consecutive_failures = 0
+            self.ready_times = (self.ready_times + [now - worker.spawned_at])[-100:]
+            logger.info(f"✅ AI worker {worker.pid} ready in {now - worker.spawned_at:.1f}s")
+        if worker is self.active and ready and self._failover_started is not None:
+            elapsed = time.time() - self._failover_started
+            self.failover_times = (self.failover_times + [elapsed])[-100:]
+            logger.info(f"✅ AI service back in {elapsed:.1f}s")
+            self._failover_started = None
+    
+    def supervise(self) -> bool:
+        """One supervision pass; False when the service cannot be kept up"""
+        now = time.time()
+        if self.active is None:
+            if not self.restart_ai_service('no active worker'):
+                return False
+        
+        reason = self.active.health(now)
+        if reason:
+            logger.warning(f"⚠️ AI worker {self.active.pid} unhealthy: {reason}")
+            if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                logger.error(f"❌ {self.consecutive_failures} AI workers failed before becoming ready")
+                return False
+            if not self.restart_ai_service(reason):
+                return False
+        self._track_ready(self.active, now)
+        
+        if self.standby is not None:
+            reason = self.standby.health(now)
+            if reason:
+                logger.warning(f"⚠️ Standby AI worker {self.standby.pid} unhealthy: {reason}")
+                if self.standby.ready_at is None:
+                    self.consecutive_failures += 1
+                self.standby.stop(timeout=2)
+                self.standby = None
+                self.metrics['standby_restarts'] += 1
+            else:
+                self._track_ready(self.standby, now)
+        
+        self.draining = [(worker, thread) for worker, thread in self.draining if thread.is_alive()]
+        
+        # The standby loads only once the active worker is up, so they do not compete
+        if self.keep_standby and self.standby is None and self.active.ready_at is not None:
+            if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                return False
+            self.standby = self._spawn(standby=True)
+        
+        self.write_metrics()
+        return True
+    
+    def status(self) -> Dict[str, Any]:
+        return {
+            'supervisor_pid': os.getpid(),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'updated_at': datetime.now().isoformat(),
+            'active': self.active.summary() if self.active else None,
+            'standby': self.standby.summary() if self.standby else None,
+            'draining': [worker.pid for worker, _ in self.draining],
+            'restarts': self.metrics['restarts'],
+            'warm_failovers': self.metrics['warm_failovers'],
+            'cold_starts': self.metrics['cold_starts'],
+            'standby_restarts': self.metrics['standby_restarts'],
+            'consecutive_failures': self.consecutive_failures,
+            'time_to_ready': _timing(self.ready_times),
+            'failover_time': _timing(self.failover_times),
+            'recent_failures': self.metrics['failures']
+        }
+    
+    def write_metrics(self):
+        try:
+            self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(self.metrics_path, self.status(), durable=False)
+        except OSError as e:
+            logger.warning(f"Could not write supervisor metrics: {e}")
 
 def signal_handler(signum, frame):
     """Handle shutdown signals"""
@@ -140,10 +451,24 @@ def signal_handler(signum, frame):
         ai_manager.stop_ai_service()
     sys.exit(0)
 
+def print_status(inbox_path: str = INBOX_PATH):
+    """Print the last supervisor metrics"""
+    metrics_path = supervisor_path(inbox_path)
+    try:
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            print(json.dumps(json.load(f), indent=2, ensure_ascii=False))
+    except (FileNotFoundError, ValueError):
+        print(json.dumps({'error': f"No supervisor metrics at {metrics_path}"}))
+        return 1
+    return 0
+
 def main():
-    """Main entry point"""
+    """Main entry point (python start_ai_service.py [status])"""
     global ai_manager
     
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        return print_status()
+    
     logger.info("🎯 AI Service Manager Starting...")
     
     # Register signal handlers
@@ -166,14 +491,12 @@ def main():
         try:
             # Keep the manager running
             while True:
-                time.sleep(5)
+                time.sleep(CHECK_INTERVAL)
                 
-                # Check if AI service is still running
-                if not ai_manager.is_running():
-                    logger.warning("⚠️ AI service stopped unexpectedly, restarting...")
-                    if not ai_manager.restart_ai_service():
-                        logger.error("❌ Failed to restart AI service, exiting...")
-                        break
+                # Heartbeats, progress and the standby are checked every pass
+                if not ai_manager.supervise():
+                    logger.error("❌ Failed to keep AI service running, exiting...")
+                    break
                         
         except KeyboardInterrupt:
             logger.info("👋 Received interrupt signal")
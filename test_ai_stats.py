@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the AI statistics aggregates
+Writes results through AICaseProcessor.save_ai_json on a temporary inbox
+and checks that the running aggregates follow every write (a rewritten
+result replaces its old contribution), that they match a full rebuild,
+that the pending count is set by walks and adjusted by ingests, and that
+updates from several processes are not lost.
+"""
+
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+from ai_case_processor import AICaseProcessor
+from ai_stats import STATS_FILE, StatsAggregator, case_contribution
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WRITERS = 4
+CASES_PER_WRITER = 10
+
+def case_path(inbox: Path, camera: str, case_id: str) -> Path:
+    return inbox / camera / '2025-10-14' / case_id
+
+def save_result(processor: AICaseProcessor, path: Path, plate: str, confidence: float):
+    """Write a case's ai.json the way the processor does after detection"""
+    (path / 'ai').mkdir(parents=True, exist_ok=True)
+    processor.save_ai_json(str(path / 'ai'), {
+        'camera_id': path.parent.parent.name, 'date': path.parent.name, 'case_path': str(path),
+        'plate_number': plate, 'confidence': confidence, 'detections': []
+    })
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_updates_on_write(inbox: Path) -> bool:
+    """Aggregates follow each write; a rewrite replaces the old contribution"""
+    processor = AICaseProcessor(str(inbox))
+    first = case_path(inbox, 'camera001', 'case001')
+    save_result(processor, first, '12-34567', 0.9)
+    save_result(processor, case_path(inbox, 'camera002', 'case002'), '', 0.0)
+
+    stats = processor.get_stats()
+    ok = check(stats['total_processed'] == 2 and stats['plate_detections'] == 1 and
+               stats['cameras'] == {'camera001': 1, 'camera002': 1}, "Both writes counted")
+    ok &= check(abs(stats['average_confidence'] - 0.45) < 1e-9, "Average confidence over both cases")
+
+    save_result(processor, first, '', 0.3)
+    stats = processor.get_stats()
+    ok &= check(stats['total_processed'] == 2 and stats['plate_detections'] == 0,
+                "Rewritten result replaces its contribution instead of adding one")
+    ok &= check(abs(stats['camera_breakdown']['camera001']['average_confidence'] - 0.3) < 1e-9,
+                "Per-camera average follows the rewrite")
+
+    before = {k: v for k, v in stats.items() if k != 'updated_at'}
+    processor.rebuild_stats()
+    after = {k: v for k, v in processor.get_stats().items() if k != 'updated_at'}
+    ok &= check(after == before, "Running aggregates match a full rebuild")
+    return ok
+
+def test_pending(inbox: Path) -> bool:
+    """The pending count is set by a walk and adjusted by ingests"""
+    stats = StatsAggregator(str(inbox / STATS_FILE))
+    stats.add_pending(3)
+    ok = check(stats.summary()['total_pending'] is None, "Never-counted pending stays unknown")
+    for index in range(2):
+        path = case_path(inbox, 'camera001', f"case{index:03d}")
+        path.mkdir(parents=True)
+        (path / 'verdict.json').write_text(json.dumps({'camera_id': 'camera001'}))
+        (path / 'photo_1.jpg').write_bytes(b'frame')
+    processor = AICaseProcessor(str(inbox))
+    ok &= check(processor.count_pending_cases() == 2 and
+                processor.get_stats(include_pending=True)['total_pending'] == 2, "Walk records the exact count")
+    stats.add_pending(3)
+    stats.add_pending(-10)
+    ok &= check(stats.summary()['total_pending'] == 0, "Adjustments never go below zero")
+    return ok
+
+def write_many(inbox: str, writer: int):
+    stats = StatsAggregator(str(Path(inbox) / STATS_FILE))
+    for index in range(CASES_PER_WRITER):
+        stats.update(None, case_contribution({'camera_id': f"camera00{writer}", 'date': '2025-10-14',
+                                              'plate_number': '12-34567', 'confidence': 0.5}))
+
+def test_concurrent_updates(inbox: Path) -> bool:
+    """Several processes update one aggregates file"""
+    processes = [multiprocessing.Process(target=write_many, args=(str(inbox), writer)) for writer in range(WRITERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    summary = StatsAggregator(str(inbox / STATS_FILE)).summary()
+    total = WRITERS * CASES_PER_WRITER
+    ok = check(summary['total_processed'] == total and summary['plate_detections'] == total,
+               f"All {total} updates counted")
+    ok &= check(all(count == CASES_PER_WRITER for count in summary['cameras'].values()), "Per-camera counts intact")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_updates_on_write, test_pending, test_concurrent_updates):
+        inbox = Path(tempfile.mkdtemp(prefix='stats_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ AI stats test passed" if ok else "❌ AI stats test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
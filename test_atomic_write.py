@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for atomic result writes
+Records the fsyncs and renames a group commit issues and checks that every
+temp file is synced before any of them is renamed and each directory is
+synced once afterwards, that batched writes appear only when the batch
+publishes, that a change feed record never points at an unpublished result,
+and that a batch opened in one thread leaves other threads' writes alone.
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import atomic_write
+from atomic_write import FsyncBatch, active_batch, atomic_write_json
+from change_feed import ChangeFeed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+@contextmanager
+def recorded():
+    """Log ('fsync', path) / ('dirsync', path) / ('rename', path) events while open"""
+    events = []
+    fsync_path, replace = atomic_write._fsync_path, os.replace
+
+    def record_fsync(path, directory=False):
+        events.append(('dirsync' if directory else 'fsync', str(path)))
+        fsync_path(path, directory)
+
+    def record_replace(src, dst):
+        events.append(('rename', str(dst)))
+        replace(src, dst)
+
+    atomic_write._fsync_path, os.replace = record_fsync, record_replace
+    try:
+        yield events
+    finally:
+        atomic_write._fsync_path, os.replace = fsync_path, replace
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_commit_order(inbox: Path) -> bool:
+    """Group commit: sync the temp files, rename them, sync each directory once"""
+    paths = [inbox / 'case001' / 'ai' / 'a.json', inbox / 'case001' / 'ai' / 'b.json',
+             inbox / 'case002' / 'ai' / 'a.json']
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('old')
+
+    with recorded() as events:
+        with FsyncBatch(max_pending=100, max_delay=60) as batch:
+            for index, path in enumerate(paths):
+                atomic_write_json(str(path), {'version': index})
+            ok = check(not events, "Nothing synced or renamed while the batch is open")
+            ok &= check(all(path.read_text() == 'old' for path in paths), "Readers still see the old files")
+    kinds = [kind for kind, _ in events]
+
+    ok &= check(kinds == ['fsync'] * 3 + ['rename'] * 3 + ['dirsync'] * 2,
+                "All temp files synced before any rename, directories synced last")
+    ok &= check([path for kind, path in events if kind == 'rename'] == [str(p) for p in paths],
+                "Renamed in the order they were written")
+    ok &= check(sorted(path for kind, path in events if kind == 'dirsync') ==
+                sorted({str(p.parent) for p in paths}), "Each directory synced once")
+    ok &= check(all(json.loads(path.read_text()) == {'version': index} for index, path in enumerate(paths)),
+                "New contents in place after the commit")
+    ok &= check(batch.commits == 1 and not list(inbox.rglob('*.tmp')), "One commit, no temp files left")
+    return ok
+
+def test_feed_publishes(inbox: Path) -> bool:
+    """A change feed record is appended only after the result it points at"""
+    case_path = inbox / 'camera001' / '2025-10-14' / 'case001'
+    result_file = case_path / 'ai' / 'ai.json'
+    result_file.parent.mkdir(parents=True)
+    feed = ChangeFeed(str(inbox))
+
+    with FsyncBatch(max_pending=100, max_delay=60):
+        atomic_write_json(str(result_file), {'plate_number': '12-34567'})
+        feed.append(str(case_path), str(result_file), plate='12-34567')
+        record = feed.read()[-1]
+        ok = check(Path(record['result_file']).exists(), "Result in place when its record is readable")
+    ok &= check(json.loads(result_file.read_text())['plate_number'] == '12-34567', "Result contents intact")
+
+    with FsyncBatch(max_pending=100, max_delay=60):
+        offsets = inbox / 'state.json'
+        atomic_write_json(str(offsets), {'seq': 1}, batch=False)
+        ok &= check(offsets.exists(), "batch=False writes through at once")
+    return ok
+
+def test_thread_local(inbox: Path) -> bool:
+    """A batch opened in one thread does not capture another thread's writes"""
+    opened, written = threading.Event(), threading.Event()
+    seen = {}
+
+    def batched():
+        with FsyncBatch(max_pending=100, max_delay=60):
+            atomic_write_json(str(inbox / 'batched.json'), {})
+            opened.set()
+            written.wait(5)
+            seen['batched'] = (inbox / 'batched.json').exists()
+
+    worker = threading.Thread(target=batched)
+    worker.start()
+    opened.wait(5)
+    ok = check(active_batch() is None, "No batch active in the other thread")
+    atomic_write_json(str(inbox / 'direct.json'), {})
+    ok &= check((inbox / 'direct.json').exists(), "Other thread's write is in place at once")
+    written.set()
+    worker.join()
+    ok &= check(seen.get('batched') is False and (inbox / 'batched.json').exists(),
+                "Batched write appeared only when its own batch committed")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_commit_order, test_feed_publishes, test_thread_local):
+        inbox = Path(tempfile.mkdtemp(prefix='atomic_write_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Atomic write test passed" if ok else "❌ Atomic write test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
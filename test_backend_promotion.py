@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for backend hot-swap and promotion
+Drives ManagedBackend through its control file with fake backends whose
+load time is controlled, and checks that workers keep detecting with the
+current primary while a backend loads, that promoting a candidate that is
+still loading takes effect once the load finishes, and that a rollback
+issued meanwhile wins over the late load.
+"""
+
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+import backend_manager
+from alpr_engine import DetectorBackend
+from backend_manager import ManagedBackend, spec_label
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Load time of the slow candidate; workers must not wait for it
+SLOW_LOAD_SECONDS = 1.0
+
+class FakeBackend(DetectorBackend):
+    """Reports its own name as the plate, so results show which backend served them"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def detect(self, image_path, image=None):
+        return [{'plate': self.name, 'confidence': 0.9, 'bbox': [0, 0, 10, 10]}]
+
+def fake_load_spec(spec):
+    time.sleep(spec.get('options', {}).get('load_seconds', 0))
+    return FakeBackend(spec_label(spec))
+
+def served_by(backend: ManagedBackend) -> str:
+    return backend.detect('frame.jpg')[0]['plate']
+
+def set_control(backend: ManagedBackend, **changes):
+    """Write the control file and apply it right away (as the next check would)"""
+    time.sleep(0.01)  # a distinct mtime
+    backend.control.update(**changes)
+    backend.check_control(force=True)
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_promote_loading_candidate(inbox: str) -> bool:
+    """The operator promotes a candidate while it is still loading"""
+    backend = ManagedBackend('primary', inbox, pool='loading').load()
+    slow = {'backend': 'candidate', 'options': {'load_seconds': SLOW_LOAD_SECONDS}}
+    set_control(backend, candidate=slow, shadow_fraction=0.0)
+    set_control(backend, primary=slow, candidate=None, previous={'backend': 'primary'})
+
+    ok = True
+    started = time.time()
+    ok &= check(served_by(backend) == 'primary', "Workers keep the old primary while the candidate loads")
+    ok &= check(time.time() - started < SLOW_LOAD_SECONDS / 2, "detect() does not wait for the load")
+    ok &= check(wait_for(lambda: backend.name == 'candidate'), "Candidate promoted once its load finished")
+    ok &= check(served_by(backend) == 'candidate', "Workers now detect with the promoted backend")
+    ok &= check(not backend._loading, "No load left in flight")
+    backend.close()
+    return ok
+
+def test_promote_warm_candidate(inbox: str) -> bool:
+    """Promoting a loaded candidate swaps it in without another load"""
+    backend = ManagedBackend('primary', inbox, pool='warm').load()
+    set_control(backend, candidate={'backend': 'candidate'}, shadow_fraction=1.0)
+
+    ok = check(wait_for(lambda: backend._candidate is not None), "Candidate loaded next to the primary")
+    candidate = backend._candidate
+    served_by(backend)  # replayed through the candidate off the request path
+    wait_for(lambda: backend._shadow_pending == 0)
+    set_control(backend, primary={'backend': 'candidate'}, candidate=None)
+    ok &= check(backend.name == 'candidate' and backend.primary is candidate,
+                "Warm candidate promoted in place")
+    ok &= check(backend._candidate is None, "Candidate slot cleared after promotion")
+    backend.close()
+    stats = backend.control.load_stats().get('candidate', {})
+    ok &= check(stats.get('frames', 0) >= 1, "Shadow frames of the candidate recorded")
+    return ok
+
+def test_rollback_during_load(inbox: str) -> bool:
+    """A rollback issued while the promoted backend loads keeps the old primary"""
+    backend = ManagedBackend('primary', inbox, pool='rollback').load()
+    slow = {'backend': 'candidate', 'options': {'load_seconds': SLOW_LOAD_SECONDS}}
+    set_control(backend, primary=slow, previous={'backend': 'primary'})
+    set_control(backend, primary={'backend': 'primary'}, previous=None)
+
+    ok = check(wait_for(lambda: not backend._loading), "Late load finished")
+    ok &= check(backend.name == 'primary' and served_by(backend) == 'primary',
+                "Rolled-back primary stays active after the late load")
+    backend.close()
+    return ok
+
+def main():
+    backend_manager.load_spec = fake_load_spec
+    inbox = tempfile.mkdtemp(prefix='promotion_test_')
+    try:
+        ok = True
+        for test in (test_promote_loading_candidate, test_promote_warm_candidate, test_rollback_during_load):
+            logger.info(f"🧪 {test.__doc__}")
+            try:
+                ok &= test(inbox)
+            except Exception:
+                logger.exception(f"❌ {test.__name__} raised")
+                ok = False
+        logger.info("✅ Backend promotion test passed" if ok else "❌ Backend promotion test failed")
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(inbox, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
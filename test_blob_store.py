@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for image deduplication in the AI service
+Processes cases through the service's case processor (mock backend) on a
+temporary inbox and checks that the blob store stays off unless enabled,
+that identical frames end up as one inode whose permissions are left as
+the writer set them, that a repeated frame reuses its detections, and
+that garbage collection drops objects no case links to any more.
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
+import ai_plate_recognition_service as service
+from backend_manager import BackendControl
+from blob_store import BLOB_DIR, BLOB_STORE_ENV
+from previews import PREVIEWS_ENV
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DAY = '2025-10-14'
+FRAME_MODE = 0o640
+
+def create_case(inbox: Path, case_id: str, frames: dict) -> Path:
+    case_path = inbox / 'camera001' / DAY / case_id
+    case_path.mkdir(parents=True, exist_ok=True)
+    for name, data in frames.items():
+        (case_path / name).write_bytes(data)
+        os.chmod(case_path / name, FRAME_MODE)
+    with open(case_path / 'verdict.json', 'w') as f:
+        json.dump({'camera_id': 'camera001', 'decision': 'violation'}, f)
+    return case_path
+
+def process(inbox: Path, case_paths) -> service.ALPRProcessor:
+    """Run cases through the service's case processor with the mock backend"""
+    BackendControl(str(inbox), 'service').update(primary={'backend': 'mock'})
+    alpr = service.ALPRProcessor(str(inbox))
+    cases = service.ViolationCaseProcessor(alpr)
+    for case_path in case_paths:
+        cases.process_case(case_path)
+    return alpr
+
+def engine_result(case_path: Path) -> dict:
+    with open(case_path / 'ai' / 'engine' / 'mock.json', 'r') as f:
+        return json.load(f)
+
+def engine_entries(case_path: Path) -> dict:
+    return {entry['image']: entry for entry in engine_result(case_path)['images']}
+
+def image_detections(case_path: Path, image: str) -> list:
+    return [d for d in engine_result(case_path)['detections'] if d.get('image') == image]
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_disabled_by_default(inbox: Path) -> bool:
+    """Without AI_BLOB_STORE=1 case files are left alone"""
+    os.environ.pop(BLOB_STORE_ENV, None)
+    first = create_case(inbox, 'case001', {'photo_1.jpg': b'frame-a'})
+    second = create_case(inbox, 'case002', {'photo_1.jpg': b'frame-a'})
+    alpr = process(inbox, [first, second])
+
+    ok = check(alpr.engine.blobs is None and not (inbox / BLOB_DIR).exists(), "No blob store created")
+    ok &= check(os.stat(first / 'photo_1.jpg').st_ino != os.stat(second / 'photo_1.jpg').st_ino,
+                "Identical frames keep their own files")
+    ok &= check((second / 'ai' / 'processed_photo_1.jpg').read_bytes() == b'frame-a', "ai/ copy written")
+    return ok
+
+def test_ingest(inbox: Path) -> bool:
+    """With AI_BLOB_STORE=1 identical frames share one object"""
+    os.environ[BLOB_STORE_ENV] = '1'
+    first = create_case(inbox, 'case001', {'photo_1.jpg': b'frame-a', 'photo_2.jpg': b'frame-b'})
+    second = create_case(inbox, 'case002', {'photo_1.jpg': b'frame-a', 'photo_2.jpg': b'frame-c'})
+    alpr = process(inbox, [first, second])
+    blobs = alpr.engine.blobs
+
+    shared = [os.stat(case / 'photo_1.jpg') for case in (first, second)]
+    shared.append(os.stat(second / 'ai' / 'processed_photo_1.jpg'))
+    ok = check(len({st.st_ino for st in shared}) == 1, "Duplicate frame and its ai/ copies are one inode")
+    ok &= check(os.stat(first / 'photo_2.jpg').st_ino != os.stat(second / 'photo_2.jpg').st_ino,
+                "Different frames are not linked")
+    ok &= check(all(st.st_mode & 0o777 == FRAME_MODE for st in shared), "Frame permissions left untouched")
+    ok &= check(blobs.deduplicated == 1 and blobs.bytes_saved == len(b'frame-a'), "One duplicate counted")
+    entries = engine_entries(second)
+    ok &= check(bool(entries['photo_1.jpg'].get('deduplicated')) and not entries['photo_2.jpg'].get('deduplicated'),
+                "Repeated frame reuses its detections, new frame is processed")
+    reused = image_detections(second, 'photo_1.jpg')
+    ok &= check(bool(reused) and reused == image_detections(first, 'photo_1.jpg'),
+                "Reused detections match the first run")
+
+    stats = blobs.stats()
+    ok &= check(stats['objects'] == 3 and stats['unreferenced'] == 0, "Three objects, all referenced")
+    shutil.rmtree(first)
+    shutil.rmtree(second)
+    ok &= check(blobs.stats()['unreferenced'] == 3, "Deleting the cases drops the references")
+    ok &= check(blobs.gc(grace=0)['removed'] == 3 and not list(blobs.objects.glob('*/*')),
+                "GC removes the objects and their cached detections")
+    return ok
+
+def main():
+    # Test frames are not decodable images
+    os.environ[PREVIEWS_ENV] = '0'
+    ok = True
+    for test in (test_disabled_by_default, test_ingest):
+        inbox = Path(tempfile.mkdtemp(prefix='blob_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Blob store test passed" if ok else "❌ Blob store test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script for the case summary cache
+Lists processed cases through AICaseProcessor with a private cache and
+checks that unchanged ai.json files are served from the cache, that a
+change of mtime or size is re-parsed, that the memory budget evicts the
+least recently used entries, and that the on-disk copy survives a restart.
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+from ai_case_processor import AICaseProcessor
+from case_cache import PARSED_SIZE_FACTOR, CaseSummaryCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def create_case(inbox: Path, case_id: str, plate: str) -> Path:
+    """A processed case: verdict and ai.json"""
+    case_path = inbox / 'camera001' / '2025-10-14' / case_id
+    (case_path / 'ai').mkdir(parents=True)
+    (case_path / 'verdict.json').write_text(json.dumps({'camera_id': 'camera001'}))
+    write_ai_json(case_path, plate)
+    return case_path
+
+def write_ai_json(case_path: Path, plate: str):
+    (case_path / 'ai' / 'ai.json').write_text(json.dumps({'plate_number': plate, 'confidence': 0.9}))
+
+def plates(processor: AICaseProcessor) -> dict:
+    return {case['case_id']: case['plate_number'] for case in processor.iter_processed_cases()}
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_invalidation(inbox: Path) -> bool:
+    """Unchanged files are cached; an mtime or size change is re-parsed"""
+    first = create_case(inbox, 'case001', '12-34567')
+    create_case(inbox, 'case002', '12-34568')
+    cache = CaseSummaryCache()
+    processor = AICaseProcessor(str(inbox), cache=cache)
+
+    ok = check(plates(processor) == {'case001': '12-34567', 'case002': '12-34568'} and cache.misses == 2,
+               "First listing parses every ai.json")
+    plates(processor)
+    ok &= check(cache.hits == 2 and cache.misses == 2, "Second listing is served from the cache")
+
+    ai_json = first / 'ai' / 'ai.json'
+    stat = os.stat(ai_json)
+    write_ai_json(first, '12-34569')                       # same size, new contents
+    os.utime(ai_json, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    ok &= check(plates(processor)['case001'] == '12-34569' and cache.misses == 3,
+                "Same-size rewrite with a new mtime is re-parsed")
+
+    stat = os.stat(ai_json)
+    write_ai_json(first, '12-345690')                      # new size, same mtime
+    os.utime(ai_json, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    ok &= check(plates(processor)['case001'] == '12-345690' and cache.misses == 4,
+                "Size change with the same mtime is re-parsed")
+    ok &= check(cache.hits == 4, "The unchanged case stays cached throughout")
+    return ok
+
+def test_eviction(inbox: Path) -> bool:
+    """The memory budget evicts the least recently used entries"""
+    paths = [create_case(inbox, f"case{index:03d}", f"12-{index:05d}") / 'ai' / 'ai.json' for index in range(3)]
+    weight = os.stat(paths[0]).st_size * PARSED_SIZE_FACTOR
+    cache = CaseSummaryCache(max_bytes=weight * 2)
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])                                     # paths[1] is now the oldest
+    cache.get(paths[2])
+
+    ok = check(len(cache) == 2 and cache.size_bytes <= cache.max_bytes, "Cache kept within its budget")
+    cache.get(paths[0])
+    ok &= check(cache.hits == 2, "Recently used entry kept")
+    cache.get(paths[1])
+    ok &= check(cache.misses == 4, "Least recently used entry evicted")
+    return ok
+
+def test_disk_copy(inbox: Path) -> bool:
+    """The on-disk copy survives a restart and is still revalidated"""
+    case_path = create_case(inbox, 'case001', '12-34567')
+    disk_path = str(inbox / '.cache' / 'cases.json')
+    processor = AICaseProcessor(str(inbox), cache=CaseSummaryCache(disk_path=disk_path))
+    plates(processor)
+    processor.cache.save_disk()
+
+    restarted = CaseSummaryCache(disk_path=disk_path)
+    ok = check(plates(AICaseProcessor(str(inbox), cache=restarted)) == {'case001': '12-34567'} and
+               restarted.hits == 1 and restarted.misses == 0, "Restarted process reads the persisted entry")
+    write_ai_json(case_path, '99-99999')
+    os.utime(case_path / 'ai' / 'ai.json', ns=(0, 1_000_000_000))
+    reloaded = CaseSummaryCache(disk_path=disk_path)
+    ok &= check(plates(AICaseProcessor(str(inbox), cache=reloaded)) == {'case001': '99-99999'} and
+                reloaded.misses == 1, "Persisted entry of a changed file is re-parsed")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_invalidation, test_eviction, test_disk_copy):
+        inbox = Path(tempfile.mkdtemp(prefix='case_cache_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Case cache test passed" if ok else "❌ Case cache test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for case readiness
+Builds cases in the states an FTP upload passes through and checks the
+readiness decided from the verdict.json photo manifest: photos missing or
+short of their listed size wait, sized photos are ready at once, unsized
+ones and legacy verdicts only once they stop changing, placeholders are
+not expected and a manifest without photos is empty. Also checks that the
+AI service queues a case only when it is ready and asks the watcher to
+look again when waiting on settling files.
+"""
+
+import os
+import sys
+import json
+import queue
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
+import ai_plate_recognition_service as service
+from case_readiness import EMPTY, READY, STABLE_SECONDS, WAITING, check_case
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FRAME = b'x' * 100
+
+def create_case(inbox: Path, case_id: str, verdict, photos=None) -> Path:
+    """photos: name -> bytes on disk; verdict: dict, raw text or None for no verdict.json"""
+    case_path = inbox / 'camera001' / '2025-10-14' / case_id
+    case_path.mkdir(parents=True)
+    for name, data in (photos or {}).items():
+        (case_path / name).write_bytes(data)
+    if verdict is not None:
+        (case_path / 'verdict.json').write_text(verdict if isinstance(verdict, str) else json.dumps(verdict))
+    return case_path
+
+def manifest(*photos) -> dict:
+    return {'camera_id': 'camera001', 'photos': list(photos)}
+
+class Watcher:
+    def __init__(self):
+        self.rechecks = []
+
+    def recheck(self, case_path, delay):
+        self.rechecks.append((os.path.basename(case_path), delay))
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_manifest_states(inbox: Path) -> bool:
+    """Readiness states from the verdict.json manifest"""
+    sized = {'filename': 'photo_1.jpg', 'size': len(FRAME)}
+    cases = [
+        ('no_verdict', None, {'photo_1.jpg': FRAME}, WAITING, 'verdict.json missing'),
+        ('partial_verdict', '{"photos": [{"filen', {'photo_1.jpg': FRAME}, WAITING, 'still being written'),
+        ('missing_photo', manifest(sized, {'filename': 'photo_2.jpg', 'size': 5}), {'photo_1.jpg': FRAME},
+         WAITING, 'listed photo not there yet'),
+        ('short_photo', manifest(sized), {'photo_1.jpg': FRAME[:40]}, WAITING, 'photo short of its listed size'),
+        ('complete', manifest(sized, {'filename': 'photo_2.jpg', 'size': 3}),
+         {'photo_1.jpg': FRAME, 'photo_2.jpg': b'abc', 'extra.jpg': b'unlisted'}, READY, 'every listed photo complete'),
+        ('placeholder', manifest(sized, {'filename': 'photo_2.jpg', 'status': 'placeholder'}),
+         {'photo_1.jpg': FRAME}, READY, 'placeholders are not expected on disk'),
+        ('empty_manifest', manifest({'filename': 'photo_1.jpg', 'status': 'placeholder'}), {}, EMPTY,
+         'manifest listing no real photo'),
+        ('unsized_empty', manifest({'filename': 'photo_1.jpg'}), {'photo_1.jpg': b''}, WAITING,
+         'unsized photo still empty'),
+        ('legacy_no_images', {'camera_id': 'camera001'}, {}, WAITING, 'legacy verdict before any image'),
+    ]
+    ok = True
+    for case_id, verdict, photos, state, description in cases:
+        readiness = check_case(create_case(inbox, case_id, verdict, photos))
+        ok &= check(readiness.state == state, f"{case_id}: {state} ({description}; {readiness.reason})")
+
+    readiness = check_case(inbox / 'camera001' / '2025-10-14' / 'complete')
+    ok &= check(sorted(os.path.basename(p) for p in readiness.photos) == ['photo_1.jpg', 'photo_2.jpg'],
+                "Ready case lists the manifest's photos only")
+    return ok
+
+def test_settling(inbox: Path) -> bool:
+    """Unsized photos and legacy verdicts wait until files stop changing"""
+    ok = True
+    for case_id, verdict in (('unsized', manifest({'filename': 'photo_1.jpg'})),
+                             ('legacy', {'camera_id': 'camera001'})):
+        case_path = create_case(inbox, case_id, verdict, {'photo_1.jpg': FRAME})
+        written = os.stat(case_path / 'photo_1.jpg').st_mtime
+        readiness = check_case(case_path, now=written + 0.5)
+        ok &= check(readiness.state == WAITING and abs(readiness.retry_after - (STABLE_SECONDS - 0.5)) < 1e-3,
+                    f"{case_id}: fresh photo waits, retry after the rest of the quiet period")
+        ok &= check(check_case(case_path, now=written + STABLE_SECONDS + 0.1).state == READY,
+                    f"{case_id}: ready once unchanged for {STABLE_SECONDS:g}s")
+    case_path = create_case(inbox, 'sized', manifest({'filename': 'photo_1.jpg', 'size': len(FRAME)}),
+                            {'photo_1.jpg': FRAME})
+    written = os.stat(case_path / 'photo_1.jpg').st_mtime
+    ok &= check(check_case(case_path, now=written).state == READY, "Sized photo needs no quiet period")
+    return ok
+
+def test_service_offer(inbox: Path) -> bool:
+    """The service queues a case only when ready"""
+    handler = service.FTPMonitorHandler(queue.Queue())
+    handler.watcher = Watcher()
+    sized = {'filename': 'photo_1.jpg', 'size': len(FRAME)}
+    uploading = create_case(inbox, 'case001', manifest(sized), {'photo_1.jpg': FRAME[:10]})
+    settling = create_case(inbox, 'case002', manifest({'filename': 'photo_1.jpg'}), {'photo_1.jpg': FRAME})
+    empty = create_case(inbox, 'case003', manifest())
+
+    ok = check(handler.offer(uploading) is False and handler.processor_queue.empty(), "Partial upload not queued")
+    ok &= check(handler.offer(settling) is False and [c for c, _ in handler.watcher.rechecks] == ['case002'],
+                "Settling photo asks the watcher to look again")
+    ok &= check(handler.offer(empty) is True and handler.processor_queue.empty(), "Empty case is done, not queued")
+    (uploading / 'photo_1.jpg').write_bytes(FRAME)
+    ok &= check(handler.offer(uploading) is True and handler.processor_queue.get_nowait() == uploading,
+                "Completed upload queued")
+    ok &= check(handler.offer(uploading) is True and handler.processor_queue.empty(), "Queued once")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_manifest_states, test_settling, test_service_offer):
+        inbox = Path(tempfile.mkdtemp(prefix='readiness_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Case readiness test passed" if ok else "❌ Case readiness test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
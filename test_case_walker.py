@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for the scandir case walker
+Builds a temporary inbox with the odd entries a real one collects (hidden
+folders, stray files, non-camera folders, cases without verdict or images)
+and checks that the walker and the processor's case scan find exactly what
+the old glob scan found, that camera/date filters and modified_since prune
+the walk, and that scan_ai lists the ai/ folder.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+from ai_case_processor import CASE_IMAGE_EXTENSIONS, AICaseProcessor
+from case_walker import scan_case, walk_cases
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def create_case(inbox: Path, camera: str, day: str, case_id: str, files=('photo_1.jpg', 'photo_2.png'),
+                verdict: bool = True) -> Path:
+    case_path = inbox / camera / day / case_id
+    case_path.mkdir(parents=True)
+    for name in files:
+        (case_path / name).write_bytes(b'frame')
+    if verdict:
+        (case_path / 'verdict.json').write_text(json.dumps({'camera_id': camera}))
+    return case_path
+
+def create_inbox(inbox: Path):
+    """Two cameras with regular cases plus everything the scans must skip"""
+    for camera in ('camera001', 'camera002'):
+        for day in ('2025-10-13', '2025-10-14'):
+            for index in range(3):
+                create_case(inbox, camera, day, f"case{index:03d}")
+    create_case(inbox, 'camera001', '2025-10-14', 'no_verdict', verdict=False)
+    create_case(inbox, 'camera001', '2025-10-14', 'no_images', files=('notes.txt',))
+    create_case(inbox, 'camera002', '2025-10-13', 'with_ai')
+    (inbox / 'camera002' / '2025-10-13' / 'with_ai' / 'ai').mkdir()
+    (inbox / 'camera002' / '2025-10-13' / 'with_ai' / 'ai' / 'processed_photo_1.jpg').write_bytes(b'frame')
+    create_case(inbox, 'uploads', '2025-10-14', 'case000')       # not a camera
+    (inbox / '.ai_changes').mkdir()                              # service state
+    (inbox / 'camera001' / 'README.txt').write_text('stray file')
+    (inbox / 'camera001' / '2025-10-14' / 'stray.jpg').write_bytes(b'frame')
+
+def glob_scan(inbox: Path) -> list:
+    """The scan find_cases_with_verdict used before the walker (sorted for comparison)"""
+    cases = []
+    for camera_dir in inbox.iterdir():
+        if not camera_dir.is_dir() or not camera_dir.name.startswith('camera'):
+            continue
+        for date_dir in camera_dir.iterdir():
+            if not date_dir.is_dir():
+                continue
+            for case_dir in date_dir.iterdir():
+                if not case_dir.is_dir() or not (case_dir / 'verdict.json').exists():
+                    continue
+                images = list(case_dir.glob('*.jpg')) + list(case_dir.glob('*.png'))
+                if images:
+                    cases.append({'camera_id': camera_dir.name, 'date': date_dir.name,
+                                  'case_id': case_dir.name, 'case_path': str(case_dir),
+                                  'images': sorted(str(img) for img in images), 'image_count': len(images)})
+    return sorted(cases, key=lambda c: c['case_path'])
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_same_as_glob(inbox: Path) -> bool:
+    """The walker finds the same cases and images as the old glob scan"""
+    create_inbox(inbox)
+    expected = glob_scan(inbox)
+
+    walked = [case.to_case_info() for case in walk_cases(str(inbox), image_extensions=CASE_IMAGE_EXTENSIONS)
+              if case.has_verdict and case.images]
+    ok = check(len(expected) == 13, "Glob scan finds the 13 cases with verdict and images")
+    ok &= check(walked == expected, "Walker yields the same cases and images, in path order")
+    found = AICaseProcessor(str(inbox)).find_cases_with_verdict()
+    ok &= check(found == expected, "find_cases_with_verdict matches the glob scan")
+    all_cases = {case.case_id for case in walk_cases(str(inbox))}
+    ok &= check({'no_verdict', 'no_images'} <= all_cases, "Cases without verdict or images are still walked")
+    return ok
+
+def test_filters(inbox: Path) -> bool:
+    """Camera/date filters and modified_since prune the walk"""
+    create_inbox(inbox)
+    cases = list(walk_cases(str(inbox), camera_filter='camera002', date_filter='2025-10-13'))
+    ok = check({(c.camera_id, c.date) for c in cases} == {('camera002', '2025-10-13')} and len(cases) == 4,
+               "Only the filtered camera and date are listed")
+    ok &= check(not list(walk_cases(str(inbox), camera_filter='uploads')), "Non-camera folders are skipped")
+
+    since = time.time() + 1
+    touched = inbox / 'camera001' / '2025-10-13' / 'case001'
+    os.utime(touched, (since + 1, since + 1))
+    recent = [c.path for c in walk_cases(str(inbox), modified_since=since)]
+    ok &= check(recent == [str(touched)], "modified_since lists only the changed case")
+    return ok
+
+def test_scan_ai(inbox: Path) -> bool:
+    """scan_ai lists the ai/ folder in the same pass"""
+    case_path = create_case(inbox, 'camera001', '2025-10-14', 'case000')
+    (case_path / 'ai').mkdir()
+    (case_path / 'ai' / 'ai.json').write_text('{}')
+    (case_path / 'ai' / 'processed_photo_1.jpg').write_bytes(b'frame')
+
+    plain = scan_case(str(case_path))
+    ok = check(plain.has_ai_folder and not plain.ai_files, "Without scan_ai the ai/ folder is only noted")
+    case = scan_case(str(case_path), scan_ai=True)
+    ok &= check(case.has_ai_file('ai.json') and case.ai_images == [str(case_path / 'ai' / 'processed_photo_1.jpg')],
+                "With scan_ai its files and images are listed")
+    ok &= check((case.camera_id, case.date, case.case_id) == ('camera001', '2025-10-14', 'case000'),
+                "Camera and date derived from the path")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_same_as_glob, test_filters, test_scan_ai):
+        inbox = Path(tempfile.mkdtemp(prefix='walker_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Case walker test passed" if ok else "❌ Case walker test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for the AI results change feed
+Checks that a torn tail left by a crashed writer costs only that record,
+that consumers resume from their committed offset and replay what they
+had not committed, and that appenders in several processes get unique,
+gap-free sequence numbers.
+"""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+from change_feed import ChangeFeed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+APPENDERS = 4
+RECORDS_PER_APPENDER = 50
+
+def case_path(inbox: str, index: int) -> str:
+    return os.path.join(inbox, 'camera001', '2025-10-14', f"case{index:03d}")
+
+def append_case(feed: ChangeFeed, inbox: str, index: int) -> int:
+    path = case_path(inbox, index)
+    return feed.append(path, os.path.join(path, 'ai', 'ai.json'), plate=f"12-{index:05d}",
+                       confidence=0.9, source='test')
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_torn_tail(inbox: str) -> bool:
+    """A writer crashed halfway through a line"""
+    feed = ChangeFeed(inbox)
+    append_case(feed, inbox, 1)
+    append_case(feed, inbox, 2)
+    torn = b'{"seq": 3, "case_id": "case0'
+    with open(feed.log_path, 'ab') as f:
+        f.write(torn)
+
+    ok = check([r['seq'] for r in feed.read()] == [1, 2], "Readers leave the torn tail alone")
+    ok &= check(feed.last_seq() == 2, "Sequence continues after the last complete record")
+    seq = append_case(feed, inbox, 3)
+    ok &= check(seq == 3, "Next append gets seq 3")
+    records = feed.read()
+    ok &= check([r['case_id'] for r in records] == ['case001', 'case002', 'case003'],
+                "Record appended after the torn tail is readable")
+    lines = Path(feed.log_path).read_bytes().split(b'\n')
+    ok &= check(lines[-3] == torn and lines[-2].startswith(b'{"seq": 3,') and lines[-1] == b'',
+                "Torn tail terminated, appended record on its own line")
+    ok &= check(append_case(feed, inbox, 4) == 4 and feed.read(after_seq=3)[0]['case_id'] == 'case004',
+                "Appends after the repair stay in order")
+    return ok
+
+def test_consumer_resume(inbox: str) -> bool:
+    """A consumer stops after handling one record, the next run resumes"""
+    feed = ChangeFeed(inbox)
+    for index in range(1, 4):
+        append_case(feed, inbox, index)
+
+    stream = feed.subscribe('fines', poll_interval=0.01)
+    first = next(stream)
+    next(stream)  # commits the first record, then the consumer "crashes" on the second
+    stream.close()
+
+    checkpoint = ChangeFeed(inbox).get_offset('fines')
+    ok = check(checkpoint['seq'] == first['seq'], "Only the handled record is committed")
+    remaining = ChangeFeed(inbox).poll('fines')
+    ok &= check([r['seq'] for r in remaining] == [2, 3], "Restarted consumer replays the uncommitted record")
+    ok &= check(feed.read(offset=checkpoint['offset'])[0]['seq'] == 2,
+                "Committed byte offset points at the next record")
+    return ok
+
+def append_many(inbox: str, worker: int):
+    feed = ChangeFeed(inbox)
+    for index in range(RECORDS_PER_APPENDER):
+        append_case(feed, inbox, worker * RECORDS_PER_APPENDER + index)
+
+def test_concurrent_appends(inbox: str) -> bool:
+    """Several processes append to one feed"""
+    processes = [multiprocessing.Process(target=append_many, args=(inbox, worker))
+                 for worker in range(APPENDERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    records = ChangeFeed(inbox).read()
+    total = APPENDERS * RECORDS_PER_APPENDER
+    ok = check([r['seq'] for r in records] == list(range(1, total + 1)), f"{total} records with gap-free seqs")
+    ok &= check(len({r['case_id'] for r in records}) == total, "No record lost or duplicated")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_torn_tail, test_consumer_resume, test_concurrent_appends):
+        inbox = tempfile.mkdtemp(prefix='feed_test_')
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Change feed test passed" if ok else "❌ Change feed test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for CLI startup
+Runs ai_case_processor in fresh interpreters and checks that importing it,
+listing cases and finding pending cases load neither cv2/numpy nor any ALPR
+library, that the ALPR probe and the engine load on first use, and that
+only the read-only commands are held to the startup budget.
+"""
+
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import subprocess
+from pathlib import Path
+
+import ai_case_processor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPO = str(Path(__file__).resolve().parent)
+# Modules a read-only command must not pay for
+HEAVY_MODULES = ('cv2', 'numpy', 'torch', 'ultralytics', 'onnxruntime', 'fast_alpr',
+                 'jordanian_numbers_only_alpr', 'alpr_engine', 'backend_manager')
+
+PROBE = """
+import sys, json
+sys.path.insert(0, {repo!r})
+import ai_case_processor
+heavy = {heavy!r}
+loaded = lambda: sorted(m for m in sys.modules if m.split('.')[0] in heavy)
+report = {{'import': loaded()}}
+processor = ai_case_processor.AICaseProcessor({inbox!r})
+report['list'] = [c['case_id'] for c in processor.iter_processed_cases()]
+report['find'] = len(processor.find_cases_with_verdict())
+report['read_only'] = loaded()
+processor.engine
+report['engine'] = 'alpr_engine' in sys.modules
+print(json.dumps(report))
+"""
+
+def run_probe(inbox: Path) -> dict:
+    """Run PROBE in a fresh interpreter (the test's own imports must not count)"""
+    code = PROBE.format(repo=REPO, heavy=HEAVY_MODULES, inbox=str(inbox))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def create_case(inbox: Path, case_id: str, plate: str) -> Path:
+    """A processed case: verdict, one frame and its ai.json"""
+    case_path = inbox / 'camera001' / '2025-10-14' / case_id
+    (case_path / 'ai').mkdir(parents=True)
+    (case_path / 'verdict.json').write_text(json.dumps({'camera_id': 'camera001'}))
+    (case_path / 'photo_1.jpg').write_bytes(b'frame')
+    (case_path / 'ai' / 'ai.json').write_text(json.dumps({'plate_number': plate, 'confidence': 0.9}))
+    return case_path
+
+class Captured(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_lazy_imports(inbox: Path) -> bool:
+    """Read-only commands do not import cv2, numpy or the ALPR libraries"""
+    for index in range(2):
+        create_case(inbox, f"case{index:03d}", f"12-{index:05d}")
+    report = run_probe(inbox)
+
+    ok = check(report['import'] == [], "Importing the processor loads no heavy module")
+    ok &= check(report['list'] == ['case000', 'case001'] and report['find'] == 2, "Cases listed and found")
+    ok &= check(report['read_only'] == [], "Listing and finding cases load no heavy module")
+    ok &= check(report['engine'], "The engine loads on first use")
+    return ok
+
+def test_startup_budget(inbox: Path) -> bool:
+    """Only list, cases, find and file are held to the startup budget"""
+    captured = Captured()
+    ai_case_processor.logger.addHandler(captured)
+    started_at = ai_case_processor._STARTED_AT
+    # Pretend the interpreter started well over the budget ago
+    ai_case_processor._STARTED_AT -= (ai_case_processor.STARTUP_BUDGET_MS + 1000) / 1000
+    try:
+        warned = {}
+        for command in ('list', 'cases', 'find', 'file', 'stats', 'plate', 'offenders', 'process'):
+            captured.records.clear()
+            ai_case_processor.check_startup_budget(command)
+            warned[command] = any(r.levelno == logging.WARNING for r in captured.records)
+    finally:
+        ai_case_processor._STARTED_AT = started_at
+        ai_case_processor.logger.removeHandler(captured)
+
+    ok = check(all(warned[c] for c in ('list', 'cases', 'find', 'file')), "Slow read-only commands warn")
+    ok &= check(not any(warned[c] for c in ('stats', 'plate', 'offenders', 'process')),
+                "Commands that may build state on first use do not")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_lazy_imports, test_startup_budget):
+        inbox = Path(tempfile.mkdtemp(prefix='startup_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ CLI startup test passed" if ok else "❌ CLI startup test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
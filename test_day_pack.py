@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for day packs
+Builds a temporary inbox of processed cases, packs a day and checks that
+every file reads back byte for byte, that readers list the packed cases,
+that re-packing merges new cases with the packed ones without loading the
+old pack into memory, that cases can be dropped from a pack, and that
+unpacking restores the original tree with its mtimes.
+"""
+
+import sys
+import json
+import shutil
+import logging
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from ai_case_processor import AICaseProcessor
+from day_pack import DayPack, pack_day, pack_path, read_case_file, remove_cases, unpack_day
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CAMERA = 'camera001'
+DAY = '2025-10-14'
+# Large enough that holding it in memory would show up in the re-pack peak
+LARGE_FRAME_BYTES = 16 * 1024 * 1024
+
+def create_case(inbox: Path, case_id: str, plate: str) -> Path:
+    """A processed case: verdict, two frames, their ai/ copies and both result files"""
+    case_path = inbox / CAMERA / DAY / case_id
+    ai_dir = case_path / 'ai'
+    ai_dir.mkdir(parents=True)
+    (case_path / 'verdict.json').write_text(json.dumps({'camera_id': CAMERA, 'decision': 'violation'}))
+    images = ['photo_1.jpg', 'photo_2.jpg']
+    for name in images:
+        data = f"{case_id}/{name}".encode()
+        (case_path / name).write_bytes(data)
+        (ai_dir / name).write_bytes(data)
+    ai_data = {'camera_id': CAMERA, 'date': DAY, 'case_path': str(case_path), 'plate_number': plate,
+               'confidence': 0.9, 'images': [{'image': name} for name in images],
+               'detections': [{'plate': plate, 'confidence': 0.9, 'image': images[0]}]}
+    (ai_dir / 'ai.json').write_text(json.dumps(ai_data))
+    (ai_dir / 'ai_detection_results.json').write_text(json.dumps({
+        'camera_id': CAMERA,
+        'detected_plates': [{'plate_text': plate, 'confidence': 0.9}],
+        'processed_images': [{'filename': name, 'ai_path': str(ai_dir / name)} for name in images]
+    }))
+    return case_path
+
+def snapshot(root: Path) -> dict:
+    """Relative path -> (bytes, mtime_ns) of every file under root"""
+    return {str(path.relative_to(root)): (path.read_bytes(), path.stat().st_mtime_ns)
+            for path in sorted(root.rglob('*')) if path.is_file()}
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_pack_round_trip(inbox: Path) -> bool:
+    """Pack a day, read it back, unpack it"""
+    for index in range(3):
+        create_case(inbox, f"case{index:03d}", f"55-{index:05d}")
+    day_dir = inbox / CAMERA / DAY
+    before = snapshot(day_dir)
+
+    target = pack_day(str(inbox), CAMERA, DAY)
+    ok = check(target == pack_path(str(inbox), CAMERA, DAY) and target.exists() and not day_dir.exists(),
+               "Day directory replaced by its pack")
+    ok &= check(all(read_case_file(str(inbox), day_dir / name) == data for name, (data, _) in before.items()),
+                "Every file reads back byte for byte")
+    cases = list(AICaseProcessor(str(inbox)).iter_processed_cases(date_filter=DAY))
+    ok &= check(sorted(c['case_id'] for c in cases) == ['case000', 'case001', 'case002'] and
+                all(c.get('packed') for c in cases), "Packed cases listed by the case processor")
+    ok &= check(all(any('/ai/' in image for image in c['ai_images']) for c in cases),
+                "Packed cases list their ai/ images")
+
+    ok &= check(unpack_day(str(inbox), CAMERA, DAY) == day_dir and not target.exists(), "Pack removed on unpack")
+    ok &= check(snapshot(day_dir) == before, "Unpacked files match the originals, mtimes included")
+    return ok
+
+def test_repack(inbox: Path) -> bool:
+    """Re-pack a day after a late case arrived"""
+    large = create_case(inbox, 'case000', '66-00000')
+    (large / 'photo_3.jpg').write_bytes(b'\xff' * LARGE_FRAME_BYTES)
+    pack_day(str(inbox), CAMERA, DAY)
+    late = create_case(inbox, 'case001', '66-00001')
+    late_ai = (late / 'ai' / 'ai.json').read_bytes()
+
+    tracemalloc.start()
+    try:
+        pack_day(str(inbox), CAMERA, DAY)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    ok = check(peak < LARGE_FRAME_BYTES // 4, f"Packed members streamed, not loaded (peak {peak} bytes)")
+    with DayPack(pack_path(str(inbox), CAMERA, DAY)) as pack:
+        ok &= check(pack.cases() == ['case000', 'case001'], "New case merged with the packed one")
+        ok &= check(pack.read('case000/photo_3.jpg') == b'\xff' * LARGE_FRAME_BYTES and
+                    pack.read('case001/ai/ai.json') == late_ai, "Members keep their contents")
+
+    remove_cases(str(inbox), CAMERA, DAY, ['case000'])
+    with DayPack(pack_path(str(inbox), CAMERA, DAY)) as pack:
+        ok &= check(pack.cases() == ['case001'], "remove_cases drops a case from the pack")
+    remove_cases(str(inbox), CAMERA, DAY, ['case001'])
+    ok &= check(not pack_path(str(inbox), CAMERA, DAY).exists(), "Emptied pack deleted")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_pack_round_trip, test_repack):
+        inbox = Path(tempfile.mkdtemp(prefix='day_pack_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Day pack test passed" if ok else "❌ Day pack test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script for the inbox watcher
+Runs InboxWatcher (inotify and polling) over a temporary inbox and checks
+that only the newest date folder of each camera is watched, that new
+cases, cameras and date folders are reported while existing cases are
+not, that a case is reported again on each write until its handler is
+done with it, that recheck() re-reports without a change on disk, that an
+old date folder is retired once a newer one appears, and that running out
+of inotify watches falls back to polling without losing a case.
+"""
+
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import logging
+import tempfile
+import threading
+from pathlib import Path
+
+from inbox_watcher import InboxWatcher
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class Handler:
+    """on_case callback: done once the case has a verdict.json"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, case_path: str) -> bool:
+        with self._lock:
+            self.calls.append(os.path.basename(case_path))
+        return os.path.exists(os.path.join(case_path, 'verdict.json'))
+
+    def count(self, case_id: str) -> int:
+        with self._lock:
+            return self.calls.count(case_id)
+
+def create_case(date_path: Path, case_id: str, verdict: bool = True) -> Path:
+    case_path = date_path / case_id
+    case_path.mkdir(parents=True)
+    (case_path / 'photo_1.jpg').write_bytes(b'frame')
+    if verdict:
+        (case_path / 'verdict.json').write_text(json.dumps({'camera_id': date_path.parent.name}))
+    return case_path
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def run_watcher(inbox: Path, use_inotify: bool) -> bool:
+    mode = 'inotify' if use_inotify else 'polling'
+    camera = inbox / 'camera001'
+    for index in range(20):
+        create_case(camera / '2025-10-13', f"old{index:03d}")
+    create_case(camera / '2025-10-14', 'case001')
+    handler = Handler()
+    watcher = InboxWatcher(str(inbox), handler, poll_interval=0.1, retire_after=0.5, use_inotify=use_inotify)
+    watcher.start()
+    try:
+        ok = check(watcher.mode == mode, f"Running in {mode} mode")
+        if use_inotify:
+            ok &= check(watcher.watch_count() == 4, "Root, camera, newest date and its open case watched")
+        time.sleep(0.3)
+        ok &= check(handler.calls == [], "Existing cases are not reported at start")
+
+        case_path = create_case(camera / '2025-10-14', 'case002', verdict=False)
+        ok &= check(wait_for(lambda: handler.count('case002') >= 1), f"New case reported ({mode})")
+        calls = handler.count('case002')
+        (case_path / 'verdict.json').write_text('{}')
+        ok &= check(wait_for(lambda: handler.count('case002') > calls), "Written file reports the case again")
+        calls = handler.count('case002')
+        (case_path / 'photo_2.jpg').write_bytes(b'late')
+        time.sleep(0.5)
+        ok &= check(handler.count('case002') == calls, "A case its handler is done with is no longer watched")
+
+        waiting = create_case(camera / '2025-10-14', 'case003', verdict=False)
+        ok &= check(wait_for(lambda: handler.count('case003') >= 1), "Incomplete case reported")
+        calls = handler.count('case003')
+        watcher.recheck(str(waiting), 0.2)
+        ok &= check(wait_for(lambda: handler.count('case003') > calls), "recheck() reports it again without a change")
+
+        create_case(inbox / 'camera002' / '2025-10-14', 'case001')
+        ok &= check(wait_for(lambda: handler.count('case001') >= 1), "Case of a new camera reported")
+        create_case(camera / '2025-10-15', 'case004')
+        ok &= check(wait_for(lambda: handler.count('case004') >= 1), "Case of a new date folder reported")
+        ok &= check(wait_for(lambda: str(camera / '2025-10-14') not in watcher._dates[str(camera)]),
+                    "Previous date folder retired after retire_after")
+        create_case(camera / '2025-10-14', 'case005')
+        time.sleep(0.5)
+        ok &= check(handler.count('case005') == 0, "Retired date folder no longer reported")
+        ok &= check(all(not call.startswith('old') for call in handler.calls), "Old date folder never reported")
+    finally:
+        watcher.stop()
+    return ok
+
+def test_inotify(inbox: Path) -> bool:
+    """inotify watcher reports new cases in the active date folders"""
+    return run_watcher(inbox, use_inotify=True)
+
+def test_polling(inbox: Path) -> bool:
+    """Polling watcher reports the same cases"""
+    return run_watcher(inbox, use_inotify=False)
+
+def test_watch_limit(inbox: Path) -> bool:
+    """Running out of inotify watches falls back to polling without losing a case"""
+    date_path = inbox / 'camera001' / '2025-10-14'
+    create_case(date_path, 'case001')
+    handler = Handler()
+    watcher = InboxWatcher(str(inbox), handler, poll_interval=0.1).start()
+    try:
+        if watcher.mode != 'inotify':
+            logger.info("inotify not available; watch limit not exercised")
+            return True
+
+        def no_space(path, mask):
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC), path)
+        watcher._inotify.add_watch = no_space
+        create_case(date_path, 'case002')
+        ok = check(wait_for(lambda: handler.count('case002') >= 1) and watcher.mode == 'polling',
+                   "Case that hit the limit reported, watcher now polling")
+        ok &= check(watcher.watch_count() == 0, "inotify watches released")
+        create_case(date_path, 'case003')
+        ok &= check(wait_for(lambda: handler.count('case003') >= 1), "Later cases found by polling")
+    finally:
+        watcher.stop()
+    return ok
+
+def main():
+    ok = True
+    for test in (test_inotify, test_polling, test_watch_limit):
+        inbox = Path(tempfile.mkdtemp(prefix='watcher_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Inbox watcher test passed" if ok else "❌ Inbox watcher test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test script for the processor's JSON Lines output
+Runs the ai_case_processor command line over a temporary inbox and checks
+that 'list --jsonl', 'cases' and 'process --jsonl' write nothing but
+well-formed JSON Lines (one record per case, in (camera, date, case) order,
+then a summary line), that 'cases' pages and filters like the full list,
+and that text-mode 'list' still prints its header before the rows.
+"""
+
+import io
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+from contextlib import redirect_stdout
+
+import ai_case_processor
+from previews import PREVIEWS_ENV
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def create_case(inbox: Path, camera: str, date: str, case_id: str, plate: str = None) -> Path:
+    """A case with a verdict and one frame; processed when it has a plate"""
+    case_path = inbox / camera / date / case_id
+    case_path.mkdir(parents=True)
+    (case_path / 'verdict.json').write_text(json.dumps({'camera_id': camera}))
+    (case_path / 'photo_1.jpg').write_bytes(b'frame')
+    if plate is not None:
+        (case_path / 'ai').mkdir()
+        (case_path / 'ai' / 'ai.json').write_text(json.dumps({'plate_number': plate, 'confidence': 0.9}))
+    return case_path
+
+def create_inbox(inbox: Path) -> list:
+    """Processed cases in shuffled creation order; returns their (camera, date, case) in listing order"""
+    cases = [('camera002', '2025-10-14', 'case001', '12-11111'),
+             ('camera001', '2025-10-15', 'case002', '33-22222'),
+             ('camera001', '2025-10-14', 'case010', '12-33333'),
+             ('camera001', '2025-10-14', 'case002', '45-44444')]
+    for camera, date, case_id, plate in cases:
+        create_case(inbox, camera, date, case_id, plate)
+    create_case(inbox, 'camera001', '2025-10-14', 'case003')            # not processed
+    return sorted((camera, date, case_id) for camera, date, case_id, _ in cases)
+
+def run_cli(inbox: Path, *args) -> str:
+    """stdout of 'ai_case_processor.py <args>' run against inbox"""
+    processor_class = ai_case_processor.AICaseProcessor
+    argv = sys.argv
+    ai_case_processor.AICaseProcessor = lambda: processor_class(str(inbox))
+    sys.argv = ['ai_case_processor.py'] + list(args)
+    out = io.StringIO()
+    try:
+        with redirect_stdout(out):
+            ai_case_processor.main()
+    finally:
+        ai_case_processor.AICaseProcessor = processor_class
+        sys.argv = argv
+    return out.getvalue()
+
+def parse_lines(output: str):
+    """Records of JSON Lines output, or None when a line is not a JSON object"""
+    records = []
+    for line in output.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        records.append(record)
+    return records if output.endswith('\n') else None
+
+def case_key(case: dict) -> tuple:
+    return case['camera_id'], case['date'], case['case_id']
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_list(inbox: Path) -> bool:
+    """list --jsonl streams one case per line and a summary"""
+    expected = create_inbox(inbox)
+    records = parse_lines(run_cli(inbox, 'list', '--jsonl'))
+    ok = check(records is not None, "Every line is a JSON object")
+    if not records:
+        return False
+    cases = [r['case'] for r in records[:-1] if 'case' in r]
+    ok &= check(len(cases) == len(records) - 1 and records[-1] == {'summary': {'total': len(expected)}},
+                "Case lines, then one summary line with the total")
+    ok &= check([case_key(c) for c in cases] == expected, "Cases in (camera, date, case) order")
+    ok &= check(cases[0]['plate_number'] == '45-44444' and cases[0]['ai_data']['confidence'] == 0.9,
+                "Case lines carry the ai.json fields")
+
+    lines = run_cli(inbox, 'list').splitlines()
+    ok &= check(lines[0] == f"Found {len(expected)} processed cases:", "Text-mode header comes first")
+    ok &= check([line.split(' - ')[0].strip() for line in lines[1:]] == ['/'.join(key) for key in expected],
+                "Text-mode rows in the same order")
+    return ok
+
+def test_cases(inbox: Path) -> bool:
+    """cases pages and filters the same stream"""
+    expected = create_inbox(inbox)
+    records = parse_lines(run_cli(inbox, 'cases', '', '', '', '1', '2'))
+    ok = check(records is not None and [case_key(r['case']) for r in records[:-1]] == expected[1:3],
+               "offset 1, limit 2: the second and third cases")
+    ok &= check(records is not None and records[-1] == {'summary': {'total': 4, 'offset': 1, 'limit': 2,
+                                                                     'has_more': True}},
+                "Summary counts every match and flags more pages")
+
+    records = parse_lines(run_cli(inbox, 'cases', 'camera001', '2025-10-14'))
+    ok &= check(records is not None and [case_key(r['case']) for r in records[:-1]] ==
+                [key for key in expected if key[:2] == ('camera001', '2025-10-14')] and
+                records[-1]['summary']['has_more'] is False, "Camera and date filters")
+    records = parse_lines(run_cli(inbox, 'cases', '', '', '12-'))
+    ok &= check(records is not None and sorted(r['case']['plate_number'] for r in records[:-1]) ==
+                ['12-11111', '12-33333'] and records[-1]['summary']['total'] == 2, "Plate search")
+    return ok
+
+def test_process(inbox: Path) -> bool:
+    """process --jsonl streams each result as its case finishes"""
+    for index in range(3):
+        create_case(inbox, 'camera001', '2025-10-14', f"case{index:03d}")
+    create_case(inbox, 'camera001', '2025-10-14', 'case003').joinpath('verdict.json').unlink()
+    records = parse_lines(run_cli(inbox, 'process', '--jsonl'))
+    ok = check(records is not None, "Every line is a JSON object")
+    if not records:
+        return False
+    results = [r['result'] for r in records[:-1] if 'result' in r]
+    ok &= check(len(results) == 3 and records[-1] == {'summary': {'processed_count': 3, 'success': True}},
+                "One result line per case with a verdict, then the summary")
+    ok &= check(all(os.path.exists(r['ai_json_path']) for r in results) and
+                sorted(r['case_id'] for r in results) == ['case000', 'case001', 'case002'],
+                "Every result line points at its written ai.json")
+
+    create_case(inbox, 'camera001', '2025-10-15', 'case004')
+    ok &= check(run_cli(inbox, 'process').splitlines()[-1] == 'Processed 4 cases', "Text mode prints the count")
+    return ok
+
+def main():
+    # Test frames are not decodable images
+    os.environ[PREVIEWS_ENV] = '0'
+    ok = True
+    for test in (test_list, test_cases, test_process):
+        inbox = Path(tempfile.mkdtemp(prefix='jsonl_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ JSON Lines output test passed" if ok else "❌ JSON Lines output test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for the ONNX Runtime Jordanian backend
+Checks option parsing from control-file strings, the cached ONNX export,
+letterboxing, and the YOLOv8 output decoding (threshold, NMS and mapping
+back to frame coordinates) through a stand-in inference session with known
+boxes, and that a missing onnxruntime falls back to yolo_jordanian while a
+control-file candidate fails loudly instead.
+"""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+
+from alpr_engine import OnnxJordanianBackend, YoloJordanianBackend, _letterbox, create_backend
+from backend_manager import _parse_spec, load_spec
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FRAME_WIDTH, FRAME_HEIGHT = 1280, 720
+# Plates in frame coordinates (xyxy) and their scores
+PLATES = [([200, 300, 400, 380], 0.9), ([800, 100, 1000, 160], 0.6)]
+
+class StandInSession:
+    """Returns YOLOv8 output (1, 4 + classes, anchors) for PLATES in a 640 letterbox"""
+
+    def __init__(self):
+        self.feeds = []
+
+    def run(self, outputs, feed):
+        self.feeds.append(feed)
+        scale, pad_y = 0.5, 140                              # 1280x720 -> 640x360, centred
+        anchors = []
+        for (x1, y1, x2, y2), score in PLATES:
+            cx, cy = (x1 + x2) / 2 * scale, (y1 + y2) / 2 * scale + pad_y
+            w, h = (x2 - x1) * scale, (y2 - y1) * scale
+            anchors.append([cx, cy, w, h, score])
+            anchors.append([cx + 2, cy + 1, w, h, score - 0.1])   # overlapping duplicate
+        anchors.append([320, 320, 50, 20, 0.1])                   # below the threshold
+        return [np.array(anchors, dtype=np.float32).T[np.newaxis]]
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_options(workdir: Path) -> bool:
+    """Control-file string options are parsed; a current export is reused"""
+    spec = _parse_spec(['onnx_jordanian', 'version=int8', f"model_path={workdir / 'best.pt'}",
+                        'quantize=int8', 'image_size=320', 'intra_op_threads=2', 'ocr=false'])
+    backend = OnnxJordanianBackend(**spec['options'])
+    ok = check(backend.quantize is True and backend.image_size == 320 and backend.intra_op_threads == 2 and
+               backend.use_ocr is False, "String options parsed")
+    ok &= check(backend.onnx_path == str(workdir / 'best.onnx'), "Export cached next to the weights")
+    ok &= check(OnnxJordanianBackend(quantize='0', ocr='1').quantize is False and
+                OnnxJordanianBackend(ocr='1').use_ocr is True, "Falsy and truthy strings")
+
+    (workdir / 'best.pt').write_bytes(b'weights')
+    (workdir / 'best.onnx').write_bytes(b'onnx')
+    os.utime(workdir / 'best.pt', (1_000_000, 1_000_000))
+    ok &= check(backend._export() == str(workdir / 'best.onnx'), "Newer export reused without re-exporting")
+    return ok
+
+def test_decode(workdir: Path) -> bool:
+    """YOLOv8 output is thresholded, NMS'd and mapped back to the frame"""
+    padded, scale, pad_x, pad_y = _letterbox(np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), np.uint8), 640)
+    ok = check(padded.shape == (640, 640, 3) and scale == 0.5 and (pad_x, pad_y) == (0, 140),
+               "Letterbox keeps the aspect ratio and centres the frame")
+
+    backend = OnnxJordanianBackend(model_path=str(workdir / 'best.pt'), ocr=False)
+    backend.session, backend.input_name = StandInSession(), 'images'
+    plates = backend.detect('frame.jpg', np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), np.uint8))
+
+    blob = backend.session.feeds[0]['images']
+    ok &= check(blob.shape == (1, 3, 640, 640) and blob.dtype == np.float32 and 0.0 <= blob.min() <= blob.max() <= 1.0,
+                "Input is a normalised NCHW float32 blob")
+    ok &= check(len(plates) == len(PLATES), "Duplicates suppressed and low scores dropped")
+    for plate, (bbox, score) in zip(plates, PLATES):
+        ok &= check(np.allclose(plate['bbox'], bbox, atol=1e-3) and abs(plate['confidence'] - score) < 1e-6 and
+                    plate['plate'] is None and plate['method'] == 'onnx_jordanian_model',
+                    f"Box {bbox} in frame coordinates, best first")
+    return ok
+
+def test_fallback(workdir: Path) -> bool:
+    """Without onnxruntime the service falls back; a candidate spec fails loudly"""
+    if importlib.util.find_spec('onnxruntime') is not None:
+        logger.info("onnxruntime is installed; fallback not exercised")
+        return True
+    backend = create_backend('onnx_jordanian', model_path=str(workdir / 'best.pt'))
+    ok = check(isinstance(backend, YoloJordanianBackend), "Falls back to yolo_jordanian")
+    try:
+        load_spec({'backend': 'onnx_jordanian', 'options': {}})
+        refused = False
+    except ImportError:
+        refused = True
+    ok &= check(refused, "Candidate spec without onnxruntime refused")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_options, test_decode, test_fallback):
+        workdir = Path(tempfile.mkdtemp(prefix='onnx_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(workdir)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    logger.info("✅ ONNX backend test passed" if ok else "❌ ONNX backend test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Test script for the plate-number index
+Indexes result files of a temporary inbox and checks exact, prefix and
+partial lookups against a brute-force scan of the same plates, plate
+normalisation (separators, Arabic-Indic digits), that rewriting or removing
+a result leaves no stale rows behind, that the processor's plate search
+uses the index, and that fuzzy lookups find every plate within the edit
+bound with OCR confusions ranked first.
+"""
+
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+from ai_case_processor import AICaseProcessor
+from plate_index import PLATE_INDEX_FILE, PlateIndex, normalize_plate
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# case_id -> plate_number of its ai.json
+PLATES = {
+    'case001': '12-34567',
+    'case002': '12-34568',
+    'case003': '13-34567',
+    'case004': '٩٩-١٢٣٤٥',     # Arabic-Indic digits
+    'case005': '45-12345',
+    'case006': '12-34567',
+}
+
+# Plates around the fuzzy query '12-34567'
+FUZZY_PLATES = {
+    'case001': '12-34567',      # exact
+    'case002': '12-84567',      # 3/8 misread
+    'case003': '12-34267',      # unrelated digit
+    'case004': '12-3456',       # dropped digit
+    'case005': '12-84587',      # two misreads
+    'case006': '99-99999',
+}
+
+def create_case(inbox: Path, case_id: str, plate: str) -> Path:
+    case_path = inbox / 'camera001' / '2025-10-14' / case_id
+    (case_path / 'ai').mkdir(parents=True)
+    (case_path / 'verdict.json').write_text(json.dumps({'camera_id': 'camera001'}))
+    (case_path / 'ai' / 'ai.json').write_text(json.dumps({'plate_number': plate, 'confidence': 0.9}))
+    return case_path
+
+def build_index(inbox: Path, plates: dict = PLATES) -> PlateIndex:
+    for case_id, plate in plates.items():
+        create_case(inbox, case_id, plate)
+    AICaseProcessor(str(inbox)).rebuild_plate_index()
+    return PlateIndex(str(inbox / PLATE_INDEX_FILE))
+
+def case_ids(rows) -> list:
+    return sorted(row['case_id'] for row in rows)
+
+def brute_force(match, plates: dict = PLATES) -> list:
+    """Cases whose normalized plate satisfies match, by scanning every plate"""
+    return sorted(case_id for case_id, plate in plates.items() if match(normalize_plate(plate)))
+
+def levenshtein(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_lookups(inbox: Path) -> bool:
+    """Exact, prefix and partial lookups agree with a scan of every plate"""
+    index = build_index(inbox)
+
+    ok = check(normalize_plate('12-34567') == '1234567' and normalize_plate('٩٩-١٢٣٤٥') == '9912345',
+               "Separators dropped, Arabic-Indic digits mapped to ASCII")
+    ok &= check(case_ids(index.exact('12 34567')) == ['case001', 'case006'] == brute_force(lambda p: p == '1234567'),
+                "Exact lookup ignores separators")
+    ok &= check(case_ids(index.exact('9912345')) == ['case004'], "Arabic-Indic plate found by its ASCII form")
+    ok &= check(case_ids(index.prefix('12-3456')) == brute_force(lambda p: p.startswith('123456')),
+                "Prefix lookup")
+    for query in ('34567', '12345', '45', '7'):
+        ok &= check(case_ids(index.partial(query)) == brute_force(lambda p, q=query: q in p),
+                    f"Partial lookup '{query}'")
+    ok &= check(index.exact('00-00000') == [] and index.prefix('') == [] and index.partial('') == [],
+                "Unknown and empty queries find nothing")
+    rows = index.exact('1234567')
+    ok &= check(rows[0]['raw_plate'] == '12-34567' and rows[0]['camera_id'] == 'camera001',
+                "Rows keep the plate as read and the case's location")
+    return ok
+
+def test_rewrite(inbox: Path) -> bool:
+    """Rewriting or removing a result leaves no stale rows"""
+    index = build_index(inbox)
+    case_path = inbox / 'camera001' / '2025-10-14' / 'case002'
+    result_file = case_path / 'ai' / 'ai.json'
+
+    index.update(str(case_path), str(result_file), {'plate_number': '77-77777', 'confidence': 0.8})
+    ok = check(index.exact('12-34568') == [] and case_ids(index.exact('77-77777')) == ['case002'],
+               "Rewritten result replaces its plate")
+    ok &= check(case_ids(index.partial('4568')) == [], "Postings of the old plate dropped")
+    index.update(str(case_path), str(result_file), None)
+    ok &= check(index.exact('77-77777') == [], "Removed result leaves the index")
+    ok &= check(case_ids(index.exact('12-34567')) == ['case001', 'case006'], "Other cases untouched")
+    return ok
+
+def test_processor_search(inbox: Path) -> bool:
+    """The processor's plate search goes through the index"""
+    build_index(inbox)
+    processor = AICaseProcessor(str(inbox))
+
+    ok = check(case_ids(processor.find_cases_by_plate('12-34567')) == ['case001', 'case006'], "Exact plate search")
+    listed = [case['case_id'] for case in processor.iter_processed_cases(search_filter='12345', plate_mode='partial')]
+    ok &= check(sorted(listed) == brute_force(lambda p: '12345' in p), "Listing filtered through the index")
+    listed = [case['case_id'] for case in processor.iter_processed_cases(search_filter='-12345')]
+    ok &= check(listed == ['case005'], "Without a plate mode the search stays a substring of the raw plate")
+    return ok
+
+def test_fuzzy(inbox: Path) -> bool:
+    """Fuzzy lookups find every plate within the bound, misreads first"""
+    index = build_index(inbox, FUZZY_PLATES)
+    query = normalize_plate('12-34567')
+
+    ok = True
+    for max_distance in (0, 1, 2):
+        found = case_ids(index.fuzzy(query, max_distance=max_distance))
+        expected = brute_force(lambda p: levenshtein(query, p) <= max_distance, FUZZY_PLATES)
+        ok &= check(found == expected, f"max_distance={max_distance} finds {expected}")
+
+    similar = index.similar_plates('12 34567', max_distance=1)
+    ok &= check([m['plate'] for m in similar] == ['1234567', '1284567', '1234267', '123456'],
+                "Ranked exact, confusable misread, then plain edits")
+    ok &= check([m['distance'] for m in similar] == [0.0, 0.5, 1.0, 1.0] and
+                [m['edits'] for m in similar] == [0, 1, 1, 1], "Confusable substitution costs half an edit")
+    similar = index.similar_plates(query, max_distance=2)
+    ok &= check(similar[-1]['plate'] == '1284587' and similar[-1]['edits'] == 2 and similar[-1]['distance'] == 1.0,
+                "Two misreads are two edits but one unit of distance")
+
+    rows = index.fuzzy(query, limit=2)
+    ok &= check([row['case_id'] for row in rows] == ['case001', 'case002'] and
+                rows[1]['raw_plate'] == '12-84567' and rows[1]['distance'] == 0.5, "Fuzzy rows closest first, limited")
+    ok &= check(case_ids(index.lookup(query, 'fuzzy')) == case_ids(index.fuzzy(query)), "lookup dispatches fuzzy")
+    raised = 0
+    for call in (lambda: index.similar_plates(query, max_distance=3),
+                 lambda: index.similar_plates(query, max_distance=-1),
+                 lambda: index.lookup(query, 'soundex')):
+        try:
+            call()
+        except ValueError:
+            raised += 1
+    ok &= check(raised == 3, "Out-of-range distance and unknown mode raise ValueError")
+    ok &= check(index.fuzzy('') == [], "Empty query finds nothing")
+
+    processor = AICaseProcessor(str(inbox))
+    ok &= check(case_ids(processor.find_cases_by_plate('12-34567', 'fuzzy', max_distance=2)) ==
+                ['case001', 'case002', 'case003', 'case004', 'case005'], "Processor fuzzy search")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_lookups, test_rewrite, test_processor_search, test_fuzzy):
+        inbox = Path(tempfile.mkdtemp(prefix='plate_index_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Plate index test passed" if ok else "❌ Plate index test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test script for plate OCR on detector crops
+Runs PlateOCR, crop_plates and the yolo_jordanian / opencv_contour
+backends against a stand-in recognizer with the fast_plate_ocr interface
+and checks that boxes are cropped with their margin, that every crop of a
+frame goes through one batched run (0.x and 1.x outputs), that the per-crop
+API is the fallback, and that backends report the text read from their own
+boxes instead of placeholders, falling back to the full-frame ALPR only
+when nothing was read.
+"""
+
+import sys
+import logging
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from alpr_engine import (RESULT_SCHEMA_VERSION, OpenCVContourBackend, PlateOCR, ProcessingEngine,
+                         YoloJordanianBackend, crop_plates, read_plate_text)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class StandInRecognizer:
+    """fast_plate_ocr-style recognizer: run(list of crops) reads texts in order"""
+
+    def __init__(self, texts, new_api=False, color_mode='grayscale'):
+        self.texts = list(texts)
+        self.new_api = new_api
+        self.config = {'image_color_mode': color_mode}
+        self.batches = []
+
+    def run(self, inputs, return_confidence=False):
+        self.batches.append(inputs)
+        texts = [self.texts.pop(0) for _ in inputs]
+        confidences = [np.full(9, 0.8) for _ in inputs]
+        if self.new_api:
+            return [SimpleNamespace(plate=text, char_probs=conf) for text, conf in zip(texts, confidences)]
+        return texts, np.array(confidences)
+
+class PerCropOCR:
+    """fast_alpr DefaultOCR without a batch-capable recognizer"""
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = 0
+
+    def predict(self, crop):
+        self.calls += 1
+        return SimpleNamespace(text=self.texts.pop(0), confidence=[0.6, 0.8])
+
+class StandInYolo:
+    """ultralytics-style model: one result whose boxes carry conf and xyxy"""
+
+    def __init__(self, boxes):
+        self.boxes = [SimpleNamespace(conf=np.array([conf]), xyxy=np.array([xyxy], dtype=np.float32))
+                      for xyxy, conf in boxes]
+
+    def __call__(self, image, verbose=False):
+        return [SimpleNamespace(boxes=self.boxes)]
+
+class StandInALPR:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, image):
+        self.calls += 1
+        return [{'plate': 'FULL-FRAME', 'confidence': 0.7, 'bbox': [0, 0, 10, 10]}]
+
+def frame():
+    image = np.zeros((200, 400, 3), np.uint8)
+    cv2.rectangle(image, (100, 80), (300, 130), (255, 255, 255), -1)
+    return image
+
+def yolo_backend(texts):
+    backend = YoloJordanianBackend(model_path='/nonexistent/best.pt')
+    backend.custom_model = StandInYolo([([100, 80, 300, 130], 0.9), ([10, 10, 60, 30], 0.4)])
+    backend.alpr = StandInALPR()
+    backend.ocr = PlateOCR(SimpleNamespace(ocr_model=StandInRecognizer(texts)))
+    return backend
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_crops() -> bool:
+    """Boxes are cropped with their margin and clipped to the frame"""
+    image = frame()
+    crops = crop_plates(image, [[100, 80, 300, 130], [-20, -10, 40, 20], [50, 50, 50, 90]])
+    ok = check(crops[0].shape == (55, 220, 3), "Margin widens the crop on every side")
+    ok &= check(crops[1].shape == (22, 43, 3), "Box past the frame edge is clipped")
+    ok &= check(crops[2] is None, "Empty box yields no crop")
+    return ok
+
+def test_batched_read() -> bool:
+    """All crops of a frame go through one batched run"""
+    image = frame()
+    ok = True
+    for new_api in (False, True):
+        recognizer = StandInRecognizer(['12-34567_', '___'], new_api=new_api)
+        plates = [{'bbox': [100, 80, 300, 130]}, {'bbox': [10, 10, 60, 30]}, {'bbox': [5, 5, 5, 5]}]
+        read_plate_text(PlateOCR(SimpleNamespace(ocr_model=recognizer)), image, plates)
+        api = '1.x' if new_api else '0.x'
+        ok &= check(len(recognizer.batches) == 1 and len(recognizer.batches[0]) == 2 and
+                    recognizer.batches[0][0].ndim == 2, f"One grayscale batch of the two real crops ({api})")
+        ok &= check([p['plate'] for p in plates] == ['12-34567', None, None] and
+                    plates[0]['ocr_confidence'] == 0.8 and plates[2]['ocr_confidence'] == 0.0,
+                    f"Padding stripped, unread and empty crops have no text ({api})")
+
+    recognizer = StandInRecognizer(['1234567'], color_mode='rgb')
+    PlateOCR(SimpleNamespace(ocr_model=recognizer)).read([image[80:130, 100:300]])
+    ok &= check(recognizer.batches[0][0].shape == (50, 200, 3), "RGB recognizers get colour crops")
+
+    fallback = PerCropOCR(['55-55555', ''])
+    texts = PlateOCR(fallback).read([image[80:130, 100:300], image[0:20, 0:40]])
+    ok &= check(fallback.calls == 2 and texts == [('55-55555', 0.7), (None, 0.7)], "Per-crop API as the fallback")
+
+    plates = [{'plate': None, 'bbox': [100, 80, 300, 130]}]
+    read_plate_text(PlateOCR(SimpleNamespace(ocr_model=None, predict=None)), image, plates)
+    ok &= check(plates[0]['plate'] is None and 'ocr_confidence' not in plates[0], "Failing OCR leaves boxes as they were")
+    return ok
+
+def test_backends() -> bool:
+    """Backends report the text read from their own boxes"""
+    backend = yolo_backend(['12-34567', ''])
+    plates = backend.detect('frame.jpg', frame())
+    ok = check([p['plate'] for p in plates] == ['12-34567', None] and
+               plates[0]['method'] == 'enhanced_jordanian_model' and backend.alpr.calls == 0,
+               "yolo_jordanian reads its boxes without the full-frame ALPR")
+    ok &= check(not any(str(p['plate']).startswith('DETECTED') for p in plates), "No placeholder plates")
+
+    backend = yolo_backend(['', ''])
+    plates = backend.detect('frame.jpg', frame())
+    ok &= check(backend.alpr.calls == 1 and [p['plate'] for p in plates] == ['FULL-FRAME'],
+                "Boxes without text fall back to the full-frame ALPR")
+    backend = yolo_backend(['', ''])
+    backend.alpr.predict = lambda image: []
+    ok &= check(len(backend.detect('frame.jpg', frame())) == 2, "Text-less boxes kept when nothing reads anywhere")
+
+    contour = OpenCVContourBackend(ocr=True, ocr_candidates=1)
+    contour.ocr = PlateOCR(SimpleNamespace(ocr_model=StandInRecognizer(['99-12345'])))
+    plates = contour.detect('frame.jpg', frame())
+    ok &= check(contour.name == 'opencv_contour_ocr' and plates[0]['plate'] == '99-12345' and
+                len(contour.ocr.ocr.ocr_model.batches[0]) == 1, "opencv_contour OCRs its top candidates")
+    ok &= check(OpenCVContourBackend().detect('frame.jpg', frame())[0]['plate'] is None,
+                "Without OCR the contour backend reports no text")
+
+    engine = ProcessingEngine('mock')
+    ok &= check(RESULT_SCHEMA_VERSION >= 2 and
+                not engine.is_current({'schema_version': 1, 'images': []}, []), "Placeholder-era results are recomputed")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_crops, test_batched_read, test_backends):
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test()
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+    logger.info("✅ Plate OCR test passed" if ok else "❌ Plate OCR test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
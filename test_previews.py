@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test script for thumbnails and annotated previews
+Runs the processing engine with a PreviewCache over real JPEG frames and
+checks that each entry gets its thumbnail and preview keys, that both are
+fitted to their longest side, that the plate boxes are drawn where the
+detections are (also for frames decoded downscaled) without touching the
+frame the backend saw, that a known frame costs no new encode while a new
+backend only adds its own preview, that garbage collection follows the
+blob store, and that the processor lists the keys per image.
+"""
+
+import sys
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from ai_case_processor import image_previews
+from alpr_engine import DetectorBackend, ProcessingEngine
+from blob_store import file_digest
+from previews import BOX_COLOR, PREVIEW_SIZE, THUMB_SIZE, PreviewCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BOX = [400.0, 300.0, 1000.0, 500.0]                        # xyxy in original pixels
+
+class BoxBackend(DetectorBackend):
+    """Finds one plate at BOX, scaled to the frame it gets"""
+    needs_image = True
+
+    def __init__(self, name='box'):
+        self.name = name
+        self.frames = []
+
+    def detect(self, image_path, image=None):
+        self.frames.append(image)
+        factor = image.shape[1] / 2000
+        return [{'plate': '12-34567', 'confidence': 0.9, 'bbox': [v * factor for v in BOX]}]
+
+class HalfScale:
+    """ResolutionPolicy stand-in decoding every frame at 1/2"""
+
+    def scale_for(self, camera_id):
+        return 0.5
+
+    def record(self, camera_id, heights, scale=1.0):
+        pass
+
+def create_frame(inbox: Path, name: str, size=(1000, 2000), value: int = 128) -> Path:
+    path = inbox / name
+    cv2.imwrite(str(path), np.full(size + (3,), value, np.uint8))
+    return path
+
+def box_drawn(preview, factor: float) -> bool:
+    """The middle of the box's top edge is box coloured"""
+    x = round((BOX[0] + BOX[2]) / 2 * factor)
+    y = round(BOX[1] * factor)
+    return bool(np.abs(preview[y, x].astype(int) - BOX_COLOR).max() < 40)
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_render(inbox: Path) -> bool:
+    """Thumbnail and annotated preview rendered from the detection decode"""
+    frame = create_frame(inbox, 'photo_1.jpg')
+    cache = PreviewCache(str(inbox))
+    backend = BoxBackend()
+    entry = ProcessingEngine(backend, previews=cache).process_image(str(frame))
+
+    digest = file_digest(str(frame))
+    ok = check(entry['sha256'] == digest and entry['thumbnail'] == cache.thumbnail_key(digest) and
+               entry['preview'] == cache.preview_key(digest, 'box'), "Entry carries both keys")
+    thumbnail = cv2.imread(str(cache.path(entry['thumbnail'])))
+    preview = cv2.imread(str(cache.path(entry['preview'])))
+    ok &= check(thumbnail.shape[:2] == (THUMB_SIZE // 2, THUMB_SIZE), f"Thumbnail fitted to {THUMB_SIZE} px")
+    ok &= check(preview.shape[:2] == (PREVIEW_SIZE // 2, PREVIEW_SIZE), f"Preview fitted to {PREVIEW_SIZE} px")
+    ok &= check(box_drawn(preview, PREVIEW_SIZE / 2000) and not box_drawn(thumbnail, THUMB_SIZE / 2000),
+                "Plate box drawn on the preview only")
+
+    small = create_frame(inbox, 'photo_2.jpg', size=(600, 800), value=90)
+    entry = ProcessingEngine(backend, previews=cache).process_image(str(small))
+    preview = cv2.imread(str(cache.path(entry['preview'])))
+    ok &= check(preview.shape[:2] == (600, 800) and box_drawn(preview, 800 / 2000),
+                "Frame smaller than the preview kept at its size")
+    ok &= check(int(np.abs(backend.frames[-1].astype(int) - 90).max()) < 5, "Frame the backend saw left untouched")
+    return ok
+
+def test_downscaled(inbox: Path) -> bool:
+    """Boxes of a downscaled decode land in the right place"""
+    frame = create_frame(inbox, 'photo_1.jpg', size=(1000, 2000))
+    cache = PreviewCache(str(inbox))
+    backend = BoxBackend()
+    entry = ProcessingEngine(backend, resolution=HalfScale(), previews=cache).process_image(str(frame))
+    preview = cv2.imread(str(cache.path(entry['preview'])))
+    ok = check(backend.frames[-1].shape[:2] == (500, 1000) and entry['scale'] == 0.5, "Frame decoded at 1/2")
+    ok &= check(preview.shape[:2] == (500, 1000) and box_drawn(preview, 0.5),
+                "Preview box at the detection's place in the smaller frame")
+    return ok
+
+def test_cached(inbox: Path) -> bool:
+    """Known frames cost no encode; a new backend adds only its preview"""
+    frame = create_frame(inbox, 'photo_1.jpg')
+    copy = inbox / 'copy.jpg'
+    shutil.copyfile(frame, copy)
+    cache = PreviewCache(str(inbox))
+    first = ProcessingEngine(BoxBackend(), previews=cache).process_image(str(frame))
+    ok = check(cache.generated == 2, "First frame: thumbnail and preview encoded")
+    second = ProcessingEngine(BoxBackend(), previews=cache).process_image(str(copy))
+    ok &= check(cache.generated == 2 and second['preview'] == first['preview'], "Same content: cached keys reused")
+    other = ProcessingEngine(BoxBackend('other'), previews=cache).process_image(str(frame))
+    ok &= check(cache.generated == 3 and other['thumbnail'] == first['thumbnail'] and
+                other['preview'] != first['preview'], "New backend: own preview, shared thumbnail")
+
+    cache.path(first['preview']).unlink()
+    keys = cache.render(first['sha256'], 'box', first['detections'], image_path=str(frame))
+    ok &= check(cache.generated == 4 and cache.path(keys['preview']).exists(),
+                "Missing preview decoded from the file and rendered again")
+    return ok
+
+def test_gc(inbox: Path) -> bool:
+    """Previews of frames gone from the blob store are collected"""
+    cache = PreviewCache(str(inbox))
+    live, gone = create_frame(inbox, 'photo_1.jpg'), create_frame(inbox, 'photo_2.jpg', value=60)
+    engine = ProcessingEngine(BoxBackend(), previews=cache)
+    live_entry, gone_entry = engine.process_image(str(live)), engine.process_image(str(gone))
+    objects = inbox / 'objects'
+    digest = live_entry['sha256']
+    (objects / digest[:2]).mkdir(parents=True)
+    (objects / digest[:2] / f"{digest}.jpg").write_bytes(b'')
+    (objects / digest[:2] / f"{digest}.box.json").write_text('{}')
+
+    stats = cache.gc(objects)
+    ok = check(stats['removed'] == 2 and stats['freed_bytes'] > 0, "Both files of the dropped frame removed")
+    ok &= check(cache.path(live_entry['thumbnail']).exists() and cache.path(live_entry['preview']).exists() and
+                not cache.path(gone_entry['preview']).exists(), "Live frame's previews kept")
+    ok &= check(gone_entry['sha256'][:2] == digest[:2] or not (cache.root / gone_entry['sha256'][:2]).exists(),
+                "Emptied shard directory removed")
+    return ok
+
+def test_processor_keys(inbox: Path) -> bool:
+    """The processor lists preview keys per image"""
+    frame = create_frame(inbox, 'photo_1.jpg')
+    entry = ProcessingEngine(BoxBackend(), previews=PreviewCache(str(inbox))).process_image(str(frame))
+    ai_data = {'images': [entry, {'image': 'photo_2.jpg', 'status': 'error'}]}
+    return check(image_previews(ai_data) == [{'image': 'photo_1.jpg', 'thumbnail': entry['thumbnail'],
+                                              'preview': entry['preview']}],
+                 "Only images with previews listed")
+
+def main():
+    ok = True
+    for test in (test_render, test_downscaled, test_cached, test_gc, test_processor_keys):
+        inbox = Path(tempfile.mkdtemp(prefix='previews_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Previews test passed" if ok else "❌ Previews test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared processing engine
+Runs a fake backend (plates on some frames, none on others, a failure on
+one) through ProcessingEngine and the AI service's case processor, and
+checks the per-image statuses, the best detection, that a stored result is
+reused until a frame changes, and that the service's processing summary
+counts frames without plates as processed.
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
+import backend_manager
+import ai_plate_recognition_service as service
+from alpr_engine import DetectorBackend, ProcessingEngine, image_results
+from backend_manager import BackendControl, spec_label
+from previews import PREVIEWS_ENV
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+original_load_spec = backend_manager.load_spec
+
+class FakeBackend(DetectorBackend):
+    """Two plates on photo_1, none on photo_2, fails on broken.jpg; counts its calls"""
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, image_path, image=None):
+        self.calls += 1
+        name = os.path.basename(image_path)
+        if name == 'broken.jpg':
+            raise RuntimeError('corrupt frame')
+        if name == 'photo_1.jpg':
+            return [{'plate': '12-34567', 'confidence': 0.7, 'bbox': [0, 0, 10, 10]},
+                    {'plate': '12-34561', 'confidence': 0.9, 'bbox': [20, 0, 30, 10]}]
+        return []
+
+def create_case(inbox: Path, case_id: str, frames=('photo_1.jpg', 'photo_2.jpg', 'broken.jpg')) -> Path:
+    case_path = inbox / 'camera001' / '2025-10-14' / case_id
+    case_path.mkdir(parents=True)
+    for name in frames:
+        (case_path / name).write_bytes(name.encode())
+    (case_path / 'verdict.json').write_text(json.dumps({'camera_id': 'camera001', 'decision': 'violation'}))
+    return case_path
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_engine_result(inbox: Path) -> bool:
+    """Per-image statuses, best detection and the legacy per-image view"""
+    case_path = create_case(inbox, 'case001')
+    result = ProcessingEngine(FakeBackend()).process_case(str(case_path))
+
+    statuses = {entry['image']: entry['status'] for entry in result['images']}
+    ok = check(statuses == {'photo_1.jpg': 'success', 'photo_2.jpg': 'no_plates_detected', 'broken.jpg': 'error'},
+               "Frames marked success, no_plates_detected and error")
+    ok &= check(result['status_counts'] == {'success': 1, 'no_plates_detected': 1, 'error': 1}, "Status counts")
+    ok &= check(result['plate_number'] == '12-34561' and result['best_detection']['image'] == 'photo_1.jpg',
+                "Most confident plate is the best detection")
+    ok &= check(all(d['image'] == 'photo_1.jpg' and d['method'] == 'fake' for d in result['detections']),
+                "Detections carry their image and backend")
+    legacy = {Path(item['image_path']).name: item for item in image_results(result)}
+    ok &= check(legacy['photo_1.jpg']['plates_detected'] == 2 and legacy['broken.jpg']['error'] == 'corrupt frame',
+                "Legacy per-image view keeps plate counts and errors")
+    return ok
+
+def test_result_reuse(inbox: Path) -> bool:
+    """A stored result is reused until a frame changes"""
+    case_path = create_case(inbox, 'case001')
+    backend = FakeBackend()
+    engine = ProcessingEngine(backend)
+    first = engine.process_case(str(case_path))
+    ok = check(backend.calls == 3 and engine.result_path(str(case_path)).exists(), "Result saved per backend")
+
+    again = engine.process_case(str(case_path))
+    ok &= check(backend.calls == 3 and again['processed_at'] == first['processed_at'],
+                "Unchanged case reuses the stored result")
+    (case_path / 'photo_2.jpg').write_bytes(b'a different frame')
+    engine.process_case(str(case_path))
+    ok &= check(backend.calls == 6, "Changed frame size reruns the backend")
+    stat = os.stat(case_path / 'photo_2.jpg')
+    os.utime(case_path / 'photo_2.jpg', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    engine.process_case(str(case_path))
+    ok &= check(backend.calls == 9, "Changed frame mtime reruns the backend")
+    engine.process_case(str(case_path), force=True)
+    ok &= check(backend.calls == 12, "force=True always reruns")
+    return ok
+
+def test_service_summary(inbox: Path) -> bool:
+    """The service counts frames without plates as processed"""
+    backend_manager.load_spec = lambda spec: FakeBackend() if spec['backend'] == 'fake' else original_load_spec(spec)
+    BackendControl(str(inbox), 'service').update(primary={'backend': 'fake'})
+    case_path = create_case(inbox, 'case001')
+    alpr = service.ALPRProcessor(str(inbox))
+    results = service.ViolationCaseProcessor(alpr).process_case(case_path)
+
+    summary = results['processing_summary']
+    ok = check(alpr.engine.backend_name == spec_label({'backend': 'fake'}), "Service runs the configured backend")
+    ok &= check(summary['success_count'] == 2 and summary['no_plates_count'] == 1 and summary['error_count'] == 1,
+                "success_count includes the frame without plates, which is also counted on its own")
+    ok &= check(results['images_processed'] == 3 and results['total_plates_detected'] == 2, "Case totals")
+    ok &= check(json.loads((case_path / 'ai' / 'ai_detection_results.json').read_text()) == results,
+                "Results file matches the returned results")
+    return ok
+
+def main():
+    # Test frames are not decodable images
+    os.environ[PREVIEWS_ENV] = '0'
+    ok = True
+    for test in (test_engine_result, test_result_reuse, test_service_summary):
+        inbox = Path(tempfile.mkdtemp(prefix='engine_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Processing engine test passed" if ok else "❌ Processing engine test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
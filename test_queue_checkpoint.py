@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Test script for the AI service's graceful drain and queue checkpoint
+Runs the service over a temporary inbox with a backend that holds the first
+case until released, stops it mid-queue and checks that the case in hand is
+finished (or recorded as interrupted when it outlasts the drain timeout),
+that the rest of the queue is checkpointed, that the next start resumes the
+saved cases in order with interrupted ones last and picks up cases that
+arrived while it was down, that a case interrupted twice is dropped, and
+that a replacement waits for its predecessor's checkpoint.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'backend'))
+import backend_manager
+import ai_plate_recognition_service as service
+from alpr_engine import DetectorBackend
+from backend_manager import BackendControl
+from previews import PREVIEWS_ENV
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+original_load_spec = backend_manager.load_spec
+
+class GatedBackend(DetectorBackend):
+    """Holds every frame of case001 until released; other cases return at once"""
+    name = 'gated'
+    release = threading.Event()
+
+    def detect(self, image_path, image=None):
+        if 'case001' in image_path:
+            GatedBackend.release.wait(timeout=10)
+        return [{'plate': '12-34567', 'confidence': 0.9, 'bbox': [0, 0, 10, 10]}]
+
+def create_case(inbox: Path, case_id: str) -> Path:
+    """A complete upload: the verdict manifest lists its photo with the final size"""
+    case_path = inbox / 'camera001' / '2025-10-14' / case_id
+    case_path.mkdir(parents=True)
+    (case_path / 'photo_1.jpg').write_bytes(b'frame')
+    (case_path / 'verdict.json').write_text(json.dumps({
+        'camera_id': 'camera001', 'photos': [{'filename': 'photo_1.jpg', 'size': 5}]}))
+    return case_path
+
+def create_service(inbox: Path) -> 'service.AIPlateRecognitionService':
+    BackendControl(str(inbox), 'service').update(primary={'backend': 'gated'})
+    return service.AIPlateRecognitionService(str(inbox))
+
+def start_blocked(inbox: Path, cases: int) -> 'service.AIPlateRecognitionService':
+    """Start a service over cases and wait until it is held on case001"""
+    for index in range(1, cases + 1):
+        create_case(inbox, f"case{index:03d}")
+    ai_service = create_service(inbox)
+    ai_service.start()
+    deadline = time.time() + 10
+    while ai_service.current_case is None and time.time() < deadline:
+        time.sleep(0.05)
+    return ai_service
+
+def release_when_stopping(ai_service):
+    """Let the held case finish once stop() has ended intake"""
+    def release():
+        while ai_service.running:
+            time.sleep(0.01)
+        GatedBackend.release.set()
+    threading.Thread(target=release, daemon=True).start()
+
+def processed(inbox: Path) -> list:
+    return sorted(path.parent.parent.name for path in inbox.glob('camera001/*/*/ai/ai_detection_results.json'))
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_drain(inbox: Path) -> bool:
+    """Stopping finishes the case in hand and checkpoints the rest"""
+    ai_service = start_blocked(inbox, 4)
+    ok = check(ai_service.current_case is not None and ai_service.current_case.name == 'case001',
+               "Worker busy with case001")
+    release_when_stopping(ai_service)
+    ai_service.stop()
+
+    checkpoint = json.loads(ai_service.checkpoint_path.read_text())
+    ok &= check(processed(inbox) == ['case001'], "Case in hand finished, nothing else started")
+    ok &= check([Path(p).name for p in checkpoint['pending']] == ['case002', 'case003', 'case004'] and
+                checkpoint['in_flight'] == [], "Remaining queue checkpointed in order")
+    return ok
+
+def test_interrupted(inbox: Path) -> bool:
+    """A case outlasting the drain is retried last, and dropped the second time"""
+    drain_timeout = service.DRAIN_TIMEOUT
+    service.DRAIN_TIMEOUT = 0.3
+    try:
+        ai_service = start_blocked(inbox, 3)
+        ai_service.stop()
+    finally:
+        service.DRAIN_TIMEOUT = drain_timeout
+    checkpoint = json.loads(ai_service.checkpoint_path.read_text())
+    ok = check([Path(e['case']).name for e in checkpoint['in_flight']] == ['case001'] and
+               checkpoint['in_flight'][0]['attempts'] == 1, "Unfinished case recorded with its attempt")
+    GatedBackend.release.set()
+    ai_service.worker_thread.join(timeout=10)
+    shutil.rmtree(inbox / 'camera001' / '2025-10-14' / 'case001' / 'ai', ignore_errors=True)
+
+    time.sleep(0.05)
+    create_case(inbox, 'case004')                           # uploaded while the service was down
+    resumed = create_service(inbox)
+    ok &= check(resumed.resume_from_checkpoint(), "Checkpoint resumed")
+    queued = [path.name for path in list(resumed.processor_queue.queue)]
+    ok &= check(queued == ['case002', 'case003', 'case001', 'case004'],
+                "Saved cases first, interrupted case last, then new arrivals")
+    ok &= check(not resumed.checkpoint_path.exists() and not resumed.resume_from_checkpoint(),
+                "Checkpoint consumed: a crash now falls back to a full scan")
+
+    resumed.checkpoint_path.write_text(json.dumps({
+        'saved_at': time.time(), 'pending': [],
+        'in_flight': [{'case': str(inbox / 'camera001' / '2025-10-14' / 'case001'), 'attempts': 2}]}))
+    again = create_service(inbox)
+    again.resume_from_checkpoint()
+    ok &= check('case001' not in [path.name for path in list(again.processor_queue.queue)],
+                "A case interrupted twice is not retried")
+    return ok
+
+def test_handoff(inbox: Path) -> bool:
+    """A replacement resumes only after its predecessor saved the checkpoint"""
+    for index in range(1, 3):
+        case_path = create_case(inbox, f"case{index:03d}")
+        os.utime(case_path, (time.time() - 3600, time.time() - 3600))    # long before the handoff
+    predecessor, replacement = create_service(inbox), create_service(inbox)
+    predecessor.processor_queue.put(inbox / 'camera001' / '2025-10-14' / 'case002')
+    predecessor.started = True
+    predecessor.hold_checkpoint()                           # draining
+
+    replacement.running = True
+    taking_over = threading.Thread(target=replacement.take_over, daemon=True)
+    taking_over.start()
+    time.sleep(0.3)
+    ok = check(taking_over.is_alive() and replacement.processor_queue.empty(), "Replacement waits for the handoff")
+    predecessor.save_queue_checkpoint()
+    predecessor.release_checkpoint()
+    taking_over.join(timeout=5)
+    ok &= check([path.name for path in list(replacement.processor_queue.queue)] == ['case002'],
+                "Replacement resumes the predecessor's queue, not a full scan")
+    replacement.running = False
+    replacement.release_checkpoint()
+
+    standby = create_service(inbox)
+    standby.stop()
+    ok &= check(not standby.checkpoint_path.exists(), "A standby stopped before activation writes no checkpoint")
+    return ok
+
+def main():
+    # Test frames are not decodable images
+    os.environ[PREVIEWS_ENV] = '0'
+    backend_manager.load_spec = lambda spec: GatedBackend() if spec['backend'] == 'gated' else original_load_spec(spec)
+    ok = True
+    for test in (test_drain, test_interrupted, test_handoff):
+        inbox = Path(tempfile.mkdtemp(prefix='queue_checkpoint_test_'))
+        GatedBackend.release.clear()
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            GatedBackend.release.set()
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Queue checkpoint test passed" if ok else "❌ Queue checkpoint test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
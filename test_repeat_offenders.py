@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script for repeat-offender detection
+Writes results through AICaseProcessor.save_ai_json on a temporary inbox
+and checks the sliding-window counts of the change feed consumer against a
+brute-force count of the same sightings: a reprocessed case counts once,
+the alert fires once when a plate crosses the threshold, old days leave
+the window, a restarted or second detector resumes from the checkpoint
+without recounting, and the bounded per-day structures keep heavy hitters
+and their error rate.
+"""
+
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+from ai_case_processor import AICaseProcessor
+from repeat_offenders import (SEEN_FILTER_CAPACITY, SEEN_FILTER_ERROR_RATE, TOP_K,
+                              DayBucket, RepeatOffenderDetector, SeenFilter)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# (camera, day, case_id, plate)
+SIGHTINGS = [
+    ('camera001', '2025-10-10', 'case001', '12-34567'),
+    ('camera002', '2025-10-11', 'case001', '12 34567'),
+    ('camera001', '2025-10-12', 'case002', '1234567'),
+    ('camera003', '2025-10-12', 'case001', '55-55555'),
+    ('camera003', '2025-10-13', 'case002', '55-55555'),
+    ('camera001', '2025-10-13', 'case003', ''),
+    ('camera002', '2025-10-14', 'case002', '99-00001'),
+]
+
+def save_result(processor: AICaseProcessor, inbox: Path, camera: str, day: str, case_id: str, plate: str):
+    """Write a case's ai.json the way the processor does after detection"""
+    ai_dir = inbox / camera / day / case_id / 'ai'
+    ai_dir.mkdir(parents=True, exist_ok=True)
+    processor.save_ai_json(str(ai_dir), {
+        'camera_id': camera, 'date': day, 'case_path': str(ai_dir.parent),
+        'plate_number': plate, 'confidence': 0.9, 'detections': []
+    })
+
+def brute_force(sightings) -> Counter:
+    """Distinct cases per normalized plate"""
+    cases = {(camera, day, case_id, plate.replace('-', '').replace(' ', ''))
+             for camera, day, case_id, plate in sightings if plate}
+    return Counter(plate for *_, plate in cases)
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_feed_counts(inbox: Path) -> bool:
+    """Window counts follow the change feed; reprocessing counts once"""
+    processor = AICaseProcessor(str(inbox))
+    for sighting in SIGHTINGS:
+        save_result(processor, inbox, *sighting)
+    save_result(processor, inbox, *SIGHTINGS[0])            # reprocessed case
+    detector = RepeatOffenderDetector(str(inbox), min_cases=3)
+    alerts = detector.sync()
+
+    expected = brute_force(SIGHTINGS)
+    ok = check(all(detector.estimate(plate) == count for plate, count in expected.items()),
+               f"Counts match a brute-force count {dict(expected)}")
+    ok &= check([alert['plate'] for alert in alerts] == ['1234567'], "Alert fired once, on the third case")
+    flagged = processor.get_repeat_offenders()
+    ok &= check([entry['plate'] for entry in flagged] == ['1234567'] and
+                flagged[0]['cameras'] == ['camera001', 'camera002'] and
+                (flagged[0]['first_seen'], flagged[0]['last_seen']) == ('2025-10-10', '2025-10-12'),
+                "Flagged plate with its cameras and first/last day")
+    ok &= check(RepeatOffenderDetector(str(inbox), min_cases=3, min_cameras=3).flagged() == [],
+                "min_cameras keeps single-area plates out")
+
+    save_result(processor, inbox, 'camera003', '2025-10-14', 'case003', '12-34567')
+    ok &= check(detector.sync() == [] and detector.estimate('12-34567') == 4,
+                "New sighting counted without a second alert")
+    return ok
+
+def test_window(inbox: Path) -> bool:
+    """Days older than the window stop counting"""
+    detector = RepeatOffenderDetector(str(inbox), window_days=3, min_cases=2)
+    start = date(2025, 10, 1)
+    for offset in range(5):
+        detector.add('12-34567', (start + timedelta(days=offset)).isoformat(), 'camera001', f"case{offset}")
+
+    ok = check(sorted(detector.buckets) == ['2025-10-03', '2025-10-04', '2025-10-05'], "Only the last three days kept")
+    ok &= check(detector.estimate('12-34567') == 3, "Count covers the window only")
+    ok &= check(detector.add('12-34567', '2025-10-02', 'camera001', 'late') is None and
+                detector.estimate('12-34567') == 3, "A sighting older than the window is ignored")
+    return ok
+
+def test_checkpoint(inbox: Path) -> bool:
+    """A restarted or second detector resumes from the checkpoint"""
+    processor = AICaseProcessor(str(inbox))
+    for sighting in SIGHTINGS[:3]:
+        save_result(processor, inbox, *sighting)
+    service = RepeatOffenderDetector(str(inbox))
+    service.sync()
+
+    cli = RepeatOffenderDetector(str(inbox))
+    ok = check(cli.estimate('12-34567') == 3 and cli.sync() == [] and cli.estimate('12-34567') == 3,
+               "Restarted detector reads the checkpoint and recounts nothing")
+    for sighting in SIGHTINGS[3:]:
+        save_result(processor, inbox, *sighting)
+    cli.sync()
+    service.sync()                                          # the CLI checkpointed further meanwhile
+    expected = brute_force(SIGHTINGS)
+    ok &= check(all(service.estimate(plate) == count and cli.estimate(plate) == count
+                    for plate, count in expected.items()), "Interleaved detectors agree, nothing double counted")
+    ok &= check(json.loads((inbox / '.ai_repeat_offenders.json').read_text())['position']['seq'] == len(SIGHTINGS),
+                "Checkpoint records the feed position")
+    return ok
+
+def test_bounded_day(inbox: Path) -> bool:
+    """Heavy hitters survive a flood of one-off plates; the seen filter keeps its error rate"""
+    bucket = DayBucket('2025-10-14')
+    for index in range(TOP_K * 4):
+        bucket.add(f"{index:07d}", 'camera001', f"once{index}")
+        if index % 8 == 0:
+            bucket.add('1234567', 'camera002', f"heavy{index}")
+    heavy = TOP_K * 4 // 8
+    ok = check(len(bucket.top) <= TOP_K, f"Top list bounded at {TOP_K} plates")
+    ok &= check('1234567' in bucket.top and bucket.sketch.estimate('1234567') >= heavy and
+                bucket.top['1234567']['count'] >= heavy, "Heavy hitter kept with a count that never undercounts")
+
+    seen = SeenFilter()
+    for index in range(SEEN_FILTER_CAPACITY):
+        seen.add(f"case{index}|1234567")
+    probes = 20000
+    false_positives = sum(f"other{index}|1234567" in seen for index in range(probes))
+    ok &= check(false_positives / probes <= SEEN_FILTER_ERROR_RATE * 5,
+                f"{false_positives} false positives in {probes} probes at capacity")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_feed_counts, test_window, test_checkpoint, test_bounded_day):
+        inbox = Path(tempfile.mkdtemp(prefix='offenders_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Repeat offenders test passed" if ok else "❌ Repeat offenders test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for the adaptive resolution policy
+Feeds plate heights to ResolutionPolicy and checks that a camera is only
+downscaled once it has enough samples, to the smallest factor that keeps
+its low-percentile plate legible, that probe frames run at full resolution
+and send the camera back when they find a small plate, that the engine
+decodes downscaled frames and reports boxes in original pixels, and that
+nodes sharing the profile file keep each other's cameras.
+"""
+
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from alpr_engine import DetectorBackend, ProcessingEngine
+from resolution_policy import (HEIGHT_PERCENTILE, MIN_PLATE_HEIGHT, MIN_SAMPLES, PROBE_EVERY,
+                               REEVALUATE_EVERY, SCALES, ResolutionPolicy)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class BoxBackend(DetectorBackend):
+    """Finds one plate at a fixed place of the original frame, scaled to the frame it gets"""
+    name = 'box'
+    needs_image = True
+
+    def __init__(self, text='12-34567'):
+        self.text = text
+        self.shapes = []
+
+    def detect(self, image_path, image=None):
+        self.shapes.append(image.shape[:2])
+        factor = image.shape[1] / 800
+        return [{'plate': self.text, 'confidence': 0.9,
+                 'bbox': [100 * factor, 200 * factor, 300 * factor, 280 * factor]}]
+
+def expected_scale(heights) -> float:
+    """Smallest factor keeping the HEIGHT_PERCENTILE plate at MIN_PLATE_HEIGHT (brute force)"""
+    low = sorted(heights)[int(HEIGHT_PERCENTILE * len(heights))]
+    return min([s for s in SCALES if low * s >= MIN_PLATE_HEIGHT] or [1.0])
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_learned_scale(inbox: Path) -> bool:
+    """Cameras are downscaled only with enough samples, to the smallest legible factor"""
+    policy = ResolutionPolicy(str(inbox))
+    policy.record('camera001', [120.0] * (MIN_SAMPLES - 1))
+    ok = check(policy.scale_for('camera001') == 1.0, f"Full resolution below {MIN_SAMPLES} samples")
+    policy.record('camera001', [120.0] * REEVALUATE_EVERY)
+    ok &= check(policy.scale_for('camera001') == expected_scale([120.0] * 54) == 0.25, "Large plates: 1/4")
+
+    heights = [60.0] * 40 + [30.0]
+    policy.record('camera002', heights)
+    ok &= check(policy.scale_for('camera002') == expected_scale(heights) == 0.5, "Medium plates: 1/2")
+    heights = [200.0] * 20 + [25.0] * 20
+    policy.record('camera003', heights)
+    ok &= check(policy.scale_for('camera003') == expected_scale(heights) == 1.0,
+                "Small low-percentile plates keep full resolution")
+    ok &= check(policy.scale_for(None) == 1.0 and policy.scale_for('camera999') == 1.0,
+                "Unknown cameras run at full resolution")
+    return ok
+
+def test_probes(inbox: Path) -> bool:
+    """Probe frames run at full resolution; a small probe plate resets the camera"""
+    policy = ResolutionPolicy(str(inbox))
+    policy.record('camera001', [120.0] * MIN_SAMPLES)
+    scales = [policy.scale_for('camera001') for _ in range(PROBE_EVERY * 2)]
+    ok = check(scales.count(1.0) == 2 and scales[PROBE_EVERY - 1] == 1.0 and set(scales) == {0.25, 1.0},
+               f"Every {PROBE_EVERY}th frame is a full-resolution probe")
+
+    policy.record('camera001', [150.0], scale=0.25)
+    ok &= check(policy.scale_for('camera001') == 0.25, "Downscaled frames do not trigger the fallback")
+    policy.record('camera001', [MIN_PLATE_HEIGHT * 2.0], scale=1.0)
+    summary = policy.summary()['cameras']['camera001']
+    ok &= check(summary['scale'] == 1.0 and summary['fallbacks'] == 1 and summary['probes'] == 2,
+                "A probe plate too small for 1/4 sends the camera back to full resolution")
+    return ok
+
+def test_engine(inbox: Path) -> bool:
+    """The engine decodes downscaled frames and reports original pixels"""
+    frame = inbox / 'photo_1.jpg'
+    cv2.imwrite(str(frame), np.full((600, 800, 3), 128, np.uint8))
+    policy = ResolutionPolicy(str(inbox))
+    policy.record('camera001', [80.0] * MIN_SAMPLES)
+    backend = BoxBackend()
+    engine = ProcessingEngine(backend, resolution=policy)
+
+    entry = engine.process_image(str(frame), camera_id='camera001')
+    ok = check(backend.shapes[-1] == (300, 400) and entry['scale'] == 0.5, "Frame decoded at 1/2")
+    ok &= check(entry['detections'][0]['bbox'] == [100.0, 200.0, 300.0, 280.0], "Box mapped back to original pixels")
+    ok &= check(list(policy.cameras['camera001'].heights)[-1] == 80.0, "Recorded height is in original pixels")
+
+    entry = engine.process_image(str(frame), camera_id='camera002')
+    ok &= check(backend.shapes[-1] == (600, 800) and 'scale' not in entry, "Unknown camera decoded in full")
+    samples = len(policy.cameras['camera002'].heights)
+    backend.text = None
+    engine.process_image(str(frame), camera_id='camera002')
+    ok &= check(len(policy.cameras['camera002'].heights) == samples, "Boxes without OCR text are not recorded")
+    return ok
+
+def test_shared_file(inbox: Path) -> bool:
+    """Nodes sharing the profile file keep each other's cameras"""
+    node_a, node_b = ResolutionPolicy(str(inbox)), ResolutionPolicy(str(inbox))
+    node_a.record('camera001', [120.0] * MIN_SAMPLES)
+    node_b.record('camera002', [60.0] * MIN_SAMPLES)
+    node_a.save(force=True)
+    node_b.save(force=True)
+
+    restarted = ResolutionPolicy(str(inbox))
+    ok = check({c: p.scale for c, p in restarted.cameras.items()} == {'camera001': 0.25, 'camera002': 0.5},
+               "Both nodes' cameras survive in the shared file")
+    node_a.reset('camera001')
+    cameras = json.loads((inbox / '.ai_resolution.json').read_text())['cameras']
+    ok &= check(list(cameras) == ['camera002'], "Resetting one camera leaves the other node's camera")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_learned_scale, test_probes, test_engine, test_shared_file):
+        inbox = Path(tempfile.mkdtemp(prefix='resolution_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Resolution policy test passed" if ok else "❌ Resolution policy test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for the columnar results archive
+Builds a temporary inbox with ai.json cases, a legacy alpr_results.json
+case and a packed day, compacts the closed days and checks the rows and
+queries against the per-case JSON, that the open day is left out, that a
+current month is not rewritten, and that a new closed day rebuilds it.
+"""
+
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from day_pack import pack_day
+from results_archive import ResultsArchive
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TODAY = date(2025, 10, 20)
+
+def create_case(inbox: Path, camera: str, day: str, case_id: str, plate: str, confidence: float) -> Path:
+    """A case with an ai.json result"""
+    ai_dir = inbox / camera / day / case_id / 'ai'
+    ai_dir.mkdir(parents=True)
+    (ai_dir / 'ai.json').write_text(json.dumps({
+        'plate_number': plate, 'confidence': confidence, 'total_images': 2,
+        'detections': [{'plate': plate, 'confidence': confidence}] if plate else [],
+        'processed_at': f"{day}T12:00:00"
+    }))
+    return ai_dir.parent
+
+def create_legacy_case(inbox: Path, camera: str, day: str, case_id: str, plate: str) -> Path:
+    """A case processed by an older pipeline (results/alpr_results.json only)"""
+    results_dir = inbox / camera / day / case_id / 'ai' / 'results'
+    results_dir.mkdir(parents=True)
+    (results_dir / 'alpr_results.json').write_text(json.dumps([
+        {'plates': [{'plate_text': plate, 'confidence': 0.6}], 'processed_at': f"{day}T08:00:00"},
+        {'plates': [{'plate_text': plate, 'confidence': 0.8}], 'processed_at': f"{day}T08:00:01"},
+    ]))
+    return results_dir.parent.parent
+
+def create_inbox(inbox: Path):
+    create_case(inbox, 'camera001', '2025-10-01', 'case001', '12-34567', 0.9)
+    create_case(inbox, 'camera001', '2025-10-01', 'case002', '', 0.0)
+    create_case(inbox, 'camera001', '2025-10-02', 'case001', '12-34567', 0.7)
+    create_legacy_case(inbox, 'camera001', '2025-10-02', 'case002', '55-55555')
+    create_case(inbox, 'camera001', '2025-10-03', 'case001', '12-34567', 0.8)
+    pack_day(str(inbox), 'camera001', '2025-10-03')
+    create_case(inbox, 'camera002', '2025-09-30', 'case001', '12-34567', 0.5)
+    create_case(inbox, 'camera001', str(TODAY), 'case001', '99-99999', 0.9)  # still open
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_compact(inbox: Path) -> bool:
+    """Closed days become one array per camera-month"""
+    create_inbox(inbox)
+    archive = ResultsArchive(str(inbox))
+    summary = archive.compact(today=TODAY)
+
+    ok = check(archive.months() == [('camera001', '2025-10'), ('camera002', '2025-09')] and
+               summary['months_written'] == 2 and summary['rows'] == 6, "Two camera-months, six cases")
+    rows = archive.load('camera001', '2025-10')
+    ok &= check([(str(r['date']), r['case_id']) for r in rows] ==
+                [('2025-10-01', 'case001'), ('2025-10-01', 'case002'), ('2025-10-02', 'case001'),
+                 ('2025-10-02', 'case002'), ('2025-10-03', 'case001')],
+                "Rows sorted by date and case, packed day included, open day left out")
+    legacy = rows[3]
+    ok &= check(legacy['source'] == 'alpr_results' and legacy['plate'] == '55-55555' and
+                abs(legacy['confidence'] - 0.8) < 1e-6 and legacy['image_count'] == 2,
+                "Legacy result summarised by its best plate")
+    ok &= check(rows[0]['source'] == 'ai_json' and rows[0]['image_count'] == 2 and
+                str(rows[0]['processed_at']) == '2025-10-01T12:00:00', "ai.json row fields")
+
+    ok &= check(archive.plate_counts() == {'12-34567': 4, '55-55555': 1}, "Plate counts across cameras")
+    ok &= check(archive.repeat_offenders(min_cases=3) == {'12-34567': 4}, "Repeat offenders")
+    ok &= check(archive.plate_counts(start='2025-10-02', end='2025-10-02') == {'12-34567': 1, '55-55555': 1},
+                "Date range filter")
+    cameras = archive.camera_summary()
+    ok &= check(cameras['camera001']['count'] == 5 and cameras['camera001']['plate_detections'] == 4 and
+                abs(cameras['camera002']['average_confidence'] - 0.5) < 1e-6, "Per-camera summary")
+    ok &= check(sum(archive.confidence_histogram(bins=5)['counts']) == 6, "Histogram covers every row")
+    return ok
+
+def test_incremental(inbox: Path) -> bool:
+    """A current month is skipped; a new closed day rebuilds it"""
+    create_inbox(inbox)
+    archive = ResultsArchive(str(inbox))
+    archive.compact(today=TODAY)
+    built_at = archive.manifest('camera001', '2025-10')['built_at']
+
+    summary = archive.compact(today=TODAY)
+    ok = check(summary['months_written'] == 0 and summary['months_current'] == 2 and
+               archive.manifest('camera001', '2025-10')['built_at'] == built_at, "Second run rewrites nothing")
+    summary = archive.compact(today=date(2025, 10, 21))
+    ok &= check(summary['months_written'] == 1 and len(archive.load('camera001', '2025-10')) == 6 and
+                str(TODAY) in archive.manifest('camera001', '2025-10')['days'], "Newly closed day rebuilds its month")
+    ok &= check(archive.compact(force=True, today=date(2025, 10, 21))['months_written'] == 2,
+                "force=True rebuilds every month")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_compact, test_incremental):
+        inbox = Path(tempfile.mkdtemp(prefix='archive_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Results archive test passed" if ok else "❌ Results archive test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test script for inbox retention
+Builds a temporary inbox of processed cases and checks that pruned ai/
+copies fall back to the originals and are relinked on restore, and that
+archiving, restoring and deleting cases (hot or packed) keep the plate
+index, stats aggregates and repeat-offender counts in step.
+"""
+
+import sys
+import json
+import shutil
+import logging
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import retention
+from ai_case_processor import AICaseProcessor
+from ai_stats import STATS_FILE, StatsAggregator
+from change_feed import ChangeFeed
+from day_pack import pack_day, pack_path
+from plate_index import PLATE_INDEX_FILE, PlateIndex
+from repeat_offenders import RepeatOffenderDetector
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CAMERA = 'camera001'
+TODAY = date.today()
+# Two closed days inside the repeat-offender window, and the camera's newest day
+OLD_DAY = str(TODAY - timedelta(days=6))
+PACKED_DAY = str(TODAY - timedelta(days=5))
+NEW_DAY = str(TODAY - timedelta(days=1))
+
+def create_case(inbox: Path, day: str, case_id: str, plate: str) -> Path:
+    """A processed case: verdict, two frames, their ai/ copies and both result files"""
+    case_path = inbox / CAMERA / day / case_id
+    ai_dir = case_path / 'ai'
+    ai_dir.mkdir(parents=True)
+    (case_path / 'verdict.json').write_text(json.dumps({'camera_id': CAMERA, 'decision': 'violation'}))
+    images = ['photo_1.jpg', 'photo_2.jpg']
+    for name in images:
+        data = f"{case_id}/{name}".encode()
+        (case_path / name).write_bytes(data)
+        (ai_dir / name).write_bytes(data)
+    ai_data = {'camera_id': CAMERA, 'date': day, 'case_path': str(case_path), 'plate_number': plate,
+               'confidence': 0.9, 'images': [{'image': name} for name in images],
+               'detections': [{'plate': plate, 'confidence': 0.9, 'image': images[0]}]}
+    (ai_dir / 'ai.json').write_text(json.dumps(ai_data))
+    (ai_dir / 'ai_detection_results.json').write_text(json.dumps({
+        'camera_id': CAMERA,
+        'detected_plates': [{'plate_text': plate, 'confidence': 0.9}],
+        'processed_images': [{'filename': name, 'ai_path': str(ai_dir / name)} for name in images]
+    }))
+    return case_path
+
+def snapshot(root: Path) -> dict:
+    """Relative path -> (bytes, mtime_ns) of every file under root"""
+    return {str(path.relative_to(root)): (path.read_bytes(), path.stat().st_mtime_ns)
+            for path in sorted(root.rglob('*')) if path.is_file()}
+
+def set_policy(inbox: Path, **default):
+    (inbox / retention.RETENTION_FILE).write_text(json.dumps({'default': default}))
+
+def plate_cases(inbox: Path, plate: str) -> set:
+    return {row['case_path'] for row in PlateIndex(str(inbox / PLATE_INDEX_FILE)).exact(plate)}
+
+def stats_total(inbox: Path) -> int:
+    return StatsAggregator(str(inbox / STATS_FILE)).load()['total']['count']
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_derived_prune(inbox: Path) -> bool:
+    """Prune ai/ copies, fall back to the originals, relink on restore"""
+    case_path = create_case(inbox, OLD_DAY, 'case000', '22-00000')
+    create_case(inbox, NEW_DAY, 'case000', '22-00001')
+    processor = AICaseProcessor(str(inbox))
+
+    retention.RetentionManager(str(inbox)).run(today=TODAY)
+    ok = check((case_path / 'ai' / 'photo_1.jpg').exists(), "ai/ copies kept by default")
+
+    set_policy(inbox, derived_days=3, hot_days={'violation': 30})
+    stats = retention.RetentionManager(str(inbox)).run(today=TODAY)
+    ok &= check(stats['derived_deleted'] == 2 and not (case_path / 'ai' / 'photo_1.jpg').exists(),
+                "ai/ copies older than derived_days pruned")
+    ok &= check((inbox / CAMERA / NEW_DAY / 'case000' / 'ai' / 'photo_1.jpg').exists(), "Newer copies kept")
+    case = next(c for c in processor.iter_processed_cases(date_filter=OLD_DAY))
+    ok &= check(case['ai_images'] == [str(case_path / 'photo_1.jpg'), str(case_path / 'photo_2.jpg')],
+                "Readers fall back to the originals")
+    ok &= check(retention.restore_derived(str(case_path)) == 2 and
+                (case_path / 'ai' / 'photo_1.jpg').read_bytes() == (case_path / 'photo_1.jpg').read_bytes(),
+                "restore_derived relinks the copies")
+    return ok
+
+def test_archive_restore(inbox: Path) -> bool:
+    """Archive closed days (one of them packed), then restore a case"""
+    hot = create_case(inbox, OLD_DAY, 'case000', '33-00000')
+    packed = create_case(inbox, PACKED_DAY, 'case000', '33-00000')
+    create_case(inbox, NEW_DAY, 'case000', '33-00000')
+    processor = AICaseProcessor(str(inbox))
+    processor.rebuild_stats()
+    processor.rebuild_plate_index()
+    before = snapshot(hot)
+    pack_day(str(inbox), CAMERA, PACKED_DAY)
+
+    ok = check(len(plate_cases(inbox, '3300000')) == 3 and stats_total(inbox) == 3, "Three cases indexed")
+    set_policy(inbox, hot_days={'violation': 2}, archive_days={'violation': None})
+    stats = retention.RetentionManager(str(inbox)).run(today=TODAY)
+    ok &= check(stats['cases_archived'] == 2, "Hot and packed cases of closed days archived")
+    ok &= check(not hot.exists() and not pack_path(str(inbox), CAMERA, PACKED_DAY).exists(),
+                "Archived cases left the tree and the pack")
+    ok &= check(plate_cases(inbox, '3300000') == {str(inbox / CAMERA / NEW_DAY / 'case000')},
+                "Archived cases dropped from the plate index")
+    ok &= check(stats_total(inbox) == 1, "Archived cases subtracted from the stats")
+
+    archive = retention.ColdArchive(str(inbox))
+    ok &= check(archive.restore_case(CAMERA, OLD_DAY, 'case000') == str(hot), "Case restored from the archive")
+    ok &= check({name: data for name, (data, _) in snapshot(hot).items()} ==
+                {name: data for name, (data, _) in before.items()}, "Restored case has the same files")
+    ok &= check(str(hot) in plate_cases(inbox, '3300000') and stats_total(inbox) == 2,
+                "Restored case back in the plate index and stats")
+    ok &= check(archive.restore_case(CAMERA, PACKED_DAY, 'case000') == str(packed) and
+                (packed / 'ai' / 'ai.json').exists(), "Packed case restored as a directory")
+    return ok
+
+def test_delete(inbox: Path) -> bool:
+    """Delete closed days without archiving"""
+    for day in (OLD_DAY, PACKED_DAY, NEW_DAY):
+        case_path = create_case(inbox, day, 'case000', '44-00000')
+        ChangeFeed(str(inbox)).append(str(case_path), str(case_path / 'ai' / 'ai.json'), plate='44-00000')
+    processor = AICaseProcessor(str(inbox))
+    processor.rebuild_stats()
+    processor.rebuild_plate_index()
+    pack_day(str(inbox), CAMERA, PACKED_DAY)
+    offenders = RepeatOffenderDetector(str(inbox))
+    offenders.sync()
+
+    ok = check(offenders.estimate('4400000') == 3, "Plate seen in three cases")
+    set_policy(inbox, hot_days={'violation': 2}, archive_days={'violation': 0})
+    stats = retention.RetentionManager(str(inbox)).run(today=TODAY)
+    ok &= check(stats['cases_deleted'] == 2 and not retention.ColdArchive(str(inbox)).index(CAMERA, OLD_DAY, 'violation'),
+                "Closed days deleted, nothing archived")
+    ok &= check(len(plate_cases(inbox, '4400000')) == 1 and stats_total(inbox) == 1,
+                "Deleted cases dropped from the plate index and stats")
+    offenders.sync()
+    ok &= check(offenders.estimate('4400000') == 1, "Deleted cases no longer count as repeat sightings")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_derived_prune, test_archive_restore, test_delete):
+        inbox = Path(tempfile.mkdtemp(prefix='retention_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Retention test passed" if ok else "❌ Retention test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
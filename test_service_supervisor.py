@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for the AI service supervisor
+Checks the health decisions made from worker heartbeats (exit, startup
+timeout, stale heartbeat, stuck worker loop, stalled queue), then runs
+AIServiceManager over stand-in worker processes that speak the heartbeat
+protocol and checks that a standby is loaded once the active worker is up,
+that killing the active worker promotes the warm standby instead of a cold
+start, and that stopping the service leaves no worker or heartbeat behind.
+"""
+
+import os
+import sys
+import time
+import json
+import signal
+import shutil
+import logging
+import tempfile
+import subprocess
+from pathlib import Path
+
+import start_ai_service
+from service_heartbeat import SERVICE_DIR, STATE_ACTIVE, STATE_LOADING, STATE_STANDBY
+from start_ai_service import (HEARTBEAT_TIMEOUT, STARTUP_TIMEOUT, WORKER_STALL_TIMEOUT,
+                              AIServiceManager, WorkerProcess)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPO = str(Path(__file__).resolve().parent)
+
+# Speaks the heartbeat protocol like backend/ai_plate_recognition_service.py
+STAND_IN_WORKER = """
+import sys, time, signal
+sys.path.insert(0, {repo!r})
+import service_heartbeat as sh
+sh.HEARTBEAT_INTERVAL = 0.1
+heartbeat = sh.Heartbeat.from_env()
+heartbeat.status = lambda: {{'worker_beat': time.time(), 'queue_depth': 0, 'processed': 0, 'failed': 0}}
+heartbeat.start()
+time.sleep(0.3)                                             # loading models
+signal.signal(signal.SIGUSR1, lambda *args: heartbeat.set_state(sh.STATE_ACTIVE))
+signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+heartbeat.set_state(sh.STATE_STANDBY if '--standby' in sys.argv else sh.STATE_ACTIVE)
+while True:
+    time.sleep(0.05)
+"""
+
+def write_heartbeat(worker: WorkerProcess, **fields):
+    worker.heartbeat_file.parent.mkdir(parents=True, exist_ok=True)
+    worker.heartbeat_file.write_text(json.dumps(dict({'pid': worker.pid, 'ts': time.time()}, **fields)))
+
+def supervise_until(manager: AIServiceManager, condition, timeout: float = 15.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not manager.supervise():
+            return False
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+def check(ok: bool, message: str) -> bool:
+    logger.info(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+def test_health(inbox: Path) -> bool:
+    """Health decisions from the heartbeat"""
+    sleeper = inbox / 'sleeper.py'
+    sleeper.write_text("import time\ntime.sleep(60)\n")
+    worker = WorkerProcess(sleeper, inbox, str(inbox), 'worker-health', standby=False)
+    try:
+        now = time.time()
+        ok = check(worker.health(now) is None, "Loading worker without a heartbeat is given time")
+        ok &= check('not ready' in (worker.health(now + STARTUP_TIMEOUT + 1) or ''), "Startup timeout")
+        write_heartbeat(worker, state=STATE_ACTIVE, ts=now - HEARTBEAT_TIMEOUT - 5)
+        ok &= check('heartbeat stale' in (worker.health(time.time()) or ''), "Frozen process: stale heartbeat")
+        write_heartbeat(worker, state=STATE_ACTIVE, worker_beat=now, current_case='case001')
+        ok &= check(worker.health(now + 1) is None, "Fresh heartbeat and worker loop: healthy")
+        ok &= check('worker stuck' in (worker.health(now + WORKER_STALL_TIMEOUT + 1) or '') and
+                    'case001' in worker.health(now + WORKER_STALL_TIMEOUT + 1), "Stuck worker loop names its case")
+        write_heartbeat(worker, state=STATE_ACTIVE, worker_beat=time.time() + 10 ** 6,
+                        queue_depth=5, processed=3, failed=0)
+        worker.health(now)
+        ok &= check(worker.health(now + WORKER_STALL_TIMEOUT / 2) is None, "Queue moving within the timeout")
+        ok &= check('queue stalled' in (worker.health(now + WORKER_STALL_TIMEOUT + 1) or ''),
+                    "Pending cases with nothing finished: stalled queue")
+        write_heartbeat(worker, state=STATE_STANDBY)
+        ok &= check(worker.health(now + WORKER_STALL_TIMEOUT + 1) is None, "Idle standby is healthy")
+        worker.process.kill()
+        worker.process.wait()
+        ok &= check('exited with code' in (worker.health(time.time()) or ''), "Exited worker")
+    finally:
+        worker.stop(timeout=1)
+    return ok
+
+def test_warm_failover(inbox: Path) -> bool:
+    """A killed active worker is replaced by the warm standby"""
+    script = inbox / 'stand_in_worker.py'
+    script.write_text(STAND_IN_WORKER.format(repo=REPO))
+    manager = AIServiceManager(str(inbox), keep_standby=True)
+    manager.service_script = script
+    try:
+        ok = check(manager.start_ai_service(), "Active worker started")
+        ok &= check(supervise_until(manager, lambda: manager.standby is not None and
+                                    manager.standby.state() == STATE_STANDBY),
+                    "Standby loaded once the active worker is up")
+        ok &= check(manager.active.state() == STATE_ACTIVE, "Active worker monitoring")
+
+        killed, standby = manager.active, manager.standby
+        os.kill(killed.pid, signal.SIGKILL)
+        ok &= check(supervise_until(manager, lambda: manager.active is standby and
+                                    standby.state() == STATE_ACTIVE and manager.standby is not None),
+                    "Standby promoted and a new standby spawned")
+        status = json.loads(start_ai_service.supervisor_path(str(inbox)).read_text())
+        ok &= check(status['warm_failovers'] == 1 and status['cold_starts'] == 1 and status['restarts'] == 1,
+                    "Failover was warm, no second cold start")
+        ok &= check(status['failover_time']['count'] == 1 and status['time_to_ready']['count'] >= 2 and
+                    'exited with code' in status['recent_failures'][0]['reason'], "Failover timing and reason recorded")
+    finally:
+        workers = [w for w in (manager.active, manager.standby) if w is not None]
+        manager.stop_ai_service()
+    ok &= check(all(w.process.poll() is not None for w in workers), "Stopping the service ends every worker")
+    ok &= check(not list((inbox / SERVICE_DIR).glob('worker-*.json')), "No heartbeat left behind")
+    return ok
+
+def main():
+    ok = True
+    for test in (test_health, test_warm_failover):
+        inbox = Path(tempfile.mkdtemp(prefix='supervisor_test_'))
+        try:
+            logger.info(f"🧪 {test.__doc__}")
+            ok &= test(inbox)
+        except Exception:
+            logger.exception(f"❌ {test.__name__} raised")
+            ok = False
+        finally:
+            shutil.rmtree(inbox, ignore_errors=True)
+    logger.info("✅ Service supervisor test passed" if ok else "❌ Service supervisor test failed")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for camera sharding
+Runs several node processes against one temporary inbox and checks that
+every case is processed exactly once and no camera is ever worked on by two
+nodes at the same time, while nodes join, get killed and leave.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import shutil
+import logging
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import camera_shards
+from camera_shards import CameraShards
+from case_walker import walk_cases
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CAMERAS = 12
+CASES_PER_CAMERA = 15
+PROCESS_SECONDS = 0.1
+
+def create_case(inbox: Path, camera: str, index: int):
+    case_path = inbox / camera / '2025-10-14' / f"case{index:03d}"
+    case_path.mkdir(parents=True, exist_ok=True)
+    (case_path / 'photo_1.jpg').write_bytes(b'jpeg')
+    with open(case_path / 'verdict.json', 'w') as f:
+        json.dump({'camera_id': camera, 'decision': 'violation'}, f)
+
+def fast_timings():
+    """Shrink the lease timings so failover happens within seconds"""
+    camera_shards.RENEW_INTERVAL = 0.3
+    camera_shards.NODE_TTL = 1.0
+    camera_shards.LEASE_TTL = 2.0
+    camera_shards.LEASE_MARGIN = 0.5
+
+def run_node(inbox: str, node: str, stop_file: str):
+    """One simulated AI service node: process the unprocessed cases of the cameras it holds"""
+    fast_timings()
+    log_path = Path(inbox) / f"intervals-{node}-{os.getpid()}.jsonl"
+    shards = CameraShards(inbox, node=node)
+    shards.start()
+    leave_file = os.path.join(inbox, f"{node}.stop")
+    while not os.path.exists(stop_file) and not os.path.exists(leave_file):
+        for camera in sorted(shards.summary()['cameras']):
+            for case in walk_cases(inbox, camera_filter=camera, camera_prefix=None, scan_ai=True):
+                if case.has_ai_folder or not shards.begin(camera):
+                    continue
+                try:
+                    started = time.time()
+                    time.sleep(PROCESS_SECONDS)
+                    os.makedirs(case.ai_path, exist_ok=True)
+                    with open(os.path.join(case.ai_path, f"done-{shards.holder}"), 'w') as f:
+                        f.write(node)
+                    with open(log_path, 'a') as f:
+                        f.write(json.dumps({'camera': camera, 'holder': shards.holder,
+                                            'start': started, 'end': time.time()}) + '\n')
+                finally:
+                    shards.end(camera)
+        time.sleep(0.1)
+    shards.stop()
+
+def check_results(inbox: Path) -> bool:
+    ok = True
+    cases = list(walk_cases(str(inbox), camera_prefix=None, scan_ai=True))
+    for case in cases:
+        done = [n for n in os.listdir(case.ai_path)] if case.has_ai_folder else []
+        if len(done) != 1:
+            logger.error(f"❌ {case.path} processed {len(done)} times")
+            ok = False
+    logger.info(f"📊 {len(cases)} cases checked")
+
+    # No two holders may work on one camera at overlapping times
+    intervals = {}
+    for log_path in inbox.glob('intervals-*.jsonl'):
+        for line in log_path.read_text().splitlines():
+            entry = json.loads(line)
+            intervals.setdefault(entry['camera'], []).append(entry)
+    for camera, entries in intervals.items():
+        entries.sort(key=lambda e: e['start'])
+        for previous, current in zip(entries, entries[1:]):
+            if current['holder'] != previous['holder'] and current['start'] < previous['end']:
+                logger.error(f"❌ Camera {camera} processed by two nodes at once")
+                ok = False
+    holders = {e['holder'].split(':')[0] for entries in intervals.values() for e in entries}
+    logger.info(f"📊 Nodes that processed cases: {', '.join(sorted(holders))}")
+    return ok
+
+def main():
+    inbox = Path(tempfile.mkdtemp(prefix='shard_test_'))
+    stop_file = str(inbox / 'STOP')
+    cameras = [f"camera{i:03d}" for i in range(1, CAMERAS + 1)]
+    for camera in cameras:
+        for index in range(CASES_PER_CAMERA):
+            create_case(inbox, camera, index)
+
+    def spawn(node):
+        process = multiprocessing.Process(target=run_node, args=(str(inbox), node, stop_file), name=node)
+        process.start()
+        return process
+
+    try:
+        nodes = {name: spawn(name) for name in ('node-a', 'node-b', 'node-c')}
+        time.sleep(1.5)
+
+        logger.info("➕ node-d joins")
+        nodes['node-d'] = spawn('node-d')
+        for camera in cameras:
+            create_case(inbox, camera, CASES_PER_CAMERA)
+        time.sleep(1.5)
+
+        logger.info("💥 node-b is killed")
+        os.kill(nodes['node-b'].pid, signal.SIGKILL)
+        nodes['node-b'].join()
+        for camera in cameras:
+            create_case(inbox, camera, CASES_PER_CAMERA + 1)
+        time.sleep(1.5)
+
+        logger.info("👋 node-c leaves")
+        Path(inbox / 'node-c.stop').touch()
+        nodes['node-c'].join()
+
+        # Everything must get processed by the remaining nodes
+        total = CAMERAS * (CASES_PER_CAMERA + 2)
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            done = sum(1 for case in walk_cases(str(inbox), camera_prefix=None, scan_ai=True) if case.has_ai_folder)
+            if done >= total:
+                break
+            time.sleep(0.5)
+
+        Path(stop_file).touch()
+        for process in nodes.values():
+            process.join(timeout=10)
+
+        ok = check_results(inbox)
+        logger.info("✅ Sharding test passed" if ok else "❌ Sharding test failed")
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(inbox, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())